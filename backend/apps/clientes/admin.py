@@ -1,7 +1,7 @@
 from django.contrib import admin
 from simple_history.admin import SimpleHistoryAdmin
 
-from .models import Cliente, Billetera, MovimientoBilletera
+from .models import Cliente, Billetera, MovimientoBilletera, SaldoMensualBilletera
 
 
 class MovimientoBilleteraInline(admin.TabularInline):
@@ -40,7 +40,8 @@ class BilleteraAdmin(admin.ModelAdmin):
         "cliente__user__last_name",
         "cliente__user__email",
     )
-    readonly_fields = ("created_at", "updated_at")
+    # El saldo solo cambia con movimientos (agregar_saldo / descontar_saldo).
+    readonly_fields = ("saldo", "aviso_vencimiento_para", "created_at", "updated_at")
     inlines = [MovimientoBilleteraInline]
 
     def cliente_nombre(self, obj):
@@ -90,6 +91,30 @@ class MovimientoBilleteraAdmin(admin.ModelAdmin):
         return False
 
 
+@admin.register(SaldoMensualBilletera)
+class SaldoMensualBilleteraAdmin(admin.ModelAdmin):
+    """Resúmenes mensuales de billetera (los arma la tarea de consolidación)"""
+
+    list_display = (
+        "billetera",
+        "mes",
+        "saldo_inicial",
+        "creditos",
+        "debitos",
+        "saldo_final",
+        "cantidad_movimientos",
+    )
+    list_filter = ("mes",)
+    search_fields = (
+        "billetera__cliente__user__first_name",
+        "billetera__cliente__user__last_name",
+    )
+    readonly_fields = list_display + ("actualizado_en",)
+
+    def has_add_permission(self, request):
+        return False
+
+
 @admin.register(Cliente)
 class ClienteAdmin(SimpleHistoryAdmin):
     list_display = (
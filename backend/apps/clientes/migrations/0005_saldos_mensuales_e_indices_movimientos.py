@@ -0,0 +1,55 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:27
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0004_billetera_fecha_vencimiento'),
+        ('turnos', '0024_exportacionreporte'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaldoMensualBilletera',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField(help_text='Primer día del mes.', verbose_name='Mes')),
+                ('saldo_inicial', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Saldo inicial')),
+                ('creditos', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12, verbose_name='Créditos')),
+                ('debitos', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12, verbose_name='Débitos')),
+                ('saldo_final', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Saldo final')),
+                ('cantidad_movimientos', models.PositiveIntegerField(default=0, verbose_name='Cantidad de movimientos')),
+                ('actualizado_en', models.DateTimeField(auto_now=True, verbose_name='Actualizado en')),
+            ],
+            options={
+                'verbose_name': 'Saldo Mensual de Billetera',
+                'verbose_name_plural': 'Saldos Mensuales de Billetera',
+                'ordering': ['-mes'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='movimientobilletera',
+            index=models.Index(fields=['billetera', 'created_at'], name='mov_billetera_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimientobilletera',
+            index=models.Index(fields=['tipo', 'created_at'], name='mov_billetera_tipo_fecha_idx'),
+        ),
+        migrations.AddField(
+            model_name='saldomensualbilletera',
+            name='billetera',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saldos_mensuales', to='clientes.billetera', verbose_name='Billetera'),
+        ),
+        migrations.AddIndex(
+            model_name='saldomensualbilletera',
+            index=models.Index(fields=['mes'], name='saldo_mensual_mes_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='saldomensualbilletera',
+            constraint=models.UniqueConstraint(fields=('billetera', 'mes'), name='saldo_mensual_billetera_unico'),
+        ),
+    ]
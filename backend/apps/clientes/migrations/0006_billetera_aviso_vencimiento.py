@@ -0,0 +1,22 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0005_saldos_mensuales_e_indices_movimientos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='billetera',
+            name='aviso_vencimiento_para',
+            field=models.DateField(blank=True, help_text='Fecha de vencimiento sobre la que ya se avisó al cliente.', null=True, verbose_name='Aviso de vencimiento enviado para'),
+        ),
+        migrations.AddIndex(
+            model_name='billetera',
+            index=models.Index(condition=models.Q(('saldo__gt', 0)), fields=['fecha_vencimiento', 'id'], name='billetera_vencimiento_idx'),
+        ),
+    ]
@@ -1,8 +1,14 @@
 """Modelos para la app de clientes"""
 
-from django.db import models
+from decimal import Decimal
+
+from django.db import models, transaction
 from django.conf import settings
-from simple_history.models import HistoricalRecords
+from django.core.exceptions import ValidationError
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from apps.core.history import BufferedHistoricalRecords
 
 
 class Cliente(models.Model):
@@ -35,7 +41,7 @@ class Cliente(models.Model):
     updated_at = models.DateTimeField(
         auto_now=True, verbose_name="Fecha de actualización"
     )
-    history = HistoricalRecords()
+    history = BufferedHistoricalRecords()
 
     class Meta:
         """Meta datos del modelo"""
@@ -151,6 +157,12 @@ class Billetera(models.Model):
         verbose_name="Fecha de vencimiento del saldo",
         help_text="Fecha límite hasta la cual el crédito de la billetera es válido.",
     )
+    aviso_vencimiento_para = models.DateField(
+        blank=True,
+        null=True,
+        verbose_name="Aviso de vencimiento enviado para",
+        help_text="Fecha de vencimiento sobre la que ya se avisó al cliente.",
+    )
     created_at = models.DateTimeField(
         auto_now_add=True, verbose_name="Fecha de creación"
     )
@@ -161,19 +173,23 @@ class Billetera(models.Model):
     class Meta:
         verbose_name = "Billetera"
         verbose_name_plural = "Billeteras"
+        indexes = [
+            # Solo las billeteras con saldo pueden vencer: el proceso diario
+            # recorre este índice por rango de fecha.
+            models.Index(
+                fields=["fecha_vencimiento", "id"],
+                name="billetera_vencimiento_idx",
+                condition=models.Q(saldo__gt=0),
+            ),
+        ]
 
     def __str__(self):
         return f"Billetera de {self.cliente.nombre_completo} - ${self.saldo}"
 
-    def actualizar_fecha_vencimiento(self, dias=None):
-        """Actualiza la fecha de vencimiento del saldo.
-
-        Por simplicidad, se maneja una única fecha de vencimiento para todo el saldo
-        de la billetera. Cada vez que se acredita nuevo saldo, se extiende la
-        vigencia a hoy + ``dias`` si esa fecha es posterior a la ya existente.
-        """
+    @staticmethod
+    def _fecha_vencimiento_extendida(dias=None):
+        """Hoy + ``dias`` (configuración global, mínimo 30)."""
         from datetime import timedelta
-        from django.utils import timezone
 
         if dias is None:
             # Usa la configuración global y cae a 90 si hubiera algún problema.
@@ -186,19 +202,22 @@ class Billetera(models.Model):
                 dias = 90
 
         dias = max(30, int(dias))
+        return timezone.now().date() + timedelta(days=dias)
 
-        hoy = timezone.now().date()
-        nueva_fecha = hoy + timedelta(days=dias)
+    def actualizar_fecha_vencimiento(self, dias=None):
+        """Actualiza la fecha de vencimiento del saldo.
 
+        Por simplicidad, se maneja una única fecha de vencimiento para todo el saldo
+        de la billetera. Cada vez que se acredita nuevo saldo, se extiende la
+        vigencia a hoy + ``dias`` si esa fecha es posterior a la ya existente.
+        """
+        nueva_fecha = self._fecha_vencimiento_extendida(dias)
         if not self.fecha_vencimiento or nueva_fecha > self.fecha_vencimiento:
             self.fecha_vencimiento = nueva_fecha
 
     @property
     def esta_por_vencer(self):
         """Indica si el saldo está próximo a vencer en la próxima semana."""
-        from datetime import timedelta
-        from django.utils import timezone
-
         if not self.fecha_vencimiento:
             return False
 
@@ -206,46 +225,58 @@ class Billetera(models.Model):
         dias_restantes = (self.fecha_vencimiento - hoy).days
         return 0 <= dias_restantes <= 7
 
-    def agregar_saldo(self, monto, motivo=""):
-        """Agrega crédito a la billetera"""
-        from decimal import Decimal
-
-        self.saldo += Decimal(str(monto))
-        # Actualizar vigencia del saldo cada vez que se acredita nuevo monto
-        self.actualizar_fecha_vencimiento()
-        self.save()
-
-        # Registrar movimiento
-        MovimientoBilletera.objects.create(
-            billetera=self,
-            tipo="credito",
-            monto=monto,
-            saldo_anterior=self.saldo - Decimal(str(monto)),
-            saldo_nuevo=self.saldo,
-            descripcion=motivo,
-        )
-
-    def descontar_saldo(self, monto, motivo=""):
-        """Descuenta saldo de la billetera"""
-        from decimal import Decimal
-        from django.core.exceptions import ValidationError
+    def agregar_saldo(self, monto, motivo="", turno=None):
+        """Agrega crédito a la billetera y devuelve el movimiento registrado.
 
-        monto_decimal = Decimal(str(monto))
-        if self.saldo < monto_decimal:
-            raise ValidationError("Saldo insuficiente")
+        El saldo se suma en la base con un único ``UPDATE`` (``saldo + monto``),
+        así que dos acreditaciones simultáneas no se pisan aunque cada una
+        tenga una copia vieja de la billetera. También extiende la vigencia.
+        """
+        monto = Decimal(str(monto))
+        nueva_fecha = Value(self._fecha_vencimiento_extendida(), output_field=models.DateField())
+        with transaction.atomic():
+            Billetera.objects.filter(pk=self.pk).update(
+                saldo=F("saldo") + monto,
+                fecha_vencimiento=Greatest(Coalesce("fecha_vencimiento", nueva_fecha), nueva_fecha),
+                updated_at=timezone.now(),
+            )
+            return self._registrar_movimiento("credito", monto, motivo, turno)
 
-        saldo_anterior = self.saldo
-        self.saldo -= monto_decimal
-        self.save()
+    def descontar_saldo(self, monto, motivo="", turno=None):
+        """Descuenta saldo de la billetera y devuelve el movimiento registrado.
 
-        # Registrar movimiento
-        MovimientoBilletera.objects.create(
+        El control de saldo suficiente va en el mismo ``UPDATE``
+        (``WHERE saldo >= monto``): si otro débito se adelantó, no se descuenta
+        nada y se levanta ``ValidationError``.
+        """
+        monto = Decimal(str(monto))
+        with transaction.atomic():
+            actualizadas = Billetera.objects.filter(pk=self.pk, saldo__gte=monto).update(
+                saldo=F("saldo") - monto,
+                updated_at=timezone.now(),
+            )
+            if not actualizadas:
+                self.refresh_from_db(fields=["saldo"])
+                raise ValidationError("Saldo insuficiente")
+            return self._registrar_movimiento("debito", monto, motivo, turno)
+
+    def _registrar_movimiento(self, tipo, monto, motivo, turno):
+        # Dentro de la transacción del UPDATE la fila sigue bloqueada: el saldo
+        # leído es exactamente el que dejó este movimiento.
+        self.saldo, self.fecha_vencimiento = (
+            Billetera.objects.filter(pk=self.pk)
+            .values_list("saldo", "fecha_vencimiento")
+            .get()
+        )
+        saldo_anterior = self.saldo - monto if tipo == "credito" else self.saldo + monto
+        return MovimientoBilletera.objects.create(
             billetera=self,
-            tipo="debito",
+            tipo=tipo,
             monto=monto,
             saldo_anterior=saldo_anterior,
             saldo_nuevo=self.saldo,
             descripcion=motivo,
+            turno=turno,
         )
 
 
@@ -292,6 +323,67 @@ class MovimientoBilletera(models.Model):
         verbose_name = "Movimiento de Billetera"
         verbose_name_plural = "Movimientos de Billetera"
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(
+                fields=["billetera", "created_at"], name="mov_billetera_fecha_idx"
+            ),
+            models.Index(fields=["tipo", "created_at"], name="mov_billetera_tipo_fecha_idx"),
+        ]
 
     def __str__(self):
         return f"{self.get_tipo_display()} - ${self.monto} - {self.created_at.strftime('%d/%m/%Y %H:%M')}"
+
+    def save(self, *args, **kwargs):
+        # El libro es de solo agregado: una corrección es un movimiento nuevo.
+        if not self._state.adding:
+            raise ValidationError("Los movimientos de billetera no se modifican.")
+        super().save(*args, **kwargs)
+
+
+class SaldoMensualBilletera(models.Model):
+    """
+    Resumen de un mes cerrado de la billetera, armado desde su libro.
+
+    Solo hay fila para los meses con movimientos. Como los movimientos no se
+    modifican ni se registran con fecha pasada, un mes cerrado no cambia y los
+    extractos y totales pueden sumar estos resúmenes y leer del libro solo los
+    tramos que no cubren.
+    """
+
+    billetera = models.ForeignKey(
+        Billetera,
+        on_delete=models.CASCADE,
+        related_name="saldos_mensuales",
+        verbose_name="Billetera",
+    )
+    mes = models.DateField(verbose_name="Mes", help_text="Primer día del mes.")
+    saldo_inicial = models.DecimalField(
+        max_digits=10, decimal_places=2, verbose_name="Saldo inicial"
+    )
+    creditos = models.DecimalField(
+        max_digits=12, decimal_places=2, default=Decimal("0.00"), verbose_name="Créditos"
+    )
+    debitos = models.DecimalField(
+        max_digits=12, decimal_places=2, default=Decimal("0.00"), verbose_name="Débitos"
+    )
+    saldo_final = models.DecimalField(
+        max_digits=10, decimal_places=2, verbose_name="Saldo final"
+    )
+    cantidad_movimientos = models.PositiveIntegerField(
+        default=0, verbose_name="Cantidad de movimientos"
+    )
+    actualizado_en = models.DateTimeField(auto_now=True, verbose_name="Actualizado en")
+
+    class Meta:
+        verbose_name = "Saldo Mensual de Billetera"
+        verbose_name_plural = "Saldos Mensuales de Billetera"
+        ordering = ["-mes"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["billetera", "mes"], name="saldo_mensual_billetera_unico"
+            )
+        ]
+        indexes = [models.Index(fields=["mes"], name="saldo_mensual_mes_idx")]
+
+    def __str__(self):
+        return f"{self.billetera} - {self.mes:%m/%Y}: ${self.saldo_final}"
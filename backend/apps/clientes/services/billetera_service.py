@@ -0,0 +1,285 @@
+"""Verificación del libro de movimientos de las billeteras.
+
+El saldo de cada billetera se mueve solo con ``agregar_saldo`` /
+``descontar_saldo``, que registran un ``MovimientoBilletera`` en la misma
+transacción. El verificador controla, con consultas agregadas y sin recorrer
+billeteras en Python, que:
+
+- el saldo coincida con créditos - débitos del libro;
+- cada movimiento sea consistente (``saldo_nuevo = saldo_anterior ± monto``);
+- los movimientos encadenen (``saldo_anterior`` = ``saldo_nuevo`` del anterior).
+
+Para extractos y totales sobre libros grandes, cada mes cerrado se resume en
+``SaldoMensualBilletera``. Un período se calcula sumando los resúmenes de
+los meses completos que cubre y leyendo del libro solo los extremos sueltos
+y el mes en curso, siempre por rango de ``created_at`` para aprovechar los
+índices ``(billetera, created_at)`` y ``(tipo, created_at)``.
+"""
+
+import logging
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from itertools import islice
+
+from django.db.models import Count, DecimalField, F, Max, Min, Q, Sum, Value, Window
+from django.db.models.functions import Coalesce, Lag
+from django.utils import timezone
+
+from apps.clientes.models import Billetera, MovimientoBilletera, SaldoMensualBilletera
+
+logger = logging.getLogger(__name__)
+
+_CERO = Value(Decimal("0.00"), output_field=DecimalField(max_digits=12, decimal_places=2))
+_LOTE_RESUMENES = 1000
+
+
+def billeteras_descuadradas():
+    """Billeteras cuyo saldo no coincide con su libro, anotadas con ``saldo_libro``."""
+    return (
+        Billetera.objects.annotate(
+            creditos=Coalesce(Sum("movimientos__monto", filter=Q(movimientos__tipo="credito")), _CERO),
+            debitos=Coalesce(Sum("movimientos__monto", filter=Q(movimientos__tipo="debito")), _CERO),
+        )
+        .annotate(saldo_libro=F("creditos") - F("debitos"))
+        .exclude(saldo=F("saldo_libro"))
+        .order_by("pk")
+    )
+
+
+def movimientos_inconsistentes():
+    return MovimientoBilletera.objects.filter(
+        (Q(tipo="credito") & ~Q(saldo_nuevo=F("saldo_anterior") + F("monto")))
+        | (Q(tipo="debito") & ~Q(saldo_nuevo=F("saldo_anterior") - F("monto")))
+    )
+
+
+def cortes_de_cadena():
+    """Movimientos cuyo ``saldo_anterior`` no es el ``saldo_nuevo`` del previo."""
+    return (
+        MovimientoBilletera.objects.annotate(
+            saldo_previo=Window(
+                Lag("saldo_nuevo"),
+                partition_by=[F("billetera_id")],
+                # El id se asigna con la fila de la billetera bloqueada por el
+                # UPDATE del saldo: sigue el orden real de los movimientos.
+                order_by=[F("id").asc()],
+            )
+        )
+        .filter(saldo_previo__isnull=False)
+        .exclude(saldo_anterior=F("saldo_previo"))
+    )
+
+
+def verificar_libro_billeteras(limite_detalle=50) -> dict:
+    """Compara saldos con el libro; devuelve el reporte y loguea si hay diferencias."""
+    descuadradas = billeteras_descuadradas()
+    reporte = {
+        "billeteras": Billetera.objects.count(),
+        "descuadradas": descuadradas.count(),
+        "movimientos_inconsistentes": movimientos_inconsistentes().count(),
+        "cortes_de_cadena": cortes_de_cadena().count(),
+        "detalle": [
+            {
+                "billetera_id": billetera.pk,
+                "cliente_id": billetera.cliente_id,
+                "saldo": str(billetera.saldo),
+                "saldo_libro": str(billetera.saldo_libro),
+                "diferencia": str(billetera.saldo - billetera.saldo_libro),
+            }
+            for billetera in descuadradas[:limite_detalle]
+        ],
+    }
+    if reporte["descuadradas"] or reporte["movimientos_inconsistentes"] or reporte["cortes_de_cadena"]:
+        logger.warning("Libro de billeteras con diferencias: %s", reporte)
+    else:
+        logger.info("Libro de billeteras verificado: %s billeteras sin diferencias", reporte["billeteras"])
+    return reporte
+
+
+# ── Resúmenes mensuales ─────────────────────────────────────────────────────
+
+
+def _inicio_mes(fecha):
+    return fecha.replace(day=1)
+
+
+def _mes_siguiente(mes):
+    return (mes.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _inicio_dia(fecha):
+    return timezone.make_aware(datetime.combine(fecha, time.min))
+
+
+def rango_fechas(desde, hasta) -> dict:
+    """Filtro de ``created_at`` entre dos fechas inclusive, usable por los índices.
+
+    ``created_at__date`` aplica una función sobre la columna y obliga a
+    recorrer la tabla; un rango semiabierto de datetimes no.
+    """
+    return {
+        "created_at__gte": _inicio_dia(desde),
+        "created_at__lt": _inicio_dia(hasta + timedelta(days=1)),
+    }
+
+
+def _consolidar_mes(mes) -> int:
+    """Crea o actualiza los resúmenes de ``mes``; devuelve cuántas billeteras resumió."""
+    agregados = (
+        MovimientoBilletera.objects.filter(
+            created_at__gte=_inicio_dia(mes), created_at__lt=_inicio_dia(_mes_siguiente(mes))
+        )
+        .values("billetera_id")
+        .annotate(
+            creditos=Coalesce(Sum("monto", filter=Q(tipo="credito")), _CERO),
+            debitos=Coalesce(Sum("monto", filter=Q(tipo="debito")), _CERO),
+            cantidad=Count("id"),
+            primero=Min("id"),
+            ultimo=Max("id"),
+        )
+        .order_by("billetera_id")
+        .iterator(chunk_size=_LOTE_RESUMENES)
+    )
+    total = 0
+    while lote := list(islice(agregados, _LOTE_RESUMENES)):
+        # Saldos de apertura y cierre: los del primer y último movimiento del mes.
+        saldos = {
+            pk: (anterior, nuevo)
+            for pk, anterior, nuevo in MovimientoBilletera.objects.filter(
+                pk__in=[fila["primero"] for fila in lote] + [fila["ultimo"] for fila in lote]
+            ).values_list("pk", "saldo_anterior", "saldo_nuevo")
+        }
+        SaldoMensualBilletera.objects.bulk_create(
+            [
+                SaldoMensualBilletera(
+                    billetera_id=fila["billetera_id"],
+                    mes=mes,
+                    saldo_inicial=saldos[fila["primero"]][0],
+                    creditos=fila["creditos"],
+                    debitos=fila["debitos"],
+                    saldo_final=saldos[fila["ultimo"]][1],
+                    cantidad_movimientos=fila["cantidad"],
+                )
+                for fila in lote
+            ],
+            update_conflicts=True,
+            unique_fields=["billetera", "mes"],
+            update_fields=["saldo_inicial", "creditos", "debitos", "saldo_final", "cantidad_movimientos"],
+        )
+        total += len(lote)
+    return total
+
+
+def _ultimo_mes_consolidado():
+    return SaldoMensualBilletera.objects.aggregate(ultimo=Max("mes"))["ultimo"]
+
+
+def consolidar_saldos_mensuales(hoy=None) -> dict:
+    """Resume los meses cerrados que todavía no tienen resumen.
+
+    Retoma desde el último mes resumido (o desde el primer movimiento del
+    libro), así que puede correr todos los días: cuando no hay meses nuevos
+    no hace nada.
+    """
+    mes_actual = _inicio_mes(hoy or timezone.localdate())
+    ultimo = _ultimo_mes_consolidado()
+    if ultimo is not None:
+        mes = _mes_siguiente(ultimo)
+    else:
+        primero = MovimientoBilletera.objects.order_by("pk").values_list("created_at", flat=True).first()
+        if primero is None:
+            return {"meses": 0, "resumenes": 0}
+        mes = _inicio_mes(timezone.localtime(primero).date())
+
+    meses = resumenes = 0
+    while mes < mes_actual:
+        resumenes += _consolidar_mes(mes)
+        meses += 1
+        mes = _mes_siguiente(mes)
+    if meses:
+        logger.info("Saldos mensuales de billeteras: %s meses, %s resúmenes", meses, resumenes)
+    return {"meses": meses, "resumenes": resumenes}
+
+
+def _dividir_periodo(desde, hasta):
+    """Parte ``[desde, hasta]`` en meses ya resumidos y tramos a leer del libro.
+
+    Devuelve ``(meses, tramos)``: ``meses`` es ``(primer_mes, fin)`` o ``None``
+    y ``tramos`` una lista de ``(inicio, fin)``, con ``fin`` exclusivo.
+    """
+    fin = hasta + timedelta(days=1)
+    ultimo = _ultimo_mes_consolidado()
+    primer_mes = desde if desde.day == 1 else _mes_siguiente(_inicio_mes(desde))
+    fin_meses = min(_inicio_mes(fin), _mes_siguiente(ultimo)) if ultimo else primer_mes
+    if primer_mes >= fin_meses:
+        return None, [(desde, fin)]
+    tramos = []
+    if desde < primer_mes:
+        tramos.append((desde, primer_mes))
+    if fin_meses < fin:
+        tramos.append((fin_meses, fin))
+    return (primer_mes, fin_meses), tramos
+
+
+def totales_movimientos(desde, hasta, billetera=None) -> dict:
+    """Créditos, débitos y cantidad de movimientos entre dos fechas inclusive."""
+    totales = {"creditos": Decimal("0.00"), "debitos": Decimal("0.00"), "cantidad": 0}
+    meses, tramos = _dividir_periodo(desde, hasta)
+    if meses:
+        resumenes = SaldoMensualBilletera.objects.filter(mes__gte=meses[0], mes__lt=meses[1])
+        if billetera is not None:
+            resumenes = resumenes.filter(billetera=billetera)
+        agregado = resumenes.aggregate(
+            creditos=Coalesce(Sum("creditos"), _CERO),
+            debitos=Coalesce(Sum("debitos"), _CERO),
+            cantidad=Coalesce(Sum("cantidad_movimientos"), 0),
+        )
+        for clave in totales:
+            totales[clave] += agregado[clave]
+
+    for inicio, fin in tramos:
+        movimientos = MovimientoBilletera.objects.filter(
+            created_at__gte=_inicio_dia(inicio), created_at__lt=_inicio_dia(fin)
+        )
+        if billetera is not None:
+            movimientos = movimientos.filter(billetera=billetera)
+        # Un agregado por tipo para que el rango use el índice (tipo, created_at).
+        for tipo, clave in (("credito", "creditos"), ("debito", "debitos")):
+            agregado = movimientos.filter(tipo=tipo).aggregate(total=Sum("monto"), cantidad=Count("id"))
+            totales[clave] += agregado["total"] or Decimal("0.00")
+            totales["cantidad"] += agregado["cantidad"]
+    return totales
+
+
+def saldo_al(billetera, fecha) -> Decimal:
+    """Saldo de ``billetera`` al comenzar el día ``fecha``.
+
+    Parte del último resumen anterior al mes de ``fecha`` y suma los
+    movimientos posteriores a ese resumen.
+    """
+    resumen = billetera.saldos_mensuales.filter(mes__lt=_inicio_mes(fecha)).order_by("-mes").first()
+    movimientos = billetera.movimientos.filter(created_at__lt=_inicio_dia(fecha))
+    saldo = Decimal("0.00")
+    if resumen is not None:
+        saldo = resumen.saldo_final
+        movimientos = movimientos.filter(created_at__gte=_inicio_dia(_mes_siguiente(resumen.mes)))
+    agregado = movimientos.aggregate(
+        creditos=Coalesce(Sum("monto", filter=Q(tipo="credito")), _CERO),
+        debitos=Coalesce(Sum("monto", filter=Q(tipo="debito")), _CERO),
+    )
+    return saldo + agregado["creditos"] - agregado["debitos"]
+
+
+def estado_de_cuenta(billetera, desde, hasta) -> dict:
+    """Saldo inicial, créditos, débitos y saldo final de ``billetera`` en el período."""
+    saldo_inicial = saldo_al(billetera, desde)
+    totales = totales_movimientos(desde, hasta, billetera=billetera)
+    return {
+        "desde": desde,
+        "hasta": hasta,
+        "saldo_inicial": saldo_inicial,
+        "creditos": totales["creditos"],
+        "debitos": totales["debitos"],
+        "cantidad_movimientos": totales["cantidad"],
+        "saldo_final": saldo_inicial + totales["creditos"] - totales["debitos"],
+    }
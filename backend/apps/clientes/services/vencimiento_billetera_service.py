@@ -0,0 +1,222 @@
+"""Vencimiento masivo del saldo de las billeteras.
+
+Corre una vez por día y trabaja en dos fases sobre el índice parcial
+``(fecha_vencimiento, id) WHERE saldo > 0``:
+
+- ``vencer``: las billeteras con ``fecha_vencimiento`` anterior a hoy pierden
+  el saldo. Por lote se bloquean las filas, se pone el saldo en cero con un
+  solo ``UPDATE`` y los débitos de vencimiento se escriben con
+  ``bulk_create``, todo en la misma transacción.
+- ``avisar``: a las que vencen dentro de ``BILLETERA_AVISO_VENCIMIENTO_DIAS``
+  se les manda el email de ``EmailService`` con el envío en lotes de
+  ``apps.emails.tasks`` y se les crea la notificación in-app.
+  ``aviso_vencimiento_para`` evita repetir el aviso para la misma fecha y
+  solo queda en las billeteras cuyo aviso salió.
+
+Los lotes se recorren por clave (``fecha_vencimiento``, ``id``) y la última
+clave procesada de cada fase se guarda en caché: si la corrida se corta, la
+siguiente del mismo día retoma desde ahí. Las billeteras ya procesadas
+tampoco vuelven a entrar (quedan sin saldo o con el aviso registrado). El
+checkpoint no pasa de un lote con emails fallidos: la próxima corrida, del
+mismo día o del siguiente, los vuelve a intentar.
+"""
+
+import logging
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from apps.clientes.models import Billetera, MovimientoBilletera
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_KEY = "billeteras:vencimiento:{fase}:{fecha}"
+MOTIVO_VENCIMIENTO = "Vencimiento del saldo"
+
+
+def _lote() -> int:
+    return max(1, int(getattr(settings, "BILLETERA_VENCIMIENTO_LOTE", 1000)))
+
+
+def _recorrer_lotes(billeteras, fase, hoy, tamano, procesar) -> int:
+    """Pasa los ids de ``billeteras`` a ``procesar`` de a ``tamano``; devuelve los lotes.
+
+    Retoma desde el checkpoint del día y lo avanza mientras ``procesar``
+    devuelva verdadero. Después de un lote incompleto el checkpoint queda
+    fijo y la corrida sigue con los lotes siguientes.
+    """
+    clave = CHECKPOINT_KEY.format(fase=fase, fecha=hoy.isoformat())
+    cursor = cache.get(clave)
+    avanzar = True
+    lotes = 0
+    while True:
+        pagina = billeteras
+        if cursor is not None:
+            fecha, pk = cursor
+            pagina = pagina.filter(Q(fecha_vencimiento__gt=fecha) | Q(fecha_vencimiento=fecha, pk__gt=pk))
+        claves = list(
+            pagina.order_by("fecha_vencimiento", "pk").values_list("fecha_vencimiento", "pk")[:tamano]
+        )
+        if not claves:
+            return lotes
+        avanzar = procesar([pk for _, pk in claves]) and avanzar
+        lotes += 1
+        cursor = claves[-1]
+        if avanzar:
+            cache.set(clave, cursor, 60 * 60 * 48)
+
+
+def billeteras_vencidas(hoy=None):
+    hoy = hoy or timezone.localdate()
+    return Billetera.objects.filter(saldo__gt=0, fecha_vencimiento__lt=hoy)
+
+
+def billeteras_por_vencer(hoy=None, dias=None):
+    """Con saldo y vencimiento entre hoy y hoy + ``dias``, sin aviso para esa fecha."""
+    hoy = hoy or timezone.localdate()
+    dias = int(dias if dias is not None else getattr(settings, "BILLETERA_AVISO_VENCIMIENTO_DIAS", 7))
+    return Billetera.objects.filter(
+        saldo__gt=0,
+        fecha_vencimiento__gte=hoy,
+        fecha_vencimiento__lte=hoy + timedelta(days=dias),
+    ).exclude(aviso_vencimiento_para=F("fecha_vencimiento"))
+
+
+def _vencer_lote(ids, hoy) -> tuple:
+    """Da de baja el saldo vencido de ``ids``; devuelve (billeteras, monto)."""
+    with transaction.atomic():
+        # Se vuelve a filtrar con las filas bloqueadas: una acreditación que
+        # entró mientras tanto extendió la vigencia y saca a la billetera.
+        saldos = list(
+            billeteras_vencidas(hoy)
+            .select_for_update()
+            .filter(pk__in=ids)
+            .values_list("pk", "saldo")
+        )
+        if not saldos:
+            return 0, Decimal("0.00")
+        Billetera.objects.filter(pk__in=[pk for pk, _ in saldos]).update(
+            saldo=Decimal("0.00"), updated_at=timezone.now()
+        )
+        MovimientoBilletera.objects.bulk_create(
+            [
+                MovimientoBilletera(
+                    billetera_id=pk,
+                    tipo="debito",
+                    monto=saldo,
+                    saldo_anterior=saldo,
+                    saldo_nuevo=Decimal("0.00"),
+                    descripcion=MOTIVO_VENCIMIENTO,
+                )
+                for pk, saldo in saldos
+            ]
+        )
+    return len(saldos), sum((saldo for _, saldo in saldos), Decimal("0.00"))
+
+
+def _avisar_lote(ids, hoy, dias) -> tuple:
+    """Notifica in-app y por email a las billeteras de ``ids``; devuelve (avisos, emails, fallidos).
+
+    Las billeteras se reclaman con las filas bloqueadas (otra corrida ya no
+    las toma), los emails salen fuera de la transacción y el aviso solo queda
+    registrado, con su notificación, para las que lo recibieron. Las que no
+    tienen email se avisan solo in-app; a las que falló el envío se les
+    libera el reclamo y se reintentan en la próxima corrida.
+    """
+    from apps.emails.models import Notificacion
+    from apps.emails.services.email_service import EmailService
+    from apps.emails.tasks import _enviar_emails_en_lotes
+
+    with transaction.atomic():
+        billeteras = list(
+            billeteras_por_vencer(hoy, dias)
+            .select_for_update(of=("self",))
+            .filter(pk__in=ids)
+            .select_related("cliente__user")
+        )
+        if not billeteras:
+            return 0, 0, 0
+        Billetera.objects.filter(pk__in=[billetera.pk for billetera in billeteras]).update(
+            aviso_vencimiento_para=F("fecha_vencimiento")
+        )
+
+    mensajes = []
+    for billetera in billeteras:
+        mensaje = EmailService.mensaje_vencimiento_billetera(
+            billetera, (billetera.fecha_vencimiento - hoy).days
+        )
+        if mensaje is not None:
+            mensajes.append((billetera.pk, mensaje))
+    enviados = _enviar_emails_en_lotes(mensajes)
+    fallidos = {billetera_id for billetera_id, _ in mensajes} - enviados
+    avisadas = [billetera for billetera in billeteras if billetera.pk not in fallidos]
+
+    with transaction.atomic():
+        if fallidos:
+            Billetera.objects.filter(
+                pk__in=fallidos, aviso_vencimiento_para=F("fecha_vencimiento")
+            ).update(aviso_vencimiento_para=None)
+        notificaciones = []
+        for billetera in avisadas:
+            restantes = (billetera.fecha_vencimiento - hoy).days
+            notificaciones.append(
+                Notificacion(
+                    usuario=billetera.cliente.user,
+                    tipo="vencimiento_billetera",
+                    titulo="Tu saldo a favor está por vencer",
+                    mensaje=(
+                        f"Tenés ${billetera.saldo} en tu billetera que vence el "
+                        f"{billetera.fecha_vencimiento:%d/%m/%Y} ({restantes} día(s)). "
+                        "Usalo al reservar tu próximo turno."
+                    ),
+                    data={
+                        "billetera_id": billetera.pk,
+                        "saldo": str(billetera.saldo),
+                        "fecha_vencimiento": billetera.fecha_vencimiento.isoformat(),
+                        "dias_restantes": restantes,
+                    },
+                )
+            )
+        Notificacion.objects.bulk_create(notificaciones)
+    return len(avisadas), len(enviados), len(fallidos)
+
+
+def procesar_vencimientos_billeteras(hoy=None, lote=None, dias_aviso=None) -> dict:
+    """Vence los saldos expirados y avisa los próximos; devuelve el reporte."""
+    hoy = hoy or timezone.localdate()
+    lote = int(lote or _lote())
+    dias_aviso = int(
+        dias_aviso if dias_aviso is not None else getattr(settings, "BILLETERA_AVISO_VENCIMIENTO_DIAS", 7)
+    )
+    reporte = {
+        "vencidas": 0,
+        "monto_vencido": Decimal("0.00"),
+        "avisos": 0,
+        "emails": 0,
+        "emails_fallidos": 0,
+        "lotes": 0,
+    }
+
+    def vencer(ids):
+        vencidas, monto = _vencer_lote(ids, hoy)
+        reporte["vencidas"] += vencidas
+        reporte["monto_vencido"] += monto
+        return True
+
+    def avisar(ids):
+        avisos, emails, fallidos = _avisar_lote(ids, hoy, dias_aviso)
+        reporte["avisos"] += avisos
+        reporte["emails"] += emails
+        reporte["emails_fallidos"] += fallidos
+        return not fallidos
+
+    reporte["lotes"] += _recorrer_lotes(billeteras_vencidas(hoy), "vencer", hoy, lote, vencer)
+    reporte["lotes"] += _recorrer_lotes(billeteras_por_vencer(hoy, dias_aviso), "avisar", hoy, lote, avisar)
+
+    logger.info("Vencimiento de billeteras: %s", reporte)
+    return reporte
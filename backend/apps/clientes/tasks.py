@@ -0,0 +1,33 @@
+"""
+Tareas asíncronas de clientes y billeteras
+"""
+
+from celery import shared_task
+
+from apps.clientes.services.billetera_service import (
+    consolidar_saldos_mensuales as consolidar_saldos_mensuales_service,
+    verificar_libro_billeteras as verificar_libro_billeteras_service,
+)
+from apps.clientes.services.vencimiento_billetera_service import (
+    procesar_vencimientos_billeteras as procesar_vencimientos_billeteras_service,
+)
+
+
+@shared_task(name="apps.clientes.tasks.verificar_libro_billeteras")
+def verificar_libro_billeteras():
+    """Controla que el saldo de cada billetera coincida con su libro de movimientos."""
+    reporte = verificar_libro_billeteras_service()
+    return {clave: valor for clave, valor in reporte.items() if clave != "detalle"}
+
+
+@shared_task(name="apps.clientes.tasks.consolidar_saldos_mensuales")
+def consolidar_saldos_mensuales():
+    """Resume los meses cerrados del libro de billeteras que todavía no tienen resumen."""
+    return consolidar_saldos_mensuales_service()
+
+
+@shared_task(name="apps.clientes.tasks.procesar_vencimientos_billeteras")
+def procesar_vencimientos_billeteras():
+    """Da de baja el saldo vencido y avisa a los clientes cuyo saldo está por vencer."""
+    reporte = procesar_vencimientos_billeteras_service()
+    return {**reporte, "monto_vencido": str(reporte["monto_vencido"])}
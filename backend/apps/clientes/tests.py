@@ -1,3 +1,381 @@
-from django.test import TestCase
+import threading
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from unittest.mock import patch
 
-# Create your tests here.
+from django.core import mail
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.clientes.models import Billetera, Cliente, MovimientoBilletera, SaldoMensualBilletera
+from apps.clientes.services.billetera_service import (
+    consolidar_saldos_mensuales,
+    estado_de_cuenta,
+    totales_movimientos,
+    verificar_libro_billeteras,
+)
+from apps.clientes.services.vencimiento_billetera_service import (
+    CHECKPOINT_KEY,
+    procesar_vencimientos_billeteras,
+)
+from apps.emails.models import Notificacion
+from apps.users.models import User
+
+
+def _crear_billetera(sufijo="1"):
+    cliente = Cliente.objects.create(
+        user=User.objects.create_user(
+            email=f"billetera{sufijo}@test.com",
+            password="password1.2.3",
+            username=f"billetera_{sufijo}",
+            role="cliente",
+        )
+    )
+    return Billetera.objects.create(cliente=cliente, saldo=Decimal("0.00"))
+
+
+class BusquedaClientesTest(TestCase):
+    def setUp(self):
+        self.cliente = Cliente.objects.create(
+            user=User.objects.create_user(
+                email="busqueda@test.com",
+                password="password1.2.3",
+                username="busqueda",
+                role="cliente",
+                dni="30123456",
+                phone="011 2233-4455",
+            )
+        )
+        Cliente.objects.create(
+            user=User.objects.create_user(
+                email="otro.busqueda@test.com",
+                password="password1.2.3",
+                username="otro_busqueda",
+                role="cliente",
+                dni="40999888",
+                phone="351 555-6677",
+            )
+        )
+        self.api = APIClient()
+        self.api.force_authenticate(
+            User.objects.create_user(
+                email="owner.busqueda@test.com",
+                password="password1.2.3",
+                username="owner_busqueda",
+                role="propietario",
+            )
+        )
+
+    def _ids(self, termino):
+        response = self.api.get("/api/clientes/", {"search": termino})
+        self.assertEqual(response.status_code, 200)
+        return [item["id"] for item in response.data["results"]]
+
+    def test_busca_por_dni_y_telefono_parcial(self):
+        self.assertEqual(self._ids("30123456"), [self.cliente.pk])
+        self.assertEqual(self._ids("2233-4455"), [self.cliente.pk])
+
+    def test_telefono_completo_en_otro_formato_usa_la_clave_normalizada(self):
+        self.assertEqual(self._ids("+54 9 11 2233 4455"), [self.cliente.pk])
+
+
+class BilleteraSaldoAtomicoTest(TestCase):
+    def setUp(self):
+        self.billetera = _crear_billetera()
+
+    def test_acreditaciones_con_copias_viejas_no_pierden_saldo(self):
+        copia = Billetera.objects.get(pk=self.billetera.pk)
+
+        self.billetera.agregar_saldo(Decimal("100.00"), motivo="Cancelación")
+        movimiento = copia.agregar_saldo(Decimal("50.00"), motivo="Reacomodamiento")
+
+        self.billetera.refresh_from_db()
+        self.assertEqual(self.billetera.saldo, Decimal("150.00"))
+        self.assertEqual(copia.saldo, Decimal("150.00"))
+        self.assertEqual(movimiento.saldo_anterior, Decimal("100.00"))
+        self.assertEqual(movimiento.saldo_nuevo, Decimal("150.00"))
+
+    def test_debito_con_copia_vieja_no_deja_saldo_negativo(self):
+        self.billetera.agregar_saldo(Decimal("100.00"))
+        copia = Billetera.objects.get(pk=self.billetera.pk)
+        self.billetera.descontar_saldo(Decimal("80.00"))
+
+        with self.assertRaises(ValidationError):
+            copia.descontar_saldo(Decimal("50.00"))
+
+        self.assertEqual(copia.saldo, Decimal("20.00"))
+        self.assertEqual(self.billetera.movimientos.filter(tipo="debito").count(), 1)
+
+    def test_credito_extiende_vencimiento_sin_acortarlo(self):
+        lejana = timezone.now().date() + timedelta(days=400)
+        Billetera.objects.filter(pk=self.billetera.pk).update(fecha_vencimiento=lejana)
+
+        self.billetera.agregar_saldo(Decimal("10.00"))
+        self.assertEqual(self.billetera.fecha_vencimiento, lejana)
+
+        Billetera.objects.filter(pk=self.billetera.pk).update(fecha_vencimiento=None)
+        self.billetera.agregar_saldo(Decimal("10.00"))
+        self.assertGreater(self.billetera.fecha_vencimiento, timezone.now().date())
+
+    def test_movimientos_son_de_solo_agregado(self):
+        movimiento = self.billetera.agregar_saldo(Decimal("10.00"))
+        movimiento.descripcion = "Editado"
+
+        with self.assertRaises(ValidationError):
+            movimiento.save()
+
+    def test_verificador_detecta_saldo_y_movimientos_descuadrados(self):
+        self.billetera.agregar_saldo(Decimal("100.00"))
+        self.billetera.descontar_saldo(Decimal("30.00"))
+        otra = _crear_billetera("2")
+        otra.agregar_saldo(Decimal("5.00"))
+
+        reporte = verificar_libro_billeteras()
+        self.assertEqual(
+            (reporte["descuadradas"], reporte["movimientos_inconsistentes"], reporte["cortes_de_cadena"]),
+            (0, 0, 0),
+        )
+
+        Billetera.objects.filter(pk=self.billetera.pk).update(saldo=Decimal("90.00"))
+        MovimientoBilletera.objects.bulk_create(
+            [
+                MovimientoBilletera(
+                    billetera=otra,
+                    tipo="credito",
+                    monto=Decimal("1.00"),
+                    saldo_anterior=Decimal("0.00"),
+                    saldo_nuevo=Decimal("7.00"),
+                )
+            ]
+        )
+
+        reporte = verificar_libro_billeteras()
+        self.assertEqual(reporte["descuadradas"], 2)
+        self.assertEqual(reporte["movimientos_inconsistentes"], 1)
+        self.assertEqual(reporte["cortes_de_cadena"], 1)
+        detalle = {item["billetera_id"]: item for item in reporte["detalle"]}
+        self.assertEqual(detalle[self.billetera.pk]["diferencia"], "20.00")
+
+
+class SaldosMensualesBilleteraTest(TestCase):
+    def setUp(self):
+        self.billetera = _crear_billetera()
+        self.otra = _crear_billetera("2")
+        operaciones = [
+            (self.billetera, "credito", "100.00", date(2026, 1, 10)),
+            (self.otra, "credito", "40.00", date(2026, 1, 31)),
+            (self.billetera, "debito", "30.00", date(2026, 2, 1)),
+            (self.billetera, "credito", "25.00", date(2026, 2, 20)),
+            (self.otra, "debito", "15.00", date(2026, 3, 5)),
+            (self.billetera, "debito", "45.00", date(2026, 4, 2)),
+            (self.billetera, "credito", "10.00", date(2026, 4, 28)),
+        ]
+        for billetera, tipo, monto, fecha in operaciones:
+            operar = billetera.agregar_saldo if tipo == "credito" else billetera.descontar_saldo
+            movimiento = operar(Decimal(monto))
+            MovimientoBilletera.objects.filter(pk=movimiento.pk).update(
+                created_at=timezone.make_aware(datetime.combine(fecha, datetime.min.time()))
+                + timedelta(hours=12)
+            )
+
+    def _totales_libro(self, desde, hasta, billetera=None):
+        movimientos = MovimientoBilletera.objects.filter(
+            created_at__date__gte=desde, created_at__date__lte=hasta
+        )
+        if billetera is not None:
+            movimientos = movimientos.filter(billetera=billetera)
+        return {
+            "creditos": sum((m.monto for m in movimientos if m.tipo == "credito"), Decimal("0.00")),
+            "debitos": sum((m.monto for m in movimientos if m.tipo == "debito"), Decimal("0.00")),
+            "cantidad": movimientos.count(),
+        }
+
+    def test_consolida_meses_cerrados_una_sola_vez(self):
+        self.assertEqual(consolidar_saldos_mensuales(hoy=date(2026, 4, 15)), {"meses": 3, "resumenes": 4})
+        self.assertEqual(consolidar_saldos_mensuales(hoy=date(2026, 4, 30)), {"meses": 0, "resumenes": 0})
+
+        febrero = SaldoMensualBilletera.objects.get(billetera=self.billetera, mes=date(2026, 2, 1))
+        self.assertEqual(
+            (febrero.saldo_inicial, febrero.creditos, febrero.debitos, febrero.saldo_final),
+            (Decimal("100.00"), Decimal("25.00"), Decimal("30.00"), Decimal("95.00")),
+        )
+        self.assertFalse(
+            SaldoMensualBilletera.objects.filter(billetera=self.billetera, mes=date(2026, 3, 1)).exists()
+        )
+
+    def test_totales_combinan_resumenes_y_libro(self):
+        consolidar_saldos_mensuales(hoy=date(2026, 4, 15))
+        periodos = [
+            (date(2026, 1, 1), date(2026, 4, 30)),
+            (date(2026, 1, 15), date(2026, 4, 10)),
+            (date(2026, 2, 1), date(2026, 2, 28)),
+            (date(2026, 2, 2), date(2026, 2, 19)),
+            (date(2026, 3, 1), date(2026, 4, 30)),
+        ]
+        for desde, hasta in periodos:
+            with self.subTest(desde=desde, hasta=hasta):
+                self.assertEqual(totales_movimientos(desde, hasta), self._totales_libro(desde, hasta))
+                self.assertEqual(
+                    totales_movimientos(desde, hasta, billetera=self.billetera),
+                    self._totales_libro(desde, hasta, billetera=self.billetera),
+                )
+
+    def test_estado_de_cuenta_y_extracto(self):
+        consolidar_saldos_mensuales(hoy=date(2026, 3, 15))
+        extracto = estado_de_cuenta(self.billetera, date(2026, 2, 10), date(2026, 4, 10))
+        self.assertEqual(extracto["saldo_inicial"], Decimal("70.00"))
+        self.assertEqual(extracto["saldo_final"], Decimal("50.00"))
+        self.assertEqual(extracto["cantidad_movimientos"], 2)
+
+        client = APIClient()
+        client.force_authenticate(self.billetera.cliente.user)
+        response = client.get(
+            reverse("extracto-billetera"), {"fecha_desde": "2026-04-01", "fecha_hasta": "2026-04-30"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data["saldo_inicial"], response.data["saldo_final"]), ("95.00", "60.00"))
+        self.assertEqual(len(response.data["movimientos"]), 2)
+
+
+class VencimientoBilleterasTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.hoy = timezone.localdate()
+        self.vencida = self._billetera("vencida", "50.00", -1)
+        self.por_vencer = self._billetera("por_vencer", "20.00", 3)
+        self.otra_por_vencer = self._billetera("otra_por_vencer", "15.00", 5)
+        self.lejana = self._billetera("lejana", "30.00", 60)
+
+    def _billetera(self, sufijo, saldo, dias):
+        billetera = _crear_billetera(sufijo)
+        billetera.agregar_saldo(Decimal(saldo))
+        Billetera.objects.filter(pk=billetera.pk).update(
+            fecha_vencimiento=self.hoy + timedelta(days=dias)
+        )
+        return billetera
+
+    def test_vence_saldos_y_avisa_una_sola_vez(self):
+        reporte = procesar_vencimientos_billeteras(hoy=self.hoy, lote=1)
+
+        self.assertEqual((reporte["vencidas"], reporte["monto_vencido"]), (1, Decimal("50.00")))
+        self.assertEqual((reporte["avisos"], reporte["emails"]), (2, 2))
+        self.vencida.refresh_from_db()
+        self.assertEqual(self.vencida.saldo, Decimal("0.00"))
+        debito = self.vencida.movimientos.get(tipo="debito")
+        self.assertEqual((debito.monto, debito.saldo_nuevo), (Decimal("50.00"), Decimal("0.00")))
+        self.assertEqual(
+            set(Notificacion.objects.filter(tipo="vencimiento_billetera").values_list("usuario", flat=True)),
+            {self.por_vencer.cliente.user_id, self.otra_por_vencer.cliente.user_id},
+        )
+        self.assertEqual(len(mail.outbox), 2)
+
+        cache.clear()
+        reporte = procesar_vencimientos_billeteras(hoy=self.hoy, lote=1)
+        self.assertEqual((reporte["vencidas"], reporte["avisos"]), (0, 0))
+        self.assertEqual(verificar_libro_billeteras()["descuadradas"], 0)
+
+    def test_retoma_desde_el_checkpoint_del_dia(self):
+        self.por_vencer.refresh_from_db()
+        cache.set(
+            CHECKPOINT_KEY.format(fase="avisar", fecha=self.hoy.isoformat()),
+            (self.por_vencer.fecha_vencimiento, self.por_vencer.pk),
+        )
+
+        reporte = procesar_vencimientos_billeteras(hoy=self.hoy)
+
+        self.assertEqual(reporte["avisos"], 1)
+        self.assertTrue(
+            Notificacion.objects.filter(usuario=self.otra_por_vencer.cliente.user).exists()
+        )
+        self.assertFalse(Notificacion.objects.filter(usuario=self.por_vencer.cliente.user).exists())
+
+    def test_credito_nuevo_renueva_el_aviso(self):
+        procesar_vencimientos_billeteras(hoy=self.hoy)
+        Billetera.objects.filter(pk=self.por_vencer.pk).update(
+            fecha_vencimiento=self.hoy + timedelta(days=6)
+        )
+        cache.clear()
+
+        reporte = procesar_vencimientos_billeteras(hoy=self.hoy)
+
+        self.assertEqual(reporte["avisos"], 1)
+
+
+    def test_aviso_usa_la_plantilla_y_solo_registra_los_enviados(self):
+        from django.core.mail.backends.locmem import EmailBackend
+
+        self.otra_por_vencer.refresh_from_db()
+        fallido = self.otra_por_vencer.cliente.user.email
+        send_messages = EmailBackend.send_messages
+
+        def falla_para_uno(backend, mensajes):
+            if any(fallido in mensaje.to for mensaje in mensajes):
+                raise ConnectionError("SMTP caído")
+            return send_messages(backend, mensajes)
+
+        with patch.object(EmailBackend, "send_messages", falla_para_uno):
+            reporte = procesar_vencimientos_billeteras(hoy=self.hoy, lote=1)
+
+        self.assertEqual((reporte["avisos"], reporte["emails"], reporte["emails_fallidos"]), (1, 1, 1))
+        self.assertEqual(len(mail.outbox), 1)
+        html, tipo = mail.outbox[0].alternatives[0]
+        self.assertEqual(tipo, "text/html")
+        self.assertIn("Tu saldo a favor está por vencer", html)
+        self.por_vencer.refresh_from_db()
+        self.otra_por_vencer.refresh_from_db()
+        self.assertEqual(self.por_vencer.aviso_vencimiento_para, self.por_vencer.fecha_vencimiento)
+        self.assertIsNone(self.otra_por_vencer.aviso_vencimiento_para)
+        self.assertFalse(Notificacion.objects.filter(usuario=self.otra_por_vencer.cliente.user).exists())
+
+        # El checkpoint del día no pasó del fallido: la corrida siguiente lo reintenta.
+        reporte = procesar_vencimientos_billeteras(hoy=self.hoy, lote=1)
+        self.assertEqual((reporte["avisos"], reporte["emails"]), (1, 1))
+        self.assertEqual(mail.outbox[-1].to, [fallido])
+
+
+@skipUnlessDBFeature("has_select_for_update")
+class BilleteraConcurrenciaTest(TransactionTestCase):
+    """Créditos y débitos en hilos reales; necesita una base con bloqueo de filas."""
+
+    def test_creditos_y_debitos_concurrentes_no_pierden_actualizaciones(self):
+        billetera = _crear_billetera("concurrencia")
+        billetera.agregar_saldo(Decimal("100.00"))
+        operaciones = [("credito", Decimal("10.00"))] * 20 + [("debito", Decimal("15.00"))] * 10
+        barrera = threading.Barrier(len(operaciones))
+        rechazados = []
+
+        def operar(tipo, monto):
+            copia = Billetera.objects.get(pk=billetera.pk)
+            try:
+                barrera.wait()
+                if tipo == "credito":
+                    copia.agregar_saldo(monto)
+                else:
+                    copia.descontar_saldo(monto)
+            except ValidationError:
+                rechazados.append(monto)
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=operar, args=operacion) for operacion in operaciones]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        billetera.refresh_from_db()
+        debitos_aplicados = 10 - len(rechazados)
+        esperado = Decimal("100.00") + 20 * Decimal("10.00") - debitos_aplicados * Decimal("15.00")
+        self.assertEqual(billetera.saldo, esperado)
+        self.assertGreaterEqual(billetera.saldo, Decimal("0.00"))
+        self.assertEqual(billetera.movimientos.count(), 1 + 20 + debitos_aplicados)
+        reporte = verificar_libro_billeteras()
+        self.assertEqual(
+            (reporte["descuadradas"], reporte["movimientos_inconsistentes"], reporte["cortes_de_cadena"]),
+            (0, 0, 0),
+        )
@@ -7,6 +7,7 @@ from .views import (
     cliente_me_view,
     mi_billetera_view,
     movimientos_billetera_view,
+    extracto_billetera_view,
     streak_status_view,
     claim_streak_coupon_view,
     validate_streak_coupon_view,
@@ -27,6 +28,11 @@ urlpatterns = [
         movimientos_billetera_view,
         name="movimientos-billetera",
     ),
+    path(
+        "me/billetera/extracto/",
+        extracto_billetera_view,
+        name="extracto-billetera",
+    ),
     path("me/streak/", streak_status_view, name="cliente-streak"),
     path(
         "me/streak-coupons/<int:coupon_id>/claim/",
@@ -18,10 +18,41 @@ from .serializers import (
     ClienteUpdateSerializer,
 )
 from apps.authentication.pagination import CustomPageNumberPagination
+from apps.users.utils import phone_lookup_keys
 
 
 TURNOS_RESERVADOS_BAJA = ["pendiente", "confirmado"]
 TURNOS_PENDIENTES_BAJA = ["pendiente", "pendiente_manual"]
+TELEFONO_BUSQUEDA_CHARS = set("0123456789+-() ")
+TELEFONO_BUSQUEDA_MIN_DIGITOS = 8
+
+
+def _claves_telefono_busqueda(termino: str) -> set:
+    """Claves de ``phone_normalized`` si el término parece un teléfono completo."""
+    termino = (termino or "").strip()
+    digitos = sum(c.isdigit() for c in termino)
+    if digitos < TELEFONO_BUSQUEDA_MIN_DIGITOS or not set(termino) <= TELEFONO_BUSQUEDA_CHARS:
+        return set()
+    return phone_lookup_keys(termino)
+
+
+class ClienteSearchFilter(filters.SearchFilter):
+    """SearchFilter que resuelve los teléfonos contra el índice normalizado.
+
+    Un término con forma de teléfono (``+54 9 11 2233-4455``, ``011 2233
+    4455``...) además de la búsqueda normal (DNI, teléfono parcial...) matchea
+    por igualdad sobre ``user__phone_normalized``, aunque el formato guardado
+    no coincida con el tipeado.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        resultado = super().filter_queryset(request, queryset, view)
+        claves = _claves_telefono_busqueda(request.query_params.get(self.search_param, ""))
+        if not claves:
+            return resultado
+        return queryset.filter(
+            models.Q(pk__in=resultado.values("pk")) | models.Q(user__phone_normalized__in=claves)
+        )
 
 
 def build_cliente_deactivation_check(cliente):
@@ -146,7 +177,7 @@ class ClienteViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     pagination_class = CustomPageNumberPagination
     filter_backends = [
-        filters.SearchFilter,
+        ClienteSearchFilter,
         filters.OrderingFilter,
     ]
 
@@ -439,6 +470,30 @@ class ClienteViewSet(viewsets.ModelViewSet):
         serializer = ClienteDetailSerializer(cliente)
         return Response({"registrado": True, "cliente": serializer.data})
 
+    @action(detail=False, methods=["get"], url_path="buscar-por-telefono")
+    def buscar_por_telefono(self, request):
+        """Buscar cliente por teléfono, en cualquier formato local o internacional."""
+
+        telefono = (request.query_params.get("telefono") or "").strip()
+        if not telefono:
+            return Response(
+                {"error": "Debe proporcionar el parámetro 'telefono'"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        cliente = (
+            Cliente.objects.select_related("user")
+            .filter(user__phone_normalized__in=phone_lookup_keys(telefono), is_active=True)
+            .order_by("id")
+            .first()
+        )
+
+        if not cliente:
+            return Response({"registrado": False, "cliente": None})
+
+        serializer = ClienteDetailSerializer(cliente)
+        return Response({"registrado": True, "cliente": serializer.data})
+
     @action(detail=False, methods=["get"])
     def mis_clientes(self, request):
         """
@@ -570,20 +625,74 @@ def movimientos_billetera_view(request):
     return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-def _get_cliente_from_request(request):
-    return Cliente.objects.select_related("user").get(user=request.user)
-
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def extracto_billetera_view(request):
+    """
+    Extracto de la billetera del cliente autenticado entre ``fecha_desde`` y
+    ``fecha_hasta`` (YYYY-MM-DD, por defecto los últimos 30 días): saldo
+    inicial y final, totales y los movimientos del período.
+    """
+    from datetime import datetime, timedelta
 
-def _expire_stale_streak_coupons(cliente):
     from django.utils import timezone
-    from apps.turnos.models import StreakCoupon
 
-    now = timezone.now()
-    StreakCoupon.objects.filter(
-        cliente=cliente,
-        status__in=["pendiente", "reclamado"],
-        expires_at__lt=now,
-    ).update(status="vencido", updated_at=now)
+    from .models import Billetera
+    from .serializers import MovimientoBilleteraSerializer
+    from .services.billetera_service import estado_de_cuenta, rango_fechas
+
+    try:
+        fecha_hasta_str = request.query_params.get("fecha_hasta")
+        fecha_desde_str = request.query_params.get("fecha_desde")
+        fecha_hasta = (
+            datetime.strptime(fecha_hasta_str, "%Y-%m-%d").date()
+            if fecha_hasta_str
+            else timezone.localdate()
+        )
+        fecha_desde = (
+            datetime.strptime(fecha_desde_str, "%Y-%m-%d").date()
+            if fecha_desde_str
+            else fecha_hasta - timedelta(days=30)
+        )
+    except ValueError:
+        return Response(
+            {"error": "Formato de fecha inválido. Use YYYY-MM-DD."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    if fecha_desde > fecha_hasta:
+        return Response(
+            {"error": "fecha_desde no puede ser posterior a fecha_hasta."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    try:
+        billetera = Billetera.objects.get(cliente__user=request.user)
+    except Billetera.DoesNotExist:
+        return Response(
+            {"error": "No se encontró billetera"}, status=status.HTTP_404_NOT_FOUND
+        )
+
+    extracto = estado_de_cuenta(billetera, fecha_desde, fecha_hasta)
+    movimientos = billetera.movimientos.filter(
+        **rango_fechas(fecha_desde, fecha_hasta)
+    ).order_by("-created_at", "-pk")
+    return Response(
+        {
+            "fecha_desde": fecha_desde.isoformat(),
+            "fecha_hasta": fecha_hasta.isoformat(),
+            "saldo_inicial": str(extracto["saldo_inicial"]),
+            "creditos": str(extracto["creditos"]),
+            "debitos": str(extracto["debitos"]),
+            "saldo_final": str(extracto["saldo_final"]),
+            "cantidad_movimientos": extracto["cantidad_movimientos"],
+            "movimientos": MovimientoBilleteraSerializer(movimientos, many=True).data,
+        },
+        status=status.HTTP_200_OK,
+    )
+
+
+def _get_cliente_from_request(request):
+    return Cliente.objects.select_related("user").get(user=request.user)
 
 
 def _serialize_streak_coupon(coupon):
@@ -594,7 +703,7 @@ def _serialize_streak_coupon(coupon):
         "code": coupon.code,
         "milestone_number": coupon.milestone_number,
         "discount_amount": str(coupon.discount_amount),
-        "status": coupon.status,
+        "status": coupon.effective_status(),
         "claimed_at": coupon.claimed_at.isoformat() if coupon.claimed_at else None,
         "expires_at": coupon.expires_at.isoformat() if coupon.expires_at else None,
         "used_at": coupon.used_at.isoformat() if coupon.used_at else None,
@@ -626,7 +735,6 @@ def streak_status_view(request):
             status=status.HTTP_404_NOT_FOUND,
         )
 
-    _expire_stale_streak_coupons(cliente)
     config = ConfiguracionGlobal.get_config()
     goal_count = int(getattr(config, "streak_goal_count", 5) or 5)
     goal_count = max(1, goal_count)
@@ -636,8 +744,9 @@ def streak_status_view(request):
     if progress_count == 0 and streak_count > 0:
         progress_count = goal_count
 
+    # Los cupones vencidos se marcan en la tarea periódica; acá solo se filtran.
     active_coupon = (
-        StreakCoupon.objects.filter(cliente=cliente, status__in=["pendiente", "reclamado"])
+        StreakCoupon.objects.filter(StreakCoupon.active_q(), cliente=cliente)
         .order_by("created_at")
         .first()
     )
@@ -672,13 +781,13 @@ def claim_streak_coupon_view(request, coupon_id):
             status=status.HTTP_404_NOT_FOUND,
         )
 
-    _expire_stale_streak_coupons(cliente)
     coupon = StreakCoupon.objects.filter(cliente=cliente, id=coupon_id).first()
     if not coupon:
         return Response({"detail": "Cupón no encontrado."}, status=status.HTTP_404_NOT_FOUND)
-    if coupon.status == "vencido":
+    coupon_status = coupon.effective_status()
+    if coupon_status == "vencido":
         return Response({"detail": "El cupón está vencido."}, status=status.HTTP_400_BAD_REQUEST)
-    if coupon.status not in {"pendiente", "reclamado"}:
+    if coupon_status not in StreakCoupon.ACTIVE_STATUSES:
         return Response({"detail": "El cupón no está disponible."}, status=status.HTTP_400_BAD_REQUEST)
 
     if coupon.status == "pendiente":
@@ -718,13 +827,13 @@ def validate_streak_coupon_view(request):
     if not code:
         return Response({"detail": "Ingresá un código de cupón."}, status=status.HTTP_400_BAD_REQUEST)
 
-    _expire_stale_streak_coupons(cliente)
     coupon = StreakCoupon.objects.filter(cliente=cliente, code=code).first()
     if not coupon:
         return Response({"detail": "Cupón inválido."}, status=status.HTTP_400_BAD_REQUEST)
-    if coupon.status == "usado":
+    coupon_status = coupon.effective_status()
+    if coupon_status == "usado":
         return Response({"detail": "Ya usaste tu código de descuento."}, status=status.HTTP_400_BAD_REQUEST)
-    if coupon.status != "reclamado":
+    if coupon_status != "reclamado":
         return Response({"detail": "Cupón inválido."}, status=status.HTTP_400_BAD_REQUEST)
 
     precio_total = None
@@ -0,0 +1,197 @@
+"""
+Escritura diferida del historial de ``simple_history``.
+
+``BufferedHistoricalRecords`` reemplaza a ``HistoricalRecords`` en los modelos
+con mucho movimiento (``Turno``, ``Servicio``, ``Cliente``). Por defecto se
+comporta igual que el original: cada ``save()`` inserta su fila de historial.
+
+Dentro de ``historial_en_lote()`` las filas se acumulan en un buffer y se
+insertan con un ``bulk_create`` por modelo en el ``on_commit``. Los guardados
+consecutivos del mismo objeto se fusionan en una sola fila, salvo que tengan
+motivos de cambio distintos: cada ``_change_reason`` explícito conserva su
+propia fila. Si la transacción (o el savepoint donde se guardó el objeto) se
+revierte, sus filas pendientes se descartan igual que se descartaría el
+``INSERT`` síncrono.
+
+Solo se usa la API pública de transacciones: cada fila registra un
+``on_commit`` que la confirma (Django descarta los de un savepoint revertido)
+y el buffer registra un único ``on_commit`` de volcado al salir del bloque,
+después de todos los de sus filas.
+"""
+
+import contextvars
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from django.db import DEFAULT_DB_ALIAS, router, transaction
+from django.utils import timezone
+from simple_history.models import HistoricalRecords
+from simple_history.signals import (
+    post_create_historical_record,
+    pre_create_historical_record,
+)
+
+_buffer_actual = contextvars.ContextVar("historial_en_lote", default=None)
+
+
+@dataclass(eq=False)
+class _FilaPendiente:
+    history_model: type
+    instance: object
+    history_instance: object
+    confirmada: bool = False
+
+    def confirmar(self):
+        self.confirmada = True
+
+
+@dataclass(eq=False)
+class _BufferHistorial:
+    alias: str
+    filas: list = field(default_factory=list)
+    programado: bool = False
+
+    def agregar(self, fila: _FilaPendiente) -> None:
+        transaction.on_commit(fila.confirmar, using=self.alias)
+        self.filas.append(fila)
+
+    def programar_volcado(self) -> None:
+        # Se llama al salir del bloque: el hook queda detrás de los
+        # ``confirmar`` de todas las filas y fuera de sus savepoints. Sin una
+        # transacción externa, ``on_commit`` vuelca en el momento.
+        if self.programado or not self.filas:
+            return
+        self.programado = True
+        transaction.on_commit(self.volcar, using=self.alias)
+
+    def volcar(self) -> None:
+        por_modelo = {}
+        for fila in _fusionar(fila for fila in self.filas if fila.confirmada):
+            por_modelo.setdefault(fila.history_model, []).append(fila)
+        self.filas = []
+
+        for history_model, filas in por_modelo.items():
+            for fila in filas:
+                _enviar_senal(pre_create_historical_record, fila, self.alias)
+            history_model.objects.using(self.alias).bulk_create(
+                [fila.history_instance for fila in filas]
+            )
+            for fila in filas:
+                _enviar_senal(post_create_historical_record, fila, self.alias)
+
+
+@contextmanager
+def historial_en_lote(using=None):
+    """Abre una transacción y difiere el historial de sus guardados al commit.
+
+    Anidado dentro de otro ``historial_en_lote()`` suma sus filas al lote
+    externo.
+    """
+    if _buffer_actual.get() is not None:
+        with transaction.atomic(using=using):
+            yield
+        return
+
+    buffer = _BufferHistorial(alias=using or DEFAULT_DB_ALIAS)
+    token = _buffer_actual.set(buffer)
+    try:
+        with transaction.atomic(using=using):
+            yield
+    finally:
+        _buffer_actual.reset(token)
+    buffer.programar_volcado()
+
+
+class BufferedHistoricalRecords(HistoricalRecords):
+    """``HistoricalRecords`` con escritura diferida opcional (ver módulo)."""
+
+    def create_historical_record(self, instance, history_type, using=None):
+        buffer = self._buffer_diferido(instance, using)
+        if buffer is None:
+            return super().create_historical_record(instance, history_type, using=using)
+
+        manager = getattr(instance, self.manager_name)
+        attrs = {
+            field.attname: getattr(instance, field.attname)
+            for field in self.fields_included(instance)
+        }
+        if getattr(manager.model, "history_relation", None) is not None:
+            attrs["history_relation"] = instance
+
+        history_instance = manager.model(
+            history_date=getattr(instance, "_history_date", timezone.now()),
+            history_type=history_type,
+            history_user=self.get_history_user(instance),
+            history_change_reason=self.get_change_reason_for_object(
+                instance, history_type, using
+            ),
+            **attrs,
+        )
+        buffer.agregar(
+            _FilaPendiente(
+                history_model=manager.model,
+                instance=instance,
+                history_instance=history_instance,
+            )
+        )
+
+    def _buffer_diferido(self, instance, using):
+        buffer = _buffer_actual.get()
+        if buffer is None or self.m2m_fields or instance.pk is None:
+            return None
+        alias = using if self.use_base_model_db and using else router.db_for_write(
+            type(instance), instance=instance
+        )
+        if alias != buffer.alias or not transaction.get_connection(alias).in_atomic_block:
+            return None
+        return buffer
+
+
+def _fusionar(filas):
+    """Fusiona los guardados consecutivos de cada objeto en una pasada.
+
+    Queda el último estado con el tipo del primero (un alta seguida de cambios
+    sigue siendo "+"), salvo que alguna fila sea una baja: entonces queda "-"
+    para no perder la eliminación. Un motivo explícito distinto corta la fusión.
+    """
+    resultado = []
+    ultima_por_objeto = {}
+    for fila in filas:
+        clave = (fila.history_model, fila.instance.pk)
+        anterior = ultima_por_objeto.get(clave)
+        motivo = fila.history_instance.history_change_reason
+        if anterior is None or motivo not in (
+            None,
+            anterior.history_instance.history_change_reason,
+        ):
+            ultima_por_objeto[clave] = fila
+            resultado.append(fila)
+            continue
+
+        destino, origen = anterior.history_instance, fila.history_instance
+        es_baja = "-" in (destino.history_type, origen.history_type)
+        conservados = {
+            "history_type": "-" if es_baja else destino.history_type,
+            "history_change_reason": destino.history_change_reason,
+            "history_user": origen.history_user or destino.history_user,
+        }
+        for campo in destino._meta.concrete_fields:
+            if not campo.primary_key:
+                setattr(destino, campo.attname, getattr(origen, campo.attname))
+        for nombre, valor in conservados.items():
+            setattr(destino, nombre, valor)
+        anterior.instance = fila.instance
+    return resultado
+
+
+def _enviar_senal(senal, fila: _FilaPendiente, using) -> None:
+    history_instance = fila.history_instance
+    senal.send(
+        sender=fila.history_model,
+        instance=fila.instance,
+        history_instance=history_instance,
+        history_date=history_instance.history_date,
+        history_user=history_instance.history_user,
+        history_change_reason=history_instance.history_change_reason,
+        using=using,
+    )
@@ -0,0 +1,190 @@
+"""
+Registro de métricas en formato Prometheus.
+
+Define contadores e histogramas para la API de turnos, el webhook de Mercado
+Pago, la API de Mercado Pago, el envío de emails, la API de Telegram y las tareas de Celery. Se
+exponen en ``/metrics`` (ver ``apps.core.views.metrics_view``).
+
+Con varios workers de gunicorn, definir la variable de entorno
+``PROMETHEUS_MULTIPROC_DIR`` (directorio vacío y escribible) antes de arrancar:
+cada proceso escribe sus valores ahí y ``/metrics`` los agrega. En el hook
+``child_exit`` de gunicorn conviene llamar a ``mark_process_dead(worker.pid)``.
+"""
+
+import functools
+import os
+import time
+
+from celery.signals import before_task_publish, task_postrun, task_prerun
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+    multiprocess,
+)
+
+# Buckets en segundos: de respuestas rápidas de la API hasta tareas de minutos.
+_LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+_TASK_BUCKETS = (0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 1800)
+
+API_REQUEST_SECONDS = Histogram(
+    "beautiful_api_request_seconds",
+    "Latencia de las acciones de la API",
+    ["view", "action", "status"],
+    buckets=_LATENCY_BUCKETS,
+)
+MP_WEBHOOK_SECONDS = Histogram(
+    "beautiful_mp_webhook_seconds",
+    "Tiempo de procesamiento de notificaciones de Mercado Pago",
+    ["topic", "outcome"],
+    buckets=_LATENCY_BUCKETS,
+)
+MP_API_REQUESTS_TOTAL = Counter(
+    "beautiful_mp_api_requests_total",
+    "Llamadas a la API de Mercado Pago",
+    ["method", "route", "outcome"],
+)
+MP_API_SECONDS = Histogram(
+    "beautiful_mp_api_seconds",
+    "Latencia de la API de Mercado Pago",
+    ["method", "route"],
+    buckets=_LATENCY_BUCKETS,
+)
+EMAILS_SENT_TOTAL = Counter(
+    "beautiful_emails_sent_total",
+    "Emails enviados por EmailService",
+    ["tipo", "outcome"],
+)
+EMAIL_SEND_SECONDS = Histogram(
+    "beautiful_email_send_seconds",
+    "Duración de cada envío de EmailService",
+    ["tipo"],
+    buckets=_LATENCY_BUCKETS,
+)
+TELEGRAM_API_REQUESTS_TOTAL = Counter(
+    "beautiful_telegram_api_requests_total",
+    "Llamadas a la Bot API de Telegram",
+    ["method", "outcome"],
+)
+TELEGRAM_API_SECONDS = Histogram(
+    "beautiful_telegram_api_seconds",
+    "Latencia de la Bot API de Telegram",
+    ["method"],
+    buckets=_LATENCY_BUCKETS,
+)
+CELERY_TASKS_TOTAL = Counter(
+    "beautiful_celery_tasks_total",
+    "Tareas de Celery ejecutadas",
+    ["task", "state"],
+)
+CELERY_TASK_SECONDS = Histogram(
+    "beautiful_celery_task_seconds",
+    "Duración de las tareas de Celery",
+    ["task"],
+    buckets=_TASK_BUCKETS,
+)
+CELERY_TASK_QUEUE_LAG_SECONDS = Histogram(
+    "beautiful_celery_task_queue_lag_seconds",
+    "Tiempo entre la publicación de una tarea y el inicio de su ejecución",
+    ["task"],
+    buckets=_TASK_BUCKETS,
+)
+
+_MP_WEBHOOK_TOPICS = {"payment", "merchant_order"}
+_PUBLISHED_AT_HEADER = "published_at"
+# Atributo del request de la tarea donde se guarda el inicio: vive lo mismo
+# que la ejecución, así una tarea que nunca llega a postrun no deja residuos.
+_STARTED_AT_ATTR = "_metricas_inicio"
+
+
+def observe_api_request(view: str, action: str, status_code: int, seconds: float) -> None:
+    API_REQUEST_SECONDS.labels(view, action or "desconocida", str(status_code)).observe(
+        seconds
+    )
+
+
+def observe_mp_webhook(topic: str, outcome: str, seconds: float) -> None:
+    topic = topic if topic in _MP_WEBHOOK_TOPICS else "otro"
+    MP_WEBHOOK_SECONDS.labels(topic, outcome).observe(seconds)
+
+
+def observe_mp_request(method: str, route: str, outcome: str, seconds: float) -> None:
+    MP_API_REQUESTS_TOTAL.labels(method, route, outcome).inc()
+    MP_API_SECONDS.labels(method, route).observe(seconds)
+
+
+def observe_telegram_request(method: str, outcome: str, seconds: float) -> None:
+    TELEGRAM_API_REQUESTS_TOTAL.labels(method, outcome).inc()
+    TELEGRAM_API_SECONDS.labels(method).observe(seconds)
+
+
+def instrument_email_sends(cls):
+    """Decorador de clase: mide cada método estático ``enviar_*`` de ``cls``.
+
+    Los métodos devuelven ``True``/``False``; se cuentan como ``ok``/``error``
+    y las excepciones como ``exception`` (y se vuelven a levantar).
+    """
+
+    for nombre, atributo in list(vars(cls).items()):
+        if not nombre.startswith("enviar_") or not isinstance(atributo, staticmethod):
+            continue
+        setattr(cls, nombre, staticmethod(_instrument_email_send(nombre, atributo.__func__)))
+    return cls
+
+
+def _instrument_email_send(tipo: str, func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        outcome = "exception"
+        try:
+            result = func(*args, **kwargs)
+            outcome = "ok" if result else "error"
+            return result
+        finally:
+            EMAILS_SENT_TOTAL.labels(tipo, outcome).inc()
+            EMAIL_SEND_SECONDS.labels(tipo).observe(time.perf_counter() - start)
+
+    return wrapper
+
+
+def render_latest() -> bytes:
+    """Serializa las métricas, agregando los workers en modo multiproceso."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+# ── Celery ───────────────────────────────────────────────────────────────────
+
+
+@before_task_publish.connect(weak=False)
+def _stamp_task_published_at(headers=None, **kwargs):
+    if headers is not None:
+        headers.setdefault(_PUBLISHED_AT_HEADER, time.time())
+
+
+@task_prerun.connect(weak=False)
+def _on_task_prerun(task_id=None, task=None, **kwargs):
+    if task is None:
+        return
+    setattr(task.request, _STARTED_AT_ATTR, time.perf_counter())
+    published_at = task.request.get(_PUBLISHED_AT_HEADER)
+    if published_at:
+        CELERY_TASK_QUEUE_LAG_SECONDS.labels(task.name).observe(
+            max(0.0, time.time() - float(published_at))
+        )
+
+
+@task_postrun.connect(weak=False)
+def _on_task_postrun(task_id=None, task=None, state=None, **kwargs):
+    started_at = getattr(task.request, _STARTED_AT_ATTR, None) if task else None
+    name = task.name if task else "desconocida"
+    CELERY_TASKS_TOTAL.labels(name, (state or "desconocido").lower()).inc()
+    if started_at is not None:
+        CELERY_TASK_SECONDS.labels(name).observe(time.perf_counter() - started_at)
+
@@ -1,41 +1,294 @@
 """
-Middleware temporal para debug de requests
+Middleware de perfilado de requests.
+
+Mide por request el tiempo total, las queries SQL (cantidad y tiempo), los
+accesos a cache (hits/misses) y el tiempo de llamadas HTTP salientes
+(Mercado Pago, Telegram, etc.). Expone los valores en el header
+``Server-Timing`` y guarda los requests lentos, con su SQL, en un buffer
+circular que el propietario puede consultar desde las herramientas de
+diagnóstico.
+
+Se activa con ``REQUEST_PROFILING_ENABLED``. Desactivado, el middleware
+levanta ``MiddlewareNotUsed`` al arrancar y Django lo saca de la cadena,
+por lo que no agrega costo alguno.
 """
-import json
+
+import contextvars
 import logging
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils import timezone
 
 logger = logging.getLogger(__name__)
 
-class RequestLoggingMiddleware:
+_current_profile = contextvars.ContextVar("request_profile", default=None)
+_slow_requests = deque(maxlen=getattr(settings, "REQUEST_PROFILING_BUFFER_SIZE", 100))
+_slow_requests_lock = threading.Lock()
+_instrumentation_lock = threading.Lock()
+_instrumentation_installed = False
+
+_CACHE_MISS = object()
+_MAX_SQL_LENGTH = 2000
+
+
+class RequestProfile:
+    """Acumulador de métricas de un único request."""
+
+    def __init__(self, max_queries: int = 50):
+        self.max_queries = max_queries
+        self.db_count = 0
+        self.db_time = 0.0
+        self.queries = []
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_time = 0.0
+        self.http_count = 0
+        self.http_time = 0.0
+        self.http_calls = []
+
+    def record_query(self, sql: str, duration: float) -> None:
+        self.db_count += 1
+        self.db_time += duration
+        if len(self.queries) < self.max_queries:
+            self.queries.append(
+                {
+                    "sql": (sql or "")[:_MAX_SQL_LENGTH],
+                    "ms": round(duration * 1000, 2),
+                }
+            )
+
+    def record_cache(self, hits: int, misses: int, duration: float) -> None:
+        self.cache_hits += hits
+        self.cache_misses += misses
+        self.cache_time += duration
+
+    def record_http(self, method: str, url: str, duration: float, status_code) -> None:
+        self.http_count += 1
+        self.http_time += duration
+        if len(self.http_calls) < self.max_queries:
+            self.http_calls.append(
+                {
+                    "method": method,
+                    "url": (url or "").split("?", 1)[0],
+                    "status": status_code,
+                    "ms": round(duration * 1000, 2),
+                }
+            )
+
+    def server_timing(self, total_ms: float) -> str:
+        """Arma el valor del header ``Server-Timing``."""
+        return ", ".join(
+            [
+                f"total;dur={total_ms:.1f}",
+                f'db;dur={self.db_time * 1000:.1f};desc="{self.db_count} queries"',
+                (
+                    f"cache;dur={self.cache_time * 1000:.1f};"
+                    f'desc="{self.cache_hits} hits {self.cache_misses} misses"'
+                ),
+                f'http;dur={self.http_time * 1000:.1f};desc="{self.http_count} calls"',
+            ]
+        )
+
+    def as_dict(self) -> dict:
+        return {
+            "db_queries": self.db_count,
+            "db_ms": round(self.db_time * 1000, 2),
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "cache_ms": round(self.cache_time * 1000, 2),
+            "http_calls": self.http_count,
+            "http_ms": round(self.http_time * 1000, 2),
+        }
+
+
+def get_current_profile():
+    """Devuelve el perfil del request en curso, o ``None`` si no se perfila."""
+    return _current_profile.get()
+
+
+def get_slow_requests() -> list:
+    """Devuelve los requests lentos registrados, del más reciente al más viejo."""
+    with _slow_requests_lock:
+        return list(reversed(_slow_requests))
+
+
+def clear_slow_requests() -> int:
+    """Vacía el buffer de requests lentos y devuelve cuántos se descartaron."""
+    with _slow_requests_lock:
+        cantidad = len(_slow_requests)
+        _slow_requests.clear()
+    return cantidad
+
+
+def _db_execute_wrapper(execute, sql, params, many, context):
+    profile = _current_profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.record_query(sql, time.perf_counter() - start)
+
+
+def _wrap_cache_class(cache_class) -> None:
+    from django.core.cache.backends.base import BaseCache
+
+    if getattr(cache_class, "_profiling_wrapped", False):
+        return
+
+    original_get = cache_class.get
+
+    def get(self, key, default=None, version=None):
+        profile = _current_profile.get()
+        if profile is None:
+            return original_get(self, key, default, version)
+        start = time.perf_counter()
+        value = original_get(self, key, _CACHE_MISS, version)
+        hit = value is not _CACHE_MISS
+        profile.record_cache(int(hit), int(not hit), time.perf_counter() - start)
+        return value if hit else default
+
+    cache_class.get = get
+
+    # BaseCache.get_many delega en get(); sólo se envuelve si el backend la redefine.
+    if cache_class.get_many is not BaseCache.get_many:
+        original_get_many = cache_class.get_many
+
+        def get_many(self, keys, version=None):
+            profile = _current_profile.get()
+            if profile is None:
+                return original_get_many(self, keys, version)
+            keys = list(keys)
+            start = time.perf_counter()
+            values = original_get_many(self, keys, version)
+            profile.record_cache(
+                len(values), len(keys) - len(values), time.perf_counter() - start
+            )
+            return values
+
+        cache_class.get_many = get_many
+
+    cache_class._profiling_wrapped = True
+
+
+def _install_cache_instrumentation() -> None:
+    from django.core.cache import caches
+
+    for alias in getattr(settings, "CACHES", {}) or {"default": {}}:
+        try:
+            _wrap_cache_class(caches[alias].__class__)
+        except Exception as exc:
+            logger.warning("No se pudo instrumentar la cache '%s': %s", alias, exc)
+
+
+def _install_http_instrumentation() -> None:
+    try:
+        import requests
+    except ImportError:
+        return
+
+    original_send = requests.Session.send
+    if getattr(original_send, "_profiling_wrapped", False):
+        return
+
+    def send(self, request, **kwargs):
+        profile = _current_profile.get()
+        if profile is None:
+            return original_send(self, request, **kwargs)
+        start = time.perf_counter()
+        status_code = None
+        try:
+            response = original_send(self, request, **kwargs)
+            status_code = response.status_code
+            return response
+        finally:
+            profile.record_http(
+                request.method, request.url, time.perf_counter() - start, status_code
+            )
+
+    send._profiling_wrapped = True
+    requests.Session.send = send
+
+
+def _install_instrumentation() -> None:
+    global _instrumentation_installed
+    with _instrumentation_lock:
+        if _instrumentation_installed:
+            return
+        _install_cache_instrumentation()
+        _install_http_instrumentation()
+        _instrumentation_installed = True
+
+
+def _record_slow_request(request, response, profile: RequestProfile, total_ms: float):
+    user = getattr(request, "user", None)
+    entry = {
+        "timestamp": timezone.now().isoformat(),
+        "method": request.method,
+        "path": request.path,
+        "status": getattr(response, "status_code", None),
+        "user_id": user.pk if user is not None and user.is_authenticated else None,
+        "total_ms": round(total_ms, 2),
+        **profile.as_dict(),
+        "queries": profile.queries,
+        "http": profile.http_calls,
+    }
+    with _slow_requests_lock:
+        _slow_requests.append(entry)
+    logger.warning(
+        "Request lento %s %s: %.1f ms (%s queries, %.1f ms SQL, %.1f ms HTTP)",
+        request.method,
+        request.path,
+        total_ms,
+        profile.db_count,
+        profile.db_time * 1000,
+        profile.http_time * 1000,
+    )
+
+
+class RequestProfilingMiddleware:
+    """Perfila cada request y registra los que superan el umbral de lentitud."""
+
     def __init__(self, get_response):
+        if not getattr(settings, "REQUEST_PROFILING_ENABLED", False):
+            raise MiddlewareNotUsed
+
         self.get_response = get_response
+        self.slow_ms = float(getattr(settings, "REQUEST_PROFILING_SLOW_MS", 500))
+        self.max_queries = int(getattr(settings, "REQUEST_PROFILING_MAX_QUERIES", 50))
+        self.server_timing = bool(
+            getattr(settings, "REQUEST_PROFILING_SERVER_TIMING", True)
+        )
+        self.path_prefixes = tuple(
+            getattr(settings, "REQUEST_PROFILING_PATH_PREFIXES", ("/api/",)) or ()
+        )
+        _install_instrumentation()
 
     def __call__(self, request):
-        if request.path == '/api/turnos/' and request.method == 'POST':
-            try:
-                body = json.loads(request.body.decode('utf-8'))
-                logger.error(f"\n{'='*50}")
-                logger.error(f"POST /api/turnos/")
-                logger.error(f"Headers: {dict(request.headers)}")
-                logger.error(f"Body: {json.dumps(body, indent=2)}")
-                logger.error(f"{'='*50}\n")
-                print(f"\n{'='*50}")
-                print(f"POST /api/turnos/")
-                print(f"Body: {json.dumps(body, indent=2)}")
-                print(f"{'='*50}\n")
-            except Exception as e:
-                logger.error(f"Error logging request: {e}")
-
-        response = self.get_response(request)
-        
-        if request.path == '/api/turnos/' and request.method == 'POST' and response.status_code >= 400:
-            try:
-                print(f"\n{'='*50}")
-                print(f"RESPONSE ERROR:")
-                print(f"Status: {response.status_code}")
-                print(f"Content: {response.content.decode('utf-8')}")
-                print(f"{'='*50}\n")
-            except:
-                pass
+        if self.path_prefixes and not request.path.startswith(self.path_prefixes):
+            return self.get_response(request)
+
+        profile = RequestProfile(max_queries=self.max_queries)
+        token = _current_profile.set(profile)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(_db_execute_wrapper))
+                response = self.get_response(request)
+        finally:
+            _current_profile.reset(token)
 
+        total_ms = (time.perf_counter() - start) * 1000
+        if self.server_timing:
+            response["Server-Timing"] = profile.server_timing(total_ms)
+        if total_ms >= self.slow_ms:
+            _record_slow_request(request, response, profile, total_ms)
         return response
@@ -0,0 +1,296 @@
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.db import transaction
+from django.test import TestCase, override_settings
+from prometheus_client import REGISTRY
+from rest_framework.test import APIClient
+
+from apps.core.history import historial_en_lote
+from apps.core.metrics import _on_task_postrun, _on_task_prerun
+from apps.core.middleware import clear_slow_requests, get_slow_requests
+from apps.servicios.models import CategoriaServicio, Sala, Servicio
+from apps.users.models import User
+
+
+class RequestProfilingMiddlewareTests(TestCase):
+    def setUp(self):
+        clear_slow_requests()
+        self.propietario = User.objects.create_user(
+            email="propietario.perfil@test.com",
+            password="password1.2.3",
+            username="propietario_perfil",
+            role="propietario",
+        )
+
+    def test_disabled_does_not_add_server_timing(self):
+        client = APIClient()
+        client.force_authenticate(self.propietario)
+
+        response = client.get("/api/turnos/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("Server-Timing", response)
+        self.assertEqual(get_slow_requests(), [])
+
+    @override_settings(REQUEST_PROFILING_ENABLED=True, REQUEST_PROFILING_SLOW_MS=0)
+    def test_enabled_emits_server_timing_and_records_slow_request(self):
+        client = APIClient()
+        client.force_authenticate(self.propietario)
+
+        response = client.get("/api/turnos/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("total;dur=", response["Server-Timing"])
+        self.assertIn("db;dur=", response["Server-Timing"])
+
+        slow = get_slow_requests()
+        self.assertEqual(len(slow), 1)
+        self.assertEqual(slow[0]["path"], "/api/turnos/")
+        self.assertGreater(slow[0]["db_queries"], 0)
+        self.assertTrue(slow[0]["queries"][0]["sql"])
+
+    @override_settings(REQUEST_PROFILING_ENABLED=True, REQUEST_PROFILING_SLOW_MS=0)
+    def test_slow_requests_visible_only_to_owner(self):
+        cliente = User.objects.create_user(
+            email="cliente.perfil@test.com",
+            password="password1.2.3",
+            username="cliente_perfil",
+            role="cliente",
+        )
+        url = "/api/turnos/diagnostico/requests-lentos/"
+
+        client = APIClient()
+        client.force_authenticate(cliente)
+        self.assertEqual(client.get(url).status_code, 403)
+
+        client.force_authenticate(self.propietario)
+        response = client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data["perfilado_activo"])
+        self.assertGreaterEqual(len(response.data["requests"]), 1)
+
+        response = client.delete(url)
+        self.assertEqual(response.status_code, 200)
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        self.propietario = User.objects.create_user(
+            email="propietario.metricas@test.com",
+            password="password1.2.3",
+            username="propietario_metricas",
+            role="propietario",
+        )
+
+    def _sample(self, name, labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_turno_viewset_actions_are_measured(self):
+        labels = {"view": "turnos", "action": "list", "status": "200"}
+        antes = self._sample("beautiful_api_request_seconds_count", labels)
+
+        client = APIClient()
+        client.force_authenticate(self.propietario)
+        client.get("/api/turnos/")
+
+        self.assertEqual(
+            self._sample("beautiful_api_request_seconds_count", labels), antes + 1
+        )
+
+    def test_webhook_without_resource_is_measured(self):
+        labels = {"topic": "payment", "outcome": "ok"}
+        antes = self._sample("beautiful_mp_webhook_seconds_count", labels)
+
+        response = APIClient().post(
+            "/api/mercadopago/webhook/", {"type": "payment"}, format="json"
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self._sample("beautiful_mp_webhook_seconds_count", labels), antes + 1
+        )
+
+    def test_email_sends_are_counted_by_outcome(self):
+        from apps.emails.services import EmailService
+
+        labels = {"tipo": "enviar_email_recuperacion_password", "outcome": "ok"}
+        antes = self._sample("beautiful_emails_sent_total", labels)
+
+        with patch("apps.emails.services.email_service.send_mail"):
+            EmailService.enviar_email_recuperacion_password(
+                email="cliente@test.com", token="abc", usuario_nombre="Ana"
+            )
+
+        self.assertEqual(self._sample("beautiful_emails_sent_total", labels), antes + 1)
+
+    @override_settings(METRICS_AUTH_TOKEN="secreto")
+    def test_metrics_endpoint_requires_token_and_renders_text_format(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 401)
+
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer secreto")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"beautiful_api_request_seconds", response.content)
+        self.assertIn(b"beautiful_celery_task_queue_lag_seconds", response.content)
+
+    @override_settings(METRICS_AUTH_TOKEN="", DEBUG=False)
+    def test_metrics_endpoint_without_token_requires_staff(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 401)
+
+        cliente = User.objects.create_user(
+            email="cliente.metricas@test.com", password="password1.2.3", username="cliente_metricas"
+        )
+        self.client.force_login(cliente)
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+
+        cliente.is_staff = True
+        cliente.save(update_fields=["is_staff"])
+        self.assertEqual(self.client.get("/metrics").status_code, 200)
+
+    def test_celery_task_duration_is_kept_on_the_task_request(self):
+        from celery import Celery
+
+        app = Celery("metricas-test")
+
+        @app.task(name="metricas.prueba")
+        def tarea():
+            return None
+
+        labels = {"task": "metricas.prueba"}
+        antes = self._sample("beautiful_celery_task_seconds_count", labels)
+
+        tarea.push_request(id="t-1")
+        try:
+            _on_task_prerun(task_id="t-1", task=tarea)
+            _on_task_postrun(task_id="t-1", task=tarea, state="SUCCESS")
+        finally:
+            tarea.pop_request()
+
+        self.assertEqual(self._sample("beautiful_celery_task_seconds_count", labels), antes + 1)
+
+
+class HistorialEnLoteTests(TestCase):
+    def setUp(self):
+        sala = Sala.objects.create(nombre="Sala Historial", capacidad_simultanea=2)
+        categoria = CategoriaServicio.objects.create(nombre="Categoria Historial", sala=sala)
+        self.servicio = Servicio.objects.create(
+            nombre="Servicio Historial",
+            categoria=categoria,
+            precio=Decimal("1000.00"),
+            duracion_minutos=30,
+        )
+
+    def _historial(self):
+        return Servicio.history.filter(id=self.servicio.id)
+
+    def test_saves_consecutivos_se_fusionan_y_se_escriben_al_commit(self):
+        previos = self._historial().count()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with historial_en_lote():
+                for precio in ("1100.00", "1200.00", "1300.00"):
+                    self.servicio.precio = Decimal(precio)
+                    self.servicio.save()
+                self.assertEqual(self._historial().count(), previos)
+
+        self.assertEqual(self._historial().count(), previos + 1)
+        self.assertEqual(self._historial().first().precio, Decimal("1300.00"))
+
+    def test_cambio_y_baja_en_la_misma_transaccion_conservan_la_baja(self):
+        previos = self._historial().count()
+        servicio_id = self.servicio.id
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with historial_en_lote():
+                self.servicio.precio = Decimal("1250.00")
+                self.servicio.save()
+                self.servicio.delete()
+
+        historial = Servicio.history.filter(id=servicio_id)
+        self.assertEqual(historial.count(), previos + 1)
+        self.assertEqual(historial.first().history_type, "-")
+        self.assertFalse(Servicio.objects.filter(id=servicio_id).exists())
+
+    def test_motivos_distintos_conservan_su_fila(self):
+        previos = self._historial().count()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with historial_en_lote():
+                self.servicio._change_reason = "Ajuste de precio"
+                self.servicio.precio = Decimal("1500.00")
+                self.servicio.save()
+                self.servicio._change_reason = "Cambio de duración"
+                self.servicio.duracion_minutos = 45
+                self.servicio.save()
+
+        motivos = list(
+            self._historial()[:2].values_list("history_change_reason", flat=True)
+        )
+        self.assertEqual(self._historial().count(), previos + 2)
+        self.assertEqual(motivos, ["Cambio de duración", "Ajuste de precio"])
+
+    def test_savepoint_revertido_descarta_su_fila(self):
+        previos = self._historial().count()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with historial_en_lote():
+                self.servicio.precio = Decimal("1400.00")
+                self.servicio.save()
+                try:
+                    with transaction.atomic():
+                        self.servicio.nombre = "Servicio Revertido"
+                        self.servicio.save()
+                        raise RuntimeError("forzar rollback")
+                except RuntimeError:
+                    pass
+
+        self.assertEqual(self._historial().count(), previos + 1)
+        self.assertEqual(self._historial().first().nombre, "Servicio Historial")
+
+    def test_fusion_ignora_el_guardado_de_un_savepoint_revertido(self):
+        previos = self._historial().count()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with historial_en_lote():
+                self.servicio.precio = Decimal("1700.00")
+                self.servicio.save()
+                try:
+                    with transaction.atomic():
+                        self.servicio.nombre = "Servicio Revertido"
+                        self.servicio.save()
+                        raise RuntimeError("forzar rollback")
+                except RuntimeError:
+                    pass
+                self.servicio.nombre = "Servicio Historial"
+                self.servicio.precio = Decimal("1800.00")
+                self.servicio.save()
+
+        self.assertEqual(self._historial().count(), previos + 1)
+        fila = self._historial().first()
+        self.assertEqual((fila.nombre, fila.precio), ("Servicio Historial", Decimal("1800.00")))
+
+    def test_lote_dentro_de_otra_transaccion_se_escribe_a_su_commit(self):
+        previos = self._historial().count()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                with historial_en_lote():
+                    with historial_en_lote():
+                        self.servicio.precio = Decimal("1900.00")
+                        self.servicio.save()
+                    self.servicio.precio = Decimal("2000.00")
+                    self.servicio.save()
+                self.assertEqual(self._historial().count(), previos)
+
+        self.assertEqual(self._historial().count(), previos + 1)
+        self.assertEqual(self._historial().first().precio, Decimal("2000.00"))
+
+    def test_fuera_del_lote_el_historial_es_sincronico(self):
+        previos = self._historial().count()
+
+        self.servicio.precio = Decimal("1600.00")
+        self.servicio.save()
+
+        self.assertEqual(self._historial().count(), previos + 1)
@@ -0,0 +1,30 @@
+"""Vistas transversales del proyecto."""
+
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse
+from prometheus_client import CONTENT_TYPE_LATEST
+
+from apps.core.metrics import render_latest
+
+
+def metrics_view(request):
+    """GET /metrics — métricas en formato de texto de Prometheus.
+
+    Si ``METRICS_AUTH_TOKEN`` está definido se exige
+    ``Authorization: Bearer <token>``. Sin token, fuera de ``DEBUG`` solo
+    responde a un usuario staff autenticado: nunca queda pública.
+    """
+    token = getattr(settings, "METRICS_AUTH_TOKEN", "")
+    if token:
+        auth = request.headers.get("Authorization", "")
+        if not hmac.compare_digest(auth, f"Bearer {token}"):
+            return HttpResponse(status=401)
+    elif not settings.DEBUG:
+        user = getattr(request, "user", None)
+        if not (user and user.is_authenticated):
+            return HttpResponse(status=401)
+        if not user.is_staff:
+            return HttpResponse(status=403)
+    return HttpResponse(render_latest(), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emails', '0008_alter_notificacion_tipo'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notificacion',
+            name='tipo',
+            field=models.CharField(choices=[('solicitud_turno', 'Solicitud de Turno'), ('pago_turno', 'Pago de Turno'), ('cancelacion_turno', 'Cancelación de Turno'), ('modificacion_turno', 'Modificación de Turno'), ('nuevo_empleado', 'Nuevo Empleado'), ('nuevo_cliente', 'Nuevo Cliente'), ('reporte_diario', 'Reporte Diario'), ('recordatorio', 'Recordatorio'), ('fidelizacion', 'Fidelización de Clientes'), ('exportacion_reporte', 'Exportación de Reporte'), ('vencimiento_billetera', 'Vencimiento de Saldo')], max_length=50),
+        ),
+    ]
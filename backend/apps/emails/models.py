@@ -92,6 +92,8 @@ class Notificacion(models.Model):
         ("reporte_diario", "Reporte Diario"),
         ("recordatorio", "Recordatorio"),
         ("fidelizacion", "Fidelización de Clientes"),
+        ("exportacion_reporte", "Exportación de Reporte"),
+        ("vencimiento_billetera", "Vencimiento de Saldo"),
     ]
 
     usuario = models.ForeignKey(
@@ -3,7 +3,7 @@ Servicio para envío de emails con plantillas HTML
 Gestiona el envío de notificaciones por email a profesionales y propietarios
 """
 
-from django.core.mail import send_mail
+from django.core.mail import EmailMultiAlternatives, send_mail
 from django.conf import settings
 from django.utils.html import strip_tags
 from django.utils import timezone
@@ -11,9 +11,12 @@ from django.urls import reverse
 from typing import Dict
 import logging
 
+from apps.core.metrics import instrument_email_sends
+
 logger = logging.getLogger(__name__)
 
 
+@instrument_email_sends
 class EmailService:
     """Servicio centralizado para envío de emails"""
 
@@ -2007,3 +2010,54 @@ class EmailService:
         except Exception as e:
             logger.error(f"Error enviando email de recuperación: {str(e)}")
             return False
+
+    @staticmethod
+    def mensaje_vencimiento_billetera(billetera, dias_restantes: int):
+        """
+        Arma el aviso de saldo por vencer sin enviarlo
+
+        Lo usa el vencimiento masivo de billeteras, que manda los avisos de un
+        lote por una sola conexión SMTP.
+
+        Returns:
+            EmailMultiAlternatives o None si el cliente no tiene email
+        """
+        usuario = billetera.cliente.user
+        if not usuario.email:
+            return None
+
+        asunto = "Tu saldo a favor está por vencer"
+        contenido = f"""
+            {EmailService._email_context('cliente', asunto)}
+            <h2 style="color: #7d4586; margin-bottom: 20px;">{asunto}</h2>
+
+            <p>Hola <strong>{usuario.first_name or 'cliente'}</strong>,</p>
+            <p>Tenés saldo a favor en tu billetera que está por vencer.</p>
+
+            <div class="info-box">
+                <div class="info-row">
+                    <span class="info-label">Saldo:</span>
+                    <span class="info-value">${float(billetera.saldo):.2f}</span>
+                </div>
+                <div class="info-row">
+                    <span class="info-label">Vence el:</span>
+                    <span class="info-value">{billetera.fecha_vencimiento:%d/%m/%Y} ({dias_restantes} día(s))</span>
+                </div>
+            </div>
+
+            <p style="margin-top: 16px;">Usalo al reservar tu próximo turno.</p>
+        """
+
+        html_message = EmailService._get_base_template().format(
+            titulo=asunto,
+            header_titulo="Billetera",
+            contenido=contenido,
+        )
+        mensaje = EmailMultiAlternatives(
+            subject=asunto,
+            body=strip_tags(html_message),
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[EmailService._get_email_destinatario(usuario.email)],
+        )
+        mensaje.attach_alternative(html_message, "text/html")
+        return mensaje
@@ -2,7 +2,6 @@
 
 from celery import shared_task
 from django.conf import settings
-from django.core.mail import send_mail
 from django.utils import timezone
 from django.db.models import Count, Sum, Q
 from datetime import timedelta, datetime
@@ -209,17 +208,20 @@ def limpiar_notificaciones_antiguas(dias=90):
         raise
 
 
-def _buscar_proximo_horario_disponible(empleado, servicio, dias_busqueda: int = 30):
+def _buscar_proximo_horario_disponible(empleado, servicio, dias_busqueda: int = 30, cliente=None):
     """Busca el próximo horario disponible para un empleado y servicio.
 
     Reutiliza la misma lógica básica que el endpoint de turnos disponibles,
     pero limitada a encontrar el primer hueco libre en los próximos
-    ``dias_busqueda`` días. Si no encuentra disponibilidad, retorna ``None``.
+    ``dias_busqueda`` días. Los checkouts en curso de otros clientes ocupan
+    horario; los de ``cliente`` no. Si no encuentra disponibilidad, retorna
+    ``None``.
     """
 
     from datetime import datetime as dt
     from apps.empleados.models import HorarioEmpleado
     from apps.turnos.models import Turno
+    from apps.turnos.services.disponibilidad_service import intervalos_bloqueados_por_fecha
 
     ahora = timezone.now()
 
@@ -227,6 +229,13 @@ def _buscar_proximo_horario_disponible(empleado, servicio, dias_busqueda: int =
     if not getattr(empleado, "is_disponible", True):
         return None
 
+    bloqueos_por_fecha = intervalos_bloqueados_por_fecha(
+        empleado,
+        ahora.date(),
+        (ahora + timedelta(days=dias_busqueda)).date(),
+        excluir_cliente=cliente,
+    )
+
     for offset in range(dias_busqueda + 1):
         fecha_obj = (ahora + timedelta(days=offset)).date()
 
@@ -305,6 +314,11 @@ def _buscar_proximo_horario_disponible(empleado, servicio, dias_busqueda: int =
                     ):
                         conflicto = True
                         break
+                if not conflicto:
+                    conflicto = any(
+                        hora_actual < fin_bloqueo and hora_fin_turno > inicio_bloqueo
+                        for inicio_bloqueo, fin_bloqueo in bloqueos_por_fecha.get(fecha_obj, [])
+                    )
 
                 if not conflicto and hora_actual > ahora:
                     return hora_actual
@@ -404,7 +418,7 @@ def enviar_emails_fidelizacion_clientes(dias_por_defecto: int = 30):
                 continue
 
             # Buscar próximo horario disponible; si no hay, no enviamos email
-            fecha_sugerida = _buscar_proximo_horario_disponible(empleado, servicio)
+            fecha_sugerida = _buscar_proximo_horario_disponible(empleado, servicio, cliente=cliente)
             if not fecha_sugerida:
                 continue
 
@@ -500,9 +514,49 @@ def enviar_emails_fidelizacion_clientes(dias_por_defecto: int = 30):
     }
 
 
+def _enviar_emails_en_lotes(mensajes, tamano_lote=None, concurrencia=None):
+    """Envía ``[(clave, EmailMessage), ...]`` por lotes, cada uno con su conexión.
+
+    Los lotes corren en un pool de ``EMAIL_ENVIO_CONCURRENCIA`` hilos.
+    Devuelve las claves de los mensajes cuyo lote se envió sin error.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from django.core.mail import get_connection
+
+    if not mensajes:
+        return set()
+    tamano_lote = max(1, int(tamano_lote or getattr(settings, "EMAIL_ENVIO_LOTE", 50)))
+    concurrencia = max(1, int(concurrencia or getattr(settings, "EMAIL_ENVIO_CONCURRENCIA", 4)))
+    lotes = [mensajes[i : i + tamano_lote] for i in range(0, len(mensajes), tamano_lote)]
+
+    def enviar(lote):
+        try:
+            with get_connection(fail_silently=False) as connection:
+                connection.send_messages([mensaje for _, mensaje in lote])
+        except Exception as exc:
+            logger.error("Error enviando lote de %s emails: %s", len(lote), exc)
+            return []
+        return [clave for clave, _ in lote]
+
+    with ThreadPoolExecutor(max_workers=min(concurrencia, len(lotes))) as executor:
+        return {clave for enviadas in executor.map(enviar, lotes) for clave in enviadas}
+
+
 @shared_task(name="apps.emails.tasks.enviar_alertas_vencimiento_racha")
 def enviar_alertas_vencimiento_racha():
-    """Envía alertas preventivas por vencimiento de racha (PA3)."""
+    """Envía alertas preventivas por vencimiento de racha (PA3).
+
+    La ventana se arma en SQL: por cada umbral ``d`` se toman las rachas con
+    ``next_expiration_at`` dentro del día ``hoy + d`` (índice parcial sobre
+    rachas activas). Por lote de clientes se reclaman los logs de
+    deduplicación con ``bulk_create(ignore_conflicts=True)`` marcados con el
+    id de la ejecución (dos ejecuciones simultáneas no avisan dos veces al
+    mismo cliente), se crean las notificaciones en bloque y los emails y
+    mensajes de Telegram salen por los envíos en lote.
+    """
+
+    from django.core.mail import EmailMessage
+    from django.db.models import Case, IntegerField, Value, When
 
     from apps.authentication.models import ConfiguracionGlobal
     from apps.emails.models import Notificacion
@@ -526,99 +580,158 @@ def enviar_alertas_vencimiento_racha():
     alert_days = sorted(set(alert_days), reverse=True) or [3, 1]
 
     today = timezone.localdate()
+    lote = max(1, int(getattr(settings, "RACHA_ALERTAS_LOTE", 500)))
+    ejecucion = uuid.uuid4()
     bot_service = TelegramBotService()
 
-    processed = 0
-    sent = 0
-    skipped = 0
+    def inicio_dia(dias):
+        return timezone.make_aware(datetime.combine(today + timedelta(days=dias), datetime.min.time()))
 
-    stats_qs = ClienteStreakStats.objects.select_related("cliente__user").filter(
-        streak_count__gt=0,
-        next_expiration_at__isnull=False,
+    rangos = {
+        days: Q(next_expiration_at__gte=inicio_dia(days), next_expiration_at__lt=inicio_dia(days + 1))
+        for days in alert_days
+    }
+    ventana = Q()
+    for rango in rangos.values():
+        ventana |= rango
+
+    stats_qs = (
+        ClienteStreakStats.objects.filter(ventana, streak_count__gt=0)
+        .annotate(
+            remaining_days=Case(
+                *[When(rango, then=Value(days)) for days, rango in rangos.items()],
+                output_field=IntegerField(),
+            )
+        )
+        .select_related("cliente__user")
+        .order_by("pk")
     )
 
-    for stats in stats_qs:
-        expiration_date = timezone.localtime(stats.next_expiration_at).date()
-        remaining_days = (expiration_date - today).days
-
-        if remaining_days not in alert_days:
-            continue
-
-        processed += 1
-        alert_log, created = StreakExpiryAlertLog.objects.get_or_create(
-            cliente=stats.cliente,
-            threshold_days=remaining_days,
-            expiration_date_reference=expiration_date,
-            defaults={"channels_sent": []},
+    processed = 0
+    sent = 0
+    skipped = 0
+    ultimo_pk = 0
+
+    while True:
+        candidatos = list(stats_qs.filter(pk__gt=ultimo_pk)[:lote])
+        if not candidatos:
+            break
+        ultimo_pk = candidatos[-1].pk
+        processed += len(candidatos)
+
+        claves = {
+            (stats.cliente_id, stats.remaining_days, today + timedelta(days=stats.remaining_days)): stats
+            for stats in candidatos
+        }
+        # Cada log se inserta con el id de esta ejecución; si otra ya lo había
+        # insertado el conflicto se ignora y conserva el suyo. Solo se avisa a
+        # los logs que quedaron reclamados por esta ejecución.
+        StreakExpiryAlertLog.objects.bulk_create(
+            [
+                StreakExpiryAlertLog(
+                    cliente_id=cliente_id,
+                    threshold_days=threshold_days,
+                    expiration_date_reference=expiration_date,
+                    channels_sent=[],
+                    ejecucion=ejecucion,
+                )
+                for cliente_id, threshold_days, expiration_date in claves
+            ],
+            ignore_conflicts=True,
         )
-
-        if not created:
-            skipped += 1
+        reclamadas = set(
+            StreakExpiryAlertLog.objects.filter(
+                ejecucion=ejecucion,
+                cliente_id__in=[stats.cliente_id for stats in candidatos],
+            ).values_list("cliente_id", "threshold_days", "expiration_date_reference")
+        )
+        nuevas = {clave: stats for clave, stats in claves.items() if clave in reclamadas}
+        skipped += len(claves) - len(nuevas)
+        if not nuevas:
             continue
 
-        cliente_user = stats.cliente.user
-        channels = []
-
         titulo = "Tu racha está por vencer"
-        mensaje = (
-            f"Tu racha actual es de {stats.streak_count} turnos y vence en "
-            f"{remaining_days} día(s). Reservá para mantenerla activa."
-        )
-
-        Notificacion.objects.create(
-            usuario=cliente_user,
-            tipo="recordatorio",
-            titulo=titulo,
-            mensaje=mensaje,
-            data={
-                "tipo": "streak_expiry",
-                "streak_count": stats.streak_count,
-                "remaining_days": remaining_days,
-                "expiration_date": expiration_date.isoformat(),
-                "expiration_days_config": expiration_days,
-            },
-        )
-        channels.append("in_app")
-
-        if cliente_user.email:
-            try:
-                send_mail(
-                    subject=titulo,
-                    message=(
-                        f"Hola {cliente_user.first_name or 'cliente'},\n\n"
-                        f"{mensaje}\n"
-                        "Podés ingresar al panel y reservar tu próximo turno."
-                    ),
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    recipient_list=[cliente_user.email],
-                    fail_silently=False,
+        notificaciones = []
+        emails = []
+        for (cliente_id, remaining_days, expiration_date), stats in nuevas.items():
+            cliente_user = stats.cliente.user
+            mensaje = (
+                f"Tu racha actual es de {stats.streak_count} turnos y vence en "
+                f"{remaining_days} día(s). Reservá para mantenerla activa."
+            )
+            notificaciones.append(
+                Notificacion(
+                    usuario=cliente_user,
+                    tipo="recordatorio",
+                    titulo=titulo,
+                    mensaje=mensaje,
+                    data={
+                        "tipo": "streak_expiry",
+                        "streak_count": stats.streak_count,
+                        "remaining_days": remaining_days,
+                        "expiration_date": expiration_date.isoformat(),
+                        "expiration_days_config": expiration_days,
+                    },
                 )
-                channels.append("email")
-            except Exception as exc:
-                logger.error(
-                    "Error enviando alerta de racha por email a cliente=%s: %s",
-                    stats.cliente_id,
-                    exc,
+            )
+            if cliente_user.email:
+                emails.append(
+                    (
+                        cliente_id,
+                        EmailMessage(
+                            subject=titulo,
+                            body=(
+                                f"Hola {cliente_user.first_name or 'cliente'},\n\n"
+                                f"{mensaje}\n"
+                                "Podés ingresar al panel y reservar tu próximo turno."
+                            ),
+                            from_email=settings.DEFAULT_FROM_EMAIL,
+                            to=[cliente_user.email],
+                        ),
+                    )
                 )
-
-        telegram_links = TelegramLink.objects.filter(
-            cliente=stats.cliente,
-            is_verified=True,
-        )
-        for link in telegram_links:
-            bot_service.send_message(
-                link.chat_id,
+        Notificacion.objects.bulk_create(notificaciones)
+
+        con_telegram = set()
+        telegram_messages = []
+        por_cliente = {clave[0]: (clave[1], stats) for clave, stats in nuevas.items()}
+        for cliente_id, chat_id in TelegramLink.objects.filter(
+            cliente_id__in=por_cliente, is_verified=True
+        ).values_list("cliente_id", "chat_id"):
+            remaining_days, stats = por_cliente[cliente_id]
+            telegram_messages.append(
                 (
+                    chat_id,
                     f"Tu racha ({stats.streak_count}) vence en {remaining_days} dia(s).\n"
-                    "Reservá tu próximo turno para no perder el progreso."
-                ),
+                    "Reservá tu próximo turno para no perder el progreso.",
+                )
             )
-            channels.append("telegram")
-
-        StreakExpiryAlertLog.objects.filter(pk=alert_log.pk).update(
-            channels_sent=sorted(set(channels))
-        )
-        sent += 1
+            con_telegram.add(cliente_id)
+
+        con_email = _enviar_emails_en_lotes(emails)
+        # El cliente de Telegram paraleliza los envíos respetando los límites
+        # global y por chat.
+        if telegram_messages:
+            bot_service.send_messages(telegram_messages)
+
+        # Un UPDATE por combinación de canales y umbral.
+        grupos = {}
+        for cliente_id, threshold_days, expiration_date in nuevas:
+            channels = ["in_app"]
+            if cliente_id in con_email:
+                channels.append("email")
+            if cliente_id in con_telegram:
+                channels.append("telegram")
+            grupos.setdefault((tuple(sorted(channels)), threshold_days, expiration_date), []).append(
+                cliente_id
+            )
+        for (channels, threshold_days, expiration_date), cliente_ids in grupos.items():
+            StreakExpiryAlertLog.objects.filter(
+                cliente_id__in=cliente_ids,
+                threshold_days=threshold_days,
+                expiration_date_reference=expiration_date,
+            ).update(channels_sent=list(channels))
+        sent += len(nuevas)
 
     logger.info(
         "Alertas PA3 - procesados=%s enviados=%s deduplicados=%s",
@@ -1,4 +1,4 @@
-from datetime import timedelta
+from datetime import datetime, time, timedelta
 from decimal import Decimal
 from types import SimpleNamespace
 from unittest.mock import patch
@@ -100,3 +100,92 @@ class EmailOfertaReasignacionTipoPagoTest(TestCase):
         self.assertEqual(kwargs["subject"], "Tenemos un turno antes para ti")
         self.assertIn("Descuento especial:", kwargs["html_message"])
         self.assertIn("Ver detalles y confirmar", kwargs["html_message"])
+
+
+class AlertasVencimientoRachaTest(TestCase):
+    def setUp(self):
+        from apps.clientes.models import Cliente
+        from apps.turnos.models import ClienteStreakStats
+        from apps.users.models import User
+
+        hoy = timezone.localdate()
+        self.clientes = {}
+        for nombre, dias, racha in (("tres", 3, 4), ("uno", 1, 2), ("cinco", 5, 3), ("sin_racha", 1, 0)):
+            cliente = Cliente.objects.create(
+                user=User.objects.create_user(
+                    email=f"racha_{nombre}@test.com",
+                    password="password1.2.3",
+                    username=f"racha_{nombre}",
+                    role="cliente",
+                )
+            )
+            ClienteStreakStats.objects.create(
+                cliente=cliente,
+                streak_count=racha,
+                next_expiration_at=timezone.make_aware(
+                    datetime.combine(hoy + timedelta(days=dias), time(18, 0))
+                ),
+            )
+            self.clientes[nombre] = cliente
+
+    @patch("apps.telegram_bot.services.TelegramBotService.send_messages")
+    def test_alerta_por_ventana_y_deduplica(self, send_messages):
+        from django.core import mail
+
+        from apps.emails.models import Notificacion
+        from apps.emails.tasks import enviar_alertas_vencimiento_racha
+        from apps.telegram_bot.models import TelegramLink
+        from apps.turnos.models import StreakExpiryAlertLog
+
+        TelegramLink.objects.create(
+            telegram_user_id=1, chat_id=99, cliente=self.clientes["uno"], is_verified=True
+        )
+
+        resultado = enviar_alertas_vencimiento_racha()
+
+        self.assertEqual((resultado["processed"], resultado["sent"]), (2, 2))
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(Notificacion.objects.filter(data__tipo="streak_expiry").count(), 2)
+        send_messages.assert_called_once()
+        self.assertEqual([chat_id for chat_id, _ in send_messages.call_args.args[0]], [99])
+        logs = {log.cliente_id: log for log in StreakExpiryAlertLog.objects.all()}
+        self.assertEqual(set(logs), {self.clientes["tres"].pk, self.clientes["uno"].pk})
+        self.assertEqual(logs[self.clientes["uno"].pk].threshold_days, 1)
+        self.assertEqual(logs[self.clientes["uno"].pk].channels_sent, ["email", "in_app", "telegram"])
+        self.assertEqual(logs[self.clientes["tres"].pk].channels_sent, ["email", "in_app"])
+
+        resultado = enviar_alertas_vencimiento_racha()
+        self.assertEqual((resultado["sent"], resultado["deduplicated"]), (0, 2))
+        self.assertEqual(len(mail.outbox), 2)
+
+    @patch("apps.telegram_bot.services.TelegramBotService.send_messages")
+    def test_no_avisa_los_logs_que_reclamo_otra_ejecucion(self, send_messages):
+        import uuid
+
+        from django.core import mail
+
+        from apps.emails.tasks import enviar_alertas_vencimiento_racha
+        from apps.turnos.models import StreakExpiryAlertLog
+
+        manager = StreakExpiryAlertLog.objects
+        bulk_create = manager.bulk_create
+        otra_ejecucion = uuid.uuid4()
+
+        def con_ejecucion_concurrente(objs, **kwargs):
+            # Otra ejecución inserta el log de "uno" entre la lectura de
+            # candidatos y el insert de esta.
+            StreakExpiryAlertLog.objects.create(
+                cliente=self.clientes["uno"],
+                threshold_days=1,
+                expiration_date_reference=timezone.localdate() + timedelta(days=1),
+                ejecucion=otra_ejecucion,
+            )
+            return bulk_create(objs, **kwargs)
+
+        with patch.object(manager, "bulk_create", side_effect=con_ejecucion_concurrente):
+            resultado = enviar_alertas_vencimiento_racha()
+
+        self.assertEqual((resultado["sent"], resultado["deduplicated"]), (1, 1))
+        self.assertEqual([mensaje.to for mensaje in mail.outbox], [["racha_tres@test.com"]])
+        log = StreakExpiryAlertLog.objects.get(cliente=self.clientes["uno"])
+        self.assertEqual((log.ejecucion, log.channels_sent), (otra_ejecucion, []))
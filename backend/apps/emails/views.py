@@ -1,5 +1,4 @@
 from decimal import Decimal, ROUND_HALF_UP
-import json
 
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
@@ -14,33 +13,32 @@ from rest_framework.authtoken.models import Token as DRFToken
 from rest_framework.views import APIView
 
 from apps.clientes.models import Billetera
-from apps.mercadopago import services as mp_services
+from apps.mercadopago import checkout, services as mp_services
 from apps.mercadopago.models import PagoMercadoPago
 from apps.turnos.models import Turno
+from apps.turnos.services.bloqueo_temporal_service import (
+    HorarioNoDisponibleError,
+    asociar_referencia as asociar_referencia_bloqueo,
+    crear_bloqueo,
+    liberar_bloqueo,
+)
+from apps.turnos.services.disponibilidad_service import (
+    ESTADOS_OCUPAN_AGENDA,
+    bloquear_agenda,
+    horario_disponible,
+)
 from .models import Notificacion, NotificacionConfig, AccessToken, PromotionOffer
 from .serializers import NotificacionSerializer, NotificacionConfigSerializer
 
 
-def _slot_turno_disponible(empleado, servicio, fecha_hora) -> bool:
-    if not fecha_hora or fecha_hora <= timezone.now():
-        return False
-
-    from datetime import timedelta
-
-    hora_fin = fecha_hora + timedelta(minutes=servicio.duracion_minutos)
-    turnos_dia = Turno.objects.select_related("servicio").filter(
-        empleado=empleado,
-        fecha_hora__date=fecha_hora.date(),
-        estado__in=["pendiente", "confirmado", "en_proceso", "oferta_enviada"],
+def _slot_turno_disponible(empleado, servicio, fecha_hora, cliente=None) -> bool:
+    return horario_disponible(
+        empleado,
+        servicio,
+        fecha_hora,
+        cliente=cliente,
+        estados=ESTADOS_OCUPAN_AGENDA + ["oferta_enviada"],
     )
-    for turno in turnos_dia:
-        if not turno.fecha_hora or not turno.servicio:
-            continue
-        inicio = turno.fecha_hora
-        fin = inicio + timedelta(minutes=turno.servicio.duracion_minutos)
-        if fecha_hora < fin and hora_fin > inicio:
-            return False
-    return True
 
 
 def _precio_promocional(offer: PromotionOffer) -> tuple[Decimal, Decimal, Decimal]:
@@ -159,7 +157,8 @@ def _lock_offer_or_error(token_slug):
         offer.save(update_fields=["status", "updated_at"])
         return None, Response({"status": "tomada_por_otro", "detail": "Esta oferta ya fue tomada por otro cliente."}, status=status.HTTP_409_CONFLICT)
 
-    if not _slot_turno_disponible(offer.empleado, offer.servicio, offer.fecha_hora):
+    bloquear_agenda(offer.empleado)
+    if not _slot_turno_disponible(offer.empleado, offer.servicio, offer.fecha_hora, cliente=offer.cliente):
         offer.status = PromotionOffer.Status.TAKEN_BY_OTHER
         offer.save(update_fields=["status", "updated_at"])
         return None, Response({"status": "tomada_por_otro", "detail": "Esta oferta ya fue tomada por otro cliente."}, status=status.HTTP_409_CONFLICT)
@@ -435,6 +434,11 @@ class PromotionOfferPaymentView(APIView):
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
+            try:
+                bloqueo = crear_bloqueo(offer.empleado, offer.servicio, offer.fecha_hora, cliente=offer.cliente)
+            except HorarioNoDisponibleError as exc:
+                return Response({"status": "tomada_por_otro", "detail": str(exc)}, status=status.HTTP_409_CONFLICT)
+
             turno_payload = {
                 "cliente_id": offer.cliente_id,
                 "servicio_id": offer.servicio_id,
@@ -451,19 +455,25 @@ class PromotionOfferPaymentView(APIView):
                 "metodo_pago": "mercadopago",
                 "aplicar_descuento_fidelizacion": offer.beneficio == PromotionOffer.Benefit.DISCOUNT,
                 "promotion_offer_token": str(offer.token),
+                "bloqueo_id": bloqueo.pk,
             }
             notification_url = getattr(settings, "MERCADO_PAGO_WEBHOOK_URL", "")
+            intent = checkout.crear_intent(turno_payload)
             try:
                 resultado = mp_services.crear_preferencia(
                     titulo=offer.servicio.nombre,
                     descripcion=f"Turno — {offer.servicio.nombre}",
                     monto=float(monto_mp),
-                    external_reference=json.dumps(turno_payload),
+                    external_reference=intent.referencia,
                     notification_url=notification_url,
                     payer_email=offer.cliente.user.email or "",
+                    expiration_date_to=bloqueo.expira_en,
                 )
             except ValueError as exc:
+                liberar_bloqueo(bloqueo.pk)
                 return Response({"detail": str(exc)}, status=status.HTTP_502_BAD_GATEWAY)
+            checkout.asociar_preferencia(intent, resultado["preference_id"])
+            asociar_referencia_bloqueo(bloqueo.pk, resultado["preference_id"])
 
             offer.status = PromotionOffer.Status.PAYMENT_PENDING
             offer.accepted_at = timezone.now()
@@ -521,7 +531,8 @@ class PromotionOfferForcePaymentView(APIView):
                     {"status": offer.status, "detail": "La oferta no tiene un pago pendiente para forzar."},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
-            if not _slot_turno_disponible(offer.empleado, offer.servicio, offer.fecha_hora):
+            bloquear_agenda(offer.empleado)
+            if not _slot_turno_disponible(offer.empleado, offer.servicio, offer.fecha_hora, cliente=offer.cliente):
                 offer.status = PromotionOffer.Status.TAKEN_BY_OTHER
                 offer.save(update_fields=["status", "updated_at"])
                 return Response(
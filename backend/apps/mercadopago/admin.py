@@ -2,7 +2,7 @@
 
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import PagoMercadoPago
+from .models import CheckoutIntent, NotificacionMercadoPago, PagoMercadoPago
 
 
 @admin.register(PagoMercadoPago)
@@ -94,3 +94,46 @@ class PagoMercadoPagoAdmin(admin.ModelAdmin):
         return obj.preference_id
 
     preference_id_corto.short_description = "Preference ID"
+
+
+@admin.register(NotificacionMercadoPago)
+class NotificacionMercadoPagoAdmin(admin.ModelAdmin):
+    """Notificaciones de webhook de Mercado Pago y su procesamiento"""
+
+    list_display = ["id", "topic", "resource_id", "estado", "payment_id", "intentos", "creado_en", "procesado_en"]
+    list_filter = ["estado", "topic", "creado_en"]
+    search_fields = ["resource_id", "payment_id", "dedup_key"]
+    readonly_fields = [
+        "topic",
+        "resource_id",
+        "dedup_key",
+        "payload",
+        "estado",
+        "payment_id",
+        "intentos",
+        "ultimo_error",
+        "creado_en",
+        "procesado_en",
+    ]
+    ordering = ["-creado_en"]
+    actions = ["reprocesar"]
+
+    @admin.action(description="Reprocesar notificaciones seleccionadas")
+    def reprocesar(self, request, queryset):
+        from .tasks import procesar_notificacion_mercadopago
+
+        ids = list(queryset.filter(payment_id="").values_list("pk", flat=True))
+        for notificacion_id in ids:
+            procesar_notificacion_mercadopago.delay(notificacion_id)
+        self.message_user(request, f"{len(ids)} notificación(es) encolada(s) para reproceso.")
+
+
+@admin.register(CheckoutIntent)
+class CheckoutIntentAdmin(admin.ModelAdmin):
+    """Datos de reserva referenciados desde el external_reference de MP"""
+
+    list_display = ["id", "referencia", "tipo_movimiento", "preference_id", "creado_en"]
+    list_filter = ["tipo_movimiento", "creado_en"]
+    search_fields = ["referencia", "preference_id"]
+    readonly_fields = ["referencia", "tipo_movimiento", "payload", "preference_id", "creado_en"]
+    ordering = ["-creado_en"]
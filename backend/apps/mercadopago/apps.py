@@ -5,3 +5,7 @@ class MercadopagoConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.mercadopago"
     verbose_name = "Mercado Pago"
+
+    def ready(self):
+        """Importar signals cuando la app esté lista"""
+        import apps.mercadopago.signals
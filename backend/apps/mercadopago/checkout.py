@@ -0,0 +1,49 @@
+"""
+Referencias compactas para ``external_reference`` de Mercado Pago.
+
+El payload de la reserva (cliente, servicio, montos, cupones…) se guarda en
+``CheckoutIntent`` y la preferencia solo lleva una referencia corta firmada
+con ``SECRET_KEY``. La firma evita ir a la base con referencias que no
+generamos nosotros; el resto es una búsqueda por índice único.
+"""
+
+import secrets
+
+from django.core import signing
+
+from .models import CheckoutIntent
+
+_SALT = "apps.mercadopago.checkout"
+PREFIJO = "ci_"
+
+
+def _signer() -> signing.Signer:
+    return signing.Signer(salt=_SALT)
+
+
+def crear_intent(payload: dict) -> CheckoutIntent:
+    """Persiste ``payload`` y devuelve el intent con su referencia firmada."""
+    return CheckoutIntent.objects.create(
+        referencia=_signer().sign(f"{PREFIJO}{secrets.token_urlsafe(12)}"),
+        tipo_movimiento=payload.get("tipo_movimiento") or "",
+        payload=payload,
+    )
+
+
+def asociar_preferencia(intent: CheckoutIntent, preference_id: str) -> None:
+    CheckoutIntent.objects.filter(pk=intent.pk).update(preference_id=preference_id or "")
+
+
+def resolver(external_reference: str) -> dict | None:
+    """Payload del intent de ``external_reference``; ``None`` si no es una referencia nuestra."""
+    if not external_reference or not external_reference.startswith(PREFIJO):
+        return None
+    try:
+        _signer().unsign(external_reference)
+    except signing.BadSignature:
+        return None
+    return (
+        CheckoutIntent.objects.filter(referencia=external_reference)
+        .values_list("payload", flat=True)
+        .first()
+    )
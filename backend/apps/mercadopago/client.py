@@ -0,0 +1,132 @@
+"""
+Cliente HTTP compartido para la API de Mercado Pago.
+
+El ``HttpClient`` por defecto del SDK abre un ``requests.Session`` nuevo en
+cada llamada, así que cada preferencia, consulta de pago u orden QR paga el
+handshake TCP+TLS. Acá se mantiene por proceso:
+
+- un único ``requests.Session`` con pool keep-alive (``MP_HTTP_POOL_SIZE``),
+  timeouts de conexión/lectura (``MP_HTTP_CONNECT_TIMEOUT`` /
+  ``MP_HTTP_READ_TIMEOUT``) y reintentos con backoff solo para ``GET``
+  (``MP_HTTP_GET_RETRIES``): crear preferencias u órdenes no se reintenta;
+- un ``mercadopago.SDK`` por access token, que usa esa sesión.
+
+Cada llamada se mide en ``beautiful_mp_api_requests_total`` y
+``beautiful_mp_api_seconds`` por método y ruta (con los IDs reemplazados por
+``:id``).
+"""
+
+import re
+import threading
+import time
+from urllib.parse import urlsplit
+
+import mercadopago
+import requests
+from django.conf import settings
+from mercadopago.config import RequestOptions
+from mercadopago.http import HttpClient
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+
+from apps.core.metrics import observe_mp_request
+
+_RETRY_STATUS = (429, 500, 502, 503, 504)
+# Segmentos con dígitos son IDs, salvo la versión de la API (``v1``).
+_ID_SEGMENT = re.compile(r"^(?!v\d+$).*\d")
+
+_session = None
+_sdks = {}
+_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Devuelve la sesión compartida del proceso (se crea en el primer uso)."""
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                retry = Retry(
+                    total=int(getattr(settings, "MP_HTTP_GET_RETRIES", 2)),
+                    backoff_factor=0.3,
+                    status_forcelist=_RETRY_STATUS,
+                    allowed_methods=frozenset({"GET"}),
+                    raise_on_status=False,
+                )
+                pool_size = int(getattr(settings, "MP_HTTP_POOL_SIZE", 10))
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+                session = requests.Session()
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def timeout() -> tuple:
+    return (
+        float(getattr(settings, "MP_HTTP_CONNECT_TIMEOUT", 5)),
+        float(getattr(settings, "MP_HTTP_READ_TIMEOUT", 20)),
+    )
+
+
+def request(method: str, url: str, **kwargs) -> requests.Response:
+    """``requests.request`` sobre la sesión compartida, con timeout y métricas."""
+    kwargs.setdefault("timeout", timeout())
+    inicio = time.perf_counter()
+    outcome = "error"
+    try:
+        response = get_session().request(method, url, **kwargs)
+        outcome = "ok" if response.ok else f"http_{response.status_code}"
+        return response
+    finally:
+        observe_mp_request(method, _ruta_metrica(url), outcome, time.perf_counter() - inicio)
+
+
+class PooledHttpClient(HttpClient):
+    """``HttpClient`` del SDK que reutiliza la sesión compartida."""
+
+    def request(self, method, url, maxretries=None, **kwargs):
+        # Los timeouts y reintentos los define la sesión, no cada llamada del SDK.
+        kwargs.pop("timeout", None)
+        api_result = request(method, url, **kwargs)
+        response = {"status": api_result.status_code, "response": None}
+        if api_result.status_code != 204 and api_result.content:
+            try:
+                response["response"] = api_result.json()
+            except ValueError:
+                response["response"] = None
+        return response
+
+
+def get_sdk(access_token: str) -> mercadopago.SDK:
+    """SDK cacheado por access token (el SDK no guarda estado entre llamadas)."""
+    sdk = _sdks.get(access_token)
+    if sdk is None:
+        with _lock:
+            sdk = _sdks.get(access_token)
+            if sdk is None:
+                sdk = mercadopago.SDK(
+                    access_token,
+                    http_client=PooledHttpClient(),
+                    request_options=RequestOptions(
+                        connection_timeout=float(getattr(settings, "MP_HTTP_READ_TIMEOUT", 20)),
+                        max_retries=int(getattr(settings, "MP_HTTP_GET_RETRIES", 2)),
+                    ),
+                )
+                _sdks[access_token] = sdk
+    return sdk
+
+
+def reset_client() -> None:
+    """Descarta la sesión y los SDK cacheados (tests o rotación de credenciales)."""
+    global _session
+    with _lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+        _sdks.clear()
+
+
+def _ruta_metrica(url: str) -> str:
+    segmentos = urlsplit(url).path.strip("/").split("/")
+    return "/" + "/".join(":id" if _ID_SEGMENT.search(s) else s for s in segmentos)
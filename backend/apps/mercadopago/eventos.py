@@ -0,0 +1,129 @@
+"""
+Eventos de pago por preferencia para ``VerificarPagoView``.
+
+Cuando un ``PagoMercadoPago`` queda aprobado (o la preferencia se cancela) se
+publica, al confirmar la transacción, un mensaje en el canal Redis
+``mp:pago:<preference_id>``. Los clientes que esperan en
+``GET verificar-pago/<preference_id>/?espera=N`` se despiertan con ese mensaje
+en lugar de volver a preguntar cada pocos segundos.
+
+Sin ``MP_PAYMENT_EVENTS_REDIS_URL`` no hay pub/sub: la espera vuelve a mirar la
+base cada ``MP_VERIFICAR_PAGO_DB_INTERVAL`` segundos.
+
+La reconciliación contra la API de MP (por si el webhook no llega) se comparte
+entre todos los clientes de la misma preferencia: a lo sumo una consulta cada
+``MP_RECONCILIACION_INTERVALO`` segundos por preferencia y, en total, no más de
+``MP_RECONCILIACION_MAX_POR_SEGUNDO`` por segundo.
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+CANAL = "mp:pago:{preference_id}"
+RECONCILIACION_KEY = "mp:reconciliacion:{preference_id}"
+RECONCILIACION_GLOBAL_KEY = "mp:reconciliacion:global:{segundo}"
+
+_redis = None
+_redis_lock = threading.Lock()
+
+
+def _cache():
+    return caches[getattr(settings, "MP_PAYMENT_EVENTS_CACHE_ALIAS", "default")]
+
+
+def _cliente_redis():
+    global _redis
+    url = getattr(settings, "MP_PAYMENT_EVENTS_REDIS_URL", "")
+    if not url:
+        return None
+    if _redis is None:
+        with _redis_lock:
+            if _redis is None:
+                import redis
+
+                _redis = redis.Redis.from_url(url)
+    return _redis
+
+
+def publicar(preference_id: str, estado: str) -> None:
+    """Avisa a los clientes que esperan ``preference_id``; nunca levanta excepciones."""
+    cliente = _cliente_redis()
+    if cliente is None or not preference_id:
+        return
+    try:
+        cliente.publish(CANAL.format(preference_id=preference_id), estado)
+    except Exception as exc:
+        logger.warning("No se pudo publicar evento de pago %s: %s", preference_id, exc)
+
+
+class _Suscripcion:
+    def __init__(self, pubsub=None):
+        self._pubsub = pubsub
+
+    def esperar(self, segundos: float) -> bool:
+        """Bloquea hasta ``segundos``; devuelve ``True`` si llegó un evento."""
+        if segundos <= 0:
+            return False
+        if self._pubsub is None:
+            time.sleep(min(segundos, float(getattr(settings, "MP_VERIFICAR_PAGO_DB_INTERVAL", 1))))
+            return False
+        try:
+            return self._pubsub.get_message(timeout=segundos) is not None
+        except Exception as exc:
+            logger.warning("Suscripción a eventos de pago interrumpida: %s", exc)
+            self._pubsub = None
+            return False
+
+
+@contextmanager
+def suscripcion(preference_id: str):
+    """Suscribe al canal de la preferencia.
+
+    Hay que suscribirse *antes* de mirar la base para no perder un evento
+    publicado entre la consulta y la espera.
+    """
+    pubsub = None
+    cliente = _cliente_redis()
+    if cliente is not None:
+        try:
+            pubsub = cliente.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(CANAL.format(preference_id=preference_id))
+        except Exception as exc:
+            logger.warning("No se pudo suscribir a eventos de pago %s: %s", preference_id, exc)
+            pubsub = None
+    try:
+        yield _Suscripcion(pubsub)
+    finally:
+        if pubsub is not None:
+            try:
+                pubsub.close()
+            except Exception:
+                pass
+
+
+def reconciliacion_permitida(preference_id: str) -> bool:
+    """Reserva la próxima consulta a MP de ``preference_id`` si le toca a este cliente."""
+    cache = _cache()
+    intervalo = int(getattr(settings, "MP_RECONCILIACION_INTERVALO", 10))
+    if not cache.add(RECONCILIACION_KEY.format(preference_id=preference_id), 1, intervalo):
+        return False
+
+    maximo = int(getattr(settings, "MP_RECONCILIACION_MAX_POR_SEGUNDO", 5))
+    clave_global = RECONCILIACION_GLOBAL_KEY.format(segundo=int(time.time()))
+    cache.add(clave_global, 0, 2)
+    try:
+        consultas = cache.incr(clave_global)
+    except ValueError:
+        consultas = 1
+    if consultas > maximo:
+        # Se libera la preferencia para que otro cliente lo intente en breve.
+        cache.delete(RECONCILIACION_KEY.format(preference_id=preference_id))
+        return False
+    return True
@@ -0,0 +1,69 @@
+"""
+Management command para reprocesar notificaciones de Mercado Pago.
+
+Por defecto toma las notificaciones ``fallida`` (API de MP caída, error al
+aplicar el pago) y las vuelve a encolar. Es seguro repetirlo: cada pago se
+aplica una sola vez gracias a ``PagoMercadoPagoAplicado``.
+"""
+from django.core.management.base import BaseCommand
+
+from apps.mercadopago.models import NotificacionMercadoPago
+from apps.mercadopago.tasks import procesar_notificacion_mercadopago
+
+
+class Command(BaseCommand):
+    help = "Reprocesa notificaciones de webhook de Mercado Pago fallidas (o las indicadas)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ids",
+            nargs="+",
+            type=int,
+            help="IDs de NotificacionMercadoPago a reprocesar (ignora --estado)",
+        )
+        parser.add_argument(
+            "--estado",
+            choices=[
+                NotificacionMercadoPago.ESTADO_FALLIDA,
+                NotificacionMercadoPago.ESTADO_PENDIENTE,
+            ],
+            default=NotificacionMercadoPago.ESTADO_FALLIDA,
+            help="Estado de las notificaciones a reprocesar (default: fallida)",
+        )
+        parser.add_argument(
+            "--limite",
+            type=int,
+            default=500,
+            help="Máximo de notificaciones a reprocesar (default: 500)",
+        )
+        parser.add_argument(
+            "--sync",
+            action="store_true",
+            help="Procesa en este proceso en lugar de encolar en Celery",
+        )
+
+    def handle(self, *args, **options):
+        if options["ids"]:
+            queryset = NotificacionMercadoPago.objects.filter(pk__in=options["ids"])
+        else:
+            queryset = NotificacionMercadoPago.objects.filter(estado=options["estado"])
+        ids = list(
+            queryset.filter(payment_id="")
+            .order_by("creado_en")
+            .values_list("pk", flat=True)[: max(1, options["limite"])]
+        )
+
+        for notificacion_id in ids:
+            if options["sync"]:
+                procesar_notificacion_mercadopago(notificacion_id)
+            else:
+                procesar_notificacion_mercadopago.delay(notificacion_id)
+
+        if options["sync"]:
+            fallidas = NotificacionMercadoPago.objects.filter(
+                pk__in=ids, estado=NotificacionMercadoPago.ESTADO_FALLIDA
+            ).count()
+            self.stdout.write(f"Notificaciones reprocesadas: {len(ids)} (fallidas: {fallidas})")
+        else:
+            self.stdout.write(f"Notificaciones encoladas: {len(ids)}")
+        self.stdout.write(self.style.SUCCESS("Reproceso finalizado."))
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mercadopago', '0005_ordenmercadopagopresencial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificacionMercadoPago',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('topic', models.CharField(max_length=50)),
+                ('resource_id', models.CharField(max_length=255)),
+                ('dedup_key', models.CharField(max_length=320, unique=True)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('procesada', 'Procesada'), ('fallida', 'Fallida')], db_index=True, default='pendiente', max_length=20)),
+                ('payment_id', models.CharField(blank=True, default='', help_text='Pago aplicado a partir de esta notificación (vacío si no aplicó ninguno).', max_length=255)),
+                ('intentos', models.PositiveIntegerField(default=0)),
+                ('ultimo_error', models.TextField(blank=True)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('procesado_en', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Notificación Mercado Pago',
+                'verbose_name_plural': 'Notificaciones Mercado Pago',
+                'ordering': ['-creado_en'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PagoMercadoPagoAplicado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payment_id', models.CharField(max_length=255, unique=True)),
+                ('aplicado_en', models.DateTimeField(auto_now_add=True)),
+                ('notificacion', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='pagos_aplicados', to='mercadopago.notificacionmercadopago')),
+            ],
+            options={
+                'verbose_name': 'Pago Mercado Pago aplicado',
+                'verbose_name_plural': 'Pagos Mercado Pago aplicados',
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mercadopago', '0006_notificacionmercadopago_pagomercadopagoaplicado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CheckoutIntent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('referencia', models.CharField(max_length=80, unique=True)),
+                ('tipo_movimiento', models.CharField(blank=True, max_length=40)),
+                ('payload', models.JSONField()),
+                ('preference_id', models.CharField(blank=True, db_index=True, max_length=255)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Checkout intent',
+                'verbose_name_plural': 'Checkout intents',
+                'ordering': ['-creado_en'],
+            },
+        ),
+    ]
@@ -133,3 +133,104 @@ class OrdenMercadoPagoPresencial(models.Model):
 
     def __str__(self):
         return f"Orden presencial {self.reference_id} — {self.estado}"
+
+
+class NotificacionMercadoPago(models.Model):
+    """
+    Notificación de webhook recibida de Mercado Pago, pendiente de procesar.
+
+    El webhook solo la registra y responde 200; la tarea
+    ``procesar_notificacion_mercadopago`` consulta el recurso en la API de MP
+    y aplica el pago. ``dedup_key`` (``topic:resource_id``) colapsa los
+    reintentos de MP sobre la misma notificación.
+    """
+
+    ESTADO_PENDIENTE = "pendiente"
+    ESTADO_PROCESADA = "procesada"
+    ESTADO_FALLIDA = "fallida"
+
+    ESTADO_CHOICES = [
+        (ESTADO_PENDIENTE, "Pendiente"),
+        (ESTADO_PROCESADA, "Procesada"),
+        (ESTADO_FALLIDA, "Fallida"),
+    ]
+
+    topic = models.CharField(max_length=50)
+    resource_id = models.CharField(max_length=255)
+    dedup_key = models.CharField(max_length=320, unique=True)
+    payload = models.JSONField(default=dict, blank=True)
+    estado = models.CharField(
+        max_length=20, choices=ESTADO_CHOICES, default=ESTADO_PENDIENTE, db_index=True
+    )
+    payment_id = models.CharField(
+        max_length=255,
+        blank=True,
+        default="",
+        help_text="Pago aplicado a partir de esta notificación (vacío si no aplicó ninguno).",
+    )
+    intentos = models.PositiveIntegerField(default=0)
+    ultimo_error = models.TextField(blank=True)
+    creado_en = models.DateTimeField(auto_now_add=True)
+    procesado_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Notificación Mercado Pago"
+        verbose_name_plural = "Notificaciones Mercado Pago"
+        ordering = ["-creado_en"]
+
+    def __str__(self):
+        return f"Notificación {self.dedup_key} — {self.estado}"
+
+    @staticmethod
+    def construir_dedup_key(topic: str, resource_id) -> str:
+        return f"{topic}:{resource_id}"
+
+
+class PagoMercadoPagoAplicado(models.Model):
+    """
+    Marca de pago de Mercado Pago ya aplicado (turno creado, reprogramado o
+    saldo registrado). La restricción única sobre ``payment_id`` garantiza que
+    las notificaciones ``payment`` y ``merchant_order`` del mismo pago lo
+    apliquen una sola vez aunque se procesen en paralelo.
+    """
+
+    payment_id = models.CharField(max_length=255, unique=True)
+    notificacion = models.ForeignKey(
+        NotificacionMercadoPago,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="pagos_aplicados",
+    )
+    aplicado_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Pago Mercado Pago aplicado"
+        verbose_name_plural = "Pagos Mercado Pago aplicados"
+
+    def __str__(self):
+        return f"Pago aplicado {self.payment_id}"
+
+
+class CheckoutIntent(models.Model):
+    """
+    Intención de reserva/cobro guardada del lado del servidor.
+
+    La preferencia de Mercado Pago solo lleva ``referencia`` (corta y firmada)
+    como ``external_reference``; el webhook la resuelve con una búsqueda por
+    índice en lugar de parsear el payload completo en cada notificación.
+    """
+
+    referencia = models.CharField(max_length=80, unique=True)
+    tipo_movimiento = models.CharField(max_length=40, blank=True)
+    payload = models.JSONField()
+    preference_id = models.CharField(max_length=255, blank=True, db_index=True)
+    creado_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Checkout intent"
+        verbose_name_plural = "Checkout intents"
+        ordering = ["-creado_en"]
+
+    def __str__(self):
+        return f"Checkout {self.referencia}"
@@ -0,0 +1,209 @@
+"""
+Reconciliación periódica de pagos de Mercado Pago cuyo webhook no llegó.
+
+Toma los ``PagoMercadoPago`` y ``OrdenMercadoPagoPresencial`` pendientes y
+los ``CheckoutIntent`` con preferencia y sin pago aprobado (los checkouts
+online que no crean ``PagoMercadoPago`` hasta que el pago se aplica) con más
+de ``MP_RECONCILIACION_ANTIGUEDAD_MINUTOS`` (y menos de
+``MP_RECONCILIACION_VENTANA_HORAS``), consulta MP en paralelo
+(``MP_RECONCILIACION_CONCURRENCIA`` hilos sobre la sesión compartida) y, para
+cada pago u orden aprobada, registra una ``NotificacionMercadoPago`` y la
+procesa con la misma tarea que el webhook: el pago se aplica una sola vez
+aunque el webhook llegue después.
+
+Cada candidato se vuelve a consultar como mucho una vez por
+``MP_RECONCILIACION_ANTIGUEDAD_MINUTOS`` y cada corrida toma hasta
+``MP_RECONCILIACION_LOTE`` candidatos.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+from . import services
+from .models import (
+    CheckoutIntent,
+    NotificacionMercadoPago,
+    OrdenMercadoPagoPresencial,
+    PagoMercadoPago,
+    PreferenciaMercadoPagoCancelada,
+)
+from .tasks import procesar_notificacion_mercadopago
+
+logger = logging.getLogger(__name__)
+
+CONSULTADO_KEY = "mp:reconciliacion:consultado:{tipo}:{pk}"
+
+
+@dataclass
+class _Candidato:
+    tipo: str
+    pk: int
+    referencia: str
+    topic: str = ""
+    resource_id: str = ""
+    error: str = ""
+
+
+def reconciliar_pagos_pendientes(antiguedad_minutos=None, lote=None, concurrencia=None) -> dict:
+    """Consulta en MP los pagos pendientes y aplica los aprobados; devuelve el reporte."""
+    antiguedad_minutos = int(
+        antiguedad_minutos or getattr(settings, "MP_RECONCILIACION_ANTIGUEDAD_MINUTOS", 5)
+    )
+    lote = int(lote or getattr(settings, "MP_RECONCILIACION_LOTE", 50))
+    concurrencia = int(concurrencia or getattr(settings, "MP_RECONCILIACION_CONCURRENCIA", 4))
+
+    candidatos = _candidatos(antiguedad_minutos, lote)
+    reporte = {
+        "candidatos": len(candidatos),
+        "pagos": sum(1 for c in candidatos if c.tipo == "pago"),
+        "ordenes": sum(1 for c in candidatos if c.tipo == "orden"),
+        "checkouts": sum(1 for c in candidatos if c.tipo == "checkout"),
+        "aprobados_en_mp": 0,
+        "aplicados": 0,
+        "ya_aplicados": 0,
+        "sin_aplicar": 0,
+        "fallidos": 0,
+        "errores_consulta": 0,
+    }
+    if not candidatos:
+        return reporte
+
+    # Solo las consultas HTTP van a los hilos; la base se toca en este hilo.
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrencia, len(candidatos)))) as executor:
+        candidatos = list(executor.map(_consultar_mp, candidatos))
+
+    cache = _cache()
+    for candidato in candidatos:
+        cache.set(
+            CONSULTADO_KEY.format(tipo=candidato.tipo, pk=candidato.pk),
+            1,
+            antiguedad_minutos * 60,
+        )
+        if candidato.error:
+            reporte["errores_consulta"] += 1
+            continue
+        if not candidato.resource_id:
+            continue
+        reporte["aprobados_en_mp"] += 1
+        reporte[_aplicar(candidato)] += 1
+
+    logger.info("Reconciliación MP: %s", reporte)
+    return reporte
+
+
+def _cache():
+    return caches[getattr(settings, "MP_PAYMENT_EVENTS_CACHE_ALIAS", "default")]
+
+
+def _candidatos(antiguedad_minutos: int, lote: int) -> list:
+    ahora = timezone.now()
+    rango = {
+        "creado_en__lte": ahora - timedelta(minutes=antiguedad_minutos),
+        "creado_en__gte": ahora
+        - timedelta(hours=int(getattr(settings, "MP_RECONCILIACION_VENTANA_HORAS", 48))),
+    }
+    canceladas = PreferenciaMercadoPagoCancelada.objects.values("preference_id")
+
+    pagos = (
+        PagoMercadoPago.objects.filter(estado="pending", **rango)
+        .exclude(preference_id__startswith="PENDING-")
+        .exclude(preference_id__in=canceladas)
+        .order_by("-creado_en")
+        .values_list("pk", "preference_id")
+    )
+    ordenes = (
+        OrdenMercadoPagoPresencial.objects.filter(estado="pending", **rango)
+        .exclude(reference_id__in=canceladas)
+        .order_by("-creado_en")
+        .values_list("pk", "reference_id")
+    )
+    # Todo pago aplicado deja su PagoMercadoPago aprobado con el preference_id.
+    checkouts = (
+        CheckoutIntent.objects.filter(**rango)
+        .exclude(preference_id="")
+        .exclude(preference_id__in=canceladas)
+        .exclude(
+            preference_id__in=PagoMercadoPago.objects.filter(estado="approved").values(
+                "preference_id"
+            )
+        )
+        .order_by("-creado_en")
+        .values_list("pk", "preference_id")
+    )
+
+    cache = _cache()
+    candidatos = []
+    preferencias = set()
+    for tipo, filas in (("orden", ordenes), ("pago", pagos), ("checkout", checkouts)):
+        for pk, referencia in filas.iterator():
+            if len(candidatos) >= lote:
+                return candidatos
+            # Un checkout con PagoMercadoPago pendiente ya se consulta como "pago".
+            if tipo == "checkout" and referencia in preferencias:
+                continue
+            if tipo == "pago":
+                preferencias.add(referencia)
+            if cache.get(CONSULTADO_KEY.format(tipo=tipo, pk=pk)):
+                continue
+            candidatos.append(_Candidato(tipo=tipo, pk=pk, referencia=referencia))
+    return candidatos
+
+
+def _consultar_mp(candidato: _Candidato) -> _Candidato:
+    try:
+        if candidato.tipo in ("pago", "checkout"):
+            pago = services.buscar_pago_aprobado_por_preference(candidato.referencia)
+            if pago:
+                candidato.topic, candidato.resource_id = "payment", str(pago.get("id") or "")
+            return candidato
+
+        pago = services.buscar_pago_aprobado_por_external_reference(
+            candidato.referencia, use_qr_credentials=True
+        )
+        if pago:
+            candidato.topic, candidato.resource_id = "payment", str(pago.get("id") or "")
+            return candidato
+        orden = services.buscar_orden_aprobada_por_external_reference(
+            candidato.referencia, use_qr_credentials=True
+        )
+        if orden:
+            candidato.topic, candidato.resource_id = "merchant_order", str(orden.get("id") or "")
+    except Exception as exc:
+        logger.warning(
+            "Reconciliación MP: error consultando %s %s: %s",
+            candidato.tipo,
+            candidato.referencia,
+            exc,
+        )
+        candidato.error = str(exc)
+    return candidato
+
+
+def _aplicar(candidato: _Candidato) -> str:
+    notificacion, _ = NotificacionMercadoPago.objects.get_or_create(
+        dedup_key=NotificacionMercadoPago.construir_dedup_key(
+            candidato.topic, candidato.resource_id
+        ),
+        defaults={
+            "topic": candidato.topic,
+            "resource_id": candidato.resource_id,
+            "payload": {"origen": "reconciliacion", "referencia": candidato.referencia},
+        },
+    )
+    if notificacion.payment_id:
+        return "ya_aplicados"
+
+    procesar_notificacion_mercadopago(notificacion.id)
+    notificacion.refresh_from_db()
+    if notificacion.estado == NotificacionMercadoPago.ESTADO_FALLIDA:
+        return "fallidos"
+    if notificacion.payment_id:
+        return "aplicados"
+    # Otra notificación del mismo pago ya lo aplicó, o el pago no aplica (p. ej. sin preferencia).
+    return "sin_aplicar"
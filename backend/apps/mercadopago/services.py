@@ -6,26 +6,34 @@ Toda la interacción con el SDK de MP vive aquí para mantener las vistas limpia
 
 import json
 import logging
+from datetime import datetime
 
 import mercadopago
-import requests
 from django.conf import settings
+from django.utils import timezone
+
+from . import client
 
 logger = logging.getLogger(__name__)
 
 
 def _get_sdk(access_token: str | None = None) -> mercadopago.SDK:
-    """Crea el SDK con el token indicado y valida configuración mínima."""
+    """Devuelve el SDK (cacheado por proceso) del token indicado y valida configuración mínima."""
     access_token = (access_token or getattr(settings, "MP_ACCESS_TOKEN", "") or "").strip()
     if not access_token:
         raise ValueError(
             "Configuración incompleta de Mercado Pago: falta MP_ACCESS_TOKEN en backend/.env"
         )
-    return mercadopago.SDK(access_token)
+    return client.get_sdk(access_token)
+
+
+def _fecha_mp(fecha: datetime) -> str:
+    """Fecha en el formato ISO 8601 con milisegundos y offset que espera MP."""
+    return timezone.localtime(fecha).isoformat(timespec="milliseconds")
 
 
 def _get_qr_sdk() -> mercadopago.SDK:
-    """Crea el SDK con las credenciales de QR presencial."""
+    """Devuelve el SDK con las credenciales de QR presencial."""
     access_token = (
         getattr(settings, "MP_QR_ACCESS_TOKEN", "")
         or getattr(settings, "MP_ACCESS_TOKEN", "")
@@ -44,10 +52,14 @@ def crear_preferencia(
     back_urls: dict | None = None,
     auto_return: str = "approved",
     payer_email: str = "",
+    expiration_date_to: datetime | None = None,
 ) -> dict:
     """
     Crea una preferencia de pago en Mercado Pago.
 
+    Con ``expiration_date_to`` la preferencia deja de aceptar pagos en esa
+    fecha (se usa el vencimiento del bloqueo temporal del horario).
+
     Devuelve un dict con:
         preference_id, init_point, sandbox_init_point
     """
@@ -94,6 +106,10 @@ def crear_preferencia(
     if payer_email:
         preference_data["payer"] = {"email": payer_email}
 
+    if expiration_date_to:
+        preference_data["expires"] = True
+        preference_data["expiration_date_to"] = _fecha_mp(expiration_date_to)
+
     # Debug log
     logger.debug(
         "MP back_urls: %s | external_reference: %s | auto_return: %s",
@@ -269,8 +285,13 @@ def crear_orden_qr_dinamico(
     notification_url: str = "",
     sponsor_id: int | None = None,
     cash_out_amount: float = 0.0,
+    expiration_date: datetime | None = None,
 ) -> dict:
-    """Crea una orden QR dinámica nativa para lector de Mercado Pago."""
+    """Crea una orden QR dinámica nativa para lector de Mercado Pago.
+
+    Con ``expiration_date`` la orden vence en esa fecha, igual que
+    ``expiration_date_to`` en las preferencias.
+    """
     access_token = (
         getattr(settings, "MP_QR_ACCESS_TOKEN", "")
         or getattr(settings, "MP_ACCESS_TOKEN", "")
@@ -313,12 +334,14 @@ def crear_orden_qr_dinamico(
         payload["cash_out"] = {"amount": float(cash_out_amount)}
     if notification_url:
         payload["notification_url"] = notification_url
+    if expiration_date:
+        payload["expiration_date"] = _fecha_mp(expiration_date)
 
-    response = requests.put(
+    response = client.request(
+        "PUT",
         url,
         headers={"Authorization": f"Bearer {access_token}", "Content-Type": "application/json"},
         json=payload,
-        timeout=20,
     )
     if response.status_code not in (200, 201):
         raise ValueError(f"Mercado Pago rechazó la orden QR: {response.status_code} {response.text}")
@@ -357,11 +380,11 @@ def crear_pos_qr(
     elif external_store_id:
         payload["external_store_id"] = external_store_id
 
-    response = requests.post(
+    response = client.request(
+        "POST",
         "https://api.mercadopago.com/pos",
         headers={"Authorization": f"Bearer {access_token}", "Content-Type": "application/json"},
         json=payload,
-        timeout=20,
     )
     if response.status_code in (200, 201):
         return response.json()
@@ -419,11 +442,11 @@ def crear_store_qr(
         },
     }
 
-    response = requests.post(
+    response = client.request(
+        "POST",
         f"https://api.mercadopago.com/users/{collector_id}/stores",
         headers={"Authorization": f"Bearer {access_token}", "Content-Type": "application/json"},
         json=payload,
-        timeout=20,
     )
     if response.status_code in (200, 201):
         return response.json()
@@ -0,0 +1,21 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from . import eventos
+from .models import PagoMercadoPago, PreferenciaMercadoPagoCancelada
+
+
+@receiver(post_save, sender=PagoMercadoPago)
+def publicar_pago_aprobado(sender, instance, **kwargs):
+    """Despierta a los clientes que esperan la aprobación de la preferencia."""
+    if instance.estado == "approved":
+        transaction.on_commit(partial(eventos.publicar, instance.preference_id, "approved"))
+
+
+@receiver(post_save, sender=PreferenciaMercadoPagoCancelada)
+def publicar_preferencia_cancelada(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(partial(eventos.publicar, instance.preference_id, "cancelled"))
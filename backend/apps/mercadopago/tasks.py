@@ -0,0 +1,44 @@
+import logging
+
+from celery import shared_task
+from django.utils import timezone
+
+from .models import NotificacionMercadoPago
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(name="apps.mercadopago.tasks.procesar_notificacion")
+def procesar_notificacion_mercadopago(notificacion_id):
+    """Consulta en MP el recurso notificado y aplica el pago (una sola vez por payment_id)."""
+    from .views import WebhookMercadoPagoView
+
+    notificacion = NotificacionMercadoPago.objects.filter(id=notificacion_id).first()
+    if not notificacion:
+        logger.warning("Notificación MP inexistente: %s", notificacion_id)
+        return
+    if notificacion.payment_id:
+        return
+
+    notificacion.intentos += 1
+    try:
+        WebhookMercadoPagoView().procesar_notificacion(notificacion)
+    except Exception as exc:
+        logger.exception("Webhook MP: error procesando %s: %s", notificacion.dedup_key, exc)
+        notificacion.estado = NotificacionMercadoPago.ESTADO_FALLIDA
+        notificacion.ultimo_error = str(exc)[:2000]
+    else:
+        notificacion.estado = NotificacionMercadoPago.ESTADO_PROCESADA
+        notificacion.ultimo_error = ""
+    notificacion.procesado_en = timezone.now()
+    notificacion.save(
+        update_fields=["estado", "payment_id", "intentos", "ultimo_error", "procesado_en"]
+    )
+
+
+@shared_task(name="apps.mercadopago.tasks.reconciliar_pagos")
+def reconciliar_pagos_mercadopago():
+    """Recupera pagos aprobados en MP cuyo webhook no llegó (ver ``reconciliacion``)."""
+    from .reconciliacion import reconciliar_pagos_pendientes
+
+    return reconciliar_pagos_pendientes()
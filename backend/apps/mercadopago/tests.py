@@ -0,0 +1,654 @@
+import json
+import threading
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.clientes.models import Cliente
+from apps.empleados.models import Empleado
+from apps.servicios.models import CategoriaServicio, Sala, Servicio
+from apps.turnos.models import BloqueoTemporalTurno, Turno
+from apps.turnos.services.bloqueo_temporal_service import (
+    HorarioNoDisponibleError,
+    crear_bloqueo,
+)
+from apps.turnos.services.disponibilidad_service import calcular_horarios_disponibles_rango
+from apps.turnos.tasks import limpiar_bloqueos_temporales
+from apps.users.models import User
+
+from . import checkout, client
+from .models import (
+    CheckoutIntent,
+    NotificacionMercadoPago,
+    OrdenMercadoPagoPresencial,
+    PagoMercadoPago,
+    PagoMercadoPagoAplicado,
+)
+from .reconciliacion import reconciliar_pagos_pendientes
+from .tasks import procesar_notificacion_mercadopago
+from .views import WebhookMercadoPagoView
+
+
+def _crear_agenda(sufijo):
+    sala = Sala.objects.create(nombre=f"Sala {sufijo}", capacidad_simultanea=1)
+    categoria = CategoriaServicio.objects.create(nombre=f"Categoria {sufijo}", sala=sala)
+    servicio = Servicio.objects.create(
+        nombre=f"Servicio {sufijo}", categoria=categoria, precio=Decimal("1000.00"), duracion_minutos=30
+    )
+    user_profesional = User.objects.create_user(
+        email=f"pro.{sufijo}@test.com",
+        password="password1.2.3",
+        username=f"pro_{sufijo}",
+        role="profesional",
+    )
+    empleado = Empleado.objects.create(
+        user=user_profesional,
+        fecha_ingreso=date.today(),
+        horario_entrada=time(9, 0),
+        horario_salida=time(18, 0),
+        dias_trabajo="L,M,Mi,J,V,S,D",
+    )
+    return servicio, empleado
+
+
+def _crear_cliente(indice):
+    user = User.objects.create_user(
+        email=f"cliente.checkout{indice}@test.com",
+        password="password1.2.3",
+        username=f"cliente_checkout{indice}",
+        role="cliente",
+    )
+    return Cliente.objects.create(user=user)
+
+
+class WebhookMercadoPagoColaTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = "/api/mercadopago/webhook/"
+        self.external_reference = json.dumps({"cliente_id": 1, "servicio_id": 1})
+
+    def _notificacion(self, topic, resource_id):
+        return NotificacionMercadoPago.objects.create(
+            topic=topic,
+            resource_id=resource_id,
+            dedup_key=NotificacionMercadoPago.construir_dedup_key(topic, resource_id),
+        )
+
+    @patch("apps.mercadopago.tasks.procesar_notificacion_mercadopago.delay")
+    @patch("apps.mercadopago.services.obtener_pago")
+    def test_registra_y_encola_sin_consultar_mp(self, mocked_obtener_pago, mocked_delay):
+        body = {"type": "payment", "data": {"id": "9001"}}
+
+        first = self.client.post(self.url, data=body, format="json")
+        second = self.client.post(self.url, data=body, format="json")
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 200)
+        notificacion = NotificacionMercadoPago.objects.get()
+        self.assertEqual(notificacion.dedup_key, "payment:9001")
+        mocked_delay.assert_called_once_with(notificacion.id)
+        mocked_obtener_pago.assert_not_called()
+
+    @patch.object(WebhookMercadoPagoView, "_crear_turno_desde_payload")
+    @patch("apps.mercadopago.services.obtener_orden")
+    @patch("apps.mercadopago.services.obtener_pago")
+    def test_payment_y_merchant_order_aplican_el_pago_una_vez(
+        self, mocked_obtener_pago, mocked_obtener_orden, mocked_crear
+    ):
+        mocked_obtener_pago.return_value = {
+            "status": "approved",
+            "preference_id": "pref-1",
+            "external_reference": self.external_reference,
+        }
+        mocked_obtener_orden.return_value = {
+            "preference_id": "pref-1",
+            "external_reference": self.external_reference,
+            "payments": [{"id": "9001", "status": "approved", "total_paid_amount": 100}],
+        }
+        payment = self._notificacion("payment", "9001")
+        merchant_order = self._notificacion("merchant_order", "555")
+
+        procesar_notificacion_mercadopago(payment.id)
+        procesar_notificacion_mercadopago(merchant_order.id)
+
+        mocked_crear.assert_called_once()
+        self.assertEqual(PagoMercadoPagoAplicado.objects.get().notificacion_id, payment.id)
+        payment.refresh_from_db()
+        merchant_order.refresh_from_db()
+        self.assertEqual(payment.payment_id, "9001")
+        self.assertEqual(merchant_order.payment_id, "")
+        self.assertEqual(merchant_order.estado, NotificacionMercadoPago.ESTADO_PROCESADA)
+
+    @patch.object(WebhookMercadoPagoView, "_crear_turno_desde_payload")
+    @patch("apps.mercadopago.services.obtener_pago")
+    def test_notificacion_fallida_se_reprocesa(self, mocked_obtener_pago, mocked_crear):
+        mocked_obtener_pago.side_effect = ValueError("MP no disponible")
+        notificacion = self._notificacion("payment", "9002")
+
+        procesar_notificacion_mercadopago(notificacion.id)
+        notificacion.refresh_from_db()
+        self.assertEqual(notificacion.estado, NotificacionMercadoPago.ESTADO_FALLIDA)
+        self.assertIn("MP no disponible", notificacion.ultimo_error)
+        self.assertFalse(PagoMercadoPagoAplicado.objects.exists())
+
+        mocked_obtener_pago.side_effect = None
+        mocked_obtener_pago.return_value = {
+            "status": "approved",
+            "preference_id": "pref-2",
+            "external_reference": self.external_reference,
+        }
+        call_command("reprocesar_notificaciones_mp", "--sync", stdout=StringIO())
+
+        notificacion.refresh_from_db()
+        self.assertEqual(notificacion.estado, NotificacionMercadoPago.ESTADO_PROCESADA)
+        self.assertEqual(notificacion.payment_id, "9002")
+        self.assertEqual(notificacion.intentos, 2)
+        mocked_crear.assert_called_once()
+
+
+class _FakeMercadoPagoHandler(BaseHTTPRequestHandler):
+    def _responder(self):
+        with self.server.lock:
+            self.server.calls.append((self.command, self.path))
+            fallar = self.server.fallas_pendientes > 0
+            if fallar:
+                self.server.fallas_pendientes -= 1
+        if "content-length" in self.headers:
+            self.rfile.read(int(self.headers["content-length"]))
+        body = json.dumps({"id": "1", "status": "approved"}).encode()
+        self.send_response(503 if fallar else 200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = _responder
+    do_POST = _responder
+
+    def log_message(self, *args):
+        pass
+
+
+@override_settings(MP_HTTP_GET_RETRIES=2)
+class MercadoPagoClientTests(TestCase):
+    def setUp(self):
+        client.reset_client()
+        self.addCleanup(client.reset_client)
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeMercadoPagoHandler)
+        self.server.lock = threading.Lock()
+        self.server.calls = []
+        self.server.fallas_pendientes = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def test_sdk_cacheado_por_token_y_sesion_compartida(self):
+        sdk = client.get_sdk("TOKEN-A")
+
+        self.assertIs(client.get_sdk("TOKEN-A"), sdk)
+        self.assertIsNot(client.get_sdk("TOKEN-B"), sdk)
+        self.assertIsInstance(sdk.http_client, client.PooledHttpClient)
+        self.assertIs(client.get_session(), client.get_session())
+
+    def test_reintenta_get_pero_no_post(self):
+        self.server.fallas_pendientes = 1
+        response = client.request("GET", f"{self.base}/v1/payments/123")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.server.calls), 2)
+
+        self.server.fallas_pendientes = 1
+        response = client.request("POST", f"{self.base}/checkout/preferences", json={})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(len(self.server.calls), 3)
+
+    def test_ruta_metrica_reemplaza_ids(self):
+        self.assertEqual(client._ruta_metrica(f"{self.base}/v1/payments/123"), "/v1/payments/:id")
+        self.assertEqual(
+            client._ruta_metrica("https://api.mercadopago.com/checkout/preferences/99-ab"),
+            "/checkout/preferences/:id",
+        )
+
+
+class VerificarPagoEsperaTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.url = "/api/mercadopago/verificar-pago/pref-espera/"
+        self.cliente = _crear_cliente("espera")
+        self.client = APIClient()
+        self.client.force_authenticate(self.cliente.user)
+        servicio, empleado = _crear_agenda("espera")
+        self.turno = Turno.objects.create(
+            cliente=self.cliente,
+            empleado=empleado,
+            servicio=servicio,
+            fecha_hora=timezone.now() + timedelta(days=2),
+        )
+
+    def _aprobar_pago(self):
+        return PagoMercadoPago.objects.create(
+            turno=self.turno,
+            cliente=self.cliente,
+            preference_id="pref-espera",
+            payment_id="777",
+            monto=Decimal("1000.00"),
+            estado="approved",
+        )
+
+    @patch("apps.mercadopago.services.buscar_ultimo_pago_por_preference", return_value=None)
+    @patch("apps.mercadopago.services.buscar_pago_aprobado_por_preference", return_value=None)
+    @override_settings(MP_VERIFICAR_PAGO_CONSULTAR_MP=True)
+    def test_reconciliacion_con_mp_compartida_entre_clientes(self, mocked_buscar, mocked_ultimo):
+        for _ in range(3):
+            response = self.client.get(self.url)
+            self.assertEqual(response.data["status"], "pending")
+
+        mocked_buscar.assert_called_once_with("pref-espera")
+
+    @patch("apps.mercadopago.services.buscar_ultimo_pago_por_preference", return_value=None)
+    @patch("apps.mercadopago.services.buscar_pago_aprobado_por_preference", return_value=None)
+    def test_long_poll_responde_al_aprobarse_el_pago(self, mocked_buscar, mocked_ultimo):
+        with patch(
+            "apps.mercadopago.eventos._Suscripcion.esperar",
+            side_effect=lambda segundos: bool(self._aprobar_pago()),
+        ) as mocked_esperar:
+            response = self.client.get(self.url, {"espera": 20})
+
+        self.assertEqual(response.data["status"], "approved")
+        self.assertEqual(response.data["turno_id"], self.turno.pk)
+        mocked_esperar.assert_called_once()
+
+    @patch("apps.mercadopago.eventos.publicar")
+    def test_pago_aprobado_publica_evento_al_confirmar(self, mocked_publicar):
+        with self.captureOnCommitCallbacks(execute=True):
+            self._aprobar_pago()
+
+        mocked_publicar.assert_called_once_with("pref-espera", "approved")
+
+
+class ReconciliacionPagosTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.orden = OrdenMercadoPagoPresencial.objects.create(
+            reference_id="qr-ref-1",
+            payload={},
+            monto=Decimal("1500.00"),
+        )
+        OrdenMercadoPagoPresencial.objects.filter(pk=self.orden.pk).update(
+            creado_en=timezone.now() - timedelta(minutes=30)
+        )
+        OrdenMercadoPagoPresencial.objects.create(
+            reference_id="qr-ref-reciente",
+            payload={},
+            monto=Decimal("1500.00"),
+        )
+
+    @patch.object(WebhookMercadoPagoView, "_crear_turno_desde_orden_presencial")
+    @patch("apps.mercadopago.services.obtener_pago")
+    @patch("apps.mercadopago.services.buscar_pago_aprobado_por_external_reference")
+    def test_aplica_ordenes_aprobadas_por_el_camino_del_webhook(
+        self, mocked_buscar, mocked_obtener_pago, mocked_crear
+    ):
+        mocked_buscar.return_value = {"id": 4242, "status": "approved"}
+        mocked_obtener_pago.return_value = {
+            "status": "approved",
+            "external_reference": "qr-ref-1",
+            "transaction_amount": 1500,
+        }
+
+        reporte = reconciliar_pagos_pendientes()
+
+        self.assertEqual(reporte["candidatos"], 1)
+        self.assertEqual(reporte["aplicados"], 1)
+        mocked_buscar.assert_called_once_with("qr-ref-1", use_qr_credentials=True)
+        mocked_crear.assert_called_once()
+        self.assertTrue(PagoMercadoPagoAplicado.objects.filter(payment_id="4242").exists())
+        self.assertTrue(
+            NotificacionMercadoPago.objects.filter(dedup_key="payment:4242").exists()
+        )
+
+        # El candidato recién consultado no vuelve a ir a MP en la corrida siguiente.
+        self.assertEqual(reconciliar_pagos_pendientes()["candidatos"], 0)
+
+
+    @patch("apps.mercadopago.services.buscar_orden_aprobada_por_external_reference", return_value=None)
+    @patch("apps.mercadopago.services.buscar_pago_aprobado_por_external_reference", return_value=None)
+    @patch("apps.mercadopago.services.obtener_pago")
+    @patch("apps.mercadopago.services.buscar_pago_aprobado_por_preference")
+    @patch("apps.mercadopago.services.crear_preferencia")
+    def test_recupera_checkout_online_que_solo_tiene_intent(
+        self, mocked_crear, mocked_buscar_preference, mocked_obtener_pago, *_
+    ):
+        servicio, empleado = _crear_agenda("reconciliacion")
+        cliente = _crear_cliente("reconciliacion")
+        fecha_hora = timezone.make_aware(
+            datetime.combine(timezone.localdate() + timedelta(days=3), time(11, 0))
+        )
+        mocked_crear.return_value = {
+            "preference_id": "pref-intent",
+            "init_point": "",
+            "sandbox_init_point": "",
+        }
+        api = APIClient()
+        api.force_authenticate(cliente.user)
+        response = api.post(
+            "/api/mercadopago/preferencia-sin-turno/",
+            {
+                "servicio_id": servicio.pk,
+                "empleado_id": empleado.pk,
+                "fecha_hora": fecha_hora.isoformat(),
+                "tipo_pago": "PAGO_COMPLETO",
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        intent = CheckoutIntent.objects.get(preference_id="pref-intent")
+        self.assertFalse(PagoMercadoPago.objects.filter(preference_id="pref-intent").exists())
+        CheckoutIntent.objects.filter(pk=intent.pk).update(
+            creado_en=timezone.now() - timedelta(minutes=30)
+        )
+        mocked_buscar_preference.return_value = {"id": 5151, "status": "approved"}
+        mocked_obtener_pago.return_value = {
+            "status": "approved",
+            "external_reference": intent.referencia,
+            "preference_id": "pref-intent",
+            "transaction_amount": 1000,
+        }
+
+        reporte = reconciliar_pagos_pendientes()
+
+        self.assertEqual((reporte["checkouts"], reporte["aplicados"]), (1, 1))
+        mocked_buscar_preference.assert_called_once_with("pref-intent")
+        pago = PagoMercadoPago.objects.get(preference_id="pref-intent")
+        self.assertEqual(pago.estado, "approved")
+        self.assertEqual((pago.turno.cliente, pago.turno.fecha_hora), (cliente, fecha_hora))
+
+        # Con el pago aplicado el intent deja de ser candidato.
+        cache.clear()
+        self.assertEqual(reconciliar_pagos_pendientes()["checkouts"], 0)
+
+
+class CheckoutIntentTests(TestCase):
+    def test_referencia_firmada_resuelve_el_payload(self):
+        payload = {"cliente_id": 1, "servicio_id": 2, "tipo_movimiento": "reserva"}
+        intent = checkout.crear_intent(payload)
+        checkout.asociar_preferencia(intent, "pref-1")
+
+        self.assertTrue(intent.referencia.startswith(checkout.PREFIJO))
+        self.assertLessEqual(len(intent.referencia), 80)
+        self.assertEqual(checkout.resolver(intent.referencia), payload)
+        self.assertEqual(
+            WebhookMercadoPagoView()._parse_turno_payload(intent.referencia), payload
+        )
+        intent.refresh_from_db()
+        self.assertEqual(intent.preference_id, "pref-1")
+        self.assertEqual(intent.tipo_movimiento, "reserva")
+
+    def test_referencia_adulterada_no_consulta_la_base(self):
+        intent = checkout.crear_intent({"cliente_id": 1})
+        adulterada = intent.referencia[:-1] + ("A" if intent.referencia[-1] != "A" else "B")
+
+        with self.assertNumQueries(0):
+            self.assertIsNone(checkout.resolver(adulterada))
+            self.assertIsNone(checkout.resolver("qr-ref-1"))
+
+    def test_external_reference_json_legacy_sigue_funcionando(self):
+        legacy = json.dumps({"cliente_id": 3, "servicio_id": 4})
+
+        self.assertEqual(
+            WebhookMercadoPagoView()._parse_turno_payload(legacy),
+            {"cliente_id": 3, "servicio_id": 4},
+        )
+
+
+class BloqueoTemporalCheckoutTests(TestCase):
+    def setUp(self):
+        self.url = "/api/mercadopago/preferencia-sin-turno/"
+        self.servicio, self.empleado = _crear_agenda("bloqueo")
+        self.fecha = timezone.localdate() + timedelta(days=3)
+        self.fecha_hora = timezone.make_aware(timezone.datetime.combine(self.fecha, time(10, 0)))
+
+    def _checkout(self, cliente, **extra):
+        api = APIClient()
+        api.force_authenticate(cliente.user)
+        return api.post(
+            self.url,
+            {
+                "servicio_id": self.servicio.pk,
+                "empleado_id": self.empleado.pk,
+                "fecha_hora": self.fecha_hora.isoformat(),
+                "tipo_pago": "PAGO_COMPLETO",
+                **extra,
+            },
+            format="json",
+        )
+
+    @patch("apps.mercadopago.services.crear_preferencia")
+    def test_checkouts_sucesivos_solo_el_primero_obtiene_el_horario(self, mocked_crear):
+        """Cubre solo el caso secuencial: cada checkout ve el bloqueo del anterior.
+
+        La carrera real entre hilos está en ``BloqueoTemporalConcurrenciaTests``.
+        """
+        mocked_crear.side_effect = [
+            {"preference_id": f"pref-{i}", "init_point": "", "sandbox_init_point": ""}
+            for i in range(8)
+        ]
+
+        respuestas = [self._checkout(_crear_cliente(i)) for i in range(8)]
+
+        self.assertEqual([r.status_code for r in respuestas].count(201), 1)
+        self.assertEqual([r.status_code for r in respuestas].count(409), 7)
+        mocked_crear.assert_called_once()
+        bloqueo = BloqueoTemporalTurno.objects.get()
+        self.assertEqual(bloqueo.referencia, "pref-0")
+        self.assertNotIn(
+            "10:00",
+            calcular_horarios_disponibles_rango(self.empleado, self.servicio, [self.fecha])[self.fecha],
+        )
+
+    @patch("apps.mercadopago.services.crear_preferencia")
+    def test_oferta_de_fidelizacion_reubicada_usa_la_misma_fecha_en_bloqueo_y_pago(self, mocked_crear):
+        mocked_crear.return_value = {"preference_id": "pref-fide", "init_point": "", "sandbox_init_point": ""}
+        Turno.objects.create(
+            cliente=_crear_cliente(2),
+            empleado=self.empleado,
+            servicio=self.servicio,
+            fecha_hora=self.fecha_hora,
+            estado="confirmado",
+        )
+
+        response = self._checkout(_crear_cliente(1), aplicar_descuento_fidelizacion=True)
+
+        self.assertEqual(response.status_code, 201)
+        bloqueo = BloqueoTemporalTurno.objects.get()
+        self.assertNotEqual(bloqueo.fecha_hora_inicio, self.fecha_hora)
+        payload = CheckoutIntent.objects.get(preference_id="pref-fide").payload
+        self.assertEqual(datetime.fromisoformat(payload["fecha_hora"]), bloqueo.fecha_hora_inicio)
+
+    @patch("apps.mercadopago.services.crear_preferencia")
+    def test_reintento_de_oferta_de_fidelizacion_conserva_su_propio_horario(self, mocked_crear):
+        mocked_crear.return_value = {"preference_id": "pref-reintento", "init_point": "", "sandbox_init_point": ""}
+        cliente = _crear_cliente(1)
+        crear_bloqueo(self.empleado, self.servicio, self.fecha_hora, cliente=cliente)
+
+        response = self._checkout(cliente, aplicar_descuento_fidelizacion=True)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(BloqueoTemporalTurno.objects.get().fecha_hora_inicio, self.fecha_hora)
+
+    def test_bloqueo_de_otro_horario_del_mismo_cliente_se_conserva(self):
+        cliente = _crear_cliente(1)
+        anterior = crear_bloqueo(self.empleado, self.servicio, self.fecha_hora, cliente=cliente)
+        otro_horario = self.fecha_hora + timedelta(hours=2)
+
+        crear_bloqueo(self.empleado, self.servicio, otro_horario, cliente=cliente)
+        reintento = crear_bloqueo(self.empleado, self.servicio, otro_horario, cliente=cliente)
+
+        self.assertEqual(
+            set(BloqueoTemporalTurno.objects.values_list("pk", flat=True)), {anterior.pk, reintento.pk}
+        )
+
+    @patch("apps.mercadopago.services.crear_preferencia")
+    def test_preferencia_vence_junto_con_el_bloqueo(self, mocked_crear):
+        mocked_crear.return_value = {"preference_id": "pref-vence", "init_point": "", "sandbox_init_point": ""}
+
+        self.assertEqual(self._checkout(_crear_cliente(1)).status_code, 201)
+
+        bloqueo = BloqueoTemporalTurno.objects.get()
+        self.assertEqual(mocked_crear.call_args.kwargs["expiration_date_to"], bloqueo.expira_en)
+
+    @patch("apps.mercadopago.services.crear_preferencia", side_effect=ValueError("MP caído"))
+    def test_error_de_mp_libera_el_horario(self, mocked_crear):
+        self.assertEqual(self._checkout(_crear_cliente(1)).status_code, 502)
+        self.assertFalse(BloqueoTemporalTurno.objects.exists())
+
+    def test_bloqueo_vencido_deja_de_ocupar_y_se_limpia(self):
+        bloqueo = crear_bloqueo(self.empleado, self.servicio, self.fecha_hora, cliente=_crear_cliente(1))
+        with self.assertRaises(HorarioNoDisponibleError):
+            crear_bloqueo(self.empleado, self.servicio, self.fecha_hora, cliente=_crear_cliente(2))
+
+        BloqueoTemporalTurno.objects.filter(pk=bloqueo.pk).update(
+            expira_en=timezone.now() - timedelta(seconds=1)
+        )
+        self.assertIn(
+            "10:00",
+            calcular_horarios_disponibles_rango(self.empleado, self.servicio, [self.fecha])[self.fecha],
+        )
+        self.assertEqual(limpiar_bloqueos_temporales(), 1)
+
+    def test_webhook_aprobado_convierte_el_bloqueo_en_turno(self):
+        cliente = _crear_cliente(1)
+        bloqueo = crear_bloqueo(self.empleado, self.servicio, self.fecha_hora, cliente=cliente)
+
+        WebhookMercadoPagoView()._crear_turno_desde_payload(
+            {
+                "cliente_id": cliente.pk,
+                "servicio_id": self.servicio.pk,
+                "empleado_id": self.empleado.pk,
+                "fecha_hora": self.fecha_hora.isoformat(),
+                "tipo_pago": "PAGO_COMPLETO",
+                "monto_cobrado": "1000.00",
+                "bloqueo_id": bloqueo.pk,
+            },
+            "pay-bloqueo",
+            "pref-bloqueo",
+        )
+
+        self.assertFalse(BloqueoTemporalTurno.objects.exists())
+        self.assertTrue(
+            Turno.objects.filter(empleado=self.empleado, fecha_hora=self.fecha_hora, cliente=cliente).exists()
+        )
+
+    @patch("apps.mercadopago.services.crear_preferencia")
+    def test_checkout_desde_panel_bloquea_el_horario(self, mocked_crear):
+        mocked_crear.return_value = {"preference_id": "pref-staff", "init_point": "", "sandbox_init_point": ""}
+        cliente = _crear_cliente(1)
+        api = APIClient()
+        api.force_authenticate(self.empleado.user)
+
+        response = api.post(
+            "/api/mercadopago/preferencia-staff/",
+            {
+                "servicio_id": self.servicio.pk,
+                "empleado_id": self.empleado.pk,
+                "fecha_hora": self.fecha_hora.isoformat(),
+                "cliente_id": cliente.pk,
+                "tipo_pago": "PAGO_COMPLETO",
+            },
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, 201)
+        bloqueo = BloqueoTemporalTurno.objects.get()
+        self.assertEqual((bloqueo.cliente_id, bloqueo.referencia), (cliente.pk, "pref-staff"))
+        self.assertEqual(self._checkout(_crear_cliente(2)).status_code, 409)
+
+    def test_alta_de_turno_respeta_el_checkout_de_otro_cliente(self):
+        from apps.turnos.serializers import TurnoCreateSerializer
+
+        pagando = _crear_cliente(1)
+        crear_bloqueo(self.empleado, self.servicio, self.fecha_hora, cliente=pagando)
+        datos = {
+            "empleado": self.empleado.pk,
+            "servicio": self.servicio.pk,
+            "fecha_hora": self.fecha_hora.isoformat(),
+        }
+
+        serializer = TurnoCreateSerializer(data={**datos, "cliente": _crear_cliente(2).pk})
+        self.assertFalse(serializer.is_valid())
+        self.assertIn("fecha_hora", serializer.errors)
+        self.assertTrue(TurnoCreateSerializer(data={**datos, "cliente": pagando.pk}).is_valid())
+
+    def test_alta_de_turno_revalida_el_horario_con_la_agenda_bloqueada(self):
+        from rest_framework.exceptions import ValidationError
+
+        from apps.turnos.serializers import TurnoCreateSerializer
+
+        serializer = TurnoCreateSerializer(
+            data={
+                "cliente": _crear_cliente(1).pk,
+                "empleado": self.empleado.pk,
+                "servicio": self.servicio.pk,
+                "fecha_hora": self.fecha_hora.isoformat(),
+            }
+        )
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        # Otro checkout toma el horario entre la validación y el guardado.
+        crear_bloqueo(self.empleado, self.servicio, self.fecha_hora, cliente=_crear_cliente(2))
+
+        with self.assertRaises(ValidationError):
+            serializer.save()
+        self.assertFalse(Turno.objects.filter(empleado=self.empleado).exists())
+
+    def test_proximo_horario_sugerido_saltea_checkouts_de_otros(self):
+        from apps.emails.tasks import _buscar_proximo_horario_disponible
+
+        primero = _buscar_proximo_horario_disponible(self.empleado, self.servicio)
+        pagando = _crear_cliente(1)
+        crear_bloqueo(self.empleado, self.servicio, primero, cliente=pagando)
+
+        self.assertGreater(_buscar_proximo_horario_disponible(self.empleado, self.servicio), primero)
+        self.assertEqual(
+            _buscar_proximo_horario_disponible(self.empleado, self.servicio, cliente=pagando),
+            primero,
+        )
+
+@skipUnlessDBFeature("has_select_for_update")
+class BloqueoTemporalConcurrenciaTests(TransactionTestCase):
+    """Checkouts en hilos reales; necesita una base con ``SELECT ... FOR UPDATE``."""
+
+    def test_un_solo_bloqueo_por_horario_bajo_concurrencia(self):
+        servicio, empleado = _crear_agenda("concurrencia")
+        clientes = [_crear_cliente(i) for i in range(8)]
+        fecha_hora = timezone.now().replace(microsecond=0) + timedelta(days=3)
+        barrera = threading.Barrier(len(clientes))
+        resultados = []
+
+        def checkout(cliente):
+            try:
+                barrera.wait()
+                crear_bloqueo(empleado, servicio, fecha_hora, cliente=cliente)
+                resultados.append("ok")
+            except HorarioNoDisponibleError:
+                resultados.append("ocupado")
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=checkout, args=(cliente,)) for cliente in clientes]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(resultados.count("ok"), 1)
+        self.assertEqual(resultados.count("ocupado"), len(clientes) - 1)
+        self.assertEqual(BloqueoTemporalTurno.objects.count(), 1)
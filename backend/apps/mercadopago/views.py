@@ -12,12 +12,13 @@ Endpoints:
 import json
 import logging
 import secrets
+import time
 import uuid
 from datetime import timedelta
 from decimal import Decimal, ROUND_HALF_UP
 from io import BytesIO
 
-from django.db import transaction
+from django.db import IntegrityError, transaction
 from django.http import HttpResponse
 from django.utils import timezone
 from django.utils.dateparse import parse_datetime
@@ -34,15 +35,24 @@ from rest_framework.views import APIView
 
 from django.conf import settings
 
+from apps.core.history import historial_en_lote
 from apps.turnos.models import StreakCoupon, Turno
 from apps.turnos.serializers import calcular_monto_pendiente_turno
 from apps.clientes.models import Cliente
+from apps.users.utils import normalize_phone
 from apps.servicios.models import Servicio
 from apps.empleados.models import Empleado
 from apps.authentication.models import AuditoriaAcciones
 from apps.emails.models import PasswordResetToken, PromotionOffer
 from apps.emails.services import EmailService
-from .models import OrdenMercadoPagoPresencial, PagoMercadoPago, PreferenciaMercadoPagoCancelada
+from apps.core.metrics import observe_mp_webhook
+from .models import (
+    NotificacionMercadoPago,
+    OrdenMercadoPagoPresencial,
+    PagoMercadoPago,
+    PagoMercadoPagoAplicado,
+    PreferenciaMercadoPagoCancelada,
+)
 from .serializers import (
     CancelarPagoStaffSerializer,
     ConfirmarPagoManualSerializer,
@@ -54,38 +64,28 @@ from .serializers import (
     CrearPreferenciaStaffSerializer,
     PagoMercadoPagoSerializer,
 )
-from . import services
+from . import checkout, eventos, services
 from apps.turnos.services.reprogramacion_service import (
     reprogramar_turno,
     validar_rango_reprogramacion,
 )
 from apps.turnos.services.pagos_service import registrar_movimiento_pago_turno
+from apps.turnos.services.bloqueo_temporal_service import (
+    HorarioNoDisponibleError,
+    asociar_referencia as asociar_referencia_bloqueo,
+    crear_bloqueo,
+    liberar_bloqueo,
+)
+from apps.turnos.services.disponibilidad_service import (
+    bloquear_agenda,
+    horario_disponible,
+    horario_ocupado,
+)
+from apps.turnos.services import comprobantes_pdf_service
 
 logger = logging.getLogger(__name__)
 
 
-def _slot_turno_disponible(empleado: Empleado, servicio: Servicio, fecha_hora) -> bool:
-    if not fecha_hora or fecha_hora <= timezone.now():
-        return False
-
-    hora_fin = fecha_hora + timedelta(minutes=servicio.duracion_minutos)
-    turnos_dia = Turno.objects.select_related("servicio").filter(
-        empleado=empleado,
-        fecha_hora__date=fecha_hora.date(),
-        estado__in=["pendiente", "confirmado", "en_proceso"],
-    )
-    for turno in turnos_dia:
-        if not turno.fecha_hora or not turno.servicio:
-            continue
-        inicio_existente = turno.fecha_hora
-        fin_existente = inicio_existente + timedelta(
-            minutes=turno.servicio.duracion_minutos
-        )
-        if fecha_hora < fin_existente and hora_fin > inicio_existente:
-            return False
-    return True
-
-
 def _registrar_auditoria_staff(usuario, accion: str, modelo: str, objeto_id: int | None, detalles: dict) -> None:
     try:
         AuditoriaAcciones.objects.create(
@@ -137,7 +137,10 @@ def _actualizar_telefono_cliente_staff(cliente: Cliente, telefono: str, usuario_
     if not telefono or not getattr(cliente, "user", None):
         return
     telefono_anterior = cliente.user.phone or ""
-    if telefono_anterior == telefono:
+    if telefono_anterior == telefono or (
+        cliente.user.phone_normalized
+        and cliente.user.phone_normalized == normalize_phone(telefono)
+    ):
         return
     cliente.user.phone = telefono
     cliente.user.save(update_fields=["phone"])
@@ -155,27 +158,18 @@ def _actualizar_telefono_cliente_staff(cliente: Cliente, telefono: str, usuario_
     )
 
 
-def _expire_stale_streak_coupons(cliente):
-    now = timezone.now()
-    StreakCoupon.objects.filter(
-        cliente=cliente,
-        status__in=["pendiente", "reclamado"],
-        expires_at__lt=now,
-    ).update(status="vencido", updated_at=now)
-
-
 def _get_valid_streak_coupon(cliente, code):
     code = (code or "").strip().upper()
     if not code:
         return None, None
 
-    _expire_stale_streak_coupons(cliente)
     coupon = StreakCoupon.objects.filter(cliente=cliente, code=code).first()
     if not coupon:
         return None, "Cupón inválido."
-    if coupon.status == "usado":
+    coupon_status = coupon.effective_status()
+    if coupon_status == "usado":
         return None, "Ya usaste tu código de descuento."
-    if coupon.status != "reclamado":
+    if coupon_status != "reclamado":
         return None, "Cupón inválido."
     return coupon, None
 
@@ -432,8 +426,11 @@ class CrearPreferenciaSinTurnoView(APIView):
     """
     POST /api/mercadopago/preferencia-sin-turno/
 
-    Crea una preferencia de MP con los datos del turno codificados en external_reference.
+    Crea una preferencia de MP cuyo external_reference apunta a un CheckoutIntent
+    con los datos del turno.
     El turno NO se crea aquí — se crea en el webhook cuando el pago es aprobado.
+    Mientras tanto el horario queda con un BloqueoTemporalTurno; si otro
+    checkout ya lo tiene, responde 409.
 
     Body: {
         "servicio_id": <int>,
@@ -492,13 +489,13 @@ class CrearPreferenciaSinTurnoView(APIView):
 
         es_oferta_fidelizacion = bool(data.get("aplicar_descuento_fidelizacion"))
         fecha_hora_reserva = data["fecha_hora"]
-        if es_oferta_fidelizacion and not _slot_turno_disponible(
-            empleado_obj, servicio, fecha_hora_reserva
+        if es_oferta_fidelizacion and not horario_disponible(
+            empleado_obj, servicio, fecha_hora_reserva, cliente=cliente
         ):
             from apps.emails.tasks import _buscar_proximo_horario_disponible
 
             fecha_recalculada = _buscar_proximo_horario_disponible(
-                empleado_obj, servicio
+                empleado_obj, servicio, cliente=cliente
             )
             if not fecha_recalculada:
                 return Response(
@@ -597,42 +594,55 @@ class CrearPreferenciaSinTurnoView(APIView):
 
         # ── Caso gratuito: saldo cubre el 100% ─────────────────────────────
         if monto_final <= 0:
-            # Descontar créditos de la billetera
-            if creditos_aplicados > 0:
-                try:
-                    cliente.billetera.descontar_saldo(
-                        creditos_aplicados,
-                        motivo=f"Seña turno — {servicio.nombre}",
-                    )
-                except Exception as exc:
-                    logger.error("Error descontando saldo billetera: %s", exc)
-
-            # Crear Turno directamente (sin Mercado Pago)
-            empleado_obj = Empleado.objects.get(pk=data["empleado_id"])
-            turno = Turno.objects.create(
-                cliente=cliente,
-                servicio=servicio,
-                empleado=empleado_obj,
-                fecha_hora=data["fecha_hora"],
-                notas_cliente=notas_cliente,
-                estado="confirmado",
-                precio_final=precio_total,
-                senia_pagada=max(Decimal("0.00"), monto_base),
-                tipo_pago=tipo_pago,
-                canal_reserva="fidelizacion" if es_oferta_fidelizacion else "web_cliente",
-                metodo_pago="mercadopago_qr" if data.get("usar_qr") else "mercadopago",
-            )
-            if creditos_aplicados > 0:
-                registrar_movimiento_pago_turno(
-                    turno=turno,
-                    monto=creditos_aplicados,
-                    metodo="billetera",
-                    tipo=tipo_pago.lower() if tipo_pago == "SENIA" else "pago_completo",
-                    descripcion="Reserva cubierta con crédito de billetera",
-                    origen="web_cliente",
+            # Sin checkout de por medio: se revisa y se crea el turno con la
+            # agenda del profesional bloqueada.
+            with transaction.atomic():
+                bloquear_agenda(empleado_obj)
+                motivo_ocupado = horario_ocupado(
+                    empleado_obj,
+                    fecha_hora_reserva,
+                    servicio.duracion_minutos,
+                    excluir_cliente=cliente,
+                )
+                if motivo_ocupado:
+                    return Response({"detail": motivo_ocupado}, status=status.HTTP_409_CONFLICT)
+
+                # Descontar créditos de la billetera
+                if creditos_aplicados > 0:
+                    try:
+                        cliente.billetera.descontar_saldo(
+                            creditos_aplicados,
+                            motivo=f"Seña turno — {servicio.nombre}",
+                        )
+                    except Exception as exc:
+                        logger.error("Error descontando saldo billetera: %s", exc)
+
+                # Crear Turno directamente (sin Mercado Pago)
+                empleado_obj = Empleado.objects.get(pk=data["empleado_id"])
+                turno = Turno.objects.create(
+                    cliente=cliente,
+                    servicio=servicio,
+                    empleado=empleado_obj,
+                    fecha_hora=fecha_hora_reserva,
+                    notas_cliente=notas_cliente,
+                    estado="confirmado",
+                    precio_final=precio_total,
+                    senia_pagada=max(Decimal("0.00"), monto_base),
+                    tipo_pago=tipo_pago,
+                    canal_reserva="fidelizacion" if es_oferta_fidelizacion else "web_cliente",
+                    metodo_pago="mercadopago_qr" if data.get("usar_qr") else "mercadopago",
                 )
-            if streak_coupon:
-                _mark_streak_coupon_used(streak_coupon.id, turno)
+                if creditos_aplicados > 0:
+                    registrar_movimiento_pago_turno(
+                        turno=turno,
+                        monto=creditos_aplicados,
+                        metodo="billetera",
+                        tipo=tipo_pago.lower() if tipo_pago == "SENIA" else "pago_completo",
+                        descripcion="Reserva cubierta con crédito de billetera",
+                        origen="web_cliente",
+                    )
+                if streak_coupon:
+                    _mark_streak_coupon_used(streak_coupon.id, turno)
             logger.info(
                 "Turno gratuito creado (créditos 100%%) pk=%s cliente=%s",
                 turno.pk,
@@ -657,12 +667,18 @@ class CrearPreferenciaSinTurnoView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        # ── Codificar datos del turno en external_reference ─────────────────
+        # ── Reservar el horario mientras el cliente paga ───────────────────
+        try:
+            bloqueo = crear_bloqueo(empleado_obj, servicio, fecha_hora_reserva, cliente=cliente)
+        except HorarioNoDisponibleError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_409_CONFLICT)
+
+        # ── Datos del turno (se guardan en un CheckoutIntent) ───────────────
         turno_payload = {
             "cliente_id": cliente.pk,
             "servicio_id": servicio.pk,
             "empleado_id": data["empleado_id"],
-            "fecha_hora": data["fecha_hora"].isoformat(),
+            "fecha_hora": fecha_hora_reserva.isoformat(),
             "notas_cliente": data.get("notas_cliente", "") or "",
             "usar_sena": tipo_pago == "SENIA",
             "tipo_pago": tipo_pago,
@@ -676,9 +692,8 @@ class CrearPreferenciaSinTurnoView(APIView):
             "canal_reserva": "fidelizacion" if es_oferta_fidelizacion else "web_cliente",
             "metodo_pago": "mercadopago_qr" if data.get("usar_qr") else "mercadopago",
             "aplicar_descuento_fidelizacion": es_oferta_fidelizacion,
+            "bloqueo_id": bloqueo.pk,
         }
-        external_reference = json.dumps(turno_payload)
-
         notification_url = getattr(settings, "MERCADO_PAGO_WEBHOOK_URL", "")
 
         if data.get("usar_qr"):
@@ -689,6 +704,7 @@ class CrearPreferenciaSinTurnoView(APIView):
             ).strip()
             qr_pos_external_id = str(getattr(settings, "MP_QR_POS_EXTERNAL_ID", "")).strip()
             if not qr_access_token or not qr_collector_id or not qr_pos_external_id:
+                liberar_bloqueo(bloqueo.pk)
                 return Response(
                     {
                         "detail": (
@@ -709,9 +725,11 @@ class CrearPreferenciaSinTurnoView(APIView):
                     descripcion=descripcion,
                     monto=monto_final,
                     notification_url=notification_url,
+                    expiration_date=bloqueo.expira_en,
                 )
             except Exception as exc:
                 logger.error("Error creando QR para reserva cliente: %s", exc)
+                liberar_bloqueo(bloqueo.pk)
                 return Response(
                     {"detail": f"Mercado Pago rechazó el QR: {exc}"},
                     status=status.HTTP_502_BAD_GATEWAY,
@@ -719,6 +737,7 @@ class CrearPreferenciaSinTurnoView(APIView):
 
             qr_data = orden_mp.get("qr_data") or orden_mp.get("qr") or ""
             if not qr_data:
+                liberar_bloqueo(bloqueo.pk)
                 return Response(
                     {"detail": "Mercado Pago creó la orden QR, pero no devolvió datos de QR."},
                     status=status.HTTP_502_BAD_GATEWAY,
@@ -729,6 +748,7 @@ class CrearPreferenciaSinTurnoView(APIView):
                 qr_data=qr_data,
                 monto=Decimal(str(monto_final)),
             )
+            asociar_referencia_bloqueo(bloqueo.pk, reference_id)
             qr_public_key = getattr(settings, "MP_QR_PUBLIC_KEY", "") or getattr(settings, "MP_PUBLIC_KEY", "")
             return Response(
                 {
@@ -744,18 +764,23 @@ class CrearPreferenciaSinTurnoView(APIView):
                 status=status.HTTP_201_CREATED,
             )
 
+        intent = checkout.crear_intent(turno_payload)
         try:
             resultado = services.crear_preferencia(
                 titulo=servicio.nombre,
                 descripcion=descripcion,
                 monto=monto_final,
-                external_reference=external_reference,
+                external_reference=intent.referencia,
                 notification_url=notification_url,
                 payer_email=cliente.user.email or "",
+                expiration_date_to=bloqueo.expira_en,
             )
         except ValueError as exc:
             logger.error("Error creando preferencia MP sin turno: %s", exc)
+            liberar_bloqueo(bloqueo.pk)
             return Response({"detail": str(exc)}, status=status.HTTP_502_BAD_GATEWAY)
+        checkout.asociar_preferencia(intent, resultado["preference_id"])
+        asociar_referencia_bloqueo(bloqueo.pk, resultado["preference_id"])
 
         logger.info(
             "Preferencia sin turno creada — cliente=%s servicio=%s monto=%.2f preference_id=%s",
@@ -873,18 +898,20 @@ class CrearPreferenciaReprogramacionView(APIView):
         descripcion = f"Reprogramación turno #{turno.pk} — {turno.servicio.nombre}"
         notification_url = getattr(settings, "MERCADO_PAGO_WEBHOOK_URL", "")
 
+        intent = checkout.crear_intent(payload)
         try:
             resultado = services.crear_preferencia(
                 titulo=f"Reprogramación — {turno.servicio.nombre}",
                 descripcion=descripcion,
                 monto=monto_final,
-                external_reference=json.dumps(payload),
+                external_reference=intent.referencia,
                 notification_url=notification_url,
                 payer_email=turno.cliente.user.email or "",
             )
         except ValueError as exc:
             logger.error("Error creando preferencia MP reprogramación: %s", exc)
             return Response({"detail": str(exc)}, status=status.HTTP_502_BAD_GATEWAY)
+        checkout.asociar_preferencia(intent, resultado["preference_id"])
 
         PagoMercadoPago.objects.create(
             preference_id=resultado["preference_id"],
@@ -1000,7 +1027,7 @@ class CrearPreferenciaStaffView(APIView):
             )
 
         try:
-            Empleado.objects.get(pk=data["empleado_id"])
+            empleado_obj = Empleado.objects.get(pk=data["empleado_id"])
         except Empleado.DoesNotExist:
             return Response(
                 {"detail": f"Profesional {data['empleado_id']} no encontrado."},
@@ -1045,6 +1072,12 @@ class CrearPreferenciaStaffView(APIView):
             else "panel_propietario"
         )
 
+        # ── Reservar el horario mientras el cliente paga ───────────────────
+        try:
+            bloqueo = crear_bloqueo(empleado_obj, servicio, data["fecha_hora"], cliente=cliente)
+        except HorarioNoDisponibleError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_409_CONFLICT)
+
         turno_payload = {
             "cliente_id": cliente.pk if cliente else None,
             "servicio_id": servicio.pk,
@@ -1063,9 +1096,9 @@ class CrearPreferenciaStaffView(APIView):
             "walkin_dni": dni,
             "walkin_email": email,
             "walkin_telefono": data.get("telefono") or "",
+            "bloqueo_id": bloqueo.pk,
         }
 
-        external_reference = json.dumps(turno_payload)
         notification_url = getattr(settings, "MERCADO_PAGO_WEBHOOK_URL", "")
         mp_env = (getattr(settings, "MP_ENV", "prod") or "prod").lower()
         access_token = (getattr(settings, "MP_ACCESS_TOKEN", "") or "").strip()
@@ -1079,6 +1112,7 @@ class CrearPreferenciaStaffView(APIView):
             ).strip()
             qr_pos_external_id = str(getattr(settings, "MP_QR_POS_EXTERNAL_ID", "")).strip()
             if not qr_access_token or not qr_collector_id or not qr_pos_external_id:
+                liberar_bloqueo(bloqueo.pk)
                 return Response(
                     {
                         "detail": (
@@ -1100,12 +1134,14 @@ class CrearPreferenciaStaffView(APIView):
                     descripcion=f"Turno {servicio.nombre}",
                     monto=monto_final,
                     notification_url=notification_url,
+                    expiration_date=bloqueo.expira_en,
                 )
             except Exception as exc:
                 logger.error(
                     "Error creando orden QR nativa MP staff: %s",
                     exc,
                 )
+                liberar_bloqueo(bloqueo.pk)
                 return Response(
                     {"detail": f"Mercado Pago rechazó el QR nativo: {exc}"},
                     status=status.HTTP_502_BAD_GATEWAY,
@@ -1120,6 +1156,7 @@ class CrearPreferenciaStaffView(APIView):
                         qr_data=qr_data,
                         monto=Decimal(str(monto_final)),
                     )
+                    asociar_referencia_bloqueo(bloqueo.pk, reference_id)
 
                     logger.info(
                         "Orden QR staff creada — reference_id=%s servicio=%s monto=%.2f",
@@ -1146,24 +1183,30 @@ class CrearPreferenciaStaffView(APIView):
                     "Mercado Pago creó la orden QR staff sin qr_data. Respuesta: %s",
                     orden_mp,
                 )
+                liberar_bloqueo(bloqueo.pk)
                 return Response(
                     {"detail": "Mercado Pago creó la orden QR, pero no devolvió datos de QR."},
                     status=status.HTTP_502_BAD_GATEWAY,
                 )
 
+        intent = checkout.crear_intent(turno_payload)
         try:
             titulo_preferencia = f"Turno {servicio.nombre}"
             resultado = services.crear_preferencia(
                 titulo=titulo_preferencia,
                 descripcion=f"Reserva presencial - {servicio.nombre}",
                 monto=monto_final,
-                external_reference=external_reference,
+                external_reference=intent.referencia,
                 notification_url=notification_url,
                 payer_email="",
+                expiration_date_to=bloqueo.expira_en,
             )
         except ValueError as exc:
             logger.error("Error creando preferencia MP staff: %s", exc)
+            liberar_bloqueo(bloqueo.pk)
             return Response({"detail": str(exc)}, status=status.HTTP_502_BAD_GATEWAY)
+        checkout.asociar_preferencia(intent, resultado["preference_id"])
+        asociar_referencia_bloqueo(bloqueo.pk, resultado["preference_id"])
 
         logger.info(
             "Preferencia staff creada — cliente=%s servicio=%s monto=%.2f preference_id=%s",
@@ -1404,6 +1447,7 @@ class CancelarPagoStaffView(APIView):
                 "cancelado_por": user,
             },
         )
+        liberar_bloqueo(referencia=preference_id)
         return Response({"status": "cancelled"}, status=status.HTTP_200_OK)
 
 
@@ -1550,14 +1594,16 @@ class CrearCobroTurnoStaffView(APIView):
                 status=status.HTTP_201_CREATED,
             )
 
+        intent = checkout.crear_intent(payload)
         resultado = services.crear_preferencia(
             titulo=f"Saldo turno #{turno.pk}",
             descripcion=f"Saldo pendiente - {turno.servicio.nombre}",
             monto=monto_final,
-            external_reference=json.dumps(payload),
+            external_reference=intent.referencia,
             notification_url=notification_url,
             payer_email=getattr(turno.cliente.user, "email", "") if turno.cliente_id else "",
         )
+        checkout.asociar_preferencia(intent, resultado["preference_id"])
         qr_init_point = resultado["sandbox_init_point"] if token_env == "test" else resultado["init_point"]
         return Response(
             {
@@ -1685,13 +1731,13 @@ class ConfirmarCobroManualView(APIView):
             )
 
         fecha_hora_reserva = data["fecha_hora"]
-        if es_oferta_fidelizacion and not _slot_turno_disponible(
-            empleado_obj, servicio, fecha_hora_reserva
+        if es_oferta_fidelizacion and not horario_disponible(
+            empleado_obj, servicio, fecha_hora_reserva, cliente=cliente
         ):
             from apps.emails.tasks import _buscar_proximo_horario_disponible
 
             fecha_recalculada = _buscar_proximo_horario_disponible(
-                empleado_obj, servicio
+                empleado_obj, servicio, cliente=cliente
             )
             if not fecha_recalculada:
                 return None, Response(
@@ -1995,6 +2041,10 @@ class WebhookMercadoPagoView(APIView):
     Acepta notificaciones IPN de Mercado Pago para topic=payment y
     topic=merchant_order.  Siempre devuelve 200 para evitar reintentos
     infinitos de MP.
+
+    La vista solo registra la notificación (``NotificacionMercadoPago``) y la
+    encola; la tarea ``procesar_notificacion_mercadopago`` consulta MP y
+    aplica cada pago una única vez (``PagoMercadoPagoAplicado``).
     """
 
     permission_classes = [AllowAny]
@@ -2087,7 +2137,8 @@ class WebhookMercadoPagoView(APIView):
         walkin_email = turno_payload.get("walkin_email") or ""
         walkin_telefono = turno_payload.get("walkin_telefono") or ""
 
-        with transaction.atomic():
+        with historial_en_lote():
+            bloquear_agenda(empleado_wh)
             cliente_wh, cliente_existia = _resolver_o_crear_cliente_staff_desde_payload(turno_payload)
             es_cliente_registrado = bool(
                 cliente_existia
@@ -2116,7 +2167,7 @@ class WebhookMercadoPagoView(APIView):
                     from apps.emails.tasks import _buscar_proximo_horario_disponible
 
                     fecha_recalculada = _buscar_proximo_horario_disponible(
-                        empleado_wh, servicio_wh
+                        empleado_wh, servicio_wh, cliente=cliente_wh
                     )
                     if not fecha_recalculada:
                         raise ValueError(
@@ -2256,6 +2307,8 @@ class WebhookMercadoPagoView(APIView):
                     )
 
             _mark_streak_coupon_used(turno_payload.get("streak_coupon_id"), turno_wh)
+            # El horario ya es un Turno: el bloqueo del checkout deja de hacer falta.
+            liberar_bloqueo(turno_payload.get("bloqueo_id"))
 
             pago_por_preference = PagoMercadoPago.objects.filter(
                 preference_id=mp_preference_id
@@ -2384,7 +2437,7 @@ class WebhookMercadoPagoView(APIView):
             except Exception:
                 staff_user = None
 
-        with transaction.atomic():
+        with historial_en_lote():
             if pago_por_preference is not None:
                 pago_por_preference.estado = "approved"
                 pago_por_preference.payment_id = str(payment_id)
@@ -2496,7 +2549,7 @@ class WebhookMercadoPagoView(APIView):
             str(monto_cobrado_override or payload.get("monto_cobrado") or 0)
         )
 
-        with transaction.atomic():
+        with historial_en_lote():
             resultado = reprogramar_turno(
                 turno=turno,
                 usuario=turno.cliente.user,
@@ -2569,7 +2622,16 @@ class WebhookMercadoPagoView(APIView):
         )
 
     def _parse_turno_payload(self, external_reference: str) -> dict | None:
-        """Intenta parsear el external_reference como JSON. Devuelve None si no es el nuevo flujo."""
+        """Payload del nuevo flujo para ``external_reference``; ``None`` si es el flujo clásico.
+
+        Las preferencias nuevas llevan la referencia de un ``CheckoutIntent``.
+        Las creadas antes de los intents traen el payload como JSON.
+        """
+        payload = checkout.resolver(external_reference)
+        if payload is not None:
+            return payload
+        if not (external_reference or "").startswith("{"):
+            return None
         try:
             parsed = json.loads(external_reference)
             if isinstance(parsed, dict) and (
@@ -2584,6 +2646,18 @@ class WebhookMercadoPagoView(APIView):
     # ── handler principal ─────────────────────────────────────────────────────
 
     def post(self, request, *args, **kwargs):
+        topic = request.data.get("type") or request.query_params.get("topic", "")
+        inicio = time.perf_counter()
+        outcome = "exception"
+        try:
+            response = self._registrar_notificacion(request)
+            outcome = "ok" if response.status_code < 400 else "error"
+            return response
+        finally:
+            observe_mp_webhook(topic, outcome, time.perf_counter() - inicio)
+
+    def _registrar_notificacion(self, request):
+        """Persiste la notificación y la encola; el pago se aplica fuera del request."""
         data = request.data
         topic = data.get("type") or request.query_params.get("topic", "")
         resource_id = data.get("data", {}).get("id") or request.query_params.get("id")
@@ -2600,235 +2674,288 @@ class WebhookMercadoPagoView(APIView):
             logger.info("Webhook MP ignorado: sin resource_id")
             return Response({"detail": "Sin resource_id."}, status=status.HTTP_200_OK)
 
-        # ── topic=payment ─────────────────────────────────────────────────────
-        if topic == "payment":
-            try:
-                pago_mp = services.obtener_pago(str(resource_id))
-            except ValueError as exc:
-                logger.warning(
-                    "Webhook MP: no se pudo obtener pago %s con credenciales generales: %s. Reintentando QR.",
-                    resource_id,
-                    exc,
-                )
-                try:
-                    pago_mp = services.obtener_pago(str(resource_id), use_qr_credentials=True)
-                except ValueError as exc_qr:
-                    logger.error(
-                        "Webhook MP: no se pudo obtener pago %s con credenciales QR: %s",
-                        resource_id,
-                        exc_qr,
-                    )
-                    return Response(
-                        {"detail": "Error consultando pago."}, status=status.HTTP_200_OK
-                    )
-
-            external_reference = pago_mp.get("external_reference", "")
-            nuevo_estado = pago_mp.get("status", "")
-            mp_preference_id = pago_mp.get("preference_id", "")
+        if topic not in {"payment", "merchant_order"}:
+            # otros topics (merchant_order:updated, etc.)
+            logger.info("Webhook MP: topic=%s ignorado.", topic)
+            return Response({"detail": "Topic ignorado."}, status=status.HTTP_200_OK)
 
-            logger.info(
-                "Webhook payment: estado=%s preference_id=%s ext_ref=%.120s",
-                nuevo_estado,
-                mp_preference_id,
-                external_reference,
+        notificacion, creada = NotificacionMercadoPago.objects.get_or_create(
+            dedup_key=NotificacionMercadoPago.construir_dedup_key(topic, resource_id),
+            defaults={
+                "topic": topic,
+                "resource_id": str(resource_id),
+                "payload": {"body": data, "query": dict(request.query_params)},
+            },
+        )
+        if not creada:
+            # MP reenvía la misma notificación cuando el pago cambia de estado
+            # (p. ej. pending → approved): se vuelve a procesar mientras no se
+            # haya aplicado ningún pago con ella.
+            reabierta = (
+                NotificacionMercadoPago.objects.filter(pk=notificacion.pk, payment_id="")
+                .exclude(estado=NotificacionMercadoPago.ESTADO_PENDIENTE)
+                .update(estado=NotificacionMercadoPago.ESTADO_PENDIENTE)
             )
+            if not reabierta:
+                logger.info("Webhook MP duplicado: %s", notificacion.dedup_key)
+                return Response({"detail": "Duplicate"}, status=status.HTTP_200_OK)
 
-            orden_presencial = OrdenMercadoPagoPresencial.objects.filter(
-                reference_id=external_reference,
-                estado="pending",
-            ).first()
-            if orden_presencial is not None:
-                if nuevo_estado == "approved":
-                    try:
-                        self._crear_turno_desde_orden_presencial(
-                            orden_presencial,
-                            str(resource_id),
-                            monto_cobrado_override=float(pago_mp.get("transaction_amount") or orden_presencial.monto or 0),
-                        )
-                    except Exception as exc:
-                        logger.error("Webhook MP orden QR presencial: error procesando pago: %s", exc)
-                return Response({"detail": "Webhook procesado."}, status=status.HTTP_200_OK)
+        from .tasks import procesar_notificacion_mercadopago
 
-            turno_payload = self._parse_turno_payload(external_reference)
+        try:
+            procesar_notificacion_mercadopago.delay(notificacion.id)
+        except Exception as exc:
+            logger.exception("Fallo cola async de Mercado Pago, proceso inline: %s", exc)
+            procesar_notificacion_mercadopago(notificacion.id)
 
-            if turno_payload is not None:
-                # ── nuevo flujo ──
-                if nuevo_estado == "approved":
-                    try:
-                        if turno_payload.get("tipo_movimiento") == "reprogramacion_turno":
-                            self._reprogramar_turno_desde_payload(
-                                turno_payload, resource_id, mp_preference_id
-                            )
-                        else:
-                            self._crear_turno_desde_payload(
-                                turno_payload, resource_id, mp_preference_id
-                            )
-                    except Exception as exc:
-                        logger.error(
-                            "Webhook MP (payment): error procesando pago: %s", exc
-                        )
-                else:
-                    logger.info(
-                        "Webhook MP (payment): estado=%s, no se crea turno.",
-                        nuevo_estado,
-                    )
-            else:
-                # ── flujo clásico ──
-                try:
-                    turno_id_clasico = int(external_reference)
-                    pago = (
-                        PagoMercadoPago.objects.filter(turno_id=turno_id_clasico)
-                        .order_by("-creado_en")
-                        .first()
-                    )
-                    if not pago:
-                        raise PagoMercadoPago.DoesNotExist
-                    pago.payment_id = str(resource_id)
-                    pago.estado = nuevo_estado
-                    pago.save(update_fields=["payment_id", "estado", "actualizado_en"])
-                    logger.info(
-                        "Webhook MP (clásico): turno=%s estado=%s",
-                        turno_id_clasico,
-                        nuevo_estado,
-                    )
-                except (TypeError, ValueError):
-                    logger.warning(
-                        "Webhook MP: external_reference inválido: %s",
-                        external_reference,
-                    )
-                except PagoMercadoPago.DoesNotExist:
-                    logger.warning(
-                        "Webhook MP: sin registro para turno_id=%s", external_reference
-                    )
+        return Response({"detail": "Notificación registrada."}, status=status.HTTP_200_OK)
+
+    def procesar_notificacion(self, notificacion: NotificacionMercadoPago) -> None:
+        """
+        Consulta el recurso de la notificación en MP y aplica el pago.
 
-            return Response(status=status.HTTP_200_OK)
+        Los errores (API de MP caída, payload inválido, turno inexistente) se
+        propagan para que la tarea marque la notificación como fallida y pueda
+        reprocesarse con ``reprocesar_notificaciones_mp``.
+        """
+        if notificacion.topic == "payment":
+            self._procesar_payment(notificacion)
+        elif notificacion.topic == "merchant_order":
+            self._procesar_merchant_order(notificacion)
 
-        # ── topic=merchant_order ──────────────────────────────────────────────
-        if topic == "merchant_order":
+    def _aplicar_una_vez(self, notificacion, payment_id, aplicar, *args, **kwargs) -> bool:
+        """
+        Ejecuta ``aplicar`` solo si ``payment_id`` no se aplicó antes.
+
+        La marca ``PagoMercadoPagoAplicado`` y los cambios del pago se confirman
+        en la misma transacción: si ``aplicar`` falla, el pago queda libre para
+        un reintento; si otra notificación del mismo pago ganó la carrera, la
+        restricción única la descarta.
+        """
+        payment_id = str(payment_id)
+        with transaction.atomic():
             try:
-                orden = services.obtener_orden(str(resource_id))
-            except ValueError as exc:
-                logger.warning(
-                    "Webhook MP: no se pudo obtener orden %s con credenciales generales: %s. Reintentando QR.",
-                    resource_id,
-                    exc,
-                )
-                try:
-                    orden = services.obtener_orden(str(resource_id), use_qr_credentials=True)
-                except ValueError as exc_qr:
-                    logger.error(
-                        "Webhook MP: no se pudo obtener orden %s con credenciales QR: %s",
-                        resource_id,
-                        exc_qr,
-                    )
-                    return Response(
-                        {"detail": "Error consultando orden."}, status=status.HTTP_200_OK
+                with transaction.atomic():
+                    PagoMercadoPagoAplicado.objects.create(
+                        payment_id=payment_id,
+                        notificacion=notificacion,
                     )
+            except IntegrityError:
+                logger.info("Webhook MP: payment_id=%s ya aplicado, se ignora.", payment_id)
+                return False
+            aplicar(*args, **kwargs)
+        notificacion.payment_id = payment_id
+        return True
+
+    def _obtener_recurso(self, obtener, resource_id: str, nombre: str) -> dict:
+        try:
+            return obtener(resource_id)
+        except ValueError as exc:
+            logger.warning(
+                "Webhook MP: no se pudo obtener %s %s con credenciales generales: %s. Reintentando QR.",
+                nombre,
+                resource_id,
+                exc,
+            )
+            return obtener(resource_id, use_qr_credentials=True)
 
-            external_reference = orden.get("external_reference", "")
-            mp_preference_id = orden.get("preference_id", "")
-            pagos_orden = orden.get("payments", [])
+    def _procesar_payment(self, notificacion: NotificacionMercadoPago) -> None:
+        resource_id = notificacion.resource_id
+        pago_mp = self._obtener_recurso(services.obtener_pago, resource_id, "pago")
 
-            logger.info(
-                "Webhook merchant_order: preference_id=%s pagos=%s ext_ref=%.120s",
-                mp_preference_id,
-                [{"id": p.get("id"), "status": p.get("status")} for p in pagos_orden],
-                external_reference,
-            )
+        external_reference = pago_mp.get("external_reference", "")
+        nuevo_estado = pago_mp.get("status", "")
+        mp_preference_id = pago_mp.get("preference_id", "")
 
-            orden_presencial = OrdenMercadoPagoPresencial.objects.filter(
-                reference_id=external_reference,
-                estado="pending",
-            ).first()
-            if orden_presencial is not None:
-                pago_aprobado = next(
-                    (p for p in pagos_orden if p.get("status") == "approved"), None
-                )
-                if pago_aprobado:
-                    payment_id_aprobado = pago_aprobado.get("id", resource_id)
-                    monto_cobrado = float(
-                        pago_aprobado.get("total_paid_amount")
-                        or pago_aprobado.get("transaction_amount")
-                        or orden_presencial.monto
-                        or 0
-                    )
-                    try:
-                        self._crear_turno_desde_orden_presencial(
-                            orden_presencial,
-                            str(payment_id_aprobado),
-                            monto_cobrado_override=monto_cobrado or None,
-                        )
-                    except Exception as exc:
-                        logger.error(
-                            "Webhook merchant_order QR presencial: error procesando pago: %s",
-                            exc,
-                        )
-                else:
-                    logger.info(
-                        "Webhook merchant_order QR presencial: ningún pago aprobado aún (estados=%s).",
-                        [p.get("status") for p in pagos_orden],
-                    )
-                return Response(status=status.HTTP_200_OK)
+        logger.info(
+            "Webhook payment: estado=%s preference_id=%s ext_ref=%.120s",
+            nuevo_estado,
+            mp_preference_id,
+            external_reference,
+        )
 
-            turno_payload = self._parse_turno_payload(external_reference)
-            if turno_payload is None:
+        orden_presencial = OrdenMercadoPagoPresencial.objects.filter(
+            reference_id=external_reference,
+            estado="pending",
+        ).first()
+        if orden_presencial is not None:
+            if nuevo_estado == "approved":
+                self._aplicar_una_vez(
+                    notificacion,
+                    resource_id,
+                    self._crear_turno_desde_orden_presencial,
+                    orden_presencial,
+                    resource_id,
+                    monto_cobrado_override=float(pago_mp.get("transaction_amount") or orden_presencial.monto or 0),
+                )
+            return
+
+        turno_payload = self._parse_turno_payload(external_reference)
+
+        if turno_payload is not None:
+            # ── nuevo flujo ──
+            if nuevo_estado != "approved":
                 logger.info(
-                    "Webhook merchant_order: external_reference no es nuevo flujo, ignorando."
+                    "Webhook MP (payment): estado=%s, no se crea turno.",
+                    nuevo_estado,
+                )
+            elif not mp_preference_id:
+                # La API de MP a veces omite preference_id en el objeto payment;
+                # el merchant_order (que siempre lo trae) aplicará este pago.
+                logger.warning(
+                    "Webhook MP: preference_id vacío para payment_id=%s. "
+                    "El webhook merchant_order procesará el pago con el preference_id correcto.",
+                    resource_id,
+                )
+            elif turno_payload.get("tipo_movimiento") == "reprogramacion_turno":
+                self._aplicar_una_vez(
+                    notificacion,
+                    resource_id,
+                    self._reprogramar_turno_desde_payload,
+                    turno_payload,
+                    resource_id,
+                    mp_preference_id,
                 )
-                return Response(status=status.HTTP_200_OK)
+            else:
+                self._aplicar_una_vez(
+                    notificacion,
+                    resource_id,
+                    self._crear_turno_desde_payload,
+                    turno_payload,
+                    resource_id,
+                    mp_preference_id,
+                )
+            return
 
-            # Buscar el primer pago aprobado en la orden
-            pago_aprobado = next(
-                (p for p in pagos_orden if p.get("status") == "approved"), None
+        # ── flujo clásico ──
+        try:
+            turno_id_clasico = int(external_reference)
+        except (TypeError, ValueError):
+            logger.warning(
+                "Webhook MP: external_reference inválido: %s",
+                external_reference,
+            )
+            return
+        pago = (
+            PagoMercadoPago.objects.filter(turno_id=turno_id_clasico)
+            .order_by("-creado_en")
+            .first()
+        )
+        if not pago:
+            logger.warning(
+                "Webhook MP: sin registro para turno_id=%s", external_reference
             )
+            return
+        pago.payment_id = str(resource_id)
+        pago.estado = nuevo_estado
+        pago.save(update_fields=["payment_id", "estado", "actualizado_en"])
+        logger.info(
+            "Webhook MP (clásico): turno=%s estado=%s",
+            turno_id_clasico,
+            nuevo_estado,
+        )
+
+    def _procesar_merchant_order(self, notificacion: NotificacionMercadoPago) -> None:
+        resource_id = notificacion.resource_id
+        orden = self._obtener_recurso(services.obtener_orden, resource_id, "orden")
+
+        external_reference = orden.get("external_reference", "")
+        mp_preference_id = orden.get("preference_id", "")
+        pagos_orden = orden.get("payments", [])
+
+        logger.info(
+            "Webhook merchant_order: preference_id=%s pagos=%s ext_ref=%.120s",
+            mp_preference_id,
+            [{"id": p.get("id"), "status": p.get("status")} for p in pagos_orden],
+            external_reference,
+        )
+
+        # Buscar el primer pago aprobado en la orden
+        pago_aprobado = next(
+            (p for p in pagos_orden if p.get("status") == "approved"), None
+        )
 
+        orden_presencial = OrdenMercadoPagoPresencial.objects.filter(
+            reference_id=external_reference,
+            estado="pending",
+        ).first()
+        if orden_presencial is not None:
             if pago_aprobado:
                 payment_id_aprobado = pago_aprobado.get("id", resource_id)
                 monto_cobrado = float(
                     pago_aprobado.get("total_paid_amount")
-                    or turno_payload.get("monto_cobrado")
+                    or pago_aprobado.get("transaction_amount")
+                    or orden_presencial.monto
                     or 0
                 )
-                try:
-                    if turno_payload.get("tipo_movimiento") == "reprogramacion_turno":
-                        self._reprogramar_turno_desde_payload(
-                            turno_payload,
-                            payment_id_aprobado,
-                            mp_preference_id,
-                            monto_cobrado_override=monto_cobrado or None,
-                        )
-                    else:
-                        self._crear_turno_desde_payload(
-                            turno_payload,
-                            payment_id_aprobado,
-                            mp_preference_id,
-                            monto_cobrado_override=monto_cobrado or None,
-                        )
-                except Exception as exc:
-                    logger.error(
-                        "Webhook MP (merchant_order): error procesando pago: %s", exc
-                    )
+                self._aplicar_una_vez(
+                    notificacion,
+                    payment_id_aprobado,
+                    self._crear_turno_desde_orden_presencial,
+                    orden_presencial,
+                    str(payment_id_aprobado),
+                    monto_cobrado_override=monto_cobrado or None,
+                )
             else:
                 logger.info(
-                    "Webhook merchant_order: ningún pago aprobado aún (estados=%s).",
+                    "Webhook merchant_order QR presencial: ningún pago aprobado aún (estados=%s).",
                     [p.get("status") for p in pagos_orden],
                 )
+            return
 
-            return Response(status=status.HTTP_200_OK)
+        turno_payload = self._parse_turno_payload(external_reference)
+        if turno_payload is None:
+            logger.info(
+                "Webhook merchant_order: external_reference no es nuevo flujo, ignorando."
+            )
+            return
 
-        # ── otros topics (merchant_order:updated, etc.) ───────────────────────
-        logger.info("Webhook MP: topic=%s ignorado.", topic)
-        return Response({"detail": "Topic ignorado."}, status=status.HTTP_200_OK)
+        if not pago_aprobado:
+            logger.info(
+                "Webhook merchant_order: ningún pago aprobado aún (estados=%s).",
+                [p.get("status") for p in pagos_orden],
+            )
+            return
+
+        payment_id_aprobado = pago_aprobado.get("id", resource_id)
+        monto_cobrado = float(
+            pago_aprobado.get("total_paid_amount")
+            or turno_payload.get("monto_cobrado")
+            or 0
+        )
+        if turno_payload.get("tipo_movimiento") == "reprogramacion_turno":
+            aplicar = self._reprogramar_turno_desde_payload
+        else:
+            aplicar = self._crear_turno_desde_payload
+        self._aplicar_una_vez(
+            notificacion,
+            payment_id_aprobado,
+            aplicar,
+            turno_payload,
+            payment_id_aprobado,
+            mp_preference_id,
+            monto_cobrado_override=monto_cobrado or None,
+        )
 
 
 class VerificarPagoView(APIView):
     """
-    GET /api/mercadopago/verificar-pago/<preference_id>/
+    GET /api/mercadopago/verificar-pago/<preference_id>/[?espera=<segundos>]
+
+    El frontend pregunta si el pago de una preferencia fue aprobado.
+
+    Sin ``espera`` responde en el acto (polling clásico). Con ``espera`` hace
+    long-poll: mantiene la request abierta hasta ``MP_VERIFICAR_PAGO_ESPERA_MAX``
+    segundos y responde apenas llega el evento de la preferencia (ver
+    ``apps.mercadopago.eventos``).
 
-    Polling: el frontend pregunta si el pago de una preferencia fue aprobado.
+    Los webhooks perdidos los recupera la tarea ``reconciliar_pagos``. Solo con
+    ``MP_VERIFICAR_PAGO_CONSULTAR_MP`` la vista consulta además la API de MP,
+    limitada y compartida entre todos los clientes de la preferencia.
 
     Responde:
         {"status": "approved", "turno_id": <int>}  → Turno creado y pago registrado
+        {"status": "cancelled"}                     → Preferencia QR cancelada desde el panel
         {"status": "pending"}                       → Webhook aún no llegó
     """
 
@@ -2836,104 +2963,107 @@ class VerificarPagoView(APIView):
 
     def get(self, request, preference_id: str, *args, **kwargs):
         try:
-            pago = PagoMercadoPago.objects.select_related("turno").filter(
-                preference_id=preference_id,
-                estado="approved",
-            ).order_by("-actualizado_en").first()
-            if not pago:
-                raise PagoMercadoPago.DoesNotExist
-            return Response(
-                {"status": "approved", "turno_id": pago.turno.pk, "payment_id": pago.payment_id},
-                status=status.HTTP_200_OK,
-            )
-        except PagoMercadoPago.DoesNotExist:
-            orden_presencial = OrdenMercadoPagoPresencial.objects.filter(
-                reference_id=preference_id
-            ).first()
-            if orden_presencial is not None:
-                if orden_presencial.estado == "approved":
-                    pago = PagoMercadoPago.objects.select_related("turno").filter(
-                        preference_id=preference_id,
-                        estado="approved",
-                    ).first()
-                    if pago:
-                        return Response(
-                            {"status": "approved", "turno_id": pago.turno.pk, "payment_id": pago.payment_id},
-                            status=status.HTTP_200_OK,
-                        )
-                if PreferenciaMercadoPagoCancelada.objects.filter(preference_id=preference_id).exists():
-                    return Response({"status": "cancelled"}, status=status.HTTP_200_OK)
+            espera = float(request.query_params.get("espera") or 0)
+        except (TypeError, ValueError):
+            espera = 0
+        espera = min(max(espera, 0), float(getattr(settings, "MP_VERIFICAR_PAGO_ESPERA_MAX", 25)))
+
+        if not espera:
+            return self._verificar(preference_id)
+
+        limite = time.monotonic() + espera
+        with eventos.suscripcion(preference_id) as suscripcion:
+            while True:
+                respuesta = self._verificar(preference_id)
+                restante = limite - time.monotonic()
+                if respuesta.data.get("status") != "pending" or restante <= 0:
+                    return respuesta
+                suscripcion.esperar(restante)
+
+    def _verificar(self, preference_id: str) -> Response:
+        respuesta = self._estado_local(preference_id)
+        if respuesta is not None:
+            return respuesta
+        if not (
+            getattr(settings, "MP_VERIFICAR_PAGO_CONSULTAR_MP", False)
+            and eventos.reconciliacion_permitida(preference_id)
+        ):
+            return Response({"status": "pending"}, status=status.HTTP_200_OK)
+        return self._reconciliar_con_mp(preference_id)
+
+    def _respuesta_aprobada(self, preference_id: str) -> Response | None:
+        pago = PagoMercadoPago.objects.select_related("turno").filter(
+            preference_id=preference_id,
+            estado="approved",
+        ).order_by("-actualizado_en").first()
+        if not pago:
+            return None
+        return Response(
+            {"status": "approved", "turno_id": pago.turno.pk, "payment_id": pago.payment_id},
+            status=status.HTTP_200_OK,
+        )
+
+    def _estado_local(self, preference_id: str) -> Response | None:
+        """Estado que ya conoce la base (webhook procesado o QR cancelado), sin ir a MP."""
+        respuesta = self._respuesta_aprobada(preference_id)
+        if respuesta is not None:
+            return respuesta
+        if (
+            OrdenMercadoPagoPresencial.objects.filter(reference_id=preference_id).exists()
+            and PreferenciaMercadoPagoCancelada.objects.filter(preference_id=preference_id).exists()
+        ):
+            return Response({"status": "cancelled"}, status=status.HTTP_200_OK)
+        return None
+
+    def _reconciliar_con_mp(self, preference_id: str) -> Response:
+        """Fallback sin webhook: consulta MP y registra el pago si ya fue aprobado."""
+        pendiente = Response({"status": "pending"}, status=status.HTTP_200_OK)
+        orden_presencial = OrdenMercadoPagoPresencial.objects.filter(
+            reference_id=preference_id
+        ).first()
+        if orden_presencial is not None:
+            try:
+                pago_mp = services.buscar_pago_aprobado_por_external_reference(
+                    preference_id,
+                    use_qr_credentials=True,
+                )
+            except ValueError as exc:
+                logger.warning(
+                    "VerificarPago QR presencial fallback MP falló para reference_id=%s: %s",
+                    preference_id,
+                    exc,
+                )
+                return pendiente
+            if not pago_mp:
                 try:
-                    pago_mp = services.buscar_pago_aprobado_por_external_reference(
+                    orden_mp = services.buscar_orden_aprobada_por_external_reference(
                         preference_id,
                         use_qr_credentials=True,
                     )
                 except ValueError as exc:
                     logger.warning(
-                        "VerificarPago QR presencial fallback MP falló para reference_id=%s: %s",
+                        "VerificarPago QR presencial merchant_order fallback falló para reference_id=%s: %s",
                         preference_id,
                         exc,
                     )
-                    return Response({"status": "pending"}, status=status.HTTP_200_OK)
-                if not pago_mp:
-                    try:
-                        orden_mp = services.buscar_orden_aprobada_por_external_reference(
-                            preference_id,
-                            use_qr_credentials=True,
-                        )
-                    except ValueError as exc:
-                        logger.warning(
-                            "VerificarPago QR presencial merchant_order fallback falló para reference_id=%s: %s",
-                            preference_id,
-                            exc,
-                        )
-                        return Response({"status": "pending"}, status=status.HTTP_200_OK)
+                    return pendiente
 
-                    if not orden_mp:
-                        return Response({"status": "pending"}, status=status.HTTP_200_OK)
-
-                    pago_aprobado = next(
-                        (p for p in orden_mp.get("payments", []) if p.get("status") == "approved"),
-                        None,
-                    )
-                    if not pago_aprobado:
-                        return Response({"status": "pending"}, status=status.HTTP_200_OK)
-
-                    payment_id = str(pago_aprobado.get("id") or "")
-                    monto_cobrado = float(
-                        pago_aprobado.get("total_paid_amount")
-                        or pago_aprobado.get("transaction_amount")
-                        or orden_presencial.monto
-                        or 0
-                    )
-                    try:
-                        WebhookMercadoPagoView()._crear_turno_desde_orden_presencial(
-                            orden_presencial,
-                            payment_id,
-                            monto_cobrado_override=monto_cobrado or None,
-                        )
-                    except Exception as exc:
-                        logger.error(
-                            "VerificarPago QR presencial merchant_order: error registrando pago/turno reference_id=%s: %s",
-                            preference_id,
-                            exc,
-                        )
-                        return Response({"status": "pending"}, status=status.HTTP_200_OK)
+                if not orden_mp:
+                    return pendiente
 
-                    pago = PagoMercadoPago.objects.select_related("turno").filter(
-                        preference_id=preference_id,
-                        estado="approved",
-                    ).first()
-                    if pago:
-                        return Response(
-                            {"status": "approved", "turno_id": pago.turno.pk, "payment_id": pago.payment_id},
-                            status=status.HTTP_200_OK,
-                        )
-                    return Response({"status": "pending"}, status=status.HTTP_200_OK)
+                pago_aprobado = next(
+                    (p for p in orden_mp.get("payments", []) if p.get("status") == "approved"),
+                    None,
+                )
+                if not pago_aprobado:
+                    return pendiente
 
-                payment_id = str(pago_mp.get("id") or "")
+                payment_id = str(pago_aprobado.get("id") or "")
                 monto_cobrado = float(
-                    pago_mp.get("transaction_amount") or orden_presencial.monto or 0
+                    pago_aprobado.get("total_paid_amount")
+                    or pago_aprobado.get("transaction_amount")
+                    or orden_presencial.monto
+                    or 0
                 )
                 try:
                     WebhookMercadoPagoView()._crear_turno_desde_orden_presencial(
@@ -2943,133 +3073,130 @@ class VerificarPagoView(APIView):
                     )
                 except Exception as exc:
                     logger.error(
-                        "VerificarPago QR presencial: error registrando pago/turno reference_id=%s: %s",
+                        "VerificarPago QR presencial merchant_order: error registrando pago/turno reference_id=%s: %s",
                         preference_id,
                         exc,
                     )
-                    return Response({"status": "pending"}, status=status.HTTP_200_OK)
+                    return pendiente
 
-                pago = PagoMercadoPago.objects.select_related("turno").filter(
-                    preference_id=preference_id,
-                    estado="approved",
-                ).first()
-                if pago:
-                    return Response(
-                        {"status": "approved", "turno_id": pago.turno.pk, "payment_id": pago.payment_id},
-                        status=status.HTTP_200_OK,
-                    )
-                return Response({"status": "pending"}, status=status.HTTP_200_OK)
+                return self._respuesta_aprobada(preference_id) or pendiente
+
+            payment_id = str(pago_mp.get("id") or "")
+            monto_cobrado = float(
+                pago_mp.get("transaction_amount") or orden_presencial.monto or 0
+            )
+            try:
+                WebhookMercadoPagoView()._crear_turno_desde_orden_presencial(
+                    orden_presencial,
+                    payment_id,
+                    monto_cobrado_override=monto_cobrado or None,
+                )
+            except Exception as exc:
+                logger.error(
+                    "VerificarPago QR presencial: error registrando pago/turno reference_id=%s: %s",
+                    preference_id,
+                    exc,
+                )
+                return pendiente
+
+            return self._respuesta_aprobada(preference_id) or pendiente
+
+        # Si MP confirma aprobado, registrar turno/pago localmente de forma
+        # idempotente reutilizando la misma lógica del webhook.
+        try:
+            pago_mp = services.buscar_pago_aprobado_por_preference(preference_id)
+        except ValueError as exc:
+            logger.warning(
+                "VerificarPago fallback MP falló para preference_id=%s: %s",
+                preference_id,
+                exc,
+            )
+            return Response(
+                {"status": "pending", "detail": str(exc)},
+                status=status.HTTP_200_OK,
+            )
 
-            # Fallback sin webhook: consultar MP por preference_id.
-            # Si MP confirma aprobado, registrar turno/pago localmente de forma
-            # idempotente reutilizando la misma lógica del webhook.
+        if not pago_mp:
             try:
-                pago_mp = services.buscar_pago_aprobado_por_preference(preference_id)
+                ultimo_pago = services.buscar_ultimo_pago_por_preference(preference_id)
             except ValueError as exc:
                 logger.warning(
-                    "VerificarPago fallback MP falló para preference_id=%s: %s",
+                    "VerificarPago último pago MP falló para preference_id=%s: %s",
                     preference_id,
                     exc,
                 )
-                return Response(
-                    {"status": "pending", "detail": str(exc)},
-                    status=status.HTTP_200_OK,
-                )
-
-            if not pago_mp:
-                try:
-                    ultimo_pago = services.buscar_ultimo_pago_por_preference(preference_id)
-                except ValueError as exc:
-                    logger.warning(
-                        "VerificarPago último pago MP falló para preference_id=%s: %s",
-                        preference_id,
-                        exc,
-                    )
-                    return Response(
-                        {"status": "pending"},
-                        status=status.HTTP_200_OK,
-                    )
+                return pendiente
 
-                if ultimo_pago:
-                    estado_mp = ultimo_pago.get("status") or "pending"
-                    detalle_mp = ultimo_pago.get("status_detail") or ""
-                    if estado_mp in {"rejected", "cancelled", "refunded", "charged_back"}:
-                        return Response(
-                            {
-                                "status": "rejected",
-                                "mp_status": estado_mp,
-                                "mp_status_detail": detalle_mp,
-                                "payment_id": ultimo_pago.get("id"),
-                            },
-                            status=status.HTTP_200_OK,
-                        )
+            if ultimo_pago:
+                estado_mp = ultimo_pago.get("status") or "pending"
+                detalle_mp = ultimo_pago.get("status_detail") or ""
+                if estado_mp in {"rejected", "cancelled", "refunded", "charged_back"}:
                     return Response(
                         {
-                            "status": "pending",
+                            "status": "rejected",
                             "mp_status": estado_mp,
                             "mp_status_detail": detalle_mp,
                             "payment_id": ultimo_pago.get("id"),
                         },
                         status=status.HTTP_200_OK,
                     )
+                return Response(
+                    {
+                        "status": "pending",
+                        "mp_status": estado_mp,
+                        "mp_status_detail": detalle_mp,
+                        "payment_id": ultimo_pago.get("id"),
+                    },
+                    status=status.HTTP_200_OK,
+                )
 
-                return Response({"status": "pending"}, status=status.HTTP_200_OK)
+            return pendiente
 
-            external_reference = pago_mp.get("external_reference", "")
-            turno_payload = WebhookMercadoPagoView()._parse_turno_payload(
-                external_reference
+        external_reference = pago_mp.get("external_reference", "")
+        turno_payload = WebhookMercadoPagoView()._parse_turno_payload(
+            external_reference
+        )
+
+        if turno_payload is None:
+            logger.warning(
+                "VerificarPago fallback: external_reference no corresponde al flujo nuevo "
+                "(preference_id=%s)",
+                preference_id,
             )
+            return pendiente
 
-            if turno_payload is None:
-                logger.warning(
-                    "VerificarPago fallback: external_reference no corresponde al flujo nuevo "
-                    "(preference_id=%s)",
+        payment_id = str(pago_mp.get("id") or "")
+        monto_cobrado = float(
+            pago_mp.get("transaction_amount")
+            or turno_payload.get("monto_cobrado")
+            or 0
+        )
+
+        try:
+            webhook = WebhookMercadoPagoView()
+            if turno_payload.get("tipo_movimiento") == "reprogramacion_turno":
+                webhook._reprogramar_turno_desde_payload(
+                    turno_payload,
+                    payment_id,
                     preference_id,
+                    monto_cobrado_override=monto_cobrado or None,
                 )
-                return Response({"status": "pending"}, status=status.HTTP_200_OK)
-
-            payment_id = str(pago_mp.get("id") or "")
-            monto_cobrado = float(
-                pago_mp.get("transaction_amount")
-                or turno_payload.get("monto_cobrado")
-                or 0
-            )
-
-            try:
-                webhook = WebhookMercadoPagoView()
-                if turno_payload.get("tipo_movimiento") == "reprogramacion_turno":
-                    webhook._reprogramar_turno_desde_payload(
-                        turno_payload,
-                        payment_id,
-                        preference_id,
-                        monto_cobrado_override=monto_cobrado or None,
-                    )
-                else:
-                    webhook._crear_turno_desde_payload(
-                        turno_payload,
-                        payment_id,
-                        preference_id,
-                        monto_cobrado_override=monto_cobrado or None,
-                    )
-            except Exception as exc:
-                logger.error(
-                    "VerificarPago fallback: error registrando pago/turno preference_id=%s: %s",
+            else:
+                webhook._crear_turno_desde_payload(
+                    turno_payload,
+                    payment_id,
                     preference_id,
-                    exc,
+                    monto_cobrado_override=monto_cobrado or None,
                 )
-                return Response({"status": "pending"}, status=status.HTTP_200_OK)
+        except Exception as exc:
+            logger.error(
+                "VerificarPago fallback: error registrando pago/turno preference_id=%s: %s",
+                preference_id,
+                exc,
+            )
+            return pendiente
 
-            try:
-                pago = PagoMercadoPago.objects.select_related("turno").get(
-                    preference_id=preference_id,
-                    estado="approved",
-                )
-                return Response(
-                    {"status": "approved", "turno_id": pago.turno.pk, "payment_id": pago.payment_id},
-                    status=status.HTTP_200_OK,
-                )
-            except PagoMercadoPago.DoesNotExist:
-                return Response({"status": "pending"}, status=status.HTTP_200_OK)
+        return self._respuesta_aprobada(preference_id) or pendiente
 
 
 class ListarPagosView(APIView):
@@ -3173,12 +3300,131 @@ class ComprobantePagoView(APIView):
             )
 
 
+def _comprobante_mp_data(pago: PagoMercadoPago) -> dict:
+    """Datos del comprobante de ``ComprobantePagoPDFView`` (lo que se dibuja)."""
+    from apps.authentication.models import ConfiguracionGlobal
+
+    config = ConfiguracionGlobal.get_config()
+    turno = pago.turno
+    return {
+        "empresa": config.nombre_empresa or config.nombre_comercial or "Beautiful Studio",
+        "razon_social": config.razon_social or "",
+        "cuit": config.cuit or "",
+        "fecha_fundacion": (
+            config.fecha_fundacion.strftime("%d/%m/%Y") if config.fecha_fundacion else ""
+        ),
+        "fecha_emision": pago.creado_en.strftime("%d/%m/%Y %H:%M"),
+        "cliente_nombre": getattr(turno.cliente, "nombre_completo", ""),
+        "cliente_email": getattr(getattr(turno.cliente, "user", None), "email", "") or "",
+        "turno_id": turno.id,
+        "servicio_nombre": getattr(turno.servicio, "nombre", ""),
+        "profesional_nombre": turno.empleado.user.get_full_name(),
+        "fecha_hora": turno.fecha_hora.strftime("%d/%m/%Y %H:%M") if turno.fecha_hora else "",
+        "monto": str(pago.monto),
+        "moneda": pago.moneda,
+        "senia_pagada": str(turno.senia_pagada) if turno.senia_pagada else "",
+        "precio_final": str(turno.precio_final) if turno.precio_final else "",
+        "payment_id": pago.payment_id,
+        "estado": pago.estado,
+    }
+
+
+def _comprobante_mp_pdf(data: dict) -> bytes:
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+
+    y = height - 50
+
+    # Encabezado de empresa
+    pdf.setFont("Helvetica-Bold", 16)
+    pdf.drawString(40, y, data["empresa"])
+    y -= 18
+
+    pdf.setFont("Helvetica", 10)
+    if data["razon_social"]:
+        pdf.drawString(40, y, f"Razón social: {data['razon_social']}")
+        y -= 14
+    if data["cuit"]:
+        pdf.drawString(40, y, f"CUIT: {data['cuit']}")
+        y -= 14
+    if data["fecha_fundacion"]:
+        pdf.drawString(40, y, f"Inicio de actividades: {data['fecha_fundacion']}")
+        y -= 20
+
+    pdf.setFont("Helvetica-Bold", 12)
+    pdf.drawString(40, y, "Comprobante de Pago de Turno")
+    y -= 10
+    pdf.setFont("Helvetica", 10)
+    pdf.drawString(40, y, f"Fecha de emisión: {data['fecha_emision']} hs")
+    y -= 24
+
+    # Datos del cliente
+    pdf.setFont("Helvetica-Bold", 11)
+    pdf.drawString(40, y, "Datos del cliente")
+    y -= 16
+    pdf.setFont("Helvetica", 10)
+    pdf.drawString(40, y, f"Nombre: {data['cliente_nombre']}")
+    y -= 14
+    if data["cliente_email"]:
+        pdf.drawString(40, y, f"Email: {data['cliente_email']}")
+        y -= 18
+
+    # Datos del turno
+    pdf.setFont("Helvetica-Bold", 11)
+    pdf.drawString(40, y, "Datos del turno")
+    y -= 16
+    pdf.setFont("Helvetica", 10)
+    pdf.drawString(40, y, f"ID de turno: {data['turno_id']}")
+    y -= 14
+    pdf.drawString(40, y, f"Servicio: {data['servicio_nombre']}")
+    y -= 14
+    pdf.drawString(40, y, f"Profesional: {data['profesional_nombre']}")
+    y -= 14
+    if data["fecha_hora"]:
+        pdf.drawString(40, y, f"Fecha y hora: {data['fecha_hora']} hs")
+        y -= 18
+
+    # Detalle del pago
+    pdf.setFont("Helvetica-Bold", 11)
+    pdf.drawString(40, y, "Detalle del pago")
+    y -= 16
+    pdf.setFont("Helvetica", 10)
+    pdf.drawString(40, y, f"Monto abonado: ${data['monto']} {data['moneda']}")
+    y -= 14
+    if data["senia_pagada"]:
+        pdf.drawString(40, y, f"Seña acumulada: ${data['senia_pagada']}")
+        y -= 14
+    if data["precio_final"]:
+        pdf.drawString(40, y, f"Precio final del turno: ${data['precio_final']}")
+        y -= 14
+
+    pdf.drawString(40, y, "Medio de pago: Mercado Pago")
+    y -= 14
+    pdf.drawString(40, y, f"ID de pago: {data['payment_id']}")
+    y -= 14
+    pdf.drawString(40, y, f"Estado: {data['estado']}")
+    y -= 24
+
+    pdf.setFont("Helvetica-Oblique", 9)
+    pdf.drawString(
+        40,
+        y,
+        "Este comprobante es válido como constancia de pago emitida por Beautiful Studio.",
+    )
+
+    pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
 class ComprobantePagoPDFView(APIView):
     """Devuelve un comprobante de pago en formato PDF para un turno.
 
     GET /api/mercadopago/comprobante/<turno_id>/pdf/
 
-    El PDF se genera a partir del pago aprobado asociado al turno.
+    El PDF se genera a partir del pago aprobado asociado al turno y se sirve
+    desde la caché de comprobantes (``ETag``/``Last-Modified``, 304).
     """
 
     # Permitimos acceso sin autenticación porque este endpoint se usará
@@ -3186,8 +3432,6 @@ class ComprobantePagoPDFView(APIView):
     permission_classes = []
 
     def get(self, request, turno_id: int, *args, **kwargs):
-        from apps.authentication.models import ConfiguracionGlobal
-
         try:
             pago = (
                 PagoMercadoPago.objects.select_related(
@@ -3205,143 +3449,14 @@ class ComprobantePagoPDFView(APIView):
                     status=status.HTTP_404_NOT_FOUND,
                 )
 
-            turno = pago.turno
-
-            # Datos de configuración / empresa
-            config = ConfiguracionGlobal.get_config()
-            fecha_fundacion = config.fecha_fundacion
-
-            buffer = BytesIO()
-            pdf = canvas.Canvas(buffer, pagesize=A4)
-            width, height = A4
-
-            y = height - 50
-
-            # Encabezado de empresa
-            pdf.setFont("Helvetica-Bold", 16)
-            pdf.drawString(
-                40,
-                y,
-                config.nombre_empresa or config.nombre_comercial or "Beautiful Studio",
-            )
-            y -= 18
-
-            pdf.setFont("Helvetica", 10)
-            if config.razon_social:
-                pdf.drawString(40, y, f"Razón social: {config.razon_social}")
-                y -= 14
-            if config.cuit:
-                pdf.drawString(40, y, f"CUIT: {config.cuit}")
-                y -= 14
-            if fecha_fundacion:
-                pdf.drawString(
-                    40,
-                    y,
-                    f"Inicio de actividades: {fecha_fundacion.strftime('%d/%m/%Y')}",
-                )
-                y -= 20
-
-            pdf.setFont("Helvetica-Bold", 12)
-            pdf.drawString(40, y, "Comprobante de Pago de Turno")
-            y -= 10
-            pdf.setFont("Helvetica", 10)
-            pdf.drawString(
-                40,
-                y,
-                f"Fecha de emisión: {pago.creado_en.strftime('%d/%m/%Y %H:%M')} hs",
-            )
-            y -= 24
-
-            # Datos del cliente
-            pdf.setFont("Helvetica-Bold", 11)
-            pdf.drawString(40, y, "Datos del cliente")
-            y -= 16
-            pdf.setFont("Helvetica", 10)
-            pdf.drawString(
-                40, y, f"Nombre: {getattr(turno.cliente, 'nombre_completo', '')}"
-            )
-            y -= 14
-            cliente_email = getattr(getattr(turno.cliente, "user", None), "email", "")
-            if cliente_email:
-                pdf.drawString(40, y, f"Email: {cliente_email}")
-                y -= 18
-
-            # Datos del turno
-            pdf.setFont("Helvetica-Bold", 11)
-            pdf.drawString(40, y, "Datos del turno")
-            y -= 16
-            pdf.setFont("Helvetica", 10)
-            pdf.drawString(40, y, f"ID de turno: {turno.id}")
-            y -= 14
-            pdf.drawString(
-                40,
-                y,
-                f"Servicio: {getattr(turno.servicio, 'nombre', '')}",
-            )
-            y -= 14
-            pdf.drawString(
-                40,
-                y,
-                f"Profesional: {turno.empleado.user.get_full_name()}",
-            )
-            y -= 14
-            if turno.fecha_hora:
-                pdf.drawString(
-                    40,
-                    y,
-                    f"Fecha y hora: {turno.fecha_hora.strftime('%d/%m/%Y %H:%M')} hs",
-                )
-                y -= 18
-
-            # Detalle del pago
-            pdf.setFont("Helvetica-Bold", 11)
-            pdf.drawString(40, y, "Detalle del pago")
-            y -= 16
-            pdf.setFont("Helvetica", 10)
-            pdf.drawString(
-                40,
-                y,
-                f"Monto abonado: ${pago.monto} {pago.moneda}",
-            )
-            y -= 14
-            if turno.senia_pagada:
-                pdf.drawString(
-                    40,
-                    y,
-                    f"Seña acumulada: ${turno.senia_pagada}",
-                )
-                y -= 14
-            if turno.precio_final:
-                pdf.drawString(
-                    40,
-                    y,
-                    f"Precio final del turno: ${turno.precio_final}",
-                )
-                y -= 14
-
-            pdf.drawString(40, y, f"Medio de pago: Mercado Pago")
-            y -= 14
-            pdf.drawString(40, y, f"ID de pago: {pago.payment_id}")
-            y -= 14
-            pdf.drawString(40, y, f"Estado: {pago.estado}")
-            y -= 24
-
-            pdf.setFont("Helvetica-Oblique", 9)
-            pdf.drawString(
-                40,
-                y,
-                "Este comprobante es válido como constancia de pago emitida por Beautiful Studio.",
-            )
-
-            pdf.showPage()
-            pdf.save()
-
-            buffer.seek(0)
-            response = HttpResponse(buffer.read(), content_type="application/pdf")
-            response["Content-Disposition"] = (
-                f'attachment; filename="comprobante_turno_{turno.id}.pdf"'
+            return comprobantes_pdf_service.responder_pdf(
+                request,
+                pago.turno_id,
+                "mp",
+                lambda: _comprobante_mp_data(pago),
+                _comprobante_mp_pdf,
+                f"comprobante_turno_{pago.turno_id}.pdf",
             )
-            return response
 
         except Exception as exc:
             logger.exception("Error generando comprobante PDF")
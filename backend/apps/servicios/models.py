@@ -1,5 +1,6 @@
 from django.db import models
 from simple_history.models import HistoricalRecords
+from apps.core.history import BufferedHistoricalRecords
 
 
 class Sala(models.Model):
@@ -179,7 +180,7 @@ class Servicio(models.Model):
     updated_at = models.DateTimeField(
         auto_now=True, verbose_name="Fecha de actualización"
     )
-    history = HistoricalRecords()
+    history = BufferedHistoricalRecords()
 
     class Meta:
         verbose_name = "Servicio"
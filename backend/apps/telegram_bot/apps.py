@@ -5,3 +5,7 @@ class TelegramBotConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.telegram_bot"
     verbose_name = "Telegram Bot"
+
+    def ready(self):
+        """Importar signals cuando la app esté lista"""
+        import apps.telegram_bot.signals
@@ -0,0 +1,200 @@
+"""
+Cliente HTTP compartido para la Bot API de Telegram.
+
+Un único ``requests.Session`` por proceso reutiliza las conexiones keep-alive
+(sin handshake TCP+TLS por mensaje). Antes de cada llamada se toma un token de
+dos limitadores tipo token bucket alineados con los límites de Telegram:
+
+- global: ``TELEGRAM_GLOBAL_RATE_PER_SEC`` (30 mensajes/s por bot);
+- por chat: ``TELEGRAM_CHAT_RATE_PER_SEC`` con ráfaga ``TELEGRAM_CHAT_BURST``
+  (≈1 mensaje/s sostenido; los grupos, con ``chat_id`` negativo, 20/min).
+
+Un 429 respeta ``parameters.retry_after``: pausa el chat (o todo el bot si la
+respuesta no es de un chat) y reintenta hasta ``TELEGRAM_MAX_RETRIES`` veces.
+``TELEGRAM_API_BASE`` permite apuntar a un servidor local que imite la Bot API.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from apps.core.metrics import observe_telegram_request
+
+logger = logging.getLogger(__name__)
+
+GROUP_RATE_PER_SEC = 20 / 60
+MAX_CHAT_BUCKETS = 10000
+
+
+class TokenBucket:
+    """Token bucket thread-safe: ``rate`` tokens por segundo, hasta ``capacity``."""
+
+    def __init__(self, rate: float, capacity: float, clock=time.monotonic):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._clock = clock
+        self._tokens = float(capacity)
+        self._updated_at = clock()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Consume un token y devuelve cuántos segundos hay que esperar antes de usarlo."""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated_at) * self.rate
+            )
+            self._updated_at = now
+            self._tokens -= 1
+            wait = 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+            return max(wait, self._paused_until - now)
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._paused_until = max(self._paused_until, self._clock() + seconds)
+
+
+class TelegramApiClient:
+    def __init__(self, sleep=time.sleep):
+        self.timeout = int(getattr(settings, "TELEGRAM_API_REQUEST_TIMEOUT", 10))
+        self.max_retries = int(getattr(settings, "TELEGRAM_MAX_RETRIES", 2))
+        self.max_retry_after = float(getattr(settings, "TELEGRAM_MAX_RETRY_AFTER", 30))
+        self.chat_rate = float(getattr(settings, "TELEGRAM_CHAT_RATE_PER_SEC", 1))
+        self.chat_burst = float(getattr(settings, "TELEGRAM_CHAT_BURST", 3))
+        self.batch_concurrency = int(getattr(settings, "TELEGRAM_BATCH_CONCURRENCY", 8))
+        self._sleep = sleep
+
+        self.global_bucket = TokenBucket(
+            rate=float(getattr(settings, "TELEGRAM_GLOBAL_RATE_PER_SEC", 30)),
+            capacity=float(getattr(settings, "TELEGRAM_GLOBAL_RATE_PER_SEC", 30)),
+        )
+        self._chat_buckets = OrderedDict()
+        self._chat_buckets_lock = threading.Lock()
+
+        pool_size = max(self.batch_concurrency, 10)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    @staticmethod
+    def method_url(method: str, token=None) -> str:
+        api_base = getattr(settings, "TELEGRAM_API_BASE", "https://api.telegram.org").rstrip("/")
+        token = token or getattr(settings, "TELEGRAM_BOT_TOKEN", "")
+        return f"{api_base}/bot{token}/{method}"
+
+    def call(self, method: str, payload: dict, token=None):
+        """Llama a ``method`` respetando los límites; devuelve la respuesta o ``None``."""
+        url = self.method_url(method, token)
+        chat_id = payload.get("chat_id")
+        for intento in range(self.max_retries + 1):
+            self._esperar_turno(chat_id)
+            inicio = time.perf_counter()
+            try:
+                response = self.session.post(url, json=payload, timeout=self.timeout)
+            except requests.RequestException as exc:
+                observe_telegram_request(method, "error", time.perf_counter() - inicio)
+                logger.exception("Error enviando mensaje a Telegram: %s", exc)
+                return None
+
+            outcome = "ok" if response.ok else f"http_{response.status_code}"
+            observe_telegram_request(method, outcome, time.perf_counter() - inicio)
+            if response.status_code != 429:
+                if not response.ok:
+                    logger.warning("Telegram API rechazo payload: %s", response.text)
+                return response
+
+            retry_after = self._retry_after(response)
+            bucket = self._chat_bucket(chat_id) if chat_id is not None else self.global_bucket
+            bucket.pause(retry_after)
+            if intento >= self.max_retries or retry_after > self.max_retry_after:
+                logger.warning(
+                    "Telegram API limitó %s (chat=%s, retry_after=%ss); se descarta",
+                    method,
+                    chat_id,
+                    retry_after,
+                )
+                return response
+            logger.info(
+                "Telegram API limitó %s (chat=%s); reintento en %ss",
+                method,
+                chat_id,
+                retry_after,
+            )
+        return None
+
+    def send_batch(self, messages, token=None):
+        """Envía varios ``sendMessage`` en paralelo, acotados por los limitadores.
+
+        ``messages`` es una lista de dicts con el payload de ``sendMessage``
+        (``chat_id``, ``text`` y opcionalmente ``reply_markup``). Devuelve las
+        respuestas en el mismo orden (``None`` para los envíos fallidos).
+        """
+        messages = list(messages)
+        if not messages:
+            return []
+        workers = max(1, min(self.batch_concurrency, len(messages)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(
+                executor.map(lambda payload: self.call("sendMessage", payload, token), messages)
+            )
+
+    def _esperar_turno(self, chat_id) -> None:
+        wait = self.global_bucket.reserve()
+        if chat_id is not None:
+            wait = max(wait, self._chat_bucket(chat_id).reserve())
+        if wait > 0:
+            self._sleep(wait)
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        key = str(chat_id)
+        with self._chat_buckets_lock:
+            bucket = self._chat_buckets.get(key)
+            if bucket is None:
+                if key.startswith("-"):
+                    bucket = TokenBucket(GROUP_RATE_PER_SEC, 1)
+                else:
+                    bucket = TokenBucket(self.chat_rate, self.chat_burst)
+                self._chat_buckets[key] = bucket
+                if len(self._chat_buckets) > MAX_CHAT_BUCKETS:
+                    self._chat_buckets.popitem(last=False)
+            else:
+                self._chat_buckets.move_to_end(key)
+            return bucket
+
+    @staticmethod
+    def _retry_after(response) -> float:
+        try:
+            return float(response.json().get("parameters", {}).get("retry_after", 1))
+        except (ValueError, AttributeError, TypeError):
+            return float(response.headers.get("Retry-After", 1) or 1)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> TelegramApiClient:
+    """Devuelve el cliente compartido del proceso (se crea en el primer uso)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = TelegramApiClient()
+    return _client
+
+
+def reset_client() -> None:
+    """Descarta el cliente compartido (tests o cambio de configuración)."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.session.close()
+        _client = None
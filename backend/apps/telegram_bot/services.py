@@ -3,27 +3,36 @@ import re
 import unicodedata
 from datetime import datetime, timedelta
 
-import requests
 from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 
 from apps.authentication.models import ConfiguracionGlobal
 from apps.clientes.models import Billetera
 from apps.turnos.models import Turno
 from apps.turnos.services.cancelacion_service import cancelar_turno_para_cliente
+from apps.turnos.services.disponibilidad_service import (
+    bloquear_agenda,
+    calcular_horarios_disponibles_rango,
+)
 from apps.turnos.services.reprogramacion_service import (
     obtener_estado_rango_reprogramacion,
     reprogramar_turno,
 )
-from apps.turnos.views import TurnoViewSet
+from apps.users.utils import normalize_phone, phone_lookup_keys
 
-from .models import TelegramConversationState, TelegramLink, TelegramLinkToken
+from . import state_store
+from .client import get_client
+from .models import TelegramConversationState, TelegramLinkToken
 
 logger = logging.getLogger(__name__)
 
 
+class _HorarioNoDisponible(Exception):
+    pass
+
+
 class TelegramBotService:
-    API_BASE = "https://api.telegram.org"
     CANCEL_REASON_MAP = {
         "agenda": "Problema de agenda personal",
         "salud": "Motivos de salud",
@@ -79,13 +88,11 @@ class TelegramBotService:
         if not chat_id or not telegram_user_id:
             return
 
-        link, _ = TelegramLink.objects.get_or_create(
-            telegram_user_id=telegram_user_id,
-            defaults={"chat_id": chat_id},
-        )
+        link = state_store.get_link(telegram_user_id, chat_id=chat_id)
         if link.chat_id != chat_id:
             link.chat_id = chat_id
             link.save(update_fields=["chat_id", "last_seen_at"])
+        state_store.touch_link(link)
 
         if text.startswith("/start "):
             payload = text.split(maxsplit=1)[1].strip()
@@ -97,7 +104,7 @@ class TelegramBotService:
             self._try_link_by_phone(link, contact.get("phone_number"))
             return
 
-        state, _ = TelegramConversationState.objects.get_or_create(link=link)
+        state = state_store.get_state(link)
 
         command = text.lower()
 
@@ -242,16 +249,17 @@ class TelegramBotService:
         if not chat_id or not telegram_user_id:
             return
 
-        link = TelegramLink.objects.filter(telegram_user_id=telegram_user_id).first()
+        link = state_store.get_link(telegram_user_id)
         if not link:
             self.answer_callback_query(callback_id, "Inicia con /start")
             return
+        state_store.touch_link(link)
 
         # Evita que el usuario vuelva a tocar botones viejos del mismo mensaje.
         if chat_id and message_id:
             self.clear_inline_keyboard(chat_id, message_id)
 
-        state, _ = TelegramConversationState.objects.get_or_create(link=link)
+        state = state_store.get_state(link)
 
         if data in {"menu:end_chat", "followup:end_chat"}:
             self._end_chat(chat_id, state)
@@ -375,7 +383,7 @@ class TelegramBotService:
         token.used_at = timezone.now()
         token.save(update_fields=["used_at"])
 
-        TelegramConversationState.objects.get_or_create(link=link)
+        state_store.get_state(link)
 
         self.send_message(
             link.chat_id,
@@ -386,22 +394,22 @@ class TelegramBotService:
 
     def _try_link_by_phone(self, link, raw_phone):
         normalized_input = normalize_phone(raw_phone)
-        input_variants = phone_variants(raw_phone)
-        if not normalized_input or not input_variants:
+        lookup_keys = phone_lookup_keys(raw_phone)
+        if not normalized_input or not lookup_keys:
             self.send_message(
                 link.chat_id,
                 "No pude leer ese telefono. Envia solo numeros con codigo de area.",
             )
             return
 
-        match = None
         from apps.users.models import User
 
-        for user in User.objects.select_related("cliente_profile").all():
-            user_variants = phone_variants(user.phone)
-            if user_variants.intersection(input_variants) and hasattr(user, "cliente_profile"):
-                match = user
-                break
+        match = (
+            User.objects.select_related("cliente_profile")
+            .filter(phone_normalized__in=lookup_keys, cliente_profile__isnull=False)
+            .order_by("id")
+            .first()
+        )
 
         if not match:
             self.send_message(
@@ -425,7 +433,7 @@ class TelegramBotService:
             ]
         )
 
-        TelegramConversationState.objects.get_or_create(link=link)
+        state_store.get_state(link)
 
         self.send_message(
             link.chat_id,
@@ -739,6 +747,8 @@ class TelegramBotService:
 
     def send_reprogram_dates(self, chat_id, turno):
         profesional = turno.empleado.nombre_completo if turno.empleado else "tu profesional asignado"
+        # Inicio del flujo: se recalcula el snapshot de opciones en una pasada.
+        self._reprogram_options(turno, refresh=True)
         fechas = self._next_available_dates(turno, limit=5)
         if not fechas:
             self.send_message(
@@ -849,18 +859,35 @@ class TelegramBotService:
             return
 
         try:
-            resultado = reprogramar_turno(
-                turno=turno,
-                usuario=link.cliente.user,
-                fecha_hora_nueva=fecha_hora,
-                motivo="Reprogramacion solicitada desde Telegram",
-                origen="telegram",
-            )
+            with transaction.atomic():
+                # El snapshot pudo quedar viejo: se revalida el horario con la
+                # agenda del profesional bloqueada hasta guardar el cambio.
+                bloquear_agenda(turno.empleado_id)
+                fecha = timezone.localtime(fecha_hora).date()
+                horarios = calcular_horarios_disponibles_rango(
+                    turno.empleado, turno.servicio, [fecha], excluir_cliente=turno.cliente
+                )[fecha]
+                if timezone.localtime(fecha_hora).strftime("%H:%M") not in horarios:
+                    raise _HorarioNoDisponible()
+
+                resultado = reprogramar_turno(
+                    turno=turno,
+                    usuario=link.cliente.user,
+                    fecha_hora_nueva=fecha_hora,
+                    motivo="Reprogramacion solicitada desde Telegram",
+                    origen="telegram",
+                )
+        except _HorarioNoDisponible:
+            self.send_message(chat_id, "Ese horario ya no esta disponible. Elegi otro.")
+            self._reprogram_options(turno, refresh=True)
+            self.send_reprogram_times(chat_id, turno, date_value)
+            return
         except ValueError as exc:
             self.send_message(chat_id, f"No pude reprogramar el turno: {exc}")
             self.send_main_menu(chat_id)
             return
 
+        state_store.clear_reprogram_options(resultado.turno)
         nueva_fecha = timezone.localtime(resultado.turno.fecha_hora).strftime("%d/%m/%Y %H:%M")
         self.send_message(
             chat_id,
@@ -929,28 +956,47 @@ class TelegramBotService:
             and "127.0.0.1" not in value
         )
 
-    def _next_available_dates(self, turno, limit=5, days_ahead=None):
-        dates = []
-        if days_ahead is None:
+    def _reprogram_options(self, turno, refresh=False):
+        """Fechas con horarios libres del turno (``{"YYYY-MM-DD": ["HH:MM", ...]}``).
+
+        Se calcula en una sola pasada para todo el rango de reprogramación y se
+        reutiliza entre callbacks mientras dure el snapshot.
+        """
+        opciones = None if refresh else state_store.get_reprogram_options(turno)
+        if opciones is not None:
+            return opciones
+
+        opciones = {}
+        if turno.empleado and turno.servicio:
             estado_rango = obtener_estado_rango_reprogramacion(turno)
             days_ahead = int(estado_rango.get("dias_rango") or 14)
+            today = timezone.localdate()
+            horarios = calcular_horarios_disponibles_rango(
+                turno.empleado,
+                turno.servicio,
+                [today + timedelta(days=offset) for offset in range(days_ahead + 1)],
+                excluir_cliente=turno.cliente,
+            )
+            opciones = {fecha.isoformat(): slots for fecha, slots in horarios.items() if slots}
+        state_store.set_reprogram_options(turno, opciones)
+        return opciones
+
+    def _next_available_dates(self, turno, limit=5, days_ahead=None):
         today = timezone.localdate()
-        for offset in range(days_ahead + 1):
-            candidate = today + timedelta(days=offset)
-            if self._available_times_for_turno(turno, candidate):
-                dates.append(candidate)
-                if len(dates) >= limit:
-                    break
+        dates = []
+        for value in sorted(self._reprogram_options(turno)):
+            candidate = self._parse_date(value)
+            if candidate < today:
+                continue
+            if days_ahead is not None and (candidate - today).days > days_ahead:
+                break
+            dates.append(candidate)
+            if len(dates) >= limit:
+                break
         return dates
 
     def _available_times_for_turno(self, turno, date_value):
-        if not turno.empleado or not turno.servicio:
-            return []
-        return TurnoViewSet()._calcular_horarios_disponibles(
-            turno.empleado,
-            turno.servicio,
-            date_value,
-        )
+        return list(self._reprogram_options(turno).get(date_value.isoformat(), []))
 
     def _visible_hourly_times(self, horarios, limit=5):
         visible = []
@@ -1009,7 +1055,7 @@ class TelegramBotService:
             )
             return
 
-        state, _ = TelegramConversationState.objects.get_or_create(link=link)
+        state = state_store.get_state(link)
         state.state = TelegramConversationState.STATE_CONFIRM_CANCEL
         state.pending_turno_id = turno.id
         state.save(update_fields=["state", "pending_turno_id", "updated_at"])
@@ -1097,7 +1143,7 @@ class TelegramBotService:
         self.send_message(chat_id, text, reply_markup=keyboard)
 
     def confirm_cancel(self, chat_id, link, turno_id, reason_key="otro"):
-        state, _ = TelegramConversationState.objects.get_or_create(link=link)
+        state = state_store.get_state(link)
         if state.state != TelegramConversationState.STATE_CONFIRM_CANCEL:
             self.send_message(chat_id, "La confirmacion expiro. Volve a intentarlo.")
             self.send_main_menu(chat_id)
@@ -1186,48 +1232,54 @@ class TelegramBotService:
         if not self.token:
             return None
 
-        url = f"{self.API_BASE}/bot{self.token}/editMessageReplyMarkup"
         payload = {
             "chat_id": chat_id,
             "message_id": message_id,
             "reply_markup": {"inline_keyboard": []},
         }
-        return self._post(url, payload)
+        return self._post("editMessageReplyMarkup", payload)
 
     def send_message(self, chat_id, text, reply_markup=None):
         if not self.token:
             logger.warning("Telegram token no configurado. Mensaje omitido.")
             return None
 
-        url = f"{self.API_BASE}/bot{self.token}/sendMessage"
-        payload = {
-            "chat_id": chat_id,
-            "text": text,
-        }
-        if reply_markup:
-            payload["reply_markup"] = reply_markup
+        return self._post("sendMessage", self._message_payload(chat_id, text, reply_markup))
+
+    def send_messages(self, messages):
+        """Envía en lote ``(chat_id, text[, reply_markup])`` por el cliente compartido.
+
+        Los envíos corren en paralelo, acotados por los limitadores global y
+        por chat. Devuelve las respuestas en el mismo orden.
+        """
+        if not self.token:
+            logger.warning("Telegram token no configurado. Mensajes omitidos.")
+            return [None] * len(messages)
 
-        return self._post(url, payload)
+        payloads = [self._message_payload(*message) for message in messages]
+        return get_client().send_batch(payloads, token=self.token)
 
     def answer_callback_query(self, callback_query_id, text=None):
         if not self.token or not callback_query_id:
             return None
 
-        url = f"{self.API_BASE}/bot{self.token}/answerCallbackQuery"
         payload = {"callback_query_id": callback_query_id}
         if text:
             payload["text"] = text
-        return self._post(url, payload)
+        return self._post("answerCallbackQuery", payload)
 
-    def _post(self, url, payload):
-        try:
-            response = requests.post(url, json=payload, timeout=self.timeout)
-            if not response.ok:
-                logger.warning("Telegram API rechazo payload: %s", response.text)
-            return response
-        except requests.RequestException as exc:
-            logger.exception("Error enviando mensaje a Telegram: %s", exc)
-            return None
+    def _post(self, method, payload):
+        return get_client().call(method, payload, token=self.token)
+
+    @staticmethod
+    def _message_payload(chat_id, text, reply_markup=None):
+        payload = {
+            "chat_id": chat_id,
+            "text": text,
+        }
+        if reply_markup:
+            payload["reply_markup"] = reply_markup
+        return payload
 
     @staticmethod
     def _safe_int(value):
@@ -1257,60 +1309,3 @@ class TelegramBotService:
             simplified == k or simplified.startswith(f"{k} ")
             for k in self.FAREWELL_KEYWORDS
         )
-
-
-def normalize_phone(value):
-    if not value:
-        return ""
-    digits = re.sub(r"\D", "", str(value))
-    if digits.startswith("00"):
-        digits = digits[2:]
-    if digits.startswith("0") and len(digits) > 10:
-        digits = digits[1:]
-    if digits.startswith("549"):
-        return digits
-    if digits.startswith("54"):
-        return f"549{digits[2:]}"
-    if len(digits) == 10:
-        return f"549{digits}"
-    return digits
-
-
-def phone_variants(value):
-    """Genera variantes de telefono para empatar formato local e internacional."""
-    if not value:
-        return set()
-
-    digits = re.sub(r"\D", "", str(value))
-    if not digits:
-        return set()
-
-    if digits.startswith("00"):
-        digits = digits[2:]
-
-    variants = {digits}
-
-    # Formato internacional AR (54 / 549)
-    if digits.startswith("549"):
-        variants.add(digits[2:])  # 9 + area + numero
-        variants.add(digits[3:])  # area + numero
-    if digits.startswith("54"):
-        variants.add(digits[2:])
-
-    # Prefijo local con 0 troncal
-    if digits.startswith("0"):
-        variants.add(digits[1:])
-
-    # Si tiene prefijo 9 de celular internacional, quitarlo
-    for candidate in list(variants):
-        if candidate.startswith("9") and len(candidate) >= 10:
-            variants.add(candidate[1:])
-
-    # Si llega sin prefijo pais y tiene 10 digitos (area + numero), agregar variantes AR.
-    for candidate in list(variants):
-        if len(candidate) == 10 and candidate.isdigit():
-            variants.add(f"54{candidate}")
-            variants.add(f"549{candidate}")
-            variants.add(f"0{candidate}")
-
-    return {v for v in variants if v}
@@ -0,0 +1,12 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import TelegramLink
+from .state_store import invalidate_link
+
+
+@receiver(post_save, sender=TelegramLink)
+@receiver(post_delete, sender=TelegramLink)
+def invalidar_link_cacheado(sender, instance, **kwargs):
+    """Vincular o desvincular un chat invalida el mapeo cacheado chat → cliente."""
+    invalidate_link(instance.telegram_user_id)
@@ -0,0 +1,198 @@
+"""
+Estado de conversación y vínculos de Telegram con respaldo opcional en caché.
+
+Con ``TELEGRAM_STATE_CACHE_ENABLED=False`` (default) todo sigue yendo a la
+base: ``TelegramLink`` y ``TelegramConversationState`` se leen y escriben en
+cada update, como hasta ahora.
+
+Con el flag activo, usando la caché ``TELEGRAM_STATE_CACHE_ALIAS`` (Redis en
+producción para que la compartan todos los workers):
+
+- el estado de conversación vive solo en la caché con TTL
+  ``TELEGRAM_STATE_TTL``; si no está, se parte de la fila existente o de
+  ``idle``;
+- el vínculo ``telegram_user_id → TelegramLink`` (chat y cliente) se cachea y
+  se invalida desde los signals de ``TelegramLink`` al vincular/desvincular;
+- ``last_seen_at`` se registra en la caché (a lo sumo una vez por
+  ``TELEGRAM_LAST_SEEN_THROTTLE`` segundos por vínculo) y la tarea
+  ``persistir_last_seen_telegram`` lo vuelca a la base en lote.
+"""
+
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import TelegramConversationState, TelegramLink
+
+LINK_KEY = "telegram:link:{telegram_user_id}"
+STATE_KEY = "telegram:state:{link_id}"
+LAST_SEEN_RECENT_KEY = "telegram:last_seen:recent:{link_id}"
+LAST_SEEN_SLOT_KEY = "telegram:last_seen:slot:{seq}"
+LAST_SEEN_SEQ_KEY = "telegram:last_seen:seq"
+LAST_SEEN_FLUSHED_KEY = "telegram:last_seen:flushed"
+REPROGRAM_OPTIONS_KEY = "telegram:reprogram:{turno_id}"
+
+_LINK_FIELDS = ("id", "telegram_user_id", "chat_id", "cliente_id", "phone_snapshot", "is_verified")
+
+
+def cache_enabled() -> bool:
+    return bool(getattr(settings, "TELEGRAM_STATE_CACHE_ENABLED", False))
+
+
+def _cache():
+    return caches[getattr(settings, "TELEGRAM_STATE_CACHE_ALIAS", "default")]
+
+
+def _ttl() -> int:
+    return int(getattr(settings, "TELEGRAM_STATE_TTL", 60 * 60 * 24))
+
+
+@dataclass
+class CachedConversationState:
+    """Misma interfaz que ``TelegramConversationState`` para el servicio del bot."""
+
+    link_id: int
+    state: str = TelegramConversationState.STATE_IDLE
+    pending_turno_id: int | None = None
+
+    def save(self, update_fields=None):
+        _cache().set(
+            STATE_KEY.format(link_id=self.link_id),
+            {"state": self.state, "pending_turno_id": self.pending_turno_id},
+            _ttl(),
+        )
+
+
+def get_link(telegram_user_id, chat_id=None):
+    """Devuelve el ``TelegramLink`` del usuario; con ``chat_id`` lo crea si no existe."""
+    if not cache_enabled():
+        if chat_id is None:
+            return TelegramLink.objects.filter(telegram_user_id=telegram_user_id).first()
+        link, _ = TelegramLink.objects.get_or_create(
+            telegram_user_id=telegram_user_id,
+            defaults={"chat_id": chat_id},
+        )
+        return link
+
+    key = LINK_KEY.format(telegram_user_id=telegram_user_id)
+    cached = _cache().get(key)
+    if cached is not None:
+        link = TelegramLink(**cached)
+        link._state.adding = False
+        return link
+
+    if chat_id is None:
+        link = TelegramLink.objects.filter(telegram_user_id=telegram_user_id).first()
+    else:
+        link, _ = TelegramLink.objects.get_or_create(
+            telegram_user_id=telegram_user_id,
+            defaults={"chat_id": chat_id},
+        )
+    if link is not None:
+        _cache().set(key, {f: getattr(link, f) for f in _LINK_FIELDS}, _ttl())
+    return link
+
+
+def get_state(link):
+    if not cache_enabled():
+        state, _ = TelegramConversationState.objects.get_or_create(link=link)
+        return state
+
+    cached = _cache().get(STATE_KEY.format(link_id=link.pk))
+    if cached is not None:
+        return CachedConversationState(link_id=link.pk, **cached)
+
+    row = (
+        TelegramConversationState.objects.filter(link_id=link.pk)
+        .values("state", "pending_turno_id")
+        .first()
+    )
+    return CachedConversationState(link_id=link.pk, **(row or {}))
+
+
+def touch_link(link) -> None:
+    """Registra actividad del vínculo; con caché, difiere ``last_seen_at``."""
+    if not cache_enabled():
+        return
+
+    cache = _cache()
+    throttle = int(getattr(settings, "TELEGRAM_LAST_SEEN_THROTTLE", 60))
+    if not cache.add(LAST_SEEN_RECENT_KEY.format(link_id=link.pk), 1, throttle):
+        return
+    cache.add(LAST_SEEN_SEQ_KEY, 0, None)
+    seq = cache.incr(LAST_SEEN_SEQ_KEY)
+    cache.set(
+        LAST_SEEN_SLOT_KEY.format(seq=seq),
+        (link.pk, timezone.now().isoformat()),
+        _ttl(),
+    )
+
+
+def get_reprogram_options(turno):
+    """Snapshot de opciones de reprogramación del turno, si sigue vigente.
+
+    Se descarta si el turno cambió de profesional, servicio o fecha desde que
+    se calculó. Vive en la caché aunque ``TELEGRAM_STATE_CACHE_ENABLED`` esté
+    apagado: es un dato derivado y un miss solo implica recalcularlo.
+    """
+    cached = _cache().get(REPROGRAM_OPTIONS_KEY.format(turno_id=turno.pk))
+    if not cached or cached.get("huella") != _huella_turno(turno):
+        return None
+    return cached["fechas"]
+
+
+def set_reprogram_options(turno, fechas: dict) -> None:
+    _cache().set(
+        REPROGRAM_OPTIONS_KEY.format(turno_id=turno.pk),
+        {"huella": _huella_turno(turno), "fechas": fechas},
+        int(getattr(settings, "TELEGRAM_REPROGRAM_OPTIONS_TTL", 300)),
+    )
+
+
+def clear_reprogram_options(turno) -> None:
+    _cache().delete(REPROGRAM_OPTIONS_KEY.format(turno_id=turno.pk))
+
+
+def _huella_turno(turno) -> list:
+    return [turno.empleado_id, turno.servicio_id, turno.fecha_hora.isoformat() if turno.fecha_hora else None]
+
+
+def invalidate_link(telegram_user_id) -> None:
+    if cache_enabled():
+        _cache().delete(LINK_KEY.format(telegram_user_id=telegram_user_id))
+
+
+def flush_last_seen(batch_size: int = 500) -> int:
+    """Vuelca a la base los ``last_seen_at`` pendientes; devuelve cuántos vínculos tocó."""
+    cache = _cache()
+    ultimo = cache.get(LAST_SEEN_SEQ_KEY) or 0
+    volcado = cache.get(LAST_SEEN_FLUSHED_KEY) or 0
+    if ultimo <= volcado:
+        return 0
+
+    ultimos_vistos = {}
+    for desde in range(volcado + 1, ultimo + 1, batch_size):
+        claves = [
+            LAST_SEEN_SLOT_KEY.format(seq=seq)
+            for seq in range(desde, min(desde + batch_size, ultimo + 1))
+        ]
+        for link_id, visto in cache.get_many(claves).values():
+            visto = parse_datetime(visto)
+            if link_id not in ultimos_vistos or visto > ultimos_vistos[link_id]:
+                ultimos_vistos[link_id] = visto
+        cache.delete_many(claves)
+
+    links = [TelegramLink(pk=link_id, last_seen_at=visto) for link_id, visto in ultimos_vistos.items()]
+    existentes = set(
+        TelegramLink.objects.filter(pk__in=ultimos_vistos).values_list("pk", flat=True)
+    )
+    TelegramLink.objects.bulk_update(
+        [link for link in links if link.pk in existentes],
+        ["last_seen_at"],
+        batch_size=batch_size,
+    )
+    cache.set(LAST_SEEN_FLUSHED_KEY, ultimo, None)
+    return len(existentes)
@@ -23,3 +23,13 @@ def process_telegram_update(update_log_id):
     update_log.processed = True
     update_log.processed_at = timezone.now()
     update_log.save(update_fields=["processed", "processed_at"])
+
+
+@shared_task(name="apps.telegram_bot.persistir_last_seen")
+def persistir_last_seen_telegram():
+    """Vuelca a la base los ``last_seen_at`` diferidos en la caché del bot."""
+    from .state_store import cache_enabled, flush_last_seen
+
+    if not cache_enabled():
+        return {"links": 0}
+    return {"links": flush_last_seen()}
@@ -1,16 +1,27 @@
+import json
+import threading
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from unittest.mock import patch
-from datetime import timedelta
 
 from django.conf import settings
+from django.core.cache import cache
 from django.test import TestCase, override_settings
 from django.utils import timezone
 from rest_framework.test import APIClient
 
 from apps.clientes.models import Cliente
+from apps.empleados.models import Empleado
+from apps.servicios.models import CategoriaServicio, Sala, Servicio
+from apps.turnos.models import Turno
 from apps.users.models import User
+from apps.users.utils import normalize_phone, phone_variants
 
+from . import state_store
+from .client import TelegramApiClient, TokenBucket
 from .models import TelegramConversationState, TelegramLink, TelegramLinkToken, TelegramUpdateLog
-from .services import TelegramBotService, normalize_phone, phone_variants
+from .services import TelegramBotService
 
 
 class TelegramWebhookTests(TestCase):
@@ -444,3 +455,227 @@ class TelegramGreetingAndFarewellTests(TestCase):
             "El chat esta finalizado. Mandame \"hola\" cuando quieras volver a empezar.",
         )
         mocked_menu.assert_not_called()
+
+
+class _FakeBotApiHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        server = self.server
+        with server.lock:
+            server.calls.append((self.path, body))
+            limitar = server.rate_limit_pending > 0
+            if limitar:
+                server.rate_limit_pending -= 1
+
+        if limitar:
+            status_code = 429
+            data = {"ok": False, "error_code": 429, "parameters": {"retry_after": 2}}
+        else:
+            status_code = 200
+            data = {"ok": True, "result": {"message_id": len(server.calls)}}
+        encoded = json.dumps(data).encode()
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TelegramApiClientTests(TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeBotApiHandler)
+        self.server.lock = threading.Lock()
+        self.server.calls = []
+        self.server.rate_limit_pending = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        self.sleeps = []
+        api_base = f"http://127.0.0.1:{self.server.server_address[1]}"
+        settings_override = override_settings(TELEGRAM_API_BASE=api_base)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_token_bucket_waits_after_burst(self):
+        now = [0.0]
+        bucket = TokenBucket(rate=1, capacity=2, clock=lambda: now[0])
+
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertAlmostEqual(bucket.reserve(), 1.0)
+
+        now[0] = 5.0
+        bucket.pause(3)
+        self.assertAlmostEqual(bucket.reserve(), 3.0)
+
+    def test_retries_after_429_respecting_retry_after(self):
+        self.server.rate_limit_pending = 1
+        client = TelegramApiClient(sleep=self.sleeps.append)
+
+        response = client.call("sendMessage", {"chat_id": 10, "text": "hola"}, token="T")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.server.calls), 2)
+        self.assertEqual(self.server.calls[0][0], "/botT/sendMessage")
+        self.assertIn(2.0, [round(s, 1) for s in self.sleeps])
+
+    def test_send_messages_batches_through_shared_client(self):
+        client = TelegramApiClient(sleep=self.sleeps.append)
+        service = TelegramBotService()
+        service.token = "T"
+
+        with patch("apps.telegram_bot.services.get_client", return_value=client):
+            responses = service.send_messages(
+                [(chat_id, f"alerta {chat_id}") for chat_id in range(1, 6)]
+            )
+
+        self.assertEqual([r.status_code for r in responses], [200] * 5)
+        self.assertEqual(
+            sorted(body["chat_id"] for _, body in self.server.calls), [1, 2, 3, 4, 5]
+        )
+
+
+@override_settings(TELEGRAM_STATE_CACHE_ENABLED=True, TELEGRAM_STATE_CACHE_ALIAS="default")
+class TelegramStateCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.link = TelegramLink.objects.create(
+            telegram_user_id=4444,
+            chat_id=9999,
+            is_verified=True,
+        )
+        self.service = TelegramBotService()
+
+    def _farewell(self):
+        with patch.object(self.service, "send_message"):
+            self.service._handle_message(
+                {
+                    "chat": {"id": self.link.chat_id},
+                    "from": {"id": self.link.telegram_user_id},
+                    "text": "chau",
+                }
+            )
+
+    def test_state_and_link_are_served_from_cache_without_db_writes(self):
+        self._farewell()
+
+        with self.assertNumQueries(0):
+            self._farewell()
+
+        state = state_store.get_state(self.link)
+        self.assertEqual(state.state, TelegramConversationState.STATE_ENDED)
+        self.assertFalse(TelegramConversationState.objects.filter(link=self.link).exists())
+
+    def test_link_cache_is_invalidated_on_unlink(self):
+        self.assertTrue(state_store.get_link(self.link.telegram_user_id).is_verified)
+
+        self.link.is_verified = False
+        self.link.save(update_fields=["is_verified"])
+
+        self.assertFalse(state_store.get_link(self.link.telegram_user_id).is_verified)
+
+    def test_last_seen_is_written_behind_in_batch(self):
+        antes = timezone.now() - timedelta(days=1)
+        TelegramLink.objects.filter(pk=self.link.pk).update(last_seen_at=antes)
+
+        self._farewell()
+        self.link.refresh_from_db()
+        self.assertEqual(self.link.last_seen_at, antes)
+
+        self.assertEqual(state_store.flush_last_seen(), 1)
+        self.link.refresh_from_db()
+        self.assertGreater(self.link.last_seen_at, antes)
+        self.assertEqual(state_store.flush_last_seen(), 0)
+
+
+class TelegramReprogramOptionsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        sala = Sala.objects.create(nombre="Sala Telegram", capacidad_simultanea=2)
+        categoria = CategoriaServicio.objects.create(nombre="Categoria Telegram", sala=sala)
+        self.servicio = Servicio.objects.create(
+            nombre="Servicio Telegram",
+            categoria=categoria,
+            precio=Decimal("10000.00"),
+            duracion_minutos=60,
+        )
+        user_cliente = User.objects.create_user(
+            email="cliente.reprog.tg@test.com",
+            password="password1.2.3",
+            username="cliente_reprog_tg",
+            role="cliente",
+        )
+        self.cliente = Cliente.objects.create(user=user_cliente)
+        user_profesional = User.objects.create_user(
+            email="pro.reprog.tg@test.com",
+            password="password1.2.3",
+            username="pro_reprog_tg",
+            first_name="Pro",
+            last_name="Telegram",
+            role="profesional",
+        )
+        self.empleado = Empleado.objects.create(
+            user=user_profesional,
+            fecha_ingreso=date.today(),
+            horario_entrada=time(9, 0),
+            horario_salida=time(18, 0),
+            dias_trabajo="L,M,Mi,J,V,S,D",
+            comision_porcentaje=Decimal("10.00"),
+        )
+        fecha_turno = (timezone.localtime() + timedelta(days=5)).replace(
+            hour=10, minute=0, second=0, microsecond=0
+        )
+        turno = Turno.objects.create(
+            cliente=self.cliente,
+            empleado=self.empleado,
+            servicio=self.servicio,
+            fecha_hora=fecha_turno,
+            estado="confirmado",
+        )
+        self.turno = Turno.objects.select_related("servicio", "empleado__user").get(pk=turno.pk)
+        self.link = TelegramLink.objects.create(
+            telegram_user_id=5555,
+            chat_id=8888,
+            cliente=self.cliente,
+            is_verified=True,
+        )
+        self.service = TelegramBotService()
+        self.fecha = timezone.localdate() + timedelta(days=3)
+
+    def test_times_are_served_from_snapshot_taken_with_dates(self):
+        with patch.object(self.service, "send_message") as send_message:
+            self.service.send_reprogram_dates(self.link.chat_id, self.turno)
+            with self.assertNumQueries(0):
+                self.service.send_reprogram_times(
+                    self.link.chat_id, self.turno, self.fecha.isoformat()
+                )
+
+        botones = send_message.call_args.kwargs["reply_markup"]["inline_keyboard"]
+        self.assertEqual(botones[0][0]["text"], "09:00")
+
+    def test_confirm_revalidates_slot_taken_after_snapshot(self):
+        with patch.object(self.service, "send_message"):
+            self.service.send_reprogram_dates(self.link.chat_id, self.turno)
+        Turno.objects.create(
+            cliente=self.cliente,
+            empleado=self.empleado,
+            servicio=self.servicio,
+            fecha_hora=timezone.make_aware(datetime.combine(self.fecha, time(9, 0))),
+            estado="confirmado",
+        )
+
+        with patch.object(self.service, "send_message") as send_message:
+            self.service.confirm_reprogram(
+                self.link.chat_id, self.link, self.turno, self.fecha.isoformat(), "0900"
+            )
+
+        self.assertIn("ya no esta disponible", send_message.call_args_list[0].args[1])
+        botones = send_message.call_args.kwargs["reply_markup"]["inline_keyboard"]
+        self.assertEqual(botones[0][0]["text"], "10:00")
+        fecha_original = self.turno.fecha_hora
+        self.turno.refresh_from_db()
+        self.assertEqual(self.turno.fecha_hora, fecha_original)
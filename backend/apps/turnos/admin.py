@@ -3,16 +3,20 @@ from simple_history.admin import SimpleHistoryAdmin
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils import timezone
+from apps.core.history import historial_en_lote
 from .models import (
     Turno,
     HistorialTurno,
     MovimientoPagoTurno,
     LogReasignacion,
+    CandidatosReasignacion,
     ClienteStreakStats,
     StreakCoupon,
     StreakRewardEvent,
     StreakExpiryAlertLog,
     StreakAuditLog,
+    BloqueoTemporalTurno,
+    ExportacionReporte,
 )
 
 
@@ -269,21 +273,22 @@ class TurnoAdmin(SimpleHistoryAdmin):
         )
         count = 0
 
-        for turno in turnos_cancelables:
-            if turno.puede_cancelar():
-                estado_anterior = turno.estado
-                turno.estado = "cancelado"
-                turno.save()
-
-                HistorialTurno.objects.create(
-                    turno=turno,
-                    usuario=request.user,
-                    accion="Cancelación masiva",
-                    estado_anterior=estado_anterior,
-                    estado_nuevo="cancelado",
-                    observaciones=f"Cancelado por {request.user.full_name} desde admin",
-                )
-                count += 1
+        with historial_en_lote():
+            for turno in turnos_cancelables:
+                if turno.puede_cancelar():
+                    estado_anterior = turno.estado
+                    turno.estado = "cancelado"
+                    turno.save()
+
+                    HistorialTurno.objects.create(
+                        turno=turno,
+                        usuario=request.user,
+                        accion="Cancelación masiva",
+                        estado_anterior=estado_anterior,
+                        estado_nuevo="cancelado",
+                        observaciones=f"Cancelado por {request.user.full_name} desde admin",
+                    )
+                    count += 1
 
         self.message_user(request, f"{count} turno(s) cancelado(s) exitosamente.")
 
@@ -294,19 +299,20 @@ class TurnoAdmin(SimpleHistoryAdmin):
         turnos_en_proceso = queryset.filter(estado="en_proceso")
         count = 0
 
-        for turno in turnos_en_proceso:
-            turno.estado = "completado"
-            turno.save()
+        with historial_en_lote():
+            for turno in turnos_en_proceso:
+                turno.estado = "completado"
+                turno.save()
 
-            HistorialTurno.objects.create(
-                turno=turno,
-                usuario=request.user,
-                accion="Completado masivamente",
-                estado_anterior="en_proceso",
-                estado_nuevo="completado",
-                observaciones=f"Completado por {request.user.full_name} desde admin",
-            )
-            count += 1
+                HistorialTurno.objects.create(
+                    turno=turno,
+                    usuario=request.user,
+                    accion="Completado masivamente",
+                    estado_anterior="en_proceso",
+                    estado_nuevo="completado",
+                    observaciones=f"Completado por {request.user.full_name} desde admin",
+                )
+                count += 1
 
         self.message_user(request, f"{count} turno(s) marcado(s) como completado(s).")
 
@@ -406,6 +412,28 @@ class StreakExpiryAlertLogAdmin(admin.ModelAdmin):
     search_fields = ["cliente__user__email"]
 
 
+@admin.register(BloqueoTemporalTurno)
+class BloqueoTemporalTurnoAdmin(admin.ModelAdmin):
+    list_display = [
+        "empleado",
+        "cliente",
+        "fecha_hora_inicio",
+        "fecha_hora_fin",
+        "expira_en",
+        "referencia",
+    ]
+    list_filter = ["expira_en"]
+    search_fields = ["referencia", "cliente__user__email"]
+
+
+@admin.register(ExportacionReporte)
+class ExportacionReporteAdmin(admin.ModelAdmin):
+    list_display = ["id", "usuario", "reporte", "formato", "estado", "filas", "creado_en", "finalizado_en"]
+    list_filter = ["reporte", "formato", "estado"]
+    search_fields = ["usuario__email", "archivo"]
+    readonly_fields = ["parametros", "archivo", "filas", "error", "creado_en", "finalizado_en"]
+
+
 @admin.register(StreakAuditLog)
 class StreakAuditLogAdmin(admin.ModelAdmin):
     list_display = [
@@ -444,6 +472,13 @@ class LogReasignacionAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(CandidatosReasignacion)
+class CandidatosReasignacionAdmin(admin.ModelAdmin):
+    list_display = ("id", "turno_cancelado", "creado_en", "actualizado_en")
+    search_fields = ("turno_cancelado__id",)
+    readonly_fields = ("turno_cancelado", "candidatos", "creado_en", "actualizado_en")
+
+
 @admin.register(HistorialTurno)
 class HistorialTurnoAdmin(admin.ModelAdmin):
     """Administración de Historial de Turnos"""
@@ -0,0 +1,119 @@
+"""
+Benchmark de la exportación ZIP de comprobantes.
+
+Arma ``--cantidad`` comprobantes sintéticos (mitad de pago, mitad finales,
+con la misma forma que ``_comprobante_data``) y los pasa por
+``generar_zip`` sin base ni caché de PDFs, primero en un solo proceso y
+después con el pool. Informa tiempo, comprobantes por segundo, tamaño del
+ZIP, bloque más grande entregado y RSS máximo del proceso principal.
+
+    python manage.py benchmark_exportacion_comprobantes --cantidad 5000
+"""
+import resource
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from apps.turnos.services.exportacion_comprobantes_service import _procesos, generar_zip
+
+
+def _comprobante_sintetico(indice: int) -> dict:
+    tipo = "pago" if indice % 2 == 0 else "final"
+    monto = str((Decimal("5000.00") + indice % 97).quantize(Decimal("0.01")))
+    movimiento = {
+        "id": indice,
+        "monto": monto,
+        "metodo": "mercadopago",
+        "metodo_display": "Mercado Pago",
+        "tipo": "pago_completo",
+        "tipo_display": "Pago completo",
+        "estado": "aprobado",
+        "referencia": f"{90000000 + indice}",
+        "descripcion": "Pago Mercado Pago",
+        "origen": "webhook_mp",
+        "creado_en": "2026-03-06T15:00:00-03:00",
+    }
+    return {
+        "tipo": tipo,
+        "numero": f"TUR-{indice:08d}-{tipo.upper()[:3]}",
+        "emitido_en": "2026-03-31T20:00:00-03:00",
+        "titulo": "Comprobante",
+        "estado_comprobante": "PAGO REGISTRADO" if tipo == "pago" else "SERVICIO FINALIZADO",
+        "subtitulo": "Constancia",
+        "fecha_principal": "2026-03-06T15:00:00-03:00",
+        "fecha_principal_label": "Fecha",
+        "monto_principal": monto,
+        "secciones": {"principal": "", "secundaria": "", "movimientos": "Pagos"},
+        "mensaje": "Comprobante de benchmark.",
+        "empresa": {
+            "nombre_empresa": "Beautiful Studio",
+            "nombre_comercial": "Beautiful Studio",
+            "razon_social": "Beautiful Studio SRL",
+            "cuit": "30-00000000-0",
+            "telefono": "",
+            "email": "",
+            "direccion": "",
+        },
+        "turno": {
+            "id": indice,
+            "cliente_nombre": f"Cliente {indice}",
+            "cliente_email": f"cliente{indice}@example.com",
+            "cliente_dni": "",
+            "profesional_nombre": "Profesional",
+            "servicio_nombre": "Servicio",
+            "categoria_nombre": "Categoria",
+            "fecha_hora": "2026-03-06T15:00:00-03:00",
+            "fecha_hora_fin": None,
+            "fecha_hora_completado": "2026-03-06T16:00:00-03:00",
+            "duracion_minutos": 60,
+            "estado": "completado",
+            "estado_display": "Completado",
+            "precio_final": monto,
+            "senia_pagada": monto,
+            "monto_pendiente": "0.00",
+        },
+        "pago_principal": movimiento,
+        "movimientos": [movimiento],
+        "resumen": {"subtotal": monto, "monto_abonado": monto, "saldo_pendiente": "0.00"},
+        "leyenda": "Comprobante electronico sin valor fiscal.",
+    }
+
+
+class Command(BaseCommand):
+    help = "Mide la exportación ZIP de comprobantes con datos sintéticos"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cantidad", type=int, default=5000, help="Comprobantes a generar (default: 5000)")
+        parser.add_argument(
+            "--procesos",
+            type=int,
+            default=0,
+            help="Procesos del pool (default: COMPROBANTES_EXPORT_PROCESOS o uno por CPU)",
+        )
+        parser.add_argument("--solo-pool", action="store_true", help="No medir la corrida en un solo proceso")
+
+    def handle(self, *args, **options):
+        cantidad = max(1, options["cantidad"])
+        procesos = _procesos(options["procesos"])
+        corridas = [procesos] if options["solo_pool"] or procesos == 1 else [1, procesos]
+
+        for corrida in corridas:
+            entradas = (
+                (f"comprobante_{i}.pdf", "pago" if i % 2 == 0 else "final", _comprobante_sintetico(i))
+                for i in range(cantidad)
+            )
+            inicio = time.perf_counter()
+            total = bloque_max = 0
+            for bloque in generar_zip(entradas, procesos=corrida, usar_cache=False):
+                total += len(bloque)
+                bloque_max = max(bloque_max, len(bloque))
+            segundos = time.perf_counter() - inicio
+            rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+            self.stdout.write(
+                f"procesos={corrida} comprobantes={cantidad} tiempo={segundos:.2f}s "
+                f"({cantidad / segundos:.0f}/s) zip={total / 1024 / 1024:.1f}MB "
+                f"bloque_max={bloque_max / 1024:.0f}KB rss_max={rss_mb:.0f}MB"
+            )
+        self.stdout.write(self.style.SUCCESS("Benchmark finalizado."))
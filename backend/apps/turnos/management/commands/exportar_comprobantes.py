@@ -0,0 +1,63 @@
+"""
+Exporta los comprobantes de un período a un ZIP en disco.
+
+Misma selección que ``GET /api/turnos/comprobantes/exportar/``, pero el
+render de los PDF se reparte en un pool de ``--procesos`` procesos (default:
+``COMPROBANTES_EXPORT_PROCESOS`` o uno por CPU). Pensado para exportaciones
+grandes que no conviene servir desde un request.
+
+    python manage.py exportar_comprobantes 2026-01-01 2026-03-31 --salida comprobantes.zip
+    python manage.py exportar_comprobantes 2026-01-01 2026-03-31 --tipo final --procesos 4
+"""
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.turnos.services import exportacion_comprobantes_service
+
+
+class Command(BaseCommand):
+    help = "Exporta los comprobantes de un período a un archivo ZIP"
+
+    def add_arguments(self, parser):
+        parser.add_argument("fecha_desde", type=date.fromisoformat, help="YYYY-MM-DD")
+        parser.add_argument("fecha_hasta", type=date.fromisoformat, help="YYYY-MM-DD")
+        parser.add_argument("--tipo", choices=["pago", "final", "todos"], default="todos")
+        parser.add_argument("--empleado-id", type=int)
+        parser.add_argument("--servicio-id", type=int)
+        parser.add_argument("--salida", default="comprobantes.zip", help="Ruta del ZIP (default: comprobantes.zip)")
+        parser.add_argument(
+            "--procesos",
+            type=int,
+            default=0,
+            help="Procesos del pool (default: COMPROBANTES_EXPORT_PROCESOS o uno por CPU)",
+        )
+
+    def handle(self, *args, **options):
+        if options["fecha_hasta"] < options["fecha_desde"]:
+            raise CommandError("fecha_hasta no puede ser anterior a fecha_desde.")
+        tipo = options["tipo"]
+        tipos = exportacion_comprobantes_service.TIPOS_EXPORTACION if tipo == "todos" else (tipo,)
+        turnos = exportacion_comprobantes_service.turnos_a_exportar(
+            options["fecha_desde"],
+            options["fecha_hasta"],
+            tipos,
+            empleado_id=options["empleado_id"],
+            servicio_id=options["servicio_id"],
+        )
+        procesos = exportacion_comprobantes_service._procesos(options["procesos"])
+
+        total = 0
+        with open(options["salida"], "wb") as archivo:
+            for bloque in exportacion_comprobantes_service.generar_zip(
+                exportacion_comprobantes_service.entradas_comprobantes(turnos, tipos),
+                procesos=procesos,
+            ):
+                archivo.write(bloque)
+                total += len(bloque)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"ZIP generado en {options['salida']} ({total / 1024 / 1024:.1f}MB, procesos={procesos})."
+            )
+        )
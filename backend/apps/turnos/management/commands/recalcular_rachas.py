@@ -0,0 +1,52 @@
+"""
+Recalcula las rachas (PA3) de todos los clientes desde el historial.
+
+Reconstruye ``ClienteStreakStats`` con ``streak_recalculo_service`` a partir
+de los turnos completados, los cortes por ``streak_expiration_days`` y los
+cupones de racha usados. Con ``--dry-run`` solo muestra las diferencias.
+
+    python manage.py recalcular_rachas --dry-run
+    python manage.py recalcular_rachas --lote 1000 --workers 4
+"""
+from django.core.management.base import BaseCommand
+
+from apps.turnos.services.streak_recalculo_service import recalcular_rachas
+
+
+class Command(BaseCommand):
+    help = "Recalcula ClienteStreakStats desde los turnos completados"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=500, help="Clientes por lote (default: 500)")
+        parser.add_argument(
+            "--workers", type=int, default=1, help="Lotes procesados en paralelo (default: 1)"
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Informar diferencias sin escribir")
+        parser.add_argument(
+            "--detalle", type=int, default=20, help="Diferencias a listar (default: 20)"
+        )
+
+    def handle(self, *args, **options):
+        reporte = recalcular_rachas(
+            lote=options["lote"],
+            workers=options["workers"],
+            dry_run=options["dry_run"],
+            limite_detalle=max(0, options["detalle"]),
+        )
+
+        for cambio in reporte["detalle"]:
+            antes = cambio["antes"] or {}
+            despues = cambio["despues"]
+            self.stdout.write(
+                f"cliente={cambio['cliente_id']} racha {antes.get('streak_count', '-')} -> "
+                f"{despues['streak_count']} vence {antes.get('next_expiration_at') or '-'} -> "
+                f"{despues['next_expiration_at'] or '-'}"
+            )
+        self.stdout.write(
+            f"clientes={reporte['clientes']} lotes={reporte['lotes']} cambios={reporte['cambios']} "
+            f"creados={reporte['creados']} expiracion={reporte['expiracion_dias']}d"
+        )
+        if reporte["dry_run"]:
+            self.stdout.write(self.style.WARNING("Dry run: no se escribió nada."))
+        else:
+            self.stdout.write(self.style.SUCCESS("Rachas recalculadas."))
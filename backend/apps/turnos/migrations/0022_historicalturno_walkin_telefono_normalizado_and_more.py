@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('turnos', '0021_historialturno_origen'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historicalturno',
+            name='walkin_telefono_normalizado',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=30, verbose_name='Teléfono walk-in normalizado'),
+        ),
+        migrations.AddField(
+            model_name='turno',
+            name='walkin_telefono_normalizado',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=30, verbose_name='Teléfono walk-in normalizado'),
+        ),
+    ]
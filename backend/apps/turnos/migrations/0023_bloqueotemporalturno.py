@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0004_billetera_fecha_vencimiento'),
+        ('empleados', '0004_empleado_is_active_alter_empleadoservicio_empleado_and_more'),
+        ('turnos', '0022_historicalturno_walkin_telefono_normalizado_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BloqueoTemporalTurno',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_hora_inicio', models.DateTimeField(verbose_name='Inicio')),
+                ('fecha_hora_fin', models.DateTimeField(verbose_name='Fin')),
+                ('expira_en', models.DateTimeField(verbose_name='Expira')),
+                ('referencia', models.CharField(blank=True, db_index=True, default='', max_length=100, verbose_name='Preferencia u orden de MP')),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('cliente', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='bloqueos_temporales', to='clientes.cliente', verbose_name='Cliente')),
+                ('empleado', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bloqueos_temporales', to='empleados.empleado', verbose_name='Profesional')),
+            ],
+            options={
+                'verbose_name': 'Bloqueo temporal de horario',
+                'verbose_name_plural': 'Bloqueos temporales de horario',
+                'ordering': ['fecha_hora_inicio'],
+                'indexes': [models.Index(fields=['empleado', 'expira_en'], name='turnos_bloq_emplead_a5b875_idx'), models.Index(fields=['expira_en'], name='turnos_bloq_expira__a5d369_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('turnos', '0023_bloqueotemporalturno'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportacionReporte',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reporte', models.CharField(choices=[('finanzas', 'Finanzas'), ('billetera', 'Auditoría de billetera'), ('automatizaciones', 'Automatizaciones'), ('clientes', 'Clientes'), ('salas', 'Salas'), ('profesionales', 'Profesionales'), ('auditoria_operativa', 'Auditoría operativa')], max_length=30, verbose_name='Reporte')),
+                ('formato', models.CharField(choices=[('csv', 'CSV'), ('xlsx', 'XLSX')], max_length=10, verbose_name='Formato')),
+                ('parametros', models.JSONField(blank=True, default=dict, verbose_name='Parámetros')),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('procesando', 'Procesando'), ('lista', 'Lista'), ('error', 'Error')], default='pendiente', max_length=20, verbose_name='Estado')),
+                ('archivo', models.CharField(blank=True, default='', max_length=255, verbose_name='Archivo')),
+                ('filas', models.PositiveIntegerField(default=0, verbose_name='Filas')),
+                ('error', models.TextField(blank=True, default='', verbose_name='Error')),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('finalizado_en', models.DateTimeField(blank=True, null=True)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exportaciones_reporte', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Exportación de reporte',
+                'verbose_name_plural': 'Exportaciones de reportes',
+                'ordering': ['-creado_en'],
+                'indexes': [models.Index(fields=['usuario', '-creado_en'], name='turnos_expo_usuario_13feb1_idx'), models.Index(fields=['creado_en'], name='turnos_expo_creado__3c9dac_idx')],
+            },
+        ),
+    ]
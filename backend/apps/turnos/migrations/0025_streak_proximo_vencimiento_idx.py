@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0006_billetera_aviso_vencimiento'),
+        ('turnos', '0024_exportacionreporte'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='clientestreakstats',
+            index=models.Index(condition=models.Q(('streak_count__gt', 0)), fields=['next_expiration_at'], name='streak_proximo_vencimiento_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0006_billetera_aviso_vencimiento'),
+        ('turnos', '0025_streak_proximo_vencimiento_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='streakcoupon',
+            index=models.Index(fields=['status', 'expires_at'], name='streak_coupon_vencimiento_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0006_billetera_aviso_vencimiento'),
+        ('empleados', '0004_empleado_is_active_alter_empleadoservicio_empleado_and_more'),
+        ('servicios', '0007_sala_is_active'),
+        ('turnos', '0026_streak_coupon_vencimiento_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CandidatosReasignacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('candidatos', models.JSONField(default=list, help_text='Ids de turno en orden de prioridad', verbose_name='Turnos candidatos')),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Candidatos de reasignación',
+                'verbose_name_plural': 'Candidatos de reasignación',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='turno',
+            index=models.Index(fields=['empleado', 'servicio', 'estado', 'fecha_hora'], name='turno_candidatos_reasig_idx'),
+        ),
+        migrations.AddField(
+            model_name='candidatosreasignacion',
+            name='turno_cancelado',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='candidatos_reasignacion', to='turnos.turno', verbose_name='Turno cancelado'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('turnos', '0027_candidatos_reasignacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='streakexpiryalertlog',
+            name='ejecucion',
+            field=models.UUIDField(blank=True, editable=False, null=True, verbose_name='Ejecución que reclamó la alerta'),
+        ),
+    ]
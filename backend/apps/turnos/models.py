@@ -6,7 +6,8 @@ from django.db import models
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.utils import timezone
-from simple_history.models import HistoricalRecords
+from apps.core.history import BufferedHistoricalRecords
+from apps.users.utils import normalize_phone
 
 
 class Turno(models.Model):
@@ -44,6 +45,10 @@ class Turno(models.Model):
         ("SENIA", "Seña"),
         ("PAGO_COMPLETO", "Pago completo"),
     ]
+
+    # Campos cuyo valor anterior necesitan los signals de modificación.
+    CAMPOS_RASTREADOS = ("estado", "fecha_hora", "empleado_id", "servicio_id")
+
     """ Relación con otros modelos """
     cliente = models.ForeignKey(
         "clientes.Cliente",
@@ -156,6 +161,14 @@ class Turno(models.Model):
         null=True,
         verbose_name="Teléfono cliente walk-in",
     )
+    walkin_telefono_normalizado = models.CharField(
+        max_length=30,
+        blank=True,
+        default="",
+        db_index=True,
+        editable=False,
+        verbose_name="Teléfono walk-in normalizado",
+    )
     fecha_pago_registrado = models.DateTimeField(
         blank=True,
         null=True,
@@ -173,7 +186,7 @@ class Turno(models.Model):
     updated_at = models.DateTimeField(
         auto_now=True, verbose_name="Fecha de actualización"
     )
-    history = HistoricalRecords()
+    history = BufferedHistoricalRecords()
 
     class Meta:
         """Meta datos del modelo"""
@@ -181,6 +194,13 @@ class Turno(models.Model):
         verbose_name = "Turno"
         verbose_name_plural = "Turnos"
         ordering = ["-fecha_hora"]
+        indexes = [
+            # Candidatos de reasignación: mismo profesional y servicio, por fecha.
+            models.Index(
+                fields=["empleado", "servicio", "estado", "fecha_hora"],
+                name="turno_candidatos_reasig_idx",
+            ),
+        ]
 
     def __str__(self):
         try:
@@ -254,10 +274,69 @@ class Turno(models.Model):
         if ocupados >= sala_actual.capacidad_simultanea:
             raise ValidationError("Capacidad física de la sala agotada.")
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._actualizar_valores_cargados()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        self._actualizar_valores_cargados(fields)
+
+    def _actualizar_valores_cargados(self, campos=None):
+        """Guarda los valores de CAMPOS_RASTREADOS tal como están en la base.
+
+        Si se pasan ``campos`` sólo se actualizan esos (p. ej. ``update_fields``).
+        Los campos diferidos que no se cargaron no se registran.
+        """
+        if campos is not None:
+            campos = {self._meta.get_field(campo).attname for campo in campos}
+        valores = dict(getattr(self, "_valores_cargados", None) or {})
+        for attname in self.CAMPOS_RASTREADOS:
+            if attname in self.__dict__ and (campos is None or attname in campos):
+                valores[attname] = self.__dict__[attname]
+        self._valores_cargados = valores
+
+    def calcular_cambios(self):
+        """Devuelve ``{campo: valor_anterior}`` de los campos rastreados modificados.
+
+        Devuelve ``None`` si la instancia no se cargó desde la base.
+        """
+        cargados = getattr(self, "_valores_cargados", None)
+        if cargados is None:
+            return None
+        return {
+            campo: anterior
+            for campo, anterior in cargados.items()
+            if self.__dict__.get(campo, anterior) != anterior
+        }
+
     def save(self, *args, **kwargs):
         if self.servicio and self.servicio.categoria:
             self.sala = self.servicio.categoria.sala
-        super().save(*args, **kwargs)
+        self.walkin_telefono_normalizado = normalize_phone(self.walkin_telefono)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "walkin_telefono" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "walkin_telefono_normalizado"}
+
+        valores_previos = getattr(self, "_valores_cargados", None)
+        if valores_previos is None and self.pk is not None:
+            # Instancia armada a mano con pk: único caso en que hace falta leer la fila.
+            valores_previos = (
+                Turno.objects.filter(pk=self.pk).values(*self.CAMPOS_RASTREADOS).first()
+            )
+            self._valores_cargados = valores_previos
+
+        # Los signals post_save consumen este diff; la foto se actualiza antes de
+        # guardar para que un save() anidado no vuelva a notificar lo mismo.
+        self._cambios_rastreados = self.calcular_cambios() or {}
+        self._actualizar_valores_cargados(kwargs.get("update_fields"))
+        try:
+            super().save(*args, **kwargs)
+        except Exception:
+            self._valores_cargados = valores_previos
+            raise
 
     @property
     def fecha_hora_fin(self):
@@ -532,6 +611,148 @@ class LogReasignacion(models.Model):
         return f"Reasignación turno #{self.turno_cancelado_id} - {self.cliente_notificado.nombre_completo}"
 
 
+class CandidatosReasignacion(models.Model):
+    """
+    Ranking de candidatos para ocupar el hueco de un turno cancelado.
+
+    Se calcula una vez al iniciar la reasignación; las ofertas siguientes
+    toman los próximos turnos de la lista en lugar de volver a buscarlos.
+    """
+
+    turno_cancelado = models.OneToOneField(
+        Turno,
+        on_delete=models.CASCADE,
+        related_name="candidatos_reasignacion",
+        verbose_name="Turno cancelado",
+    )
+    candidatos = models.JSONField(
+        default=list,
+        verbose_name="Turnos candidatos",
+        help_text="Ids de turno en orden de prioridad",
+    )
+    creado_en = models.DateTimeField(auto_now_add=True)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Candidatos de reasignación"
+        verbose_name_plural = "Candidatos de reasignación"
+
+    def __str__(self):
+        return f"Candidatos turno #{self.turno_cancelado_id} ({len(self.candidatos)})"
+
+
+class BloqueoTemporalTurno(models.Model):
+    """
+    Reserva provisoria de un horario mientras el cliente paga en Mercado Pago.
+
+    Se crea junto con la preferencia, las consultas de disponibilidad la
+    tratan como ocupada hasta ``expira_en`` y se elimina al crear el turno
+    (webhook aprobado) o al cancelar la preferencia.
+    """
+
+    empleado = models.ForeignKey(
+        "empleados.Empleado",
+        on_delete=models.CASCADE,
+        related_name="bloqueos_temporales",
+        verbose_name="Profesional",
+    )
+    cliente = models.ForeignKey(
+        "clientes.Cliente",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="bloqueos_temporales",
+        verbose_name="Cliente",
+    )
+    fecha_hora_inicio = models.DateTimeField(verbose_name="Inicio")
+    fecha_hora_fin = models.DateTimeField(verbose_name="Fin")
+    expira_en = models.DateTimeField(verbose_name="Expira")
+    referencia = models.CharField(
+        max_length=100,
+        blank=True,
+        default="",
+        db_index=True,
+        verbose_name="Preferencia u orden de MP",
+    )
+    creado_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Bloqueo temporal de horario"
+        verbose_name_plural = "Bloqueos temporales de horario"
+        ordering = ["fecha_hora_inicio"]
+        indexes = [
+            models.Index(fields=["empleado", "expira_en"]),
+            models.Index(fields=["expira_en"]),
+        ]
+
+    def __str__(self):
+        return f"Bloqueo profesional={self.empleado_id} {self.fecha_hora_inicio} (expira {self.expira_en})"
+
+
+class ExportacionReporte(models.Model):
+    """
+    Exportación CSV/XLSX de un reporte generada en segundo plano.
+
+    Guarda el reporte, el formato y los parámetros del pedido; la tarea
+    ``generar_exportacion_reporte`` escribe el archivo en
+    ``REPORTES_EXPORT_STORAGE`` y avisa al usuario con una notificación.
+    """
+
+    ESTADO_PENDIENTE = "pendiente"
+    ESTADO_PROCESANDO = "procesando"
+    ESTADO_LISTA = "lista"
+    ESTADO_ERROR = "error"
+    ESTADO_CHOICES = [
+        (ESTADO_PENDIENTE, "Pendiente"),
+        (ESTADO_PROCESANDO, "Procesando"),
+        (ESTADO_LISTA, "Lista"),
+        (ESTADO_ERROR, "Error"),
+    ]
+    REPORTE_CHOICES = [
+        ("finanzas", "Finanzas"),
+        ("billetera", "Auditoría de billetera"),
+        ("automatizaciones", "Automatizaciones"),
+        ("clientes", "Clientes"),
+        ("salas", "Salas"),
+        ("profesionales", "Profesionales"),
+        ("auditoria_operativa", "Auditoría operativa"),
+    ]
+    FORMATO_CHOICES = [("csv", "CSV"), ("xlsx", "XLSX")]
+
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="exportaciones_reporte",
+        verbose_name="Usuario",
+    )
+    reporte = models.CharField(max_length=30, choices=REPORTE_CHOICES, verbose_name="Reporte")
+    formato = models.CharField(max_length=10, choices=FORMATO_CHOICES, verbose_name="Formato")
+    parametros = models.JSONField(default=dict, blank=True, verbose_name="Parámetros")
+    estado = models.CharField(
+        max_length=20,
+        choices=ESTADO_CHOICES,
+        default=ESTADO_PENDIENTE,
+        verbose_name="Estado",
+    )
+    archivo = models.CharField(max_length=255, blank=True, default="", verbose_name="Archivo")
+    filas = models.PositiveIntegerField(default=0, verbose_name="Filas")
+    error = models.TextField(blank=True, default="", verbose_name="Error")
+    creado_en = models.DateTimeField(auto_now_add=True)
+    finalizado_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Exportación de reporte"
+        verbose_name_plural = "Exportaciones de reportes"
+        ordering = ["-creado_en"]
+        indexes = [
+            models.Index(fields=["usuario", "-creado_en"]),
+            models.Index(fields=["creado_en"]),
+        ]
+
+    def __str__(self):
+        return f"Exportación {self.reporte}.{self.formato} #{self.pk} ({self.estado})"
+
+
 class ClienteStreakStats(models.Model):
     """Estado agregado de la racha de consumo por cliente."""
 
@@ -566,6 +787,14 @@ class ClienteStreakStats(models.Model):
     class Meta:
         verbose_name = "Estadística de Racha"
         verbose_name_plural = "Estadísticas de Racha"
+        indexes = [
+            # Alertas de vencimiento: rango de next_expiration_at sobre rachas activas.
+            models.Index(
+                fields=["next_expiration_at"],
+                name="streak_proximo_vencimiento_idx",
+                condition=models.Q(streak_count__gt=0),
+            ),
+        ]
 
     def __str__(self):
         return f"Racha {self.cliente.nombre_completo}: {self.streak_count}"
@@ -632,6 +861,7 @@ class StreakCoupon(models.Model):
         ("vencido", "Vencido"),
         ("cancelado", "Cancelado"),
     ]
+    ACTIVE_STATUSES = ("pendiente", "reclamado")
 
     cliente = models.ForeignKey(
         "clientes.Cliente",
@@ -669,11 +899,27 @@ class StreakCoupon(models.Model):
         indexes = [
             models.Index(fields=["cliente", "status"]),
             models.Index(fields=["code"]),
+            models.Index(fields=["status", "expires_at"], name="streak_coupon_vencimiento_idx"),
         ]
 
     def __str__(self):
         return f"Cupón racha cliente={self.cliente_id} hito={self.milestone_number} estado={self.status}"
 
+    @classmethod
+    def active_q(cls, now=None):
+        """Cupones activos y sin vencer, aunque la tarea todavía no los haya marcado."""
+        now = now or timezone.now()
+        return models.Q(status__in=cls.ACTIVE_STATUSES) & (
+            models.Q(expires_at__isnull=True) | models.Q(expires_at__gte=now)
+        )
+
+    def effective_status(self, now=None):
+        """``status`` con el vencimiento aplicado: las lecturas no escriben."""
+        now = now or timezone.now()
+        if self.status in self.ACTIVE_STATUSES and self.expires_at and self.expires_at < now:
+            return "vencido"
+        return self.status
+
 
 class StreakExpiryAlertLog(models.Model):
     """Deduplicación de alertas de vencimiento de racha."""
@@ -686,6 +932,12 @@ class StreakExpiryAlertLog(models.Model):
     threshold_days = models.PositiveSmallIntegerField(verbose_name="Umbral de días")
     expiration_date_reference = models.DateField(verbose_name="Fecha de vencimiento")
     channels_sent = models.JSONField(default=list, blank=True)
+    ejecucion = models.UUIDField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="Ejecución que reclamó la alerta",
+    )
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -1,17 +1,28 @@
 """Serializers para la app de turnos"""
 
 from decimal import Decimal
+from django.db import transaction
 from django.utils import timezone
 
 from rest_framework import serializers
 from .models import Turno, HistorialTurno
+from .services.disponibilidad_service import (
+    MENSAJE_HORARIO_BLOQUEADO,
+    bloquear_agenda,
+    horario_bloqueado,
+    horario_ocupado,
+)
 from apps.clientes.serializers import ClienteListSerializer
 from apps.empleados.serializers import EmpleadoListSerializer
 from apps.servicios.serializers import ServicioSerializer
 
 
-def calcular_monto_pendiente_turno(obj: Turno) -> Decimal:
-    """Calcula el saldo real que falta cobrar para completar el turno."""
+def calcular_monto_pendiente_turno(obj: Turno, descuento_reasignacion=None) -> Decimal:
+    """Calcula el saldo real que falta cobrar para completar el turno.
+
+    Si se pasa ``descuento_reasignacion`` (p. ej. anotado en la consulta) no
+    se consulta ``LogReasignacion``.
+    """
 
     precio_base = Decimal(obj.precio_final if obj.precio_final is not None else 0)
     if precio_base <= 0 and obj.servicio:
@@ -20,6 +31,11 @@ def calcular_monto_pendiente_turno(obj: Turno) -> Decimal:
     senia = Decimal(obj.senia_pagada or 0)
     descuento = Decimal("0.00")
 
+    if descuento_reasignacion is not None:
+        return Turno.calcular_pago_final(
+            precio_base, Decimal(descuento_reasignacion), senia
+        )
+
     try:
         from .models import LogReasignacion
 
@@ -499,6 +515,10 @@ class TurnoCreateSerializer(serializers.ModelSerializer):
                     }
                 )
 
+        # Un horario que otro cliente está pagando en Mercado Pago tampoco se reserva.
+        if horario_bloqueado(empleado, fecha_hora, hora_fin, excluir_cliente=data.get("cliente")):
+            raise serializers.ValidationError({"fecha_hora": MENSAJE_HORARIO_BLOQUEADO})
+
         # Validar horario laboral del empleado. Debe coincidir con la lógica de
         # disponibilidad: primero horarios detallados y fallback a campos legacy.
         dia_semana = fecha_hora.weekday()  # 0=Lunes, 6=Domingo
@@ -570,7 +590,19 @@ class TurnoCreateSerializer(serializers.ModelSerializer):
         if servicio and servicio.categoria:
             validated_data["sala"] = servicio.categoria.sala
 
-        return super().create(validated_data)
+        # validate() revisó el horario sin lock; se vuelve a revisar con la
+        # agenda del profesional bloqueada hasta guardar el turno.
+        with transaction.atomic():
+            bloquear_agenda(validated_data["empleado"])
+            motivo = horario_ocupado(
+                validated_data["empleado"],
+                validated_data["fecha_hora"],
+                servicio.duracion_minutos,
+                excluir_cliente=validated_data.get("cliente"),
+            )
+            if motivo:
+                raise serializers.ValidationError({"fecha_hora": motivo})
+            return super().create(validated_data)
 
 
 class TurnoUpdateSerializer(serializers.ModelSerializer):
@@ -0,0 +1,74 @@
+"""Bloqueos temporales de horario durante el checkout de Mercado Pago.
+
+Entre la creación de la preferencia y el webhook de aprobación el horario no
+es todavía un ``Turno``; sin bloqueo, dos clientes pueden pagar el mismo
+horario y el segundo webhook falla. El bloqueo se toma con la fila del
+profesional bloqueada (``select_for_update``), igual que la confirmación de
+reprogramaciones, así que dos checkouts simultáneos del mismo profesional se
+serializan y solo uno obtiene el horario.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from apps.turnos.models import BloqueoTemporalTurno
+from apps.turnos.services.disponibilidad_service import bloquear_agenda, horario_ocupado
+
+
+class HorarioNoDisponibleError(ValueError):
+    """El horario ya está ocupado por un turno o por otro checkout en curso."""
+
+
+def _vigencia() -> timedelta:
+    return timedelta(minutes=int(getattr(settings, "TURNOS_BLOQUEO_TEMPORAL_MINUTOS", 15)))
+
+
+def crear_bloqueo(empleado, servicio, fecha_hora, cliente=None) -> BloqueoTemporalTurno:
+    """Reserva ``fecha_hora`` para ``cliente`` o levanta ``HorarioNoDisponibleError``.
+
+    Un bloqueo del mismo cliente con el mismo profesional y horario se
+    reemplaza: es el mismo cliente reintentando el checkout. Los bloqueos de
+    otros horarios se conservan, porque su preferencia todavía puede pagarse.
+    La preferencia que se cree para el bloqueo debe vencer en ``expira_en``
+    (``expiration_date_to``), así no se paga un horario que ya se liberó.
+    """
+    fin = fecha_hora + timedelta(minutes=servicio.duracion_minutos)
+    with transaction.atomic():
+        bloquear_agenda(empleado)
+
+        if cliente is not None:
+            BloqueoTemporalTurno.objects.filter(
+                empleado=empleado, cliente=cliente, fecha_hora_inicio=fecha_hora
+            ).delete()
+
+        motivo = horario_ocupado(empleado, fecha_hora, servicio.duracion_minutos, excluir_cliente=cliente)
+        if motivo:
+            raise HorarioNoDisponibleError(motivo)
+
+        return BloqueoTemporalTurno.objects.create(
+            empleado=empleado,
+            cliente=cliente,
+            fecha_hora_inicio=fecha_hora,
+            fecha_hora_fin=fin,
+            expira_en=timezone.now() + _vigencia(),
+        )
+
+
+def asociar_referencia(bloqueo_id, referencia: str) -> None:
+    BloqueoTemporalTurno.objects.filter(pk=bloqueo_id).update(referencia=referencia or "")
+
+
+def liberar_bloqueo(bloqueo_id=None, referencia: str = "") -> int:
+    """Elimina el bloqueo por id o por preferencia/orden; devuelve cuántos borró."""
+    if bloqueo_id:
+        return BloqueoTemporalTurno.objects.filter(pk=bloqueo_id).delete()[0]
+    if referencia:
+        return BloqueoTemporalTurno.objects.filter(referencia=referencia).delete()[0]
+    return 0
+
+
+def limpiar_bloqueos_vencidos() -> int:
+    return BloqueoTemporalTurno.objects.filter(expira_en__lte=timezone.now()).delete()[0]
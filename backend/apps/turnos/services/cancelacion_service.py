@@ -75,13 +75,9 @@ def cancelar_turno_para_cliente(turno, usuario, motivo, origen="panel"):
             billetera.agregar_saldo(
                 monto=monto_credito,
                 motivo=f"Cancelacion anticipada del turno #{turno.id} - {turno.servicio.nombre}",
+                turno=turno,
             )
 
-            ultimo_movimiento = billetera.movimientos.first()
-            if ultimo_movimiento:
-                ultimo_movimiento.turno = turno
-                ultimo_movimiento.save(update_fields=["turno"])
-
             credito_aplicado = True
             monto_credito_valor = monto_credito
 
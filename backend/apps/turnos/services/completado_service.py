@@ -0,0 +1,193 @@
+"""Completado masivo de turnos en lote.
+
+Reemplaza el recorrido fila por fila de ``completar_masivo`` y
+``completar_ultima_semana``: los saldos se validan con una sola consulta
+anotada, los estados se actualizan con un único ``UPDATE``, el historial se
+escribe con ``bulk_create`` y los efectos secundarios (racha PA3, aviso de
+pago pendiente y notificaciones de modificación) se procesan en una sola
+tarea en segundo plano, los mismos que dispara el completado de a un turno.
+"""
+
+import logging
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.turnos.models import LogReasignacion, Turno
+from apps.turnos.serializers import calcular_monto_pendiente_turno
+from apps.turnos.services import comprobantes_pdf_service
+from apps.turnos.services.streak_service import process_turno_state_transition
+
+logger = logging.getLogger(__name__)
+
+ESTADOS_COMPLETABLES = ("pendiente", "confirmado", "en_proceso")
+
+
+@dataclass
+class CompletadoMasivoResult:
+    completados: list = field(default_factory=list)
+    errores: list = field(default_factory=list)
+    resultados: list = field(default_factory=list)
+    total_seleccionados: int = 0
+
+
+def completar_turnos_en_lote(
+    queryset,
+    actor_user=None,
+    turno_ids_solicitados=None,
+    motivo: str = "Completado masivo",
+) -> CompletadoMasivoResult:
+    """Marca como completados los turnos del queryset sin saldo pendiente.
+
+    Devuelve un reporte por turno en ``resultados`` con ``resultado`` igual a
+    ``completado``, ``saldo_pendiente`` u ``omitido`` (IDs solicitados que no
+    están en un estado completable).
+    """
+
+    descuento_reasignacion = Coalesce(
+        Subquery(
+            LogReasignacion.objects.filter(
+                turno_cancelado=OuterRef("pk"), estado_final="aceptada"
+            )
+            .order_by("-id")
+            .values("monto_descuento")[:1]
+        ),
+        Value(Decimal("0.00")),
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    )
+    ahora = timezone.now()
+    result = CompletadoMasivoResult()
+
+    with transaction.atomic():
+        turnos = list(
+            queryset.filter(estado__in=ESTADOS_COMPLETABLES)
+            .select_related("servicio")
+            .select_for_update(of=("self",))
+            .annotate(descuento_reasignacion=descuento_reasignacion)
+            .order_by("fecha_hora", "id")
+        )
+        result.total_seleccionados = len(turnos)
+
+        completables = []
+        for turno in turnos:
+            pendiente = calcular_monto_pendiente_turno(
+                turno, descuento_reasignacion=turno.descuento_reasignacion
+            )
+            if pendiente > Decimal("0.00"):
+                error = {
+                    "turno_id": turno.id,
+                    "error": f"Falta registrar un pago de ${pendiente}.",
+                    "monto_pendiente": str(pendiente),
+                }
+                result.errores.append(error)
+                result.resultados.append({**error, "resultado": "saldo_pendiente"})
+                continue
+            completables.append(turno)
+
+        if completables:
+            transiciones = [[turno.id, turno.estado] for turno in completables]
+            Turno.objects.filter(id__in=[turno.id for turno in completables]).update(
+                estado="completado",
+                fecha_hora_completado=ahora,
+                updated_at=ahora,
+            )
+            for turno in completables:
+                turno.estado = "completado"
+                turno.fecha_hora_completado = ahora
+                turno.updated_at = ahora
+                turno._actualizar_valores_cargados()
+                result.completados.append(turno.id)
+                result.resultados.append({"turno_id": turno.id, "resultado": "completado"})
+
+            Turno.history.bulk_history_create(
+                completables,
+                update=True,
+                default_user=actor_user,
+                default_change_reason=motivo,
+                default_date=ahora,
+            )
+
+            # El UPDATE no dispara post_save: los comprobantes cacheados se
+            # invalidan acá, igual que en el signal del completado individual.
+            completados_ids = list(result.completados)
+            transaction.on_commit(
+                lambda: comprobantes_pdf_service.invalidar_turnos(completados_ids)
+            )
+
+            actor_user_id = getattr(actor_user, "pk", None)
+            transaction.on_commit(
+                lambda: _encolar_efectos_completado(transiciones, actor_user_id)
+            )
+
+    if turno_ids_solicitados:
+        encontrados = {str(turno.id) for turno in turnos}
+        for turno_id in turno_ids_solicitados:
+            if str(turno_id) not in encontrados:
+                result.resultados.append(
+                    {
+                        "turno_id": turno_id,
+                        "resultado": "omitido",
+                        "error": "El turno no existe o no está pendiente de completar.",
+                    }
+                )
+
+    return result
+
+
+def _encolar_efectos_completado(transiciones, actor_user_id) -> None:
+    try:
+        from apps.turnos.tasks import procesar_efectos_completado_masivo
+
+        procesar_efectos_completado_masivo.delay(transiciones, actor_user_id)
+    except Exception as celery_error:
+        logger.warning(
+            "Celery no disponible para completado masivo, procesando efectos "
+            "directamente: %s",
+            celery_error,
+        )
+        procesar_efectos_completado(transiciones, actor_user_id)
+
+
+def procesar_efectos_completado(transiciones, actor_user_id=None) -> dict:
+    """Aplica racha PA3, aviso de pago pendiente y avisos de modificación.
+
+    ``transiciones`` es una lista de ``[turno_id, estado_anterior]``.
+    """
+
+    from apps.turnos.signals import manejar_turno_completado, notificar_modificacion_turno
+    from apps.users.models import User
+
+    estados_previos = {int(turno_id): estado for turno_id, estado in transiciones}
+    actor_user = User.objects.filter(pk=actor_user_id).first() if actor_user_id else None
+
+    turnos = (
+        Turno.objects.select_related("cliente__user", "empleado__user", "servicio")
+        .filter(id__in=estados_previos, estado="completado")
+        .order_by("fecha_hora", "id")
+    )
+
+    procesados = 0
+    for turno in turnos:
+        try:
+            process_turno_state_transition(
+                turno=turno,
+                previous_state=estados_previos[turno.id],
+                actor_user=actor_user,
+            )
+        except Exception as exc:
+            logger.error("Error procesando racha del turno %s: %s", turno.id, exc)
+        manejar_turno_completado(turno)
+        try:
+            notificar_modificacion_turno(
+                turno,
+                {"Estado": {"anterior": estados_previos[turno.id], "nuevo": turno.estado}},
+            )
+        except Exception as exc:
+            logger.error("Error notificando completado del turno %s: %s", turno.id, exc)
+        procesados += 1
+
+    return {"procesados": procesados, "solicitados": len(estados_previos)}
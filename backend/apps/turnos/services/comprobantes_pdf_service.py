@@ -0,0 +1,178 @@
+"""Caché de PDFs de comprobantes direccionada por contenido.
+
+Cada PDF se guarda en ``COMPROBANTES_PDF_STORAGE`` bajo el sha256 de los datos
+del comprobante (sin la fecha de emisión), así que dos pedidos con los mismos
+datos comparten archivo y ese hash es también el ``ETag``.
+
+Para no recalcular los datos (configuración de la empresa, movimientos de
+pago) en cada descarga, la caché ``COMPROBANTES_PDF_CACHE_ALIAS`` guarda por
+turno y tipo de comprobante el hash vigente y la fecha de generación. Ese
+índice se invalida desde los signals de ``Turno``, ``MovimientoPagoTurno`` y
+``PagoMercadoPago`` y, para todos los turnos a la vez, al guardar
+``ConfiguracionGlobal``. Quien escribe con ``QuerySet.update`` (que no
+dispara signals) invalida con ``invalidar_turnos``; ``COMPROBANTES_PDF_INDEX_TTL``
+acota lo que puede durar un índice desactualizado por una escritura que lo omita.
+"""
+
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.utils.module_loading import import_string
+
+INDEX_KEY = "comprobantes:pdf:{config}:{turno_id}:{tipo}"
+CONFIG_VERSION_KEY = "comprobantes:pdf:config"
+TIPOS = ("pago", "final", "mp")
+_CAMPOS_VOLATILES = {"emitido_en"}
+
+
+def _cache():
+    return caches[getattr(settings, "COMPROBANTES_PDF_CACHE_ALIAS", "default")]
+
+
+def _storage():
+    conf = getattr(settings, "COMPROBANTES_PDF_STORAGE", None) or {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+        "OPTIONS": {"location": str(settings.BASE_DIR / "media" / "comprobantes")},
+    }
+    return import_string(conf["BACKEND"])(**conf.get("OPTIONS", {}))
+
+
+def _version_config() -> int:
+    cache = _cache()
+    cache.add(CONFIG_VERSION_KEY, 1, None)
+    return cache.get(CONFIG_VERSION_KEY) or 1
+
+
+def _index_key(turno_id, tipo) -> str:
+    return INDEX_KEY.format(config=_version_config(), turno_id=turno_id, tipo=tipo)
+
+
+def huella(data: dict) -> str:
+    """sha256 de los datos del comprobante, estable entre emisiones.
+
+    Se ignora la fecha de emisión y cualquier campo que la repita (p. ej.
+    ``fecha_principal`` cuando no hay fecha de pago registrada).
+    """
+    emitido_en = data.get("emitido_en")
+    contenido = {
+        k: v
+        for k, v in data.items()
+        if k not in _CAMPOS_VOLATILES and (emitido_en is None or v != emitido_en)
+    }
+    serializado = json.dumps(contenido, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(serializado.encode("utf-8")).hexdigest()
+
+
+def _ruta(hash_datos: str) -> str:
+    return f"{hash_datos[:2]}/{hash_datos}.pdf"
+
+
+def leer_pdf(hash_datos: str) -> bytes | None:
+    storage = _storage()
+    ruta = _ruta(hash_datos)
+    if not storage.exists(ruta):
+        return None
+    with storage.open(ruta, "rb") as archivo:
+        return archivo.read()
+
+
+def guardar_pdf(hash_datos: str, contenido: bytes) -> None:
+    storage = _storage()
+    ruta = _ruta(hash_datos)
+    if not storage.exists(ruta):
+        storage.save(ruta, ContentFile(contenido))
+
+
+def obtener_pdf(data: dict, construir_pdf) -> tuple[str, bytes]:
+    """Devuelve ``(hash, pdf)``; genera y guarda el PDF solo si no existe."""
+    hash_datos = huella(data)
+    contenido = leer_pdf(hash_datos)
+    if contenido is None:
+        contenido = construir_pdf(data)
+        guardar_pdf(hash_datos, contenido)
+    return hash_datos, contenido
+
+
+def responder_pdf(request, turno_id, tipo, construir_data, construir_pdf, nombre_archivo) -> HttpResponse:
+    """Respuesta del PDF con ``ETag``/``Last-Modified`` y 304 si el cliente ya lo tiene.
+
+    ``construir_data`` solo se llama si el índice no tiene el hash vigente o
+    el archivo ya no está en el storage.
+    """
+    cache = _cache()
+    clave = _index_key(turno_id, tipo)
+    indice = cache.get(clave)
+    contenido = None
+
+    if indice is not None:
+        no_modificado = _respuesta_condicional(request, indice)
+        if no_modificado is not None:
+            return no_modificado
+        contenido = leer_pdf(indice["hash"])
+
+    if contenido is None:
+        hash_datos, contenido = obtener_pdf(construir_data(), construir_pdf)
+        if indice is None or indice["hash"] != hash_datos:
+            indice = {"hash": hash_datos, "modificado": timezone.now().timestamp()}
+        cache.set(clave, indice, int(getattr(settings, "COMPROBANTES_PDF_INDEX_TTL", 60 * 60)))
+        no_modificado = _respuesta_condicional(request, indice)
+        if no_modificado is not None:
+            return no_modificado
+
+    response = HttpResponse(contenido, content_type="application/pdf")
+    response["Content-Disposition"] = f'attachment; filename="{nombre_archivo}"'
+    _cabeceras_cache(response, indice)
+    return response
+
+
+def _respuesta_condicional(request, indice):
+    response = get_conditional_response(
+        request,
+        etag=f'"{indice["hash"]}"',
+        last_modified=int(indice["modificado"]),
+    )
+    if response is not None:
+        _cabeceras_cache(response, indice)
+    return response
+
+
+def _cabeceras_cache(response, indice) -> None:
+    response["ETag"] = f'"{indice["hash"]}"'
+    response["Last-Modified"] = http_date(int(indice["modificado"]))
+    response["Cache-Control"] = "private, no-cache"
+
+
+def invalidar_turno(turno_id) -> None:
+    if turno_id:
+        invalidar_turnos([turno_id])
+
+
+def invalidar_turnos(turno_ids) -> None:
+    """Invalida varios turnos a la vez, p. ej. después de un ``QuerySet.update``."""
+    config = _version_config()
+    claves = [
+        INDEX_KEY.format(config=config, turno_id=turno_id, tipo=tipo)
+        for turno_id in turno_ids
+        if turno_id
+        for tipo in TIPOS
+    ]
+    if claves:
+        _cache().delete_many(claves)
+
+
+def invalidar_todos() -> None:
+    """Cambió la configuración de la empresa: todos los índices quedan viejos."""
+    cache = _cache()
+    cache.add(CONFIG_VERSION_KEY, 1, None)
+    try:
+        cache.incr(CONFIG_VERSION_KEY)
+    except ValueError:
+        cache.set(CONFIG_VERSION_KEY, int(time.time()), None)
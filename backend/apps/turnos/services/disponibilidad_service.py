@@ -0,0 +1,194 @@
+"""Cálculo de horarios disponibles de un profesional para uno o varios días."""
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.utils import timezone
+
+from apps.empleados.models import Empleado, HorarioEmpleado
+from apps.turnos.models import BloqueoTemporalTurno, Turno
+
+ESTADOS_OCUPAN_AGENDA = ["pendiente", "confirmado", "en_proceso"]
+MENSAJE_HORARIO_OCUPADO = "Este horario ya está ocupado. Por favor elegí otro."
+MENSAJE_HORARIO_BLOQUEADO = "Otro cliente está pagando este horario. Por favor elegí otro."
+INCREMENTO_SLOTS = timedelta(minutes=15)
+_DIAS_LEGACY = {"L": 0, "M": 1, "Mi": 2, "X": 2, "J": 3, "V": 4, "S": 5, "D": 6}
+
+
+class _HorarioLegacy:
+    def __init__(self, hora_inicio, hora_fin):
+        self.hora_inicio = hora_inicio
+        self.hora_fin = hora_fin
+
+
+def calcular_horarios_disponibles_rango(empleado, servicio, fechas, excluir_cliente=None) -> dict:
+    """Devuelve ``{fecha: ["HH:MM", ...]}`` para cada fecha de ``fechas``.
+
+    Lee los rangos horarios del profesional, sus turnos y sus bloqueos
+    temporales de checkout del período con una consulta cada uno, sin importar
+    cuántos días se pidan. Cada día se resuelve
+    igual que el cálculo de un solo día: rangos de ``HorarioEmpleado`` del día
+    o, si no hay, ``dias_trabajo``/``horario_entrada``/``horario_salida``.
+    Los bloqueos de ``excluir_cliente`` no ocupan horario.
+    """
+
+    fechas = sorted(set(fechas))
+    if not fechas:
+        return {}
+
+    horarios_por_dia = defaultdict(list)
+    for horario in HorarioEmpleado.objects.filter(empleado=empleado, is_active=True).order_by(
+        "hora_inicio"
+    ):
+        horarios_por_dia[horario.dia_semana].append(horario)
+
+    ocupados_por_fecha = defaultdict(list)
+    for turno in Turno.objects.select_related("servicio").filter(
+        empleado=empleado,
+        fecha_hora__date__gte=fechas[0],
+        fecha_hora__date__lte=fechas[-1],
+        estado__in=ESTADOS_OCUPAN_AGENDA,
+    ):
+        if not turno.servicio:
+            continue
+        ocupados_por_fecha[timezone.localtime(turno.fecha_hora).date()].append(
+            (turno.fecha_hora, turno.fecha_hora + timedelta(minutes=turno.servicio.duracion_minutos))
+        )
+    for fecha, intervalos in intervalos_bloqueados_por_fecha(
+        empleado, fechas[0], fechas[-1], excluir_cliente
+    ).items():
+        ocupados_por_fecha[fecha].extend(intervalos)
+
+    dias_legacy = {
+        _DIAS_LEGACY[dia.strip()]
+        for dia in (empleado.dias_trabajo or "").split(",")
+        if dia.strip() in _DIAS_LEGACY
+    }
+    ahora = timezone.now()
+
+    resultado = {}
+    for fecha in fechas:
+        rangos = horarios_por_dia.get(fecha.weekday())
+        if not rangos:
+            if fecha.weekday() not in dias_legacy:
+                resultado[fecha] = []
+                continue
+            rangos = [_HorarioLegacy(empleado.horario_entrada, empleado.horario_salida)]
+        resultado[fecha] = _horarios_del_dia(
+            fecha, rangos, ocupados_por_fecha.get(fecha, []), servicio, ahora
+        )
+    return resultado
+
+
+def bloquear_agenda(empleado) -> None:
+    """Toma el lock de la agenda del profesional hasta que cierre la transacción.
+
+    Se llama dentro de ``transaction.atomic()`` antes de revisar el horario en
+    todo camino que después reserva (turno, reprogramación o checkout): así
+    dos reservas del mismo profesional no se cruzan entre la revisión y el
+    alta.
+    """
+    list(Empleado.objects.select_for_update().filter(pk=getattr(empleado, "pk", empleado)))
+
+
+def bloqueos_vigentes(excluir_cliente=None):
+    """Bloqueos de checkout sin vencer.
+
+    ``excluir_cliente`` deja afuera los del cliente que está reservando: su
+    propio checkout en curso no le ocupa el horario.
+    """
+    bloqueos = BloqueoTemporalTurno.objects.filter(expira_en__gt=timezone.now())
+    if excluir_cliente is not None:
+        bloqueos = bloqueos.exclude(cliente_id=getattr(excluir_cliente, "pk", excluir_cliente))
+    return bloqueos
+
+
+def horario_bloqueado(empleado, inicio, fin, excluir_cliente=None) -> bool:
+    """True si otro checkout en curso tiene tomado parte de ``[inicio, fin)``."""
+    return bloqueos_vigentes(excluir_cliente).filter(
+        empleado=empleado,
+        fecha_hora_inicio__lt=fin,
+        fecha_hora_fin__gt=inicio,
+    ).exists()
+
+
+def horario_ocupado(
+    empleado,
+    fecha_hora,
+    duracion_minutos,
+    excluir_turno_id=None,
+    excluir_cliente=None,
+    estados=ESTADOS_OCUPAN_AGENDA,
+) -> str | None:
+    """Motivo por el que ``fecha_hora`` no está libre para el profesional, o ``None``.
+
+    Revisa los turnos en ``estados`` que se solapan y los bloqueos de checkout
+    vigentes de otros clientes.
+    """
+    fin = fecha_hora + timedelta(minutes=duracion_minutos)
+    turnos = (
+        Turno.objects.select_related("servicio")
+        .filter(
+            empleado=empleado,
+            estado__in=estados,
+            fecha_hora__lt=fin,
+            fecha_hora__gte=fecha_hora - timedelta(days=1),
+        )
+        .exclude(pk=excluir_turno_id)
+    )
+    for turno in turnos:
+        if not turno.servicio:
+            continue
+        if fecha_hora < turno.fecha_hora + timedelta(minutes=turno.servicio.duracion_minutos):
+            return MENSAJE_HORARIO_OCUPADO
+    if horario_bloqueado(empleado, fecha_hora, fin, excluir_cliente):
+        return MENSAJE_HORARIO_BLOQUEADO
+    return None
+
+
+def horario_disponible(empleado, servicio, fecha_hora, cliente=None, estados=ESTADOS_OCUPAN_AGENDA) -> bool:
+    """True si ``fecha_hora`` es futura y está libre para reservar ``servicio``."""
+    if not fecha_hora or fecha_hora <= timezone.now():
+        return False
+    return (
+        horario_ocupado(
+            empleado,
+            fecha_hora,
+            servicio.duracion_minutos,
+            excluir_cliente=cliente,
+            estados=estados,
+        )
+        is None
+    )
+
+
+def intervalos_bloqueados_por_fecha(empleado, fecha_desde, fecha_hasta, excluir_cliente=None) -> dict:
+    """``{fecha: [(inicio, fin), ...]}`` con los bloqueos de checkout vigentes del profesional."""
+    intervalos = defaultdict(list)
+    for inicio, fin in bloqueos_vigentes(excluir_cliente).filter(
+        empleado=empleado,
+        fecha_hora_inicio__date__gte=fecha_desde,
+        fecha_hora_inicio__date__lte=fecha_hasta,
+    ).values_list("fecha_hora_inicio", "fecha_hora_fin"):
+        intervalos[timezone.localtime(inicio).date()].append((inicio, fin))
+    return intervalos
+
+
+def _horarios_del_dia(fecha, rangos, ocupados, servicio, ahora) -> list:
+    duracion = timedelta(minutes=servicio.duracion_minutos)
+
+    horarios = set()
+    for rango in rangos:
+        hora_actual = timezone.make_aware(datetime.combine(fecha, rango.hora_inicio))
+        hora_fin = timezone.make_aware(datetime.combine(fecha, rango.hora_fin))
+        while hora_actual + duracion <= hora_fin:
+            hora_fin_turno = hora_actual + duracion
+            conflicto = any(
+                hora_actual < fin_existente and hora_fin_turno > inicio_existente
+                for inicio_existente, fin_existente in ocupados
+            )
+            if not conflicto and hora_actual > ahora:
+                horarios.add(hora_actual.strftime("%H:%M"))
+            hora_actual += INCREMENTO_SLOTS
+
+    return sorted(horarios)
@@ -0,0 +1,201 @@
+"""Exportación masiva de comprobantes en un ZIP que se arma mientras se envía.
+
+Los datos de cada comprobante salen de ``_comprobante_data`` (con la empresa
+leída una sola vez y los pagos precargados) y los PDF de los mismos
+constructores que usan las descargas individuales, en lotes de
+``COMPROBANTES_EXPORT_LOTE``. En el request el render corre en serie; el
+comando ``exportar_comprobantes`` puede repartir el render con reportlab,
+que es CPU pura, en un pool de ``COMPROBANTES_EXPORT_PROCESOS`` procesos.
+El proceso principal solo arma el ZIP en orden y entrega cada lote apenas
+está escrito, con a lo sumo ``procesos * 2`` lotes en vuelo, así que la
+memoria no crece con la cantidad de comprobantes.
+
+Los PDF ya presentes en la caché de comprobantes se reutilizan y los nuevos
+se guardan en ella.
+"""
+
+import os
+import zipfile
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Prefetch
+from django.utils import timezone
+
+from apps.mercadopago.models import PagoMercadoPago
+from apps.turnos.models import MovimientoPagoTurno, Turno
+from apps.turnos.services import comprobantes_pdf_service
+
+TIPOS_EXPORTACION = ("pago", "final")
+
+
+class _Salida:
+    """Destino no posicionable para ``ZipFile``: junta los bytes hasta que se leen."""
+
+    def __init__(self):
+        self._partes = []
+        self._posicion = 0
+
+    def write(self, datos) -> int:
+        self._partes.append(bytes(datos))
+        self._posicion += len(datos)
+        return len(datos)
+
+    def tell(self) -> int:
+        return self._posicion
+
+    def flush(self) -> None:
+        pass
+
+    def vaciar(self) -> bytes:
+        datos = b"".join(self._partes)
+        self._partes.clear()
+        return datos
+
+
+def _procesos(procesos=None) -> int:
+    procesos = int(procesos or getattr(settings, "COMPROBANTES_EXPORT_PROCESOS", 0) or 0)
+    return procesos if procesos > 0 else (os.cpu_count() or 1)
+
+
+def _inicializar_worker() -> None:
+    django.setup()
+
+
+def _renderizar_lote(lote: list) -> list:
+    """PDFs de ``[(tipo, data), ...]``; se manda por lotes para amortizar el IPC."""
+    from apps.turnos.views_comprobantes import _comprobante_final_pdf, _comprobante_pago_pdf
+
+    return [
+        (_comprobante_pago_pdf if tipo == "pago" else _comprobante_final_pdf)(data)
+        for tipo, data in lote
+    ]
+
+
+def turnos_a_exportar(fecha_desde, fecha_hasta, tipos, empleado_id=None, servicio_id=None):
+    """Turnos del período con al menos un comprobante de los ``tipos`` pedidos."""
+    turnos = (
+        Turno.objects.filter(fecha_hora__date__gte=fecha_desde, fecha_hora__date__lte=fecha_hasta)
+        .annotate(
+            tiene_movimientos=Exists(
+                MovimientoPagoTurno.objects.filter(turno=OuterRef("pk"), estado="aprobado")
+            ),
+            tiene_pago_mp=Exists(
+                PagoMercadoPago.objects.filter(turno=OuterRef("pk"), estado="approved")
+            ),
+        )
+        .select_related("cliente__user", "empleado__user", "servicio__categoria")
+        .prefetch_related(
+            Prefetch(
+                "movimientos_pago",
+                queryset=MovimientoPagoTurno.objects.filter(estado="aprobado").select_related(
+                    "registrado_por"
+                ),
+                to_attr="movimientos_aprobados",
+            ),
+            Prefetch(
+                "pagos_mercadopago",
+                queryset=PagoMercadoPago.objects.filter(estado="approved"),
+                to_attr="pagos_mercadopago_aprobados",
+            ),
+        )
+        .order_by("fecha_hora", "pk")
+    )
+    if empleado_id:
+        turnos = turnos.filter(empleado_id=empleado_id)
+    if servicio_id:
+        turnos = turnos.filter(servicio_id=servicio_id)
+    if tuple(tipos) == ("final",):
+        turnos = turnos.filter(estado="completado")
+    return turnos
+
+
+def _tiene_pago(turno) -> bool:
+    return bool(
+        turno.tiene_movimientos
+        or turno.tiene_pago_mp
+        or (turno.senia_pagada is not None and turno.senia_pagada > 0)
+    )
+
+
+def entradas_comprobantes(turnos, tipos):
+    """``(nombre_en_zip, tipo, data)`` por cada comprobante de ``turnos``."""
+    from apps.turnos.views_comprobantes import _comprobante_data, _empresa_data
+
+    empresa = _empresa_data()
+    for turno in turnos.iterator(chunk_size=200):
+        for tipo in tipos:
+            if tipo == "pago" and not _tiene_pago(turno):
+                continue
+            if tipo == "final" and turno.estado != "completado":
+                continue
+            yield (
+                f"{tipo}/comprobante_{tipo}_turno_{turno.id}.pdf",
+                tipo,
+                _comprobante_data(turno, tipo, empresa=empresa),
+            )
+
+
+def generar_zip(entradas, procesos=1, usar_cache=True, tamano_lote=None):
+    """Genera el ZIP de ``entradas`` como una secuencia de bloques de bytes.
+
+    Con ``procesos > 1`` levanta un pool propio; solo lo piden los comandos,
+    nunca un request web.
+    """
+    procesos = max(1, int(procesos or 1))
+    tamano_lote = int(tamano_lote or getattr(settings, "COMPROBANTES_EXPORT_LOTE", 16))
+    en_vuelo = procesos * 2
+    fecha_zip = timezone.localtime().timetuple()[:6]
+    salida = _Salida()
+    pendientes = deque()
+    executor = (
+        ProcessPoolExecutor(max_workers=procesos, initializer=_inicializar_worker)
+        if procesos > 1
+        else None
+    )
+
+    def enviar(lote):
+        a_renderizar = [(tipo, data) for _, _, contenido, tipo, data in lote if contenido is None]
+        if executor is not None:
+            futuro = executor.submit(_renderizar_lote, a_renderizar)
+        else:
+            futuro = Future()
+            futuro.set_result(_renderizar_lote(a_renderizar))
+        pendientes.append((lote, futuro))
+
+    def escribir(archivo, lote, futuro):
+        generados = iter(futuro.result())
+        for nombre, hash_datos, contenido, _, _ in lote:
+            if contenido is None:
+                contenido = next(generados)
+                if usar_cache:
+                    comprobantes_pdf_service.guardar_pdf(hash_datos, contenido)
+            archivo.writestr(zipfile.ZipInfo(nombre, date_time=fecha_zip), contenido)
+
+    try:
+        with zipfile.ZipFile(salida, mode="w", compression=zipfile.ZIP_STORED) as archivo:
+            lote = []
+            for nombre, tipo, data in entradas:
+                hash_datos = comprobantes_pdf_service.huella(data) if usar_cache else ""
+                contenido = comprobantes_pdf_service.leer_pdf(hash_datos) if usar_cache else None
+                lote.append((nombre, hash_datos, contenido, tipo, data))
+                if len(lote) < tamano_lote:
+                    continue
+                enviar(lote)
+                lote = []
+                if len(pendientes) >= en_vuelo:
+                    escribir(archivo, *pendientes.popleft())
+                    yield salida.vaciar()
+
+            if lote:
+                enviar(lote)
+            while pendientes:
+                escribir(archivo, *pendientes.popleft())
+                yield salida.vaciar()
+        # Directorio central del ZIP.
+        yield salida.vaciar()
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
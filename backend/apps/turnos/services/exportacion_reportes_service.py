@@ -0,0 +1,1429 @@
+"""Exportación CSV/XLSX de los reportes, completa y con memoria constante.
+
+Cada reporte se describe como una lista de ``Tabla`` cuyas filas salen de
+querysets recorridos con ``.iterator(chunk_size=REPORTES_EXPORT_CHUNK)``. Los
+reportes que juntan varias fuentes (billetera, automatizaciones, ofertas y
+finanzas de la auditoría) piden cada fuente ya ordenada por fecha a la base y
+las intercalan con ``heapq.merge``, así que nunca se cargan todas las filas.
+
+Las consultas y filas de cada reporte (``consultas_finanzas``,
+``consultas_billetera``, ``consultas_automatizaciones``,
+``consultas_auditoria``) son las mismas que usan las vistas JSON de
+``views_reportes``: la vista las recorta a sus topes y la exportación las
+recorre completas.
+
+El CSV lleva una sola tabla (``tabla``, por defecto la primera) y el XLSX una
+hoja por tabla. El XLSX se escribe a mano (SpreadsheetML con cadenas en
+línea, sin estilos) dentro de un ZIP que se va entregando mientras se arma.
+
+Las exportaciones grandes pueden pedirse en segundo plano: se guarda una
+``ExportacionReporte``, la tarea ``generar_exportacion_reporte`` escribe el
+archivo en ``REPORTES_EXPORT_STORAGE`` y avisa al usuario con una
+``Notificacion``.
+"""
+
+import csv
+import heapq
+import json
+import re
+import tempfile
+import zipfile
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Callable, Iterable
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.files import File
+from django.db.models import Count, Exists, Max, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from apps.turnos.models import ExportacionReporte, HistorialTurno, Turno
+from apps.turnos.services.exportacion_comprobantes_service import _Salida
+
+FORMATOS = ("csv", "xlsx")
+CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+ESTADOS_ACTIVOS = ["pendiente", "confirmado", "en_proceso"]
+_FILAS_POR_BLOQUE = 500
+_CARACTERES_INVALIDOS_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+@dataclass
+class Tabla:
+    nombre: str
+    columnas: list  # [(clave, encabezado), ...]
+    filas: Callable[[], Iterable[dict]]
+
+
+def _chunk() -> int:
+    return int(getattr(settings, "REPORTES_EXPORT_CHUNK", 1000))
+
+
+def _iterar(qs):
+    return qs.iterator(chunk_size=_chunk())
+
+
+def _intercalar(fuentes, clave="fecha", descendente=True):
+    """Une fuentes ya ordenadas por ``clave`` sin materializarlas."""
+    return heapq.merge(*fuentes, key=lambda fila: fila[clave], reverse=descendente)
+
+
+def _rango(desde, hasta):
+    return datetime.combine(desde, time.min), datetime.combine(hasta, time.max)
+
+
+def _q_persona(valor, campo_id, prefijo_usuario):
+    """Filtro por id (si ``valor`` es numérico) o por nombre, email o DNI."""
+    if str(valor).isdigit():
+        return Q(**{campo_id: valor})
+    return (
+        Q(**{f"{prefijo_usuario}first_name__icontains": valor})
+        | Q(**{f"{prefijo_usuario}last_name__icontains": valor})
+        | Q(**{f"{prefijo_usuario}email__icontains": valor})
+        | Q(**{f"{prefijo_usuario}dni__icontains": valor})
+    )
+
+
+def _q_nombre(valor, campo_id, campo_nombre):
+    if str(valor).isdigit():
+        return Q(**{campo_id: valor})
+    return Q(**{f"{campo_nombre}__icontains": valor})
+
+
+def _elegido(params, clave):
+    valor = params.get(clave)
+    return valor if valor and valor != "todos" else None
+
+
+def _turnos_filtrados(params, desde, hasta):
+    from apps.turnos.views_reportes import _apply_turno_common_filters
+
+    qs = Turno.objects.filter(fecha_hora__date__gte=desde, fecha_hora__date__lte=hasta)
+    return _apply_turno_common_filters(qs, params)
+
+
+def _filtrar_canal(qs, canal):
+    if canal == "telegram":
+        return qs.filter(id__in=HistorialTurno.objects.filter(origen="telegram").values("turno_id"))
+    if canal == "web":
+        return qs.filter(canal_reserva="web_cliente")
+    if canal == "panel":
+        return qs.filter(canal_reserva__in=["panel_profesional", "panel_propietario"])
+    if canal == "sistema":
+        return qs.filter(canal_reserva__isnull=True)
+    return qs
+
+
+# ── Tablas por entidad (clientes, salas, profesionales, servicios) ──────────
+
+
+def _agregados_turnos(turnos_qs):
+    """Agregados sobre ``turnos`` restringidos al queryset filtrado."""
+    filtro = Q(turnos__id__in=turnos_qs.values("id"))
+    return {
+        "total_turnos": Count("turnos", filter=filtro),
+        "completados": Count("turnos", filter=filtro & Q(turnos__estado="completado")),
+        "cancelados": Count("turnos", filter=filtro & Q(turnos__estado="cancelado")),
+        "reservados_activos": Count("turnos", filter=filtro & Q(turnos__estado__in=ESTADOS_ACTIVOS)),
+        "ingresos": Sum("turnos__precio_final", filter=filtro & Q(turnos__estado="completado")),
+        "ultimo_turno": Max("turnos__fecha_hora", filter=filtro),
+    }
+
+
+def _tabla_clientes(turnos_qs):
+    from apps.clientes.models import Cliente
+    from apps.telegram_bot.models import TelegramLink
+
+    def filas():
+        qs = (
+            Cliente.objects.filter(id__in=turnos_qs.values("cliente_id"))
+            .select_related("user")
+            .annotate(
+                **_agregados_turnos(turnos_qs),
+                telegram_vinculado=Exists(
+                    TelegramLink.objects.filter(cliente=OuterRef("pk"), is_verified=True)
+                ),
+            )
+            .order_by("-ultimo_turno", "pk")
+        )
+        for cliente in _iterar(qs):
+            yield {
+                "id": cliente.id,
+                "nombre": cliente.nombre_completo,
+                "email": cliente.email,
+                "telefono": cliente.telefono,
+                "activo": cliente.is_active and cliente.user.is_active,
+                "total_turnos": cliente.total_turnos,
+                "completados": cliente.completados,
+                "cancelados": cliente.cancelados,
+                "ingresos": cliente.ingresos or 0,
+                "ultimo_turno": cliente.ultimo_turno,
+                "telegram_vinculado": cliente.telegram_vinculado,
+            }
+
+    return Tabla(
+        "clientes",
+        [
+            ("id", "ID"),
+            ("nombre", "Cliente"),
+            ("email", "Email"),
+            ("telefono", "Teléfono"),
+            ("activo", "Activo"),
+            ("total_turnos", "Turnos"),
+            ("completados", "Completados"),
+            ("cancelados", "Cancelados"),
+            ("ingresos", "Ingresos"),
+            ("ultimo_turno", "Último turno"),
+            ("telegram_vinculado", "Telegram"),
+        ],
+        filas,
+    )
+
+
+def _tabla_salas(turnos_qs):
+    from apps.servicios.models import Sala
+
+    def filas():
+        qs = (
+            Sala.objects.filter(id__in=turnos_qs.values("sala_id"))
+            .annotate(**_agregados_turnos(turnos_qs))
+            .order_by("-total_turnos", "pk")
+        )
+        for sala in _iterar(qs):
+            yield {
+                "id": sala.id,
+                "nombre": sala.nombre,
+                "activa": sala.is_active,
+                "capacidad_simultanea": sala.capacidad_simultanea,
+                "total_turnos": sala.total_turnos,
+                "reservados_activos": sala.reservados_activos,
+                "completados": sala.completados,
+                "ingresos": sala.ingresos or 0,
+                "ultimo_turno": sala.ultimo_turno,
+            }
+
+    return Tabla(
+        "salas",
+        [
+            ("id", "ID"),
+            ("nombre", "Sala"),
+            ("activa", "Activa"),
+            ("capacidad_simultanea", "Capacidad"),
+            ("total_turnos", "Turnos"),
+            ("reservados_activos", "Reservados activos"),
+            ("completados", "Completados"),
+            ("ingresos", "Ingresos"),
+            ("ultimo_turno", "Último turno"),
+        ],
+        filas,
+    )
+
+
+def _tabla_profesionales(turnos_qs):
+    from apps.empleados.models import Empleado
+
+    def filas():
+        qs = (
+            Empleado.objects.filter(id__in=turnos_qs.values("empleado_id"))
+            .select_related("user")
+            .annotate(**_agregados_turnos(turnos_qs))
+            .order_by("-total_turnos", "pk")
+        )
+        for profesional in _iterar(qs):
+            yield {
+                "id": profesional.id,
+                "nombre": profesional.nombre_completo,
+                "email": profesional.email,
+                "activo": profesional.is_active and profesional.user.is_active,
+                "disponible": profesional.is_disponible,
+                "total_turnos": profesional.total_turnos,
+                "completados": profesional.completados,
+                "cancelados": profesional.cancelados,
+                "ingresos": profesional.ingresos or 0,
+                "ultimo_turno": profesional.ultimo_turno,
+            }
+
+    return Tabla(
+        "profesionales",
+        [
+            ("id", "ID"),
+            ("nombre", "Profesional"),
+            ("email", "Email"),
+            ("activo", "Activo"),
+            ("disponible", "Disponible"),
+            ("total_turnos", "Turnos"),
+            ("completados", "Completados"),
+            ("cancelados", "Cancelados"),
+            ("ingresos", "Ingresos"),
+            ("ultimo_turno", "Último turno"),
+        ],
+        filas,
+    )
+
+
+def _tabla_servicios(turnos_qs):
+    from apps.servicios.models import Servicio
+
+    def filas():
+        filtro = Q(turnos__id__in=turnos_qs.values("id"))
+        qs = (
+            Servicio.objects.filter(id__in=turnos_qs.values("servicio_id"))
+            .select_related("categoria__sala")
+            .annotate(
+                total_turnos=Count("turnos", filter=filtro),
+                ingresos=Sum("turnos__precio_final", filter=filtro & Q(turnos__estado="completado")),
+                clientes=Count("turnos__cliente", filter=filtro, distinct=True),
+                ultima_reserva=Max("turnos__fecha_hora", filter=filtro),
+            )
+            .order_by("-total_turnos", "pk")
+        )
+        for servicio in _iterar(qs):
+            categoria = servicio.categoria
+            yield {
+                "id": servicio.id,
+                "nombre": servicio.nombre,
+                "categoria": categoria.nombre if categoria else "Sin categoría",
+                "sala": categoria.sala.nombre if categoria and categoria.sala else "Sin sala",
+                "total_turnos": servicio.total_turnos,
+                "ingresos": servicio.ingresos or 0,
+                "clientes": servicio.clientes,
+                "ultima_reserva": servicio.ultima_reserva,
+            }
+
+    return Tabla(
+        "servicios",
+        [
+            ("id", "ID"),
+            ("nombre", "Servicio"),
+            ("categoria", "Categoría"),
+            ("sala", "Sala"),
+            ("total_turnos", "Turnos"),
+            ("ingresos", "Ingresos"),
+            ("clientes", "Clientes"),
+            ("ultima_reserva", "Última reserva"),
+        ],
+        filas,
+    )
+
+
+# ── Reportes ────────────────────────────────────────────────────────────────
+
+COLUMNAS_TURNO = [
+    ("id", "Turno"),
+    ("fecha", "Fecha"),
+    ("estado", "Estado"),
+    ("cliente", "Cliente"),
+    ("cliente_email", "Email cliente"),
+    ("profesional", "Profesional"),
+    ("servicio", "Servicio"),
+    ("sala", "Sala"),
+    ("metodo_pago", "Método de pago"),
+    ("canal_reserva", "Canal"),
+    ("precio_final", "Precio final"),
+    ("senia_pagada", "Pagado"),
+]
+
+
+def _fila_turno(turno) -> dict:
+    return {
+        "id": turno.id,
+        "fecha": turno.fecha_hora,
+        "estado": turno.get_estado_display(),
+        "cliente": turno.cliente.nombre_completo if turno.cliente else "Sin cliente",
+        "cliente_email": turno.cliente.email if turno.cliente else "",
+        "profesional": turno.empleado.nombre_completo if turno.empleado else "Sin profesional",
+        "servicio": turno.servicio.nombre if turno.servicio else "Sin servicio",
+        "sala": turno.sala.nombre if turno.sala else "Sin sala",
+        "metodo_pago": turno.get_metodo_pago_display() if turno.metodo_pago else "Sin pago",
+        "canal_reserva": turno.get_canal_reserva_display() if turno.canal_reserva else "Sin canal",
+        "precio_final": turno.precio_final or 0,
+        "senia_pagada": turno.senia_pagada or 0,
+    }
+
+
+def consultas_finanzas(desde, hasta) -> dict:
+    """Querysets del reporte de finanzas, compartidos por la vista y la exportación."""
+    turnos_qs = Turno.objects.filter(fecha_hora__date__gte=desde, fecha_hora__date__lte=hasta)
+    completados = turnos_qs.filter(estado="completado")
+    return {
+        "turnos": turnos_qs,
+        "ingresos_mensuales": (
+            completados.annotate(mes=TruncMonth("fecha_hora"))
+            .values("mes")
+            .annotate(total=Sum("precio_final"), cantidad_turnos=Count("id"))
+            .order_by("mes")
+        ),
+        "ingresos_por_servicio": (
+            completados.values("servicio__id", "servicio__nombre")
+            .annotate(total=Sum("precio_final"), cantidad=Count("id"))
+            .order_by("-total", "servicio__id")
+        ),
+        "ingresos_por_profesional": (
+            completados.values(
+                "empleado__id", "empleado__user__first_name", "empleado__user__last_name"
+            )
+            .annotate(total=Sum("precio_final"), cantidad=Count("id"))
+            .order_by("-total", "empleado__id")
+        ),
+    }
+
+
+def _reporte_finanzas(params, desde, hasta):
+    consultas = consultas_finanzas(desde, hasta)
+
+    def turnos():
+        qs = consultas["turnos"].select_related("cliente__user", "empleado__user", "servicio", "sala")
+        for turno in _iterar(qs.order_by("fecha_hora", "pk")):
+            yield _fila_turno(turno)
+
+    def mensuales():
+        for item in _iterar(consultas["ingresos_mensuales"]):
+            yield {
+                "mes": item["mes"].strftime("%Y-%m"),
+                "total": item["total"] or 0,
+                "cantidad_turnos": item["cantidad_turnos"],
+            }
+
+    def por_servicio():
+        for item in _iterar(consultas["ingresos_por_servicio"]):
+            yield {
+                "id": item["servicio__id"],
+                "nombre": item["servicio__nombre"],
+                "total": item["total"] or 0,
+                "cantidad": item["cantidad"],
+            }
+
+    def por_profesional():
+        for item in _iterar(consultas["ingresos_por_profesional"]):
+            yield {
+                "id": item["empleado__id"],
+                "nombre": f"{item['empleado__user__first_name']} {item['empleado__user__last_name']}",
+                "total": item["total"] or 0,
+                "cantidad": item["cantidad"],
+            }
+
+    columnas_ranking = [("id", "ID"), ("nombre", "Nombre"), ("total", "Total"), ("cantidad", "Turnos")]
+    return [
+        Tabla("turnos", COLUMNAS_TURNO, turnos),
+        Tabla(
+            "ingresos_mensuales",
+            [("mes", "Mes"), ("total", "Total"), ("cantidad_turnos", "Turnos")],
+            mensuales,
+        ),
+        Tabla("ingresos_por_servicio", columnas_ranking, por_servicio),
+        Tabla("ingresos_por_profesional", columnas_ranking, por_profesional),
+    ]
+
+
+ACCIONES_HISTORIAL = {
+    "+": ("insercion", "Inserción"),
+    "~": ("modificacion", "Modificación"),
+    "-": ("eliminacion", "Eliminación"),
+}
+
+
+def _filas(qs, fila, limite=None):
+    """Arma una fila por objeto de ``qs``; ``limite`` recorta en la base."""
+    if limite is not None:
+        qs = qs[:limite]
+    for obj in _iterar(qs):
+        yield fila(obj)
+
+
+def _fila_movimiento(mov) -> dict:
+    cliente = mov.billetera.cliente
+    monto = mov.monto or Decimal("0")
+    return {
+        "id": f"mov-{mov.id}",
+        "fecha": mov.created_at,
+        "descripcion": mov.descripcion or f"Movimiento de billetera ({mov.get_tipo_display()})",
+        "monto": -abs(monto) if mov.tipo == "debito" else monto,
+        "status": "Aplicado",
+        "entidad": "Usuarios/Crédito",
+        "entidad_key": "usuarios_credito",
+        "actor": cliente.nombre_completo,
+        "actor_email": cliente.email or "",
+        "detalle": f"Saldo: ${mov.saldo_anterior} -> ${mov.saldo_nuevo}",
+        "accion": "Inserción",
+        "accion_key": "insercion",
+    }
+
+
+def _fila_pago(pago) -> dict:
+    return {
+        "id": f"pago-{pago.id}",
+        "fecha": pago.creado_en,
+        "descripcion": f"Pago MP ({pago.preference_id})",
+        "monto": pago.monto or 0,
+        "status": pago.get_estado_display(),
+        "entidad": "Pagos (MP)",
+        "entidad_key": "pagos_mp",
+        "actor": pago.cliente.nombre_completo if pago.cliente else "Sistema",
+        "actor_email": pago.cliente.email if pago.cliente else "",
+        "detalle": f"Turno #{pago.turno_id}",
+        "accion": "Inserción",
+        "accion_key": "insercion",
+    }
+
+
+def _fila_login(token) -> dict:
+    if token.used_at:
+        estado = "Usado"
+    elif token.is_expired:
+        estado = "Expirado"
+    else:
+        estado = "Activo"
+    return {
+        "id": f"login-{token.id}",
+        "fecha": token.created_at,
+        "descripcion": "Generación de acceso mágico",
+        "monto": None,
+        "status": estado,
+        "entidad": "Logins (Inicios de Sesión)",
+        "entidad_key": "logins",
+        "actor": token.user.full_name,
+        "actor_email": token.user.email,
+        "detalle": token.get_tipo_accion_display(),
+        "accion": "Inserción",
+        "accion_key": "insercion",
+    }
+
+
+def _fila_historial(record, entidad, entidad_key) -> dict:
+    accion_key, accion_label = ACCIONES_HISTORIAL.get(record.history_type, ("modificacion", "Modificación"))
+    return {
+        "fecha": record.history_date,
+        "entidad": entidad,
+        "entidad_key": entidad_key,
+        "actor": record.history_user.full_name if record.history_user else "Sistema",
+        "actor_email": record.history_user.email if record.history_user else "system@local",
+        "accion": accion_label,
+        "accion_key": accion_key,
+    }
+
+
+def _fila_historial_turno(record) -> dict:
+    return {
+        **_fila_historial(record, "Turnos", "turnos"),
+        "id": f"turno-{record.id}-{record.history_id}",
+        "descripcion": f"Turno #{record.id} · {record.servicio.nombre if record.servicio else 'Sin servicio'}",
+        "monto": record.precio_final,
+        "status": (record.estado or "").replace("_", " ").title() or "N/A",
+        "detalle": record.history_change_reason or "Cambio en turno",
+    }
+
+
+def _fila_historial_servicio(record) -> dict:
+    return {
+        **_fila_historial(record, "Servicios", "servicios"),
+        "id": f"servicio-{record.id}-{record.history_id}",
+        "descripcion": f"Servicio · {record.nombre}",
+        "monto": record.precio,
+        "status": "Activo" if getattr(record, "is_active", False) else "Inactivo",
+        "detalle": record.history_change_reason or "Cambio en servicio",
+    }
+
+
+def consultas_billetera(params, desde, hasta, descendente=True, limites=None) -> dict:
+    """Fuentes del reporte de billetera, compartidas por la vista y la exportación.
+
+    Devuelve ``{entidad_key: filas}`` con un generador por fuente, ordenado por
+    fecha y con los filtros de acción y entidad ya resueltos en la consulta.
+    ``limites`` (``{entidad_key: n}``) recorta cada fuente en la base.
+    """
+    from apps.clientes.models import MovimientoBilletera
+    from apps.clientes.services.billetera_service import rango_fechas
+    from apps.emails.models import AccessToken
+    from apps.mercadopago.models import PagoMercadoPago
+    from apps.servicios.models import Servicio
+
+    desde_dt, hasta_dt = _rango(desde, hasta)
+    accion = (params.get("accion") or "todas").lower()
+    entidad = (params.get("entidad") or "todas").lower()
+    orden = "-" if descendente else ""
+    history_types = {clave: tipo for tipo, (clave, _) in ACCIONES_HISTORIAL.items()}
+
+    def historial(modelo, *relacionados):
+        qs = modelo.history.model.objects.filter(
+            history_date__gte=desde_dt, history_date__lte=hasta_dt
+        ).select_related("history_user", *relacionados)
+        if accion != "todas":
+            qs = qs.filter(history_type=history_types.get(accion))
+        return qs.order_by(f"{orden}history_date", f"{orden}history_id")
+
+    consultas = {
+        "usuarios_credito": (
+            MovimientoBilletera.objects.filter(**rango_fechas(desde, hasta))
+            .select_related("billetera__cliente__user")
+            .order_by(f"{orden}created_at", f"{orden}pk"),
+            _fila_movimiento,
+        ),
+        "pagos_mp": (
+            PagoMercadoPago.objects.filter(creado_en__date__gte=desde, creado_en__date__lte=hasta)
+            .select_related("cliente__user")
+            .order_by(f"{orden}creado_en", f"{orden}pk"),
+            _fila_pago,
+        ),
+        "logins": (
+            AccessToken.objects.filter(created_at__date__gte=desde, created_at__date__lte=hasta)
+            .select_related("user")
+            .order_by(f"{orden}created_at", f"{orden}pk"),
+            _fila_login,
+        ),
+        "turnos": (historial(Turno, "servicio"), _fila_historial_turno),
+        "servicios": (historial(Servicio), _fila_historial_servicio),
+    }
+    if accion not in ("todas", "insercion"):
+        consultas = {k: v for k, v in consultas.items() if k in ("turnos", "servicios")}
+    if entidad != "todas":
+        consultas = {k: v for k, v in consultas.items() if k == entidad}
+    limites = limites or {}
+    return {clave: _filas(qs, fila, limites.get(clave)) for clave, (qs, fila) in consultas.items()}
+
+
+def _monto_param(params, clave):
+    valor = params.get(clave)
+    if valor in (None, ""):
+        return None
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        raise ValueError(f"{clave} inválido") from None
+
+
+def filtro_billetera(params):
+    """Filtros de actor, estado y monto del reporte de billetera, sobre las filas armadas.
+
+    Lanza ``ValueError`` si ``monto_desde`` o ``monto_hasta`` no son números.
+    """
+    actor = (params.get("actor") or "").strip().lower()
+    status = (params.get("status") or "todos").strip().lower()
+    monto_desde = _monto_param(params, "monto_desde")
+    monto_hasta = _monto_param(params, "monto_hasta")
+
+    def incluida(fila):
+        if actor and not (
+            actor in (fila["actor"] or "").lower() or actor in (fila["actor_email"] or "").lower()
+        ):
+            return False
+        if status != "todos" and (fila["status"] or "").strip().lower() != status:
+            return False
+        monto = fila["monto"]
+        if monto_desde is not None and (monto is None or float(monto) < monto_desde):
+            return False
+        if monto_hasta is not None and (monto is None or float(monto) > monto_hasta):
+            return False
+        return True
+
+    return incluida
+
+
+def _reporte_billetera(params, desde, hasta):
+    descendente = (params.get("sort_dir") or "desc").strip().lower() != "asc"
+    incluida = filtro_billetera(params)
+
+    def registros():
+        fuentes = consultas_billetera(params, desde, hasta, descendente=descendente)
+        filas = _intercalar(fuentes.values(), descendente=descendente)
+        return (fila for fila in filas if incluida(fila))
+
+    return [
+        Tabla(
+            "registros",
+            [
+                ("id", "ID"),
+                ("fecha", "Fecha"),
+                ("entidad", "Entidad"),
+                ("accion", "Acción"),
+                ("actor", "Actor"),
+                ("actor_email", "Email"),
+                ("descripcion", "Descripción"),
+                ("monto", "Monto"),
+                ("status", "Estado"),
+                ("detalle", "Detalle"),
+            ],
+            registros,
+        )
+    ]
+
+
+def _fila_fidelizacion(item) -> dict:
+    data = item.data or {}
+    return {
+        "id": f"pa1-{item.id}",
+        "pa": "PA1",
+        "proceso": "Fidelización",
+        "fecha": item.created_at,
+        "cliente": item.usuario.full_name,
+        "cliente_email": item.usuario.email,
+        "estado": "Leída" if item.leida else "Enviada",
+        "detalle": item.titulo,
+        "datos": {
+            "mensaje": item.mensaje,
+            "tipo_email": data.get("tipo_email"),
+            "servicio_id": data.get("servicio_id"),
+            "fecha_sugerida": data.get("fecha_sugerida"),
+            "fecha_ultimo_turno": data.get("fecha_ultimo_turno"),
+        },
+    }
+
+
+def _fila_reasignacion(item) -> dict:
+    return {
+        "id": f"pa2-{item.id}",
+        "pa": "PA2",
+        "proceso": "Reacomodamiento",
+        "fecha": item.fecha_envio,
+        "cliente": item.cliente_notificado.nombre_completo,
+        "cliente_email": item.cliente_notificado.email,
+        "estado": item.estado_final or "pendiente",
+        "detalle": f"Cancelado #{item.turno_cancelado_id} / Ofrecido #{item.turno_ofrecido_id or '-'}",
+        "datos": {
+            "monto_descuento": str(item.monto_descuento),
+            "regla_descuento_aplicada": item.regla_descuento_aplicada,
+            "expira": item.expires_at.isoformat() if item.expires_at else None,
+            "estado_anterior": item.estado_anterior,
+            "estado_posterior": item.estado_posterior,
+        },
+    }
+
+
+def _fila_racha(item) -> dict:
+    return {
+        "id": f"pa3-event-{item.id}",
+        "pa": "PA3",
+        "proceso": "Racha y cupón",
+        "fecha": item.created_at,
+        "cliente": item.cliente.nombre_completo,
+        "cliente_email": item.cliente.email,
+        "estado": item.get_status_display(),
+        "detalle": f"Hito {item.milestone_number} en turno #{item.turno_id}",
+        "datos": {
+            "racha_anterior": item.streak_before,
+            "racha_posterior": item.streak_after,
+            "bono": str(item.bonus_amount),
+            "descuento_aplicado": str(item.applied_discount_amount),
+            "motivo": item.reason,
+            "valor_anterior": item.valor_anterior,
+            "valor_posterior": item.valor_posterior,
+        },
+    }
+
+
+def _fila_cupon(item) -> dict:
+    return {
+        "id": f"pa3-coupon-{item.id}",
+        "pa": "PA3",
+        "proceso": "Cupón de racha",
+        "fecha": item.created_at,
+        "cliente": item.cliente.nombre_completo,
+        "cliente_email": item.cliente.email,
+        "estado": item.get_status_display(),
+        "detalle": item.code or f"Cupón hito {item.milestone_number}",
+        "datos": {
+            "hito": item.milestone_number,
+            "descuento": str(item.discount_amount),
+            "reclamado": item.claimed_at.isoformat() if item.claimed_at else None,
+            "usado": item.used_at.isoformat() if item.used_at else None,
+            "turno_usado": item.used_turno_id,
+            "vence": item.expires_at.isoformat() if item.expires_at else None,
+        },
+    }
+
+
+def consultas_automatizaciones(params, desde, hasta, limite=None) -> list:
+    """Fuentes del reporte de automatizaciones, compartidas por la vista y la exportación.
+
+    Un generador por fuente de los procesos elegidos en ``pa``, cada uno
+    ordenado por fecha descendente y recortado a ``limite`` filas si se pide.
+    """
+    from apps.emails.models import Notificacion
+    from apps.turnos.models import LogReasignacion, StreakCoupon, StreakRewardEvent
+
+    desde_dt, hasta_dt = _rango(desde, hasta)
+    pa = params.get("pa", "todos")
+    cliente_id = _elegido(params, "cliente")
+
+    consultas = []
+    if pa in ["todos", "pa1"]:
+        qs = Notificacion.objects.filter(
+            tipo="fidelizacion", created_at__gte=desde_dt, created_at__lte=hasta_dt
+        ).select_related("usuario")
+        if cliente_id:
+            qs = qs.filter(usuario__cliente_profile__id=cliente_id)
+        consultas.append((qs.order_by("-created_at", "-pk"), _fila_fidelizacion))
+    if pa in ["todos", "pa2"]:
+        qs = LogReasignacion.objects.filter(
+            fecha_envio__gte=desde_dt, fecha_envio__lte=hasta_dt
+        ).select_related("cliente_notificado__user")
+        if cliente_id:
+            qs = qs.filter(cliente_notificado_id=cliente_id)
+        consultas.append((qs.order_by("-fecha_envio", "-pk"), _fila_reasignacion))
+    if pa in ["todos", "pa3"]:
+        for modelo, fila in ((StreakRewardEvent, _fila_racha), (StreakCoupon, _fila_cupon)):
+            qs = modelo.objects.filter(
+                created_at__gte=desde_dt, created_at__lte=hasta_dt
+            ).select_related("cliente__user")
+            if cliente_id:
+                qs = qs.filter(cliente_id=cliente_id)
+            consultas.append((qs.order_by("-created_at", "-pk"), fila))
+    return [_filas(qs, fila, limite) for qs, fila in consultas]
+
+
+def filtro_automatizaciones(params):
+    """Búsqueda libre del reporte de automatizaciones, sobre las filas armadas."""
+    search = (params.get("search") or "").strip().lower()
+
+    def incluida(fila):
+        return not search or (
+            search in fila["cliente"].lower()
+            or search in (fila["cliente_email"] or "").lower()
+            or search in fila["proceso"].lower()
+            or search in fila["detalle"].lower()
+        )
+
+    return incluida
+
+
+def _reporte_automatizaciones(params, desde, hasta):
+    incluida = filtro_automatizaciones(params)
+
+    def registros():
+        filas = _intercalar(consultas_automatizaciones(params, desde, hasta))
+        return (fila for fila in filas if incluida(fila))
+
+    return [
+        Tabla(
+            "registros",
+            [
+                ("id", "ID"),
+                ("pa", "PA"),
+                ("proceso", "Proceso"),
+                ("fecha", "Fecha"),
+                ("cliente", "Cliente"),
+                ("cliente_email", "Email"),
+                ("estado", "Estado"),
+                ("detalle", "Detalle"),
+                ("datos", "Datos"),
+            ],
+            registros,
+        )
+    ]
+
+
+def _reporte_clientes(params, desde, hasta):
+    return [_tabla_clientes(_turnos_filtrados(params, desde, hasta))]
+
+
+def _reporte_salas(params, desde, hasta):
+    return [_tabla_salas(_turnos_filtrados(params, desde, hasta))]
+
+
+def _reporte_profesionales(params, desde, hasta):
+    return [_tabla_profesionales(_turnos_filtrados(params, desde, hasta))]
+
+
+CAMPOS_CAMBIOS_TURNO = ["estado", "fecha_hora", "empleado_id", "servicio_id", "precio_final", "motivo_cancelacion"]
+
+
+def consultas_auditoria(params, desde, hasta) -> dict:
+    """Querysets de la auditoría operativa, compartidos por la vista y la exportación.
+
+    ``turnos`` es el queryset filtrado sobre el que se arman las tablas por
+    entidad; el resto ya vienen ordenados por fecha descendente.
+    """
+    from apps.clientes.models import MovimientoBilletera
+    from apps.clientes.services.billetera_service import rango_fechas
+    from apps.emails.models import Notificacion
+    from apps.mercadopago.models import PagoMercadoPago
+    from apps.turnos.models import LogReasignacion, StreakRewardEvent
+
+    desde_dt, hasta_dt = _rango(desde, hasta)
+    search = (params.get("search") or "").strip()
+    cliente_id = _elegido(params, "cliente")
+    profesional_id = _elegido(params, "profesional")
+    servicio_id = _elegido(params, "servicio")
+    sala_id = _elegido(params, "sala")
+    estado = _elegido(params, "estado")
+    canal = _elegido(params, "canal")
+    turnos_qs = _filtrar_canal(_turnos_filtrados(params, desde, hasta), canal)
+
+    ultimo_historial = HistorialTurno.objects.filter(turno=OuterRef("pk")).order_by("-created_at")
+    turnos_detalle = (
+        turnos_qs.select_related("cliente__user", "empleado__user", "servicio", "sala")
+        .annotate(
+            ultimo_cambio=Subquery(ultimo_historial.values("accion")[:1]),
+            ultimo_origen=Subquery(ultimo_historial.values("origen")[:1]),
+        )
+        .order_by("-fecha_hora", "-pk")
+    )
+
+    notificaciones = Notificacion.objects.filter(
+        tipo="fidelizacion", created_at__gte=desde_dt, created_at__lte=hasta_dt
+    ).select_related("usuario")
+    logs = LogReasignacion.objects.filter(
+        fecha_envio__gte=desde_dt, fecha_envio__lte=hasta_dt
+    ).select_related("cliente_notificado__user", "turno_cancelado__servicio")
+    rewards = StreakRewardEvent.objects.filter(
+        created_at__gte=desde_dt, created_at__lte=hasta_dt
+    ).select_related("cliente__user", "turno__servicio")
+    if cliente_id:
+        notificaciones = notificaciones.filter(_q_persona(cliente_id, "usuario__cliente_profile__id", "usuario__"))
+        logs = logs.filter(_q_persona(cliente_id, "cliente_notificado_id", "cliente_notificado__user__"))
+        rewards = rewards.filter(_q_persona(cliente_id, "cliente_id", "cliente__user__"))
+    if servicio_id:
+        logs = logs.filter(
+            _q_nombre(servicio_id, "turno_cancelado__servicio_id", "turno_cancelado__servicio__nombre")
+        )
+        rewards = rewards.filter(_q_nombre(servicio_id, "turno__servicio_id", "turno__servicio__nombre"))
+    if profesional_id:
+        logs = logs.filter(
+            _q_persona(profesional_id, "turno_cancelado__empleado_id", "turno_cancelado__empleado__user__")
+        )
+        rewards = rewards.filter(_q_persona(profesional_id, "turno__empleado_id", "turno__empleado__user__"))
+    if sala_id:
+        logs = logs.filter(_q_nombre(sala_id, "turno_cancelado__sala_id", "turno_cancelado__sala__nombre"))
+        rewards = rewards.filter(_q_nombre(sala_id, "turno__sala_id", "turno__sala__nombre"))
+
+    movimientos = MovimientoBilletera.objects.filter(**rango_fechas(desde, hasta)).select_related(
+        "billetera__cliente__user"
+    )
+    pagos = PagoMercadoPago.objects.filter(
+        creado_en__date__gte=desde, creado_en__date__lte=hasta
+    ).select_related("cliente__user")
+    if cliente_id:
+        movimientos = movimientos.filter(
+            _q_persona(cliente_id, "billetera__cliente_id", "billetera__cliente__user__")
+        )
+        pagos = pagos.filter(_q_persona(cliente_id, "cliente_id", "cliente__user__"))
+    if search:
+        movimientos = movimientos.filter(
+            Q(billetera__cliente__user__first_name__icontains=search)
+            | Q(billetera__cliente__user__last_name__icontains=search)
+            | Q(billetera__cliente__user__email__icontains=search)
+            | Q(descripcion__icontains=search)
+        )
+        pagos = pagos.filter(
+            Q(cliente__user__first_name__icontains=search)
+            | Q(cliente__user__last_name__icontains=search)
+            | Q(cliente__user__email__icontains=search)
+            | Q(descripcion__icontains=search)
+            | Q(preference_id__icontains=search)
+        )
+
+    modelo = Turno.history.model
+    cambios = modelo.objects.filter(history_date__gte=desde_dt, history_date__lte=hasta_dt).select_related(
+        "history_user"
+    )
+    if cliente_id:
+        cambios = cambios.filter(_q_persona(cliente_id, "cliente_id", "cliente__user__"))
+    if profesional_id:
+        cambios = cambios.filter(_q_persona(profesional_id, "empleado_id", "empleado__user__"))
+    if servicio_id:
+        cambios = cambios.filter(_q_nombre(servicio_id, "servicio_id", "servicio__nombre"))
+    if sala_id:
+        cambios = cambios.filter(_q_nombre(sala_id, "sala_id", "sala__nombre"))
+    if estado:
+        cambios = cambios.filter(estado=estado)
+    cambios = _filtrar_canal(cambios, canal)
+    # Valores del registro anterior (mismo criterio que ``prev_record``),
+    # calculados por la base en vez de una consulta por fila.
+    anterior = modelo.objects.filter(id=OuterRef("id"), history_date__lt=OuterRef("history_date")).order_by(
+        "-history_date"
+    )
+    cambios = cambios.annotate(
+        tiene_anterior=Exists(anterior),
+        **{f"anterior_{campo}": Subquery(anterior.values(campo)[:1]) for campo in CAMPOS_CAMBIOS_TURNO},
+        origen_telegram=Exists(HistorialTurno.objects.filter(turno_id=OuterRef("id"), origen="telegram")),
+    )
+
+    return {
+        "turnos": turnos_qs,
+        "turnos_detalle": turnos_detalle,
+        "notificaciones": notificaciones.order_by("-created_at", "-pk"),
+        "reasignaciones": logs.order_by("-fecha_envio", "-pk"),
+        "rachas": rewards.order_by("-created_at", "-pk"),
+        "movimientos": movimientos.order_by("-created_at", "-pk"),
+        "pagos": pagos.order_by("-creado_en", "-pk"),
+        "cambios": cambios.order_by("-history_date", "-history_id"),
+    }
+
+
+def _fila_oferta_notificacion(item) -> dict:
+    data = item.data or {}
+    return {
+        "id": f"pa1-{item.id}",
+        "pa": "Oferta de fidelización",
+        "cliente": item.usuario.full_name,
+        "fecha": item.created_at,
+        "estado": "Leída" if item.leida else "Enviada",
+        "turno": data.get("turno_id") or "-",
+        "servicio": data.get("servicio_id") or "-",
+        "resultado": item.titulo,
+        "detalle": item.mensaje,
+    }
+
+
+def _fila_oferta_reasignacion(item) -> dict:
+    cancelado = item.turno_cancelado
+    return {
+        "id": f"pa2-{item.id}",
+        "pa": "Reacomodamiento",
+        "cliente": item.cliente_notificado.nombre_completo,
+        "fecha": item.fecha_envio,
+        "estado": item.estado_final or "Pendiente",
+        "turno": item.turno_cancelado_id,
+        "servicio": cancelado.servicio.nombre if cancelado and cancelado.servicio else "-",
+        "resultado": f"Ofrecido #{item.turno_ofrecido_id or '-'}",
+        "detalle": f"Descuento ${item.monto_descuento}",
+    }
+
+
+def _fila_oferta_racha(item) -> dict:
+    return {
+        "id": f"pa3-{item.id}",
+        "pa": "Bono por racha",
+        "cliente": item.cliente.nombre_completo,
+        "fecha": item.created_at,
+        "estado": item.get_status_display(),
+        "turno": item.turno_id,
+        "servicio": item.turno.servicio.nombre if item.turno and item.turno.servicio else "-",
+        "resultado": f"Hito {item.milestone_number}",
+        "detalle": f"Bono ${item.bonus_amount}",
+    }
+
+
+def _fila_finanza_movimiento(mov) -> dict:
+    return {
+        "id": f"mov-{mov.id}",
+        "fecha": mov.created_at,
+        "entidad": "Billetera",
+        "actor": mov.billetera.cliente.nombre_completo,
+        "accion": mov.get_tipo_display(),
+        "monto": mov.monto,
+        "estado": "Aplicado",
+        "detalle": mov.descripcion or "Movimiento de billetera",
+    }
+
+
+def _fila_finanza_pago(pago) -> dict:
+    return {
+        "id": f"pago-{pago.id}",
+        "fecha": pago.creado_en,
+        "entidad": "Mercado Pago",
+        "actor": pago.cliente.nombre_completo if pago.cliente else "Sistema",
+        "accion": "Pago",
+        "monto": pago.monto or 0,
+        "estado": pago.get_estado_display(),
+        "detalle": f"Turno #{pago.turno_id}",
+    }
+
+
+def _fila_cambio(record) -> dict:
+    cambiados, antes, despues, detalle = [], [], [], []
+    if record.tiene_anterior:
+        for campo in CAMPOS_CAMBIOS_TURNO:
+            previo = getattr(record, f"anterior_{campo}")
+            actual = getattr(record, campo, None)
+            if previo != actual:
+                cambiados.append(campo)
+                antes.append(f"{campo}: {previo or '-'}")
+                despues.append(f"{campo}: {actual or '-'}")
+                detalle.append(
+                    {"campo": campo, "estado_anterior": str(previo or "-"), "estado_siguiente": str(actual or "-")}
+                )
+    return {
+        "id": record.history_id,
+        "fecha": record.history_date,
+        "objeto_id": record.id,
+        "accion": record.get_history_type_display(),
+        "actor": record.history_user.full_name if record.history_user else "Sistema",
+        "canal": "telegram" if record.origen_telegram else record.canal_reserva or "panel",
+        "motivo": record.history_change_reason or "Sin motivo registrado",
+        "campos": cambiados,
+        "antes": antes,
+        "despues": despues,
+        "detalle_cambios": detalle,
+    }
+
+
+def filas_ofertas(consultas, limite=None) -> list:
+    """Un generador de ofertas por proceso (fidelización, reacomodamiento, rachas)."""
+    return [
+        _filas(consultas["notificaciones"], _fila_oferta_notificacion, limite),
+        _filas(consultas["reasignaciones"], _fila_oferta_reasignacion, limite),
+        _filas(consultas["rachas"], _fila_oferta_racha, limite),
+    ]
+
+
+def filas_finanzas(consultas, limite=None) -> list:
+    """Un generador por fuente financiera (movimientos de billetera y pagos MP)."""
+    return [
+        _filas(consultas["movimientos"], _fila_finanza_movimiento, limite),
+        _filas(consultas["pagos"], _fila_finanza_pago, limite),
+    ]
+
+
+def filas_cambios(consultas, limite=None):
+    """Cambios del historial de turnos; ``campos``, ``antes`` y ``despues`` van como listas."""
+    return _filas(consultas["cambios"], _fila_cambio, limite)
+
+
+def _reporte_auditoria_operativa(params, desde, hasta):
+    consultas = consultas_auditoria(params, desde, hasta)
+
+    def turnos():
+        for turno in _iterar(consultas["turnos_detalle"]):
+            fila = _fila_turno(turno)
+            fila["canal_reserva"] = turno.ultimo_origen or fila["canal_reserva"]
+            fila["ultimo_cambio"] = turno.ultimo_cambio or "Sin historial operativo"
+            fila["precio_final"] = turno.precio_final or (turno.servicio.precio if turno.servicio else 0)
+            yield fila
+
+    def ofertas():
+        return _intercalar(filas_ofertas(consultas))
+
+    def finanzas():
+        return _intercalar(filas_finanzas(consultas))
+
+    def cambios():
+        for fila in filas_cambios(consultas):
+            yield {
+                **fila,
+                "campos": ", ".join(fila["campos"]),
+                "antes": "; ".join(fila["antes"]),
+                "despues": "; ".join(fila["despues"]),
+            }
+
+    turnos_qs = consultas["turnos"]
+    tablas = [
+        Tabla("turnos", COLUMNAS_TURNO + [("ultimo_cambio", "Último cambio")], turnos),
+        _tabla_clientes(turnos_qs),
+        Tabla(
+            "ofertas",
+            [
+                ("id", "ID"),
+                ("pa", "Proceso"),
+                ("cliente", "Cliente"),
+                ("fecha", "Fecha"),
+                ("estado", "Estado"),
+                ("turno", "Turno"),
+                ("servicio", "Servicio"),
+                ("resultado", "Resultado"),
+                ("detalle", "Detalle"),
+            ],
+            ofertas,
+        ),
+        _tabla_profesionales(turnos_qs),
+        _tabla_salas(turnos_qs),
+        _tabla_servicios(turnos_qs),
+        Tabla(
+            "finanzas",
+            [
+                ("id", "ID"),
+                ("fecha", "Fecha"),
+                ("entidad", "Entidad"),
+                ("actor", "Actor"),
+                ("accion", "Acción"),
+                ("monto", "Monto"),
+                ("estado", "Estado"),
+                ("detalle", "Detalle"),
+            ],
+            finanzas,
+        ),
+        Tabla(
+            "cambios",
+            [
+                ("id", "ID"),
+                ("fecha", "Fecha"),
+                ("objeto_id", "Turno"),
+                ("accion", "Acción"),
+                ("actor", "Actor"),
+                ("canal", "Canal"),
+                ("motivo", "Motivo"),
+                ("campos", "Campos"),
+                ("antes", "Antes"),
+                ("despues", "Después"),
+            ],
+            cambios,
+        ),
+    ]
+    tipo = params.get("tipo") or "todos"
+    if tipo != "todos":
+        tablas = [tabla for tabla in tablas if tabla.nombre == tipo] or tablas
+    return tablas
+
+
+REPORTES = {
+    "finanzas": _reporte_finanzas,
+    "billetera": _reporte_billetera,
+    "automatizaciones": _reporte_automatizaciones,
+    "clientes": _reporte_clientes,
+    "salas": _reporte_salas,
+    "profesionales": _reporte_profesionales,
+    "auditoria_operativa": _reporte_auditoria_operativa,
+}
+
+
+def tablas_reporte(reporte: str, params: dict, desde: date, hasta: date, formato: str) -> list:
+    """Tablas a exportar; en CSV solo la pedida en ``tabla`` (o la primera)."""
+    tablas = REPORTES[reporte](params, desde, hasta)
+    if formato == "csv":
+        nombre = params.get("tabla")
+        elegida = next((tabla for tabla in tablas if tabla.nombre == nombre), tablas[0])
+        return [elegida]
+    return tablas
+
+
+def nombre_archivo(reporte: str, desde: date, hasta: date, formato: str) -> str:
+    return f"reporte_{reporte}_{desde:%Y%m%d}_{hasta:%Y%m%d}.{formato}"
+
+
+# ── Escritura ───────────────────────────────────────────────────────────────
+
+
+def _valor(valor):
+    """Normaliza un valor de fila a número, booleano o texto."""
+    if valor is None:
+        return ""
+    if isinstance(valor, (bool, int, float, Decimal)):
+        return valor
+    if isinstance(valor, datetime):
+        if timezone.is_aware(valor):
+            valor = timezone.localtime(valor)
+        return valor.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(valor, date):
+        return valor.isoformat()
+    if isinstance(valor, (dict, list)):
+        return json.dumps(valor, ensure_ascii=False, default=str)
+    return str(valor)
+
+
+def _celda_csv(valor):
+    valor = _valor(valor)
+    if isinstance(valor, bool):
+        return "Sí" if valor else "No"
+    # Evita que una planilla interprete el texto como fórmula.
+    if isinstance(valor, str) and valor[:1] in ("=", "+", "-", "@"):
+        return f"'{valor}"
+    return valor
+
+
+class _Eco:
+    """Buffer de una línea para ``csv.writer``: devuelve lo que se escribe."""
+
+    def write(self, valor):
+        return valor
+
+
+def generar_csv(tablas, contador=None):
+    tabla = tablas[0]
+    escritor = csv.writer(_Eco())
+    claves = [clave for clave, _ in tabla.columnas]
+    lineas = ["\ufeff" + escritor.writerow([encabezado for _, encabezado in tabla.columnas])]
+    for fila in tabla.filas():
+        lineas.append(escritor.writerow([_celda_csv(fila.get(clave)) for clave in claves]))
+        if contador is not None:
+            contador[0] += 1
+        if len(lineas) >= _FILAS_POR_BLOQUE:
+            yield "".join(lineas).encode("utf-8")
+            lineas = []
+    if lineas:
+        yield "".join(lineas).encode("utf-8")
+
+
+def _texto_xml(valor: str) -> str:
+    return escape(_CARACTERES_INVALIDOS_XML.sub("", valor))
+
+
+def _celda_xlsx(valor) -> str:
+    valor = _valor(valor)
+    if isinstance(valor, bool):
+        return f'<c t="b"><v>{int(valor)}</v></c>'
+    if isinstance(valor, (int, float, Decimal)):
+        return f"<c><v>{valor}</v></c>"
+    if valor == "":
+        return "<c/>"
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{_texto_xml(valor)}</t></is></c>'
+
+
+def _fila_xlsx(valores) -> str:
+    return "<row>" + "".join(_celda_xlsx(valor) for valor in valores) + "</row>"
+
+
+def _nombre_hoja(nombre: str) -> str:
+    return re.sub(r"[\[\]:*?/\\]", "_", nombre)[:31]
+
+
+def _partes_fijas_xlsx(tablas) -> dict:
+    hojas = range(1, len(tablas) + 1)
+    return {
+        "[Content_Types].xml": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            + "".join(
+                f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+                'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+                for i in hojas
+            )
+            + "</Types>"
+        ),
+        "_rels/.rels": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+            'Target="xl/workbook.xml"/></Relationships>'
+        ),
+        "xl/workbook.xml": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"><sheets>'
+            + "".join(
+                f'<sheet name="{escape(_nombre_hoja(tabla.nombre))}" sheetId="{i}" r:id="rId{i}"/>'
+                for i, tabla in zip(hojas, tablas)
+            )
+            + "</sheets></workbook>"
+        ),
+        "xl/_rels/workbook.xml.rels": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            + "".join(
+                f'<Relationship Id="rId{i}" '
+                'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+                f'Target="worksheets/sheet{i}.xml"/>'
+                for i in hojas
+            )
+            + "</Relationships>"
+        ),
+    }
+
+
+def generar_xlsx(tablas, contador=None):
+    salida = _Salida()
+    with zipfile.ZipFile(salida, mode="w", compression=zipfile.ZIP_DEFLATED) as archivo:
+        for nombre, contenido in _partes_fijas_xlsx(tablas).items():
+            archivo.writestr(nombre, contenido)
+        for indice, tabla in enumerate(tablas, start=1):
+            claves = [clave for clave, _ in tabla.columnas]
+            with archivo.open(f"xl/worksheets/sheet{indice}.xml", "w", force_zip64=True) as hoja:
+                hoja.write(
+                    (
+                        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                        '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                        "<sheetData>" + _fila_xlsx(encabezado for _, encabezado in tabla.columnas)
+                    ).encode("utf-8")
+                )
+                filas = []
+                for fila in tabla.filas():
+                    filas.append(_fila_xlsx(fila.get(clave) for clave in claves))
+                    if contador is not None:
+                        contador[0] += 1
+                    if len(filas) >= _FILAS_POR_BLOQUE:
+                        hoja.write("".join(filas).encode("utf-8"))
+                        filas = []
+                        datos = salida.vaciar()
+                        if datos:
+                            yield datos
+                hoja.write(("".join(filas) + "</sheetData></worksheet>").encode("utf-8"))
+            yield salida.vaciar()
+    yield salida.vaciar()
+
+
+def generar(tablas, formato: str, contador=None):
+    """Bloques de bytes del archivo; ``contador[0]`` suma las filas escritas."""
+    if formato == "csv":
+        return generar_csv(tablas, contador)
+    return generar_xlsx(tablas, contador)
+
+
+# ── Exportación en segundo plano ────────────────────────────────────────────
+
+
+def _storage():
+    conf = getattr(settings, "REPORTES_EXPORT_STORAGE", None) or {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+        "OPTIONS": {"location": str(settings.BASE_DIR / "media" / "reportes")},
+    }
+    return import_string(conf["BACKEND"])(**conf.get("OPTIONS", {}))
+
+
+def abrir_archivo(exportacion: ExportacionReporte):
+    return _storage().open(exportacion.archivo, "rb")
+
+
+def generar_archivo(exportacion_id: int) -> ExportacionReporte:
+    """Escribe el archivo de la exportación y avisa al usuario."""
+    from apps.emails.models import Notificacion
+
+    exportacion = ExportacionReporte.objects.select_related("usuario").get(pk=exportacion_id)
+    if exportacion.estado == ExportacionReporte.ESTADO_LISTA:
+        return exportacion
+    ExportacionReporte.objects.filter(pk=exportacion.pk).update(
+        estado=ExportacionReporte.ESTADO_PROCESANDO
+    )
+
+    desde = date.fromisoformat(exportacion.parametros["fecha_desde"])
+    hasta = date.fromisoformat(exportacion.parametros["fecha_hasta"])
+    nombre = nombre_archivo(exportacion.reporte, desde, hasta, exportacion.formato)
+    contador = [0]
+    try:
+        tablas = tablas_reporte(
+            exportacion.reporte, exportacion.parametros, desde, hasta, exportacion.formato
+        )
+        with tempfile.TemporaryFile() as temporal:
+            for bloque in generar(tablas, exportacion.formato, contador):
+                temporal.write(bloque)
+            temporal.seek(0)
+            ruta = _storage().save(f"{exportacion.pk}/{nombre}", File(temporal))
+    except Exception as exc:
+        exportacion.estado = ExportacionReporte.ESTADO_ERROR
+        exportacion.error = str(exc)
+        exportacion.finalizado_en = timezone.now()
+        exportacion.save(update_fields=["estado", "error", "finalizado_en"])
+        raise
+
+    exportacion.estado = ExportacionReporte.ESTADO_LISTA
+    exportacion.archivo = ruta
+    exportacion.filas = contador[0]
+    exportacion.finalizado_en = timezone.now()
+    exportacion.save(update_fields=["estado", "archivo", "filas", "finalizado_en"])
+
+    Notificacion.objects.create(
+        usuario=exportacion.usuario,
+        tipo="exportacion_reporte",
+        titulo="Exportación lista",
+        mensaje=f"El reporte {exportacion.get_reporte_display()} ({nombre}) ya se puede descargar.",
+        data={
+            "exportacion_id": exportacion.pk,
+            "reporte": exportacion.reporte,
+            "formato": exportacion.formato,
+            "filas": exportacion.filas,
+        },
+    )
+    return exportacion
+
+
+def limpiar_exportaciones_vencidas() -> int:
+    """Borra archivos y registros más viejos que ``REPORTES_EXPORT_RETENCION_DIAS``."""
+    limite = timezone.now() - timedelta(
+        days=int(getattr(settings, "REPORTES_EXPORT_RETENCION_DIAS", 7))
+    )
+    storage = _storage()
+    eliminadas = 0
+    for exportacion in ExportacionReporte.objects.filter(creado_en__lt=limite).iterator():
+        if exportacion.archivo and storage.exists(exportacion.archivo):
+            storage.delete(exportacion.archivo)
+        exportacion.delete()
+        eliminadas += 1
+    return eliminadas
@@ -5,11 +5,12 @@ import logging
 import uuid
 from datetime import timedelta
 
+from django.conf import settings
 from django.db import transaction
 from django.utils import timezone
-from simple_history.utils import update_change_reason
 
-from apps.turnos.models import Turno, LogReasignacion
+from apps.core.history import historial_en_lote
+from apps.turnos.models import CandidatosReasignacion, Turno, LogReasignacion
 from apps.turnos.utils import get_system_history_user
 from apps.emails.services import EmailService
 from apps.clientes.models import Billetera
@@ -83,12 +84,9 @@ def _calcular_credito_billetera_para_candidato(
 
 def _save_turno_with_history(turno: Turno, reason: str, update_fields=None) -> None:
     """Guarda el turno y registra el motivo del cambio en el historial"""
-    try:
-        update_change_reason(turno, reason)
-    except Exception:
-        # Fallback compatible con entornos donde simple_history no puede
-        # adjuntar el motivo previo al save (evita cortar el flujo).
-        turno._change_reason = reason
+    # El motivo viaja en la instancia para que quede en la fila de este save,
+    # también cuando el historial se difiere al commit (historial_en_lote).
+    turno._change_reason = reason
     if update_fields:
         turno.save(update_fields=update_fields)
     else:
@@ -198,47 +196,75 @@ def _calcular_monto_final(
     return Turno.calcular_pago_final(precio_total, descuento, senia)
 
 
-def iniciar_reasignacion_turno(turno_cancelado_id: int) -> dict:
-    """Selecciona un candidato y envía la oferta de reasignación."""
-    try:
-        turno_cancelado = Turno.objects.select_related(
-            "servicio", "empleado__user"
-        ).get(id=turno_cancelado_id)
-    except Turno.DoesNotExist:
-        logger.warning(f"Turno cancelado {turno_cancelado_id} no existe")
-        return {"status": "turno_no_encontrado"}
+def _ofertas_simultaneas() -> int:
+    return max(1, int(getattr(settings, "REASIGNACION_OFERTAS_SIMULTANEAS", 1) or 1))
 
-    if turno_cancelado.estado != "cancelado":
-        return {"status": "turno_no_cancelado"}
 
-    if turno_cancelado.fecha_hora <= timezone.now():
-        return {"status": "turno_fuera_de_ventana"}
+def _clientes_notificados(turno_cancelado: Turno):
+    return LogReasignacion.objects.filter(turno_cancelado=turno_cancelado).values(
+        "cliente_notificado_id"
+    )
 
-    if not _slot_libre(turno_cancelado):
-        return {"status": "hueco_no_disponible"}
 
-    clientes_ya_notificados = list(
-        LogReasignacion.objects.filter(turno_cancelado=turno_cancelado).values_list(
-            "cliente_notificado_id", flat=True
-        )
-    )
+def _rankear_candidatos(turno_cancelado: Turno) -> list[int]:
+    """Ids de los turnos candidatos en orden de prioridad, uno por cliente.
 
-    candidato = (
+    Una sola consulta sobre el índice ``(empleado, servicio, estado,
+    fecha_hora)``: turnos confirmados posteriores al hueco, sin los clientes
+    ya notificados, empezando por el más lejano (el que más se adelanta).
+    """
+    limite = max(1, int(getattr(settings, "REASIGNACION_CANDIDATOS_MAX", 50) or 50))
+    filas = (
         Turno.objects.filter(
+            empleado=turno_cancelado.empleado,
             servicio=turno_cancelado.servicio,
+            estado="confirmado",
+            fecha_hora__gt=turno_cancelado.fecha_hora,
+            cliente__isnull=False,
+        )
+        .exclude(cliente_id__in=_clientes_notificados(turno_cancelado))
+        .order_by("-fecha_hora", "pk")
+        .values_list("pk", "cliente_id")
+    )
+    ranking, clientes = [], set()
+    for pk, cliente_id in filas.iterator(chunk_size=limite):
+        if cliente_id in clientes:
+            continue
+        clientes.add(cliente_id)
+        ranking.append(pk)
+        if len(ranking) >= limite:
+            break
+    return ranking
+
+
+def _siguientes_candidatos(turno_cancelado: Turno, ranking: list[int], cantidad: int) -> list[Turno]:
+    """Los primeros ``cantidad`` turnos del ranking que siguen disponibles."""
+    vigentes = (
+        Turno.objects.filter(
+            pk__in=ranking,
             empleado=turno_cancelado.empleado,
+            servicio=turno_cancelado.servicio,
             estado="confirmado",
             fecha_hora__gt=turno_cancelado.fecha_hora,
         )
-        .exclude(cliente_id__in=clientes_ya_notificados)
+        .exclude(cliente_id__in=_clientes_notificados(turno_cancelado))
         .select_related("cliente__user", "servicio")
-        .order_by("-fecha_hora")
-        .first()
+        .in_bulk()
     )
-
-    if not candidato:
-        return {"status": "sin_candidatos"}
-
+    elegidos, clientes = [], set()
+    for pk in ranking:
+        candidato = vigentes.get(pk)
+        if candidato is None or candidato.cliente_id in clientes:
+            continue
+        clientes.add(candidato.cliente_id)
+        elegidos.append(candidato)
+        if len(elegidos) >= cantidad:
+            break
+    return elegidos
+
+
+def _crear_oferta(turno_cancelado: Turno, candidato: Turno) -> dict:
+    """Registra la oferta para ``candidato`` y lo pasa a ``oferta_enviada``."""
     servicio = turno_cancelado.servicio
 
     # Calcular descuento según reglas de negocio de Proceso 2.
@@ -281,28 +307,29 @@ def iniciar_reasignacion_turno(turno_cancelado_id: int) -> dict:
     try:
         from apps.emails.models import PromotionOffer
 
-        PromotionOffer.objects.create(
-            campaign_id=uuid.uuid5(uuid.NAMESPACE_URL, f"reacomodamiento:{turno_cancelado.id}"),
-            process_type=PromotionOffer.ProcessType.REACOMODAMIENTO,
-            cliente=candidato.cliente,
-            servicio=turno_cancelado.servicio,
-            empleado=turno_cancelado.empleado,
-            turno=turno_cancelado,
-            reasignacion_log=log_reasignacion,
-            fecha_hora=turno_cancelado.fecha_hora,
-            beneficio=PromotionOffer.Benefit.DISCOUNT,
-            saldo_snapshot=Decimal("0.00"),
-            expires_at=log_reasignacion.expires_at,
-            metadata={
-                "turno_cancelado_id": turno_cancelado.id,
-                "turno_ofrecido_id": candidato.id,
-                "monto_descuento": str(descuento),
-                "monto_final": str(monto_final),
-                "credito_billetera": str(credito_billetera),
-                "regla_descuento_aplicada": regla_descuento,
-                "tipo_pago_cliente_ofertado": tipo_pago_candidato,
-            },
-        )
+        with transaction.atomic():
+            PromotionOffer.objects.create(
+                campaign_id=uuid.uuid5(uuid.NAMESPACE_URL, f"reacomodamiento:{turno_cancelado.id}"),
+                process_type=PromotionOffer.ProcessType.REACOMODAMIENTO,
+                cliente=candidato.cliente,
+                servicio=turno_cancelado.servicio,
+                empleado=turno_cancelado.empleado,
+                turno=turno_cancelado,
+                reasignacion_log=log_reasignacion,
+                fecha_hora=turno_cancelado.fecha_hora,
+                beneficio=PromotionOffer.Benefit.DISCOUNT,
+                saldo_snapshot=Decimal("0.00"),
+                expires_at=log_reasignacion.expires_at,
+                metadata={
+                    "turno_cancelado_id": turno_cancelado.id,
+                    "turno_ofrecido_id": candidato.id,
+                    "monto_descuento": str(descuento),
+                    "monto_final": str(monto_final),
+                    "credito_billetera": str(credito_billetera),
+                    "regla_descuento_aplicada": regla_descuento,
+                    "tipo_pago_cliente_ofertado": tipo_pago_candidato,
+                },
+            )
     except Exception as exc:
         logger.warning(
             "No se pudo crear PromotionOffer para reasignacion log=%s: %s",
@@ -317,14 +344,30 @@ def iniciar_reasignacion_turno(turno_cancelado_id: int) -> dict:
         update_fields=["estado"],
     )
 
+    return {
+        "log": log_reasignacion,
+        "candidato": candidato,
+        "monto_final": monto_final,
+        "descuento": descuento,
+        "senia_pagada": senia_pagada,
+        "credito_billetera": credito_billetera,
+        "tiempo_espera_min": tiempo_espera_min,
+    }
+
+
+def _enviar_oferta(turno_cancelado: Turno, oferta: dict) -> bool:
+    """Manda el email de la oferta y encola su expiración; si falla, la revierte."""
+    log_reasignacion = oferta["log"]
+    candidato = oferta["candidato"]
+
     enviado = EmailService.enviar_email_oferta_reasignacion(
         turno_cancelado=turno_cancelado,
         turno_ofrecido=candidato,
         log_reasignacion=log_reasignacion,
-        monto_final=monto_final,
-        monto_descuento=descuento,
-        senia_pagada=senia_pagada,
-        monto_credito_billetera=credito_billetera,
+        monto_final=oferta["monto_final"],
+        monto_descuento=oferta["descuento"],
+        senia_pagada=oferta["senia_pagada"],
+        monto_credito_billetera=oferta["credito_billetera"],
     )
 
     if not enviado:
@@ -352,14 +395,14 @@ def iniciar_reasignacion_turno(turno_cancelado_id: int) -> dict:
             {"estado_final": "rechazada", "turno_ofrecido_estado": "confirmado", "motivo": "email_fallido"},
         )
         log_reasignacion.save(update_fields=["estado_final", "estado_anterior", "estado_posterior"])
-        return {"status": "email_fallido"}
+        return False
 
     # Encolar tarea de expiración automática (si Celery está disponible)
     try:
         from apps.turnos.tasks import expirar_oferta_reasignacion
 
         expirar_oferta_reasignacion.apply_async(
-            args=[log_reasignacion.id], countdown=tiempo_espera_min * 60
+            args=[log_reasignacion.id], countdown=oferta["tiempo_espera_min"] * 60
         )
         logger.info(f"Tarea de expiración encolada para log {log_reasignacion.id}")
     except Exception as e:  # pragma: no cover - fallo opcional de Celery
@@ -367,8 +410,113 @@ def iniciar_reasignacion_turno(turno_cancelado_id: int) -> dict:
             f"No se pudo encolar tarea de expiración (Celery no disponible): {e}"
         )
         logger.info("La oferta seguirá válida pero no expirará automáticamente")
+    return True
 
-    return {"status": "oferta_enviada", "log_id": log_reasignacion.id}
+
+def iniciar_reasignacion_turno(turno_cancelado_id: int) -> dict:
+    """Ofrece el hueco a los próximos candidatos del ranking.
+
+    El ranking se calcula la primera vez y queda en ``CandidatosReasignacion``;
+    cada llamada posterior (expiración o rechazo de una oferta) completa las
+    ofertas abiertas hasta ``REASIGNACION_OFERTAS_SIMULTANEAS`` tomando los
+    siguientes turnos de la lista. Solo se vuelve a rankear si la lista se
+    agota, por si se sumaron turnos después.
+    """
+    try:
+        turno_cancelado = Turno.objects.select_related(
+            "servicio", "empleado__user"
+        ).get(id=turno_cancelado_id)
+    except Turno.DoesNotExist:
+        logger.warning(f"Turno cancelado {turno_cancelado_id} no existe")
+        return {"status": "turno_no_encontrado"}
+
+    if turno_cancelado.estado != "cancelado":
+        return {"status": "turno_no_cancelado"}
+
+    if turno_cancelado.fecha_hora <= timezone.now():
+        return {"status": "turno_fuera_de_ventana"}
+
+    if not _slot_libre(turno_cancelado):
+        return {"status": "hueco_no_disponible"}
+
+    with historial_en_lote():
+        # La fila del ranking bloqueada evita que dos llamadas simultáneas
+        # ofrezcan el mismo hueco más veces de las configuradas.
+        ranking, creado = CandidatosReasignacion.objects.select_for_update().get_or_create(
+            turno_cancelado=turno_cancelado
+        )
+        abiertas = LogReasignacion.objects.filter(
+            turno_cancelado=turno_cancelado,
+            estado_final__isnull=True,
+            expires_at__gt=timezone.now(),
+        ).count()
+        cupo = _ofertas_simultaneas() - abiertas
+        if cupo <= 0:
+            return {"status": "ofertas_en_curso"}
+
+        if creado:
+            ranking.candidatos = _rankear_candidatos(turno_cancelado)
+            ranking.save(update_fields=["candidatos", "actualizado_en"])
+        candidatos = _siguientes_candidatos(turno_cancelado, ranking.candidatos, cupo)
+        if len(candidatos) < cupo and not creado:
+            ranking.candidatos = _rankear_candidatos(turno_cancelado)
+            ranking.save(update_fields=["candidatos", "actualizado_en"])
+            candidatos = _siguientes_candidatos(turno_cancelado, ranking.candidatos, cupo)
+
+        if not candidatos:
+            return {"status": "sin_candidatos"}
+
+        ofertas = [_crear_oferta(turno_cancelado, candidato) for candidato in candidatos]
+
+    log_ids = [
+        oferta["log"].id for oferta in ofertas if _enviar_oferta(turno_cancelado, oferta)
+    ]
+    if not log_ids:
+        return {"status": "email_fallido"}
+
+    return {"status": "oferta_enviada", "log_id": log_ids[0], "log_ids": log_ids}
+
+
+def _cerrar_ofertas_paralelas(log_aceptado: LogReasignacion) -> None:
+    """Cierra las demás ofertas abiertas del hueco que acaba de ocuparse."""
+    from apps.emails.models import PromotionOffer
+
+    abiertas = list(
+        LogReasignacion.objects.select_for_update(of=("self",))
+        .filter(turno_cancelado_id=log_aceptado.turno_cancelado_id, estado_final__isnull=True)
+        .exclude(pk=log_aceptado.pk)
+        .select_related("turno_ofrecido")
+    )
+    for log_reasignacion in abiertas:
+        turno_ofrecido = log_reasignacion.turno_ofrecido
+        anterior_log = {
+            "estado_final": None,
+            "turno_ofrecido_estado": getattr(turno_ofrecido, "estado", None),
+        }
+        if turno_ofrecido and turno_ofrecido.estado == "oferta_enviada":
+            turno_ofrecido.estado = "confirmado"
+            _save_turno_with_history(
+                turno_ofrecido,
+                "Oferta cerrada: el hueco lo tomo otro cliente",
+                update_fields=["estado"],
+            )
+        log_reasignacion.estado_final = "expirada"
+        _set_log_audit(
+            log_reasignacion,
+            anterior_log,
+            {
+                "estado_final": "expirada",
+                "turno_ofrecido_estado": getattr(turno_ofrecido, "estado", None),
+                "motivo": "aceptada_por_otro_cliente",
+                "log_aceptado_id": log_aceptado.pk,
+            },
+        )
+        log_reasignacion.save(update_fields=["estado_final", "estado_anterior", "estado_posterior"])
+
+    if abiertas:
+        PromotionOffer.objects.filter(reasignacion_log__in=abiertas).update(
+            status=PromotionOffer.Status.TAKEN_BY_OTHER
+        )
 
 
 def expirar_oferta_reasignacion(log_id: int) -> dict:
@@ -531,7 +679,14 @@ def responder_oferta_reasignacion(token: str, accion: str) -> dict:
     if not _slot_libre(turno_cancelado):
         return {"status": "hueco_no_disponible"}
 
-    with transaction.atomic():
+    with historial_en_lote():
+        # Con ofertas simultáneas, bloquear el turno cancelado serializa las
+        # aceptaciones: la primera ocupa el hueco y cierra las demás ofertas.
+        estado_hueco = (
+            Turno.objects.select_for_update()
+            .values_list("estado", flat=True)
+            .get(pk=turno_cancelado.pk)
+        )
         log_reasignacion = LogReasignacion.objects.select_for_update(of=("self",)).get(
             pk=log_reasignacion.pk
         )
@@ -542,7 +697,7 @@ def responder_oferta_reasignacion(token: str, accion: str) -> dict:
                 "estado": log_reasignacion.estado_final,
             }
 
-        if not _slot_libre(turno_cancelado):
+        if estado_hueco != "cancelado" or not _slot_libre(turno_cancelado):
             return {"status": "hueco_no_disponible"}
 
         if turno_ofrecido.estado != "oferta_enviada":
@@ -590,11 +745,8 @@ def responder_oferta_reasignacion(token: str, accion: str) -> dict:
                     f"Crédito por aceptar reacomodamiento del turno #{turno_cancelado.id} - "
                     f"{turno_cancelado.servicio.nombre}"
                 ),
+                turno=turno_cancelado,
             )
-            movimiento = billetera.movimientos.first()
-            if movimiento:
-                movimiento.turno = turno_cancelado
-                movimiento.save(update_fields=["turno"])
 
         turno_ofrecido.estado = "cancelado"
         _silenciar_notificaciones_genericas(turno_ofrecido)
@@ -616,6 +768,7 @@ def responder_oferta_reasignacion(token: str, accion: str) -> dict:
             },
         )
         log_reasignacion.save(update_fields=["estado_final", "estado_anterior", "estado_posterior"])
+        _cerrar_ofertas_paralelas(log_reasignacion)
 
         transaction.on_commit(
             lambda: _notificar_reacomodamiento_confirmado(
@@ -11,6 +11,11 @@ from django.utils import timezone
 from apps.authentication.models import ConfiguracionGlobal
 from apps.empleados.models import Empleado, EmpleadoServicio, HorarioEmpleado
 from apps.turnos.models import HistorialTurno, LogReasignacion, Turno
+from apps.turnos.services.disponibilidad_service import (
+    MENSAJE_HORARIO_BLOQUEADO,
+    bloquear_agenda,
+    horario_bloqueado,
+)
 
 ESTADOS_SOLAPAMIENTO = ["pendiente", "confirmado", "en_proceso", "oferta_enviada"]
 
@@ -140,6 +145,9 @@ def _validar_disponibilidad_empleado(turno: Turno, empleado: Empleado, fecha_hor
         if fecha_hora_nueva < turno_fin and hora_fin_nueva > turno_existente.fecha_hora:
             raise ValueError("El profesional ya tiene un turno agendado en ese horario.")
 
+    if horario_bloqueado(empleado, fecha_hora_nueva, hora_fin_nueva, excluir_cliente=turno.cliente_id):
+        raise ValueError(MENSAJE_HORARIO_BLOQUEADO)
+
     dia_semana = fecha_hora_nueva.weekday()
     horarios_dia = HorarioEmpleado.objects.filter(
         empleado=empleado,
@@ -238,19 +246,6 @@ def reprogramar_turno(
         turno.servicio,
         requerir_relacion_servicio=cambio_profesional,
     )
-    if not permitir_sobreturno:
-        _validar_disponibilidad_empleado(turno, empleado_destino, fecha_hora_nueva)
-
-        try:
-            turno.validar_capacidad_salas(
-                fecha_hora=fecha_hora_nueva,
-                servicio=turno.servicio,
-            )
-        except Exception as exc:
-            mensaje = getattr(exc, "messages", None)
-            detalle = mensaje[0] if mensaje else str(exc)
-            raise ValueError(detalle)
-
     fecha_hora_anterior = turno.fecha_hora
     empleado_anterior = turno.empleado
     motivo_normalizado = (motivo or "").strip()
@@ -261,6 +256,22 @@ def reprogramar_turno(
     penalidad_aplicada = False
 
     with transaction.atomic():
+        if not permitir_sobreturno:
+            # Con la agenda bloqueada, otra reserva no puede tomar el horario
+            # entre la validación y el guardado.
+            bloquear_agenda(empleado_destino)
+            _validar_disponibilidad_empleado(turno, empleado_destino, fecha_hora_nueva)
+
+            try:
+                turno.validar_capacidad_salas(
+                    fecha_hora=fecha_hora_nueva,
+                    servicio=turno.servicio,
+                )
+            except Exception as exc:
+                mensaje = getattr(exc, "messages", None)
+                detalle = mensaje[0] if mensaje else str(exc)
+                raise ValueError(detalle)
+
         turno.empleado = empleado_destino
         turno.fecha_hora = fecha_hora_nueva
 
@@ -0,0 +1,212 @@
+"""Recálculo masivo de ``ClienteStreakStats`` desde el historial de turnos.
+
+El estado de racha se mantiene de forma incremental (``_apply_completion`` /
+``_apply_completion_reversal``). Este servicio lo reconstruye con las mismas
+reglas, útil después de cambiar ``streak_expiration_days`` o de corregir
+datos:
+
+- la racha cuenta los turnos completados consecutivos (por
+  ``fecha_hora_completado``, o ``fecha_hora`` si falta);
+- se corta cuando entre dos completados pasan más de
+  ``streak_expiration_days``; el corte lo marca la base con una ventana
+  ``Lag`` por cliente;
+- usar un cupón de racha la reinicia: solo cuentan los completados
+  posteriores al último uso.
+
+Los clientes se procesan en lotes, opcionalmente en paralelo (un hilo y una
+conexión por lote). Cada lote compara contra lo guardado, escribe con
+``bulk_update``/``bulk_create`` en una transacción y deja un
+``StreakAuditLog`` por cliente cambiado. Con ``dry_run`` solo informa las
+diferencias. No se generan bonos ni cupones por hitos.
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from itertools import groupby
+from operator import itemgetter
+
+from django.db import connections, transaction
+from django.db.models import BooleanField, Case, F, Max, Q, Value, When, Window
+from django.db.models.functions import Coalesce, Lag
+from django.utils import timezone
+
+from apps.authentication.models import ConfiguracionGlobal
+from apps.turnos.models import ClienteStreakStats, StreakAuditLog, StreakCoupon, Turno
+
+CAMPOS = ("streak_count", "last_completed_turno_id", "last_completed_at", "next_expiration_at")
+
+
+def _expiracion() -> timedelta:
+    config = ConfiguracionGlobal.get_config()
+    return timedelta(days=max(1, int(getattr(config, "streak_expiration_days", 180) or 180)))
+
+
+def _completados(cliente_ids, expiracion):
+    """``(cliente_id, turno_id, completado_en, corte)`` ordenados por cliente y fecha."""
+    return (
+        Turno.objects.filter(cliente_id__in=cliente_ids, estado="completado")
+        .annotate(completado_en=Coalesce("fecha_hora_completado", "fecha_hora"))
+        .annotate(
+            previo=Window(
+                Lag("completado_en"),
+                partition_by=[F("cliente_id")],
+                order_by=[F("completado_en").asc(), F("pk").asc()],
+            )
+        )
+        .annotate(
+            corte=Case(
+                When(
+                    Q(previo__isnull=True) | Q(previo__lt=F("completado_en") - Value(expiracion)),
+                    then=Value(True),
+                ),
+                default=Value(False),
+                output_field=BooleanField(),
+            )
+        )
+        .order_by("cliente_id", "completado_en", "pk")
+        .values_list("cliente_id", "pk", "completado_en", "corte")
+    )
+
+
+def calcular_rachas(cliente_ids, expiracion) -> dict:
+    """Estado de racha calculado para cada cliente de ``cliente_ids``."""
+    ultimos_usos = dict(
+        StreakCoupon.objects.filter(cliente_id__in=cliente_ids, status="usado", used_at__isnull=False)
+        .values("cliente_id")
+        .annotate(ultimo=Max("used_at"))
+        .values_list("cliente_id", "ultimo")
+    )
+    rachas = {
+        cliente_id: {
+            "streak_count": 0,
+            "last_completed_turno_id": None,
+            "last_completed_at": None,
+            "next_expiration_at": None,
+        }
+        for cliente_id in cliente_ids
+    }
+    for cliente_id, filas in groupby(_completados(cliente_ids, expiracion), key=itemgetter(0)):
+        uso = ultimos_usos.get(cliente_id)
+        cantidad, ultimo, turno_id = 0, None, None
+        for _, pk, completado_en, corte in filas:
+            if uso is not None and completado_en <= uso:
+                continue
+            # Tras el uso de un cupón la racha arranca de cero, haya o no corte.
+            cantidad = 1 if corte or ultimo is None else cantidad + 1
+            ultimo, turno_id = completado_en, pk
+        if ultimo is not None:
+            rachas[cliente_id] = {
+                "streak_count": cantidad,
+                "last_completed_turno_id": turno_id,
+                "last_completed_at": ultimo,
+                "next_expiration_at": ultimo + expiracion,
+            }
+    return rachas
+
+
+def _serializar(estado: dict) -> dict:
+    return {
+        clave: valor.isoformat() if hasattr(valor, "isoformat") else valor
+        for clave, valor in estado.items()
+    }
+
+
+def _procesar_lote(cliente_ids, expiracion, dry_run) -> list:
+    """Recalcula un lote de clientes; devuelve los cambios ``(cliente_id, antes, después)``."""
+    calculadas = calcular_rachas(cliente_ids, expiracion)
+    with transaction.atomic():
+        existentes = ClienteStreakStats.objects.filter(cliente_id__in=cliente_ids)
+        if not dry_run:
+            existentes = existentes.select_for_update()
+        existentes = {stats.cliente_id: stats for stats in existentes}
+
+        cambios, a_actualizar, a_crear = [], [], []
+        ahora = timezone.now()
+        for cliente_id, despues in calculadas.items():
+            stats = existentes.get(cliente_id)
+            if stats is None:
+                if despues["streak_count"]:
+                    cambios.append((cliente_id, None, despues))
+                    a_crear.append(ClienteStreakStats(cliente_id=cliente_id, **despues))
+                continue
+            antes = {campo: getattr(stats, campo) for campo in CAMPOS}
+            if antes == despues:
+                continue
+            cambios.append((cliente_id, antes, despues))
+            for campo, valor in despues.items():
+                setattr(stats, campo, valor)
+            stats.updated_at = ahora
+            a_actualizar.append(stats)
+
+        if dry_run or not cambios:
+            return cambios
+        ClienteStreakStats.objects.bulk_update(
+            a_actualizar,
+            ["streak_count", "last_completed_turno", "last_completed_at", "next_expiration_at", "updated_at"],
+        )
+        ClienteStreakStats.objects.bulk_create(a_crear)
+        StreakAuditLog.objects.bulk_create(
+            [
+                StreakAuditLog(
+                    cliente_id=cliente_id,
+                    turno_id=despues["last_completed_turno_id"],
+                    accion="modificacion" if antes is not None else "insercion",
+                    event_type="streak_counter",
+                    valor_anterior=_serializar(antes) if antes is not None else None,
+                    valor_posterior=_serializar(despues),
+                    detalle="PA3 recálculo masivo desde el historial",
+                )
+                for cliente_id, antes, despues in cambios
+            ]
+        )
+    return cambios
+
+
+def recalcular_rachas(lote=500, workers=1, dry_run=False, limite_detalle=50) -> dict:
+    """Recalcula las rachas de todos los clientes; devuelve el reporte de diferencias."""
+    lote = max(1, int(lote))
+    workers = max(1, int(workers))
+    expiracion = _expiracion()
+    cliente_ids = sorted(
+        set(
+            Turno.objects.filter(estado="completado", cliente__isnull=False)
+            .order_by()
+            .values_list("cliente_id", flat=True)
+            .distinct()
+        )
+        | set(ClienteStreakStats.objects.values_list("cliente_id", flat=True))
+    )
+    lotes = [cliente_ids[i : i + lote] for i in range(0, len(cliente_ids), lote)]
+
+    if workers > 1 and len(lotes) > 1:
+
+        def procesar(ids):
+            try:
+                return _procesar_lote(ids, expiracion, dry_run)
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=min(workers, len(lotes))) as executor:
+            resultados = list(executor.map(procesar, lotes))
+    else:
+        resultados = [_procesar_lote(ids, expiracion, dry_run) for ids in lotes]
+
+    cambios = [cambio for resultado in resultados for cambio in resultado]
+    return {
+        "clientes": len(cliente_ids),
+        "lotes": len(lotes),
+        "cambios": len(cambios),
+        "creados": sum(1 for _, antes, _ in cambios if antes is None),
+        "dry_run": dry_run,
+        "expiracion_dias": expiracion.days,
+        "detalle": [
+            {
+                "cliente_id": cliente_id,
+                "antes": _serializar(antes) if antes is not None else None,
+                "despues": _serializar(despues),
+            }
+            for cliente_id, antes, despues in cambios[:limite_detalle]
+        ],
+    }
@@ -265,15 +265,25 @@ def _create_or_apply_milestone_reward(
 
 
 def _cliente_has_active_streak_coupon(cliente) -> bool:
-    now = timezone.now()
-    expired = StreakCoupon.objects.filter(
-        cliente=cliente,
-        status__in=["pendiente", "reclamado"],
+    return StreakCoupon.objects.filter(StreakCoupon.active_q(), cliente=cliente).exists()
+
+
+def expire_streak_coupons(now=None, batch_size=1000) -> int:
+    """Marca como vencidos los cupones activos con ``expires_at`` pasado.
+
+    Corre periódicamente: las lecturas ya tratan esos cupones como vencidos
+    (``StreakCoupon.active_q`` / ``effective_status``), así que solo deja el
+    estado guardado al día. Actualiza por lotes sobre el índice
+    ``(status, expires_at)`` para no bloquear muchas filas a la vez.
+    """
+    now = now or timezone.now()
+    vencidos = StreakCoupon.objects.filter(
+        status__in=StreakCoupon.ACTIVE_STATUSES,
         expires_at__lt=now,
     )
-    expired.update(status="vencido", updated_at=now)
-
-    return StreakCoupon.objects.filter(
-        cliente=cliente,
-        status__in=["pendiente", "reclamado"],
-    ).exists()
+    total = 0
+    while True:
+        ids = list(vencidos.order_by().values_list("pk", flat=True)[:batch_size])
+        if not ids:
+            return total
+        total += vencidos.filter(pk__in=ids).update(status="vencido", updated_at=now)
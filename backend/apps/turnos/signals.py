@@ -4,12 +4,15 @@ Maneja el envío de notificaciones y emails cuando ocurren eventos en los turnos
 """
 
 from django.db import transaction
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.utils import timezone
-from .models import Turno
+from .models import MovimientoPagoTurno, Turno
+from apps.authentication.models import ConfiguracionGlobal
+from apps.mercadopago.models import PagoMercadoPago
 from apps.emails.models import Notificacion, NotificacionConfig
 from apps.emails.services import EmailService
+from apps.turnos.services import comprobantes_pdf_service
 from apps.turnos.services.streak_service import process_turno_state_transition
 import logging
 
@@ -127,36 +130,16 @@ def manejar_creacion_turno(sender, instance, created, **kwargs):
         transaction.on_commit(lambda: _enviar_notificaciones_nuevo_turno(turno_pk))
 
 
-# Variable global para trackear cambios antes de guardar
-_turno_anterior = {}
-
-
-@receiver(pre_save, sender=Turno)
-def capturar_estado_anterior(sender, instance, **kwargs):
-    """
-    Captura el estado anterior del turno antes de guardarlo
-    para detectar cambios
-    """
-    if instance.pk:
-        try:
-            turno_anterior = Turno.objects.get(pk=instance.pk)
-            _turno_anterior[instance.pk] = {
-                "estado": turno_anterior.estado,
-                "fecha_hora": turno_anterior.fecha_hora,
-                "empleado_id": turno_anterior.empleado_id,
-                "servicio_id": turno_anterior.servicio_id,
-            }
-        except Turno.DoesNotExist:
-            pass
-
-
 @receiver(post_save, sender=Turno)
 def manejar_modificacion_turno(sender, instance, created, **kwargs):
     """
-    Detecta modificaciones en turnos existentes y envía notificaciones
+    Detecta modificaciones en turnos existentes y envía notificaciones.
+
+    Los valores anteriores salen del diff que arma ``Turno.save()`` a partir
+    de la foto tomada al cargar la instancia (``Turno.from_db``), sin volver
+    a leer la fila.
     """
     if getattr(instance, "_skip_generic_notifications", False):
-        _turno_anterior.pop(instance.pk, None)
         logger.info(
             "Notificaciones genericas omitidas para turno %s (contexto: %s)",
             instance.pk,
@@ -164,13 +147,13 @@ def manejar_modificacion_turno(sender, instance, created, **kwargs):
         )
         return
 
-    if not created and instance.pk in _turno_anterior:
+    anterior = getattr(instance, "_cambios_rastreados", None)
+    if not created and anterior:
         try:
-            anterior = _turno_anterior[instance.pk]
             cambios = {}
 
             # Detectar cambios específicos
-            if anterior["estado"] != instance.estado:
+            if "estado" in anterior:
                 if instance.estado == "cancelado":
                     # Manejar cancelación
                     manejar_cancelacion_turno(instance)
@@ -194,13 +177,13 @@ def manejar_modificacion_turno(sender, instance, created, **kwargs):
                     "nuevo": instance.estado,
                 }
 
-            if anterior["fecha_hora"] != instance.fecha_hora:
+            if "fecha_hora" in anterior:
                 cambios["Fecha y Hora"] = {
                     "anterior": anterior["fecha_hora"].strftime("%d/%m/%Y %H:%M"),
                     "nuevo": instance.fecha_hora.strftime("%d/%m/%Y %H:%M"),
                 }
 
-            if anterior["empleado_id"] != instance.empleado_id:
+            if "empleado_id" in anterior:
                 try:
                     from apps.empleados.models import Empleado
 
@@ -212,7 +195,7 @@ def manejar_modificacion_turno(sender, instance, created, **kwargs):
                 except:
                     pass
 
-            if anterior["servicio_id"] != instance.servicio_id:
+            if "servicio_id" in anterior:
                 try:
                     from apps.servicios.models import Servicio
 
@@ -226,64 +209,71 @@ def manejar_modificacion_turno(sender, instance, created, **kwargs):
 
             # Si hay cambios significativos (no solo cancelación), notificar
             if cambios and instance.estado != "cancelado":
-                config_profesional, _ = NotificacionConfig.objects.get_or_create(
-                    user=instance.empleado.user,
-                    defaults={
-                        "notificar_modificacion_turno": True,
-                        "email_modificacion_turno": True,
-                    },
-                )
-
-                if config_profesional.notificar_modificacion_turno:
-                    Notificacion.objects.create(
-                        usuario=instance.empleado.user,
-                        tipo="modificacion_turno",
-                        titulo="Turno modificado",
-                        mensaje=f"Se ha modificado tu turno con {instance.cliente.nombre_completo}",
-                        data={
-                            "turno_id": instance.id,
-                            "cambios": cambios,
-                        },
-                    )
+                notificar_modificacion_turno(instance, cambios)
 
-                # Enviar email solo si está configurado
-                if config_profesional.email_modificacion_turno:
-                    EmailService.enviar_email_modificacion_turno(instance, cambios)
+        except Exception as e:
+            logger.error(f"Error en signal de modificación de turno: {str(e)}")
 
-                # Notificar al cliente sobre el cambio de turno
-                config_cliente, _ = NotificacionConfig.objects.get_or_create(
-                    user=instance.cliente.user,
-                    defaults={
-                        "notificar_modificacion_turno": True,
-                        "email_modificacion_turno": True,
-                    },
-                )
 
-                if config_cliente.notificar_modificacion_turno:
-                    Notificacion.objects.create(
-                        usuario=instance.cliente.user,
-                        tipo="modificacion_turno",
-                        titulo="Tu turno fue reprogramado",
-                        mensaje=(
-                            f"Tu turno con {instance.empleado.user.get_full_name()} fue actualizado."
-                        ),
-                        data={
-                            "turno_id": instance.id,
-                            "cambios": cambios,
-                        },
-                    )
+def notificar_modificacion_turno(instance, cambios):
+    """Notificación in-app y email de modificación al profesional y al cliente.
 
-                if config_cliente.email_modificacion_turno:
-                    EmailService.enviar_email_modificacion_turno_cliente(
-                        instance,
-                        cambios,
-                    )
+    ``cambios`` es ``{campo: {"anterior": ..., "nuevo": ...}}``. Lo usa el
+    signal de modificación y el completado masivo, que actualiza los estados
+    sin pasar por ``save()``.
+    """
+    config_profesional, _ = NotificacionConfig.objects.get_or_create(
+        user=instance.empleado.user,
+        defaults={
+            "notificar_modificacion_turno": True,
+            "email_modificacion_turno": True,
+        },
+    )
+
+    if config_profesional.notificar_modificacion_turno:
+        Notificacion.objects.create(
+            usuario=instance.empleado.user,
+            tipo="modificacion_turno",
+            titulo="Turno modificado",
+            mensaje=f"Se ha modificado tu turno con {instance.cliente.nombre_completo}",
+            data={
+                "turno_id": instance.id,
+                "cambios": cambios,
+            },
+        )
 
-            # Limpiar del tracking
-            del _turno_anterior[instance.pk]
+    # Enviar email solo si está configurado
+    if config_profesional.email_modificacion_turno:
+        EmailService.enviar_email_modificacion_turno(instance, cambios)
+
+    # Notificar al cliente sobre el cambio de turno
+    config_cliente, _ = NotificacionConfig.objects.get_or_create(
+        user=instance.cliente.user,
+        defaults={
+            "notificar_modificacion_turno": True,
+            "email_modificacion_turno": True,
+        },
+    )
+
+    if config_cliente.notificar_modificacion_turno:
+        Notificacion.objects.create(
+            usuario=instance.cliente.user,
+            tipo="modificacion_turno",
+            titulo="Tu turno fue reprogramado",
+            mensaje=(
+                f"Tu turno con {instance.empleado.user.get_full_name()} fue actualizado."
+            ),
+            data={
+                "turno_id": instance.id,
+                "cambios": cambios,
+            },
+        )
 
-        except Exception as e:
-            logger.error(f"Error en signal de modificación de turno: {str(e)}")
+    if config_cliente.email_modificacion_turno:
+        EmailService.enviar_email_modificacion_turno_cliente(
+            instance,
+            cambios,
+        )
 
 
 def manejar_cancelacion_turno(turno):
@@ -420,3 +410,22 @@ def manejar_turno_completado(turno):
 
     except Exception as e:
         logger.error(f"Error manejando turno completado: {str(e)}")
+
+
+@receiver(post_save, sender=Turno)
+@receiver(post_delete, sender=Turno)
+def invalidar_comprobantes_turno(sender, instance, **kwargs):
+    comprobantes_pdf_service.invalidar_turno(instance.pk)
+
+
+@receiver(post_save, sender=MovimientoPagoTurno)
+@receiver(post_delete, sender=MovimientoPagoTurno)
+@receiver(post_save, sender=PagoMercadoPago)
+@receiver(post_delete, sender=PagoMercadoPago)
+def invalidar_comprobantes_pago(sender, instance, **kwargs):
+    comprobantes_pdf_service.invalidar_turno(instance.turno_id)
+
+
+@receiver(post_save, sender=ConfiguracionGlobal)
+def invalidar_comprobantes_configuracion(sender, instance, **kwargs):
+    comprobantes_pdf_service.invalidar_todos()
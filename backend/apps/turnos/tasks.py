@@ -12,6 +12,10 @@ from apps.turnos.services.reasignacion_service import (
 from apps.turnos.services.reacomodamiento_service import (
     iniciar_reacomodamiento as iniciar_reacomodamiento_service,
 )
+from apps.turnos.services.completado_service import procesar_efectos_completado
+from apps.turnos.services.bloqueo_temporal_service import limpiar_bloqueos_vencidos
+from apps.turnos.services import exportacion_reportes_service
+from apps.turnos.services.streak_service import expire_streak_coupons
 
 logger = logging.getLogger(__name__)
 
@@ -29,3 +33,48 @@ def expirar_oferta_reasignacion(log_id: int):
 @shared_task(name="apps.turnos.tasks.iniciar_reacomodamiento_proceso_2")
 def iniciar_reacomodamiento_proceso_2(turno_cancelado_id: int):
     return iniciar_reacomodamiento_service(turno_cancelado_id)
+
+
+@shared_task(name="apps.turnos.tasks.procesar_efectos_completado_masivo")
+def procesar_efectos_completado_masivo(transiciones: list, actor_user_id: int | None = None):
+    return procesar_efectos_completado(transiciones, actor_user_id)
+
+
+@shared_task(name="apps.turnos.tasks.limpiar_bloqueos_temporales")
+def limpiar_bloqueos_temporales():
+    """Elimina los bloqueos de checkout vencidos (ya no cuentan como ocupados)."""
+    eliminados = limpiar_bloqueos_vencidos()
+    if eliminados:
+        logger.info("Bloqueos temporales vencidos eliminados: %s", eliminados)
+    return eliminados
+
+
+@shared_task(name="apps.turnos.tasks.expirar_cupones_racha")
+def expirar_cupones_racha():
+    """Marca como vencidos los cupones de racha cuyo ``expires_at`` ya pasó."""
+    vencidos = expire_streak_coupons()
+    if vencidos:
+        logger.info("Cupones de racha vencidos: %s", vencidos)
+    return vencidos
+
+
+@shared_task(name="apps.turnos.tasks.generar_exportacion_reporte")
+def generar_exportacion_reporte(exportacion_id: int):
+    """Escribe el CSV/XLSX de una exportación pedida con ``modo=async``."""
+    exportacion = exportacion_reportes_service.generar_archivo(exportacion_id)
+    logger.info(
+        "Exportación de reporte %s lista: %s filas en %s",
+        exportacion.pk,
+        exportacion.filas,
+        exportacion.archivo,
+    )
+    return exportacion.filas
+
+
+@shared_task(name="apps.turnos.tasks.limpiar_exportaciones_reporte")
+def limpiar_exportaciones_reporte():
+    """Elimina las exportaciones de reportes (y sus archivos) ya vencidas."""
+    eliminadas = exportacion_reportes_service.limpiar_exportaciones_vencidas()
+    if eliminadas:
+        logger.info("Exportaciones de reportes vencidas eliminadas: %s", eliminadas)
+    return eliminadas
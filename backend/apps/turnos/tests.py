@@ -1,8 +1,18 @@
+import csv
+import io
+import os
+import shutil
+import tempfile
+import zipfile
 from datetime import timedelta
 from decimal import Decimal
 from datetime import date, time
+from unittest.mock import patch
 
-from django.test import TestCase
+from django.db import IntegrityError, connection, transaction
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from rest_framework.test import APIClient
 
@@ -11,9 +21,13 @@ from apps.clientes.models import Billetera, Cliente
 from apps.empleados.models import Empleado, EmpleadoServicio
 from apps.servicios.models import Servicio
 from apps.servicios.models import CategoriaServicio, Sala
-from apps.turnos.models import LogReasignacion, Turno
+from apps.emails.models import Notificacion
+from apps.turnos.models import ExportacionReporte, LogReasignacion, MovimientoPagoTurno, StreakCoupon, Turno
+from apps.turnos.services import exportacion_reportes_service
 from apps.turnos.services.cancelacion_service import cancelar_turno_para_cliente
 from apps.turnos.services.reasignacion_service import _calcular_descuento_para_candidato
+from apps.turnos.services.streak_recalculo_service import recalcular_rachas
+from apps.turnos.services.streak_service import expire_streak_coupons
 from apps.users.models import User
 
 
@@ -477,3 +491,1011 @@ class ReprogramacionTurnoAPITest(TestCase):
 
         self.assertEqual(response.status_code, 400)
         self.assertIn("oferta de reasignacion activa", response.data.get("error", ""))
+
+
+class TurnoCambiosRastreadosTest(TestCase):
+    def setUp(self):
+        self.sala = Sala.objects.create(nombre="Sala Tracking", capacidad_simultanea=2)
+        self.categoria = CategoriaServicio.objects.create(
+            nombre="Categoria Tracking",
+            sala=self.sala,
+        )
+        self.servicio = Servicio.objects.create(
+            nombre="Servicio Tracking",
+            categoria=self.categoria,
+            precio=Decimal("8000.00"),
+            duracion_minutos=60,
+        )
+        self.user_cliente = User.objects.create_user(
+            email="cliente.tracking@test.com",
+            password="password1.2.3",
+            username="cliente_tracking",
+            role="cliente",
+        )
+        self.cliente = Cliente.objects.create(user=self.user_cliente)
+        self.user_empleado = User.objects.create_user(
+            email="profesional.tracking@test.com",
+            password="password1.2.3",
+            username="profesional_tracking",
+            role="profesional",
+        )
+        self.empleado = Empleado.objects.create(
+            user=self.user_empleado,
+            fecha_ingreso=date.today(),
+            horario_entrada=time(9, 0),
+            horario_salida=time(18, 0),
+            dias_trabajo="L,M,M,J,V",
+            comision_porcentaje=Decimal("10.00"),
+        )
+        self.turno = Turno.objects.create(
+            cliente=self.cliente,
+            empleado=self.empleado,
+            servicio=self.servicio,
+            fecha_hora=timezone.now() + timedelta(days=5),
+            estado="confirmado",
+        )
+
+    def test_save_no_vuelve_a_leer_la_fila(self):
+        turno = Turno.objects.select_related("servicio__categoria").get(pk=self.turno.pk)
+        turno.notas_empleado = "Sin cambios de estado"
+
+        with CaptureQueriesContext(connection) as ctx:
+            turno.save()
+
+        selects_turno = [
+            q["sql"]
+            for q in ctx.captured_queries
+            if q["sql"].startswith("SELECT") and 'FROM "turnos_turno"' in q["sql"]
+        ]
+        self.assertEqual(selects_turno, [])
+        self.assertEqual(turno._cambios_rastreados, {})
+
+    def test_diff_por_instancia_y_foto_actualizada_despues_de_guardar(self):
+        turno = Turno.objects.get(pk=self.turno.pk)
+        turno.estado = "cancelado"
+
+        with patch("apps.turnos.signals.manejar_cancelacion_turno") as cancelacion:
+            turno.save()
+            self.assertEqual(turno._cambios_rastreados, {"estado": "confirmado"})
+            turno.save()
+
+        cancelacion.assert_called_once_with(turno)
+        self.assertEqual(turno._cambios_rastreados, {})
+
+    def test_save_fallido_conserva_la_foto_anterior(self):
+        turno = Turno.objects.get(pk=self.turno.pk)
+        turno.estado = "cancelado"
+        turno.cliente_id = None
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            turno.save()
+
+        self.assertEqual(turno.calcular_cambios(), {"estado": "confirmado"})
+
+
+class CompletadoMasivoTest(TestCase):
+    def setUp(self):
+        self.client_api = APIClient()
+        self.sala = Sala.objects.create(nombre="Sala Masivo", capacidad_simultanea=5)
+        self.categoria = CategoriaServicio.objects.create(
+            nombre="Categoria Masivo",
+            sala=self.sala,
+        )
+        self.servicio = Servicio.objects.create(
+            nombre="Servicio Masivo",
+            categoria=self.categoria,
+            precio=Decimal("10000.00"),
+            duracion_minutos=60,
+        )
+        self.user_cliente = User.objects.create_user(
+            email="cliente.masivo@test.com",
+            password="password1.2.3",
+            username="cliente_masivo",
+            role="cliente",
+        )
+        self.cliente = Cliente.objects.create(user=self.user_cliente)
+        self.user_profesional = User.objects.create_user(
+            email="profesional.masivo@test.com",
+            password="password1.2.3",
+            username="profesional_masivo",
+            role="profesional",
+        )
+        self.profesional = Empleado.objects.create(
+            user=self.user_profesional,
+            fecha_ingreso=date.today(),
+            horario_entrada=time(9, 0),
+            horario_salida=time(18, 0),
+            dias_trabajo="L,M,M,J,V",
+            comision_porcentaje=Decimal("10.00"),
+        )
+
+    def _crear_turno(self, dias_atras, senia):
+        return Turno.objects.create(
+            cliente=self.cliente,
+            empleado=self.profesional,
+            servicio=self.servicio,
+            fecha_hora=timezone.now() - timedelta(days=dias_atras),
+            estado="confirmado",
+            precio_final=Decimal("10000.00"),
+            senia_pagada=Decimal(senia),
+        )
+
+    def test_completa_en_lote_y_reporta_por_turno(self):
+        from apps.turnos.models import ClienteStreakStats
+        from apps.turnos.services.completado_service import procesar_efectos_completado
+
+        pagado_1 = self._crear_turno(3, "10000.00")
+        pagado_2 = self._crear_turno(2, "10000.00")
+        con_saldo = self._crear_turno(1, "4000.00")
+        historial_previo = Turno.history.filter(id=pagado_1.id).count()
+
+        self.client_api.force_authenticate(self.user_profesional)
+        with patch(
+            "apps.turnos.tasks.procesar_efectos_completado_masivo.delay",
+            side_effect=procesar_efectos_completado,
+        ) as delay, self.captureOnCommitCallbacks(execute=True):
+            response = self.client_api.post(
+                "/api/turnos/completar-masivo/",
+                {"turno_ids": [pagado_1.id, pagado_2.id, con_saldo.id, 999999]},
+                format="json",
+            )
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data["completados"], 2)
+        self.assertEqual(response.data["errores"][0]["turno_id"], con_saldo.id)
+        resultados = {r["turno_id"]: r["resultado"] for r in response.data["resultados"]}
+        self.assertEqual(resultados[pagado_1.id], "completado")
+        self.assertEqual(resultados[con_saldo.id], "saldo_pendiente")
+        self.assertEqual(resultados[999999], "omitido")
+
+        self.assertEqual(
+            set(Turno.objects.filter(estado="completado").values_list("id", flat=True)),
+            {pagado_1.id, pagado_2.id},
+        )
+        self.assertEqual(
+            Turno.history.filter(id=pagado_1.id).count(), historial_previo + 1
+        )
+        self.assertEqual(
+            Turno.history.filter(id=pagado_1.id).first().history_change_reason,
+            "Completado masivo",
+        )
+
+        delay.assert_called_once()
+        self.assertEqual(ClienteStreakStats.objects.get(cliente=self.cliente).streak_count, 2)
+
+    def test_completado_masivo_invalida_comprobantes_cacheados(self):
+        from apps.turnos.services import comprobantes_pdf_service
+        from apps.turnos.services.completado_service import completar_turnos_en_lote
+
+        turno = self._crear_turno(1, "10000.00")
+        clave = comprobantes_pdf_service._index_key(turno.pk, "final")
+        comprobantes_pdf_service._cache().set(clave, {"hash": "viejo"})
+
+        with patch("apps.turnos.tasks.procesar_efectos_completado_masivo.delay"), (
+            self.captureOnCommitCallbacks(execute=True)
+        ):
+            completar_turnos_en_lote(Turno.objects.filter(pk=turno.pk))
+
+        self.assertIsNone(comprobantes_pdf_service._cache().get(clave))
+
+    def test_completado_masivo_genera_las_mismas_notificaciones_que_el_individual(self):
+        from django.core import mail
+
+        from apps.turnos.services.completado_service import (
+            completar_turnos_en_lote,
+            procesar_efectos_completado,
+        )
+
+        individual = self._crear_turno(2, "10000.00")
+        masivo = self._crear_turno(1, "10000.00")
+        Notificacion.objects.all().delete()
+        mail.outbox = []
+
+        individual.estado = "completado"
+        individual.save()
+        emails_individual = len(mail.outbox)
+
+        with patch(
+            "apps.turnos.tasks.procesar_efectos_completado_masivo.delay",
+            side_effect=procesar_efectos_completado,
+        ), self.captureOnCommitCallbacks(execute=True):
+            completar_turnos_en_lote(Turno.objects.filter(pk=masivo.pk))
+
+        def notificaciones(turno):
+            return sorted(
+                (n.usuario_id, n.tipo, n.titulo, n.mensaje, str(n.data.get("cambios")))
+                for n in Notificacion.objects.filter(data__turno_id=turno.pk)
+            )
+
+        self.assertTrue(notificaciones(individual))
+        self.assertEqual(notificaciones(masivo), notificaciones(individual))
+        self.assertEqual(len(mail.outbox) - emails_individual, emails_individual)
+
+
+class ComprobantePDFCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.storage_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.storage_dir, ignore_errors=True)
+        override = override_settings(
+            COMPROBANTES_PDF_STORAGE={
+                "BACKEND": "django.core.files.storage.FileSystemStorage",
+                "OPTIONS": {"location": self.storage_dir},
+            }
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+
+        sala = Sala.objects.create(nombre="Sala PDF", capacidad_simultanea=1)
+        categoria = CategoriaServicio.objects.create(nombre="Categoria PDF", sala=sala)
+        servicio = Servicio.objects.create(
+            nombre="Servicio PDF", categoria=categoria, precio=Decimal("8000.00"), duracion_minutos=60
+        )
+        self.user_cliente = User.objects.create_user(
+            email="cliente.pdf@test.com",
+            password="password1.2.3",
+            username="cliente_pdf",
+            role="cliente",
+        )
+        cliente = Cliente.objects.create(user=self.user_cliente)
+        profesional = Empleado.objects.create(
+            user=User.objects.create_user(
+                email="pro.pdf@test.com",
+                password="password1.2.3",
+                username="pro_pdf",
+                role="profesional",
+            ),
+            fecha_ingreso=date.today(),
+            horario_entrada=time(9, 0),
+            horario_salida=time(18, 0),
+            dias_trabajo="L,M,Mi,J,V",
+        )
+        self.turno = Turno.objects.create(
+            cliente=cliente,
+            empleado=profesional,
+            servicio=servicio,
+            fecha_hora=timezone.now() - timedelta(days=1),
+            estado="confirmado",
+            precio_final=Decimal("8000.00"),
+            senia_pagada=Decimal("4000.00"),
+        )
+        self.url = f"/api/turnos/{self.turno.id}/comprobante-pago/pdf/"
+        self.client_api = APIClient()
+        self.client_api.force_authenticate(self.user_cliente)
+
+    def test_segunda_descarga_reusa_el_pdf_y_responde_304(self):
+        with patch(
+            "apps.turnos.views_comprobantes._comprobante_pago_pdf", return_value=b"%PDF-1"
+        ) as construir:
+            primera = self.client_api.get(self.url)
+            segunda = self.client_api.get(self.url)
+            condicional = self.client_api.get(self.url, HTTP_IF_NONE_MATCH=primera["ETag"])
+
+        self.assertEqual(primera.status_code, 200)
+        self.assertEqual(primera.content, b"%PDF-1")
+        self.assertEqual(segunda.content, b"%PDF-1")
+        self.assertEqual(segunda["ETag"], primera["ETag"])
+        self.assertIn("Last-Modified", primera)
+        self.assertEqual(condicional.status_code, 304)
+        construir.assert_called_once()
+
+    def test_nuevo_movimiento_de_pago_invalida_el_comprobante(self):
+        primera = self.client_api.get(self.url)
+
+        MovimientoPagoTurno.objects.create(
+            turno=self.turno,
+            cliente=self.turno.cliente,
+            monto=Decimal("4000.00"),
+            metodo="efectivo",
+            tipo="saldo",
+            estado="aprobado",
+        )
+        segunda = self.client_api.get(self.url, HTTP_IF_NONE_MATCH=primera["ETag"])
+
+        self.assertEqual(segunda.status_code, 200)
+        self.assertNotEqual(segunda["ETag"], primera["ETag"])
+        self.assertTrue(segunda.content.startswith(b"%PDF"))
+
+    def test_cambio_de_configuracion_invalida_todos_los_comprobantes(self):
+        primera = self.client_api.get(self.url)
+
+        config = ConfiguracionGlobal.get_config()
+        config.razon_social = "Beautiful Studio SRL"
+        config.save()
+        segunda = self.client_api.get(self.url, HTTP_IF_NONE_MATCH=primera["ETag"])
+
+        self.assertEqual(segunda.status_code, 200)
+        self.assertNotEqual(segunda["ETag"], primera["ETag"])
+
+
+class ExportacionComprobantesZipTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        storage_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, storage_dir, ignore_errors=True)
+        override = override_settings(
+            COMPROBANTES_PDF_STORAGE={
+                "BACKEND": "django.core.files.storage.FileSystemStorage",
+                "OPTIONS": {"location": storage_dir},
+            },
+            COMPROBANTES_EXPORT_PROCESOS=1,
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+
+        sala = Sala.objects.create(nombre="Sala ZIP", capacidad_simultanea=1)
+        categoria = CategoriaServicio.objects.create(nombre="Categoria ZIP", sala=sala)
+        servicio = Servicio.objects.create(
+            nombre="Servicio ZIP", categoria=categoria, precio=Decimal("6000.00"), duracion_minutos=60
+        )
+        cliente = Cliente.objects.create(
+            user=User.objects.create_user(
+                email="cliente.zip@test.com",
+                password="password1.2.3",
+                username="cliente_zip",
+                role="cliente",
+            )
+        )
+        profesional = Empleado.objects.create(
+            user=User.objects.create_user(
+                email="pro.zip@test.com",
+                password="password1.2.3",
+                username="pro_zip",
+                role="profesional",
+            ),
+            fecha_ingreso=date.today(),
+            horario_entrada=time(9, 0),
+            horario_salida=time(18, 0),
+            dias_trabajo="L,M,Mi,J,V",
+        )
+        self.propietario = User.objects.create_user(
+            email="owner.zip@test.com",
+            password="password1.2.3",
+            username="owner_zip",
+            role="propietario",
+        )
+        base = timezone.now() - timedelta(days=3)
+
+        def crear(horas, estado, senia):
+            return Turno.objects.create(
+                cliente=cliente,
+                empleado=profesional,
+                servicio=servicio,
+                fecha_hora=base + timedelta(hours=horas),
+                estado=estado,
+                precio_final=Decimal("6000.00"),
+                senia_pagada=Decimal(senia),
+            )
+
+        self.completado = crear(0, "completado", "6000.00")
+        self.con_senia = crear(2, "confirmado", "3000.00")
+        self.sin_pago = crear(4, "confirmado", "0")
+        self.fecha = timezone.localtime(base).date()
+        self.client_api = APIClient()
+
+    def _exportar(self, **params):
+        return self.client_api.get(
+            "/api/turnos/comprobantes/exportar/",
+            {"fecha_desde": self.fecha - timedelta(days=1), "fecha_hasta": self.fecha + timedelta(days=1), **params},
+        )
+
+    def test_exporta_comprobantes_de_pago_y_finales_del_periodo(self):
+        self.client_api.force_authenticate(self.propietario)
+
+        response = self._exportar()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/zip")
+        archivo = zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content)))
+        self.assertEqual(
+            sorted(archivo.namelist()),
+            sorted(
+                [
+                    f"pago/comprobante_pago_turno_{self.completado.id}.pdf",
+                    f"pago/comprobante_pago_turno_{self.con_senia.id}.pdf",
+                    f"final/comprobante_final_turno_{self.completado.id}.pdf",
+                ]
+            ),
+        )
+        self.assertTrue(all(archivo.read(nombre).startswith(b"%PDF") for nombre in archivo.namelist()))
+
+        solo_finales = self._exportar(tipo="final")
+        archivo = zipfile.ZipFile(io.BytesIO(b"".join(solo_finales.streaming_content)))
+        self.assertEqual(archivo.namelist(), [f"final/comprobante_final_turno_{self.completado.id}.pdf"])
+
+    def test_pool_de_procesos_genera_el_mismo_zip_en_orden(self):
+        from apps.turnos.services.exportacion_comprobantes_service import (
+            TIPOS_EXPORTACION,
+            entradas_comprobantes,
+            generar_zip,
+            turnos_a_exportar,
+        )
+
+        turnos = turnos_a_exportar(self.fecha, self.fecha + timedelta(days=1), TIPOS_EXPORTACION)
+        contenido = b"".join(
+            generar_zip(
+                entradas_comprobantes(turnos, TIPOS_EXPORTACION),
+                procesos=2,
+                usar_cache=False,
+                tamano_lote=1,
+            )
+        )
+
+        archivo = zipfile.ZipFile(io.BytesIO(contenido))
+        self.assertEqual(len(archivo.namelist()), 3)
+        self.assertIsNone(archivo.testzip())
+
+    def test_endpoint_renderiza_en_serie_y_valida_filtros(self):
+        from apps.turnos.services import exportacion_comprobantes_service
+
+        self.client_api.force_authenticate(self.propietario)
+
+        with override_settings(COMPROBANTES_EXPORT_PROCESOS=4), patch.object(
+            exportacion_comprobantes_service, "ProcessPoolExecutor"
+        ) as pool:
+            response = self._exportar(empleado_id=self.completado.empleado_id)
+            archivo = zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content)))
+
+        pool.assert_not_called()
+        self.assertEqual(len(archivo.namelist()), 3)
+        for campo in ("empleado_id", "servicio_id"):
+            with self.subTest(campo=campo):
+                self.assertEqual(self._exportar(**{campo: "abc"}).status_code, 400)
+
+    def test_comando_exporta_el_zip_a_disco(self):
+        from django.core.management import call_command
+
+        salida = os.path.join(tempfile.mkdtemp(), "comprobantes.zip")
+        self.addCleanup(shutil.rmtree, os.path.dirname(salida), ignore_errors=True)
+
+        call_command(
+            "exportar_comprobantes",
+            (self.fecha - timedelta(days=1)).isoformat(),
+            (self.fecha + timedelta(days=1)).isoformat(),
+            tipo="final",
+            salida=salida,
+            stdout=io.StringIO(),
+        )
+
+        with zipfile.ZipFile(salida) as archivo:
+            self.assertEqual(archivo.namelist(), [f"final/comprobante_final_turno_{self.completado.id}.pdf"])
+
+    def test_solo_propietario_puede_exportar(self):
+        self.client_api.force_authenticate(self.completado.cliente.user)
+
+        self.assertEqual(self._exportar().status_code, 403)
+
+
+@override_settings(REPORTES_EXPORT_CHUNK=2)
+class ReportesExportacionTest(TestCase):
+    def setUp(self):
+        storage_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, storage_dir, ignore_errors=True)
+        override = override_settings(
+            REPORTES_EXPORT_STORAGE={
+                "BACKEND": "django.core.files.storage.FileSystemStorage",
+                "OPTIONS": {"location": storage_dir},
+            }
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+
+        sala = Sala.objects.create(nombre="Sala Export", capacidad_simultanea=1)
+        categoria = CategoriaServicio.objects.create(nombre="Categoria Export", sala=sala)
+        servicio = Servicio.objects.create(
+            nombre="Servicio Export", categoria=categoria, precio=Decimal("4000.00"), duracion_minutos=60
+        )
+        self.cliente = Cliente.objects.create(
+            user=User.objects.create_user(
+                email="cliente.export@test.com",
+                password="password1.2.3",
+                username="cliente_export",
+                first_name="=Ana",
+                role="cliente",
+            )
+        )
+        self.profesional = Empleado.objects.create(
+            user=User.objects.create_user(
+                email="pro.export@test.com",
+                password="password1.2.3",
+                username="pro_export",
+                role="profesional",
+            ),
+            fecha_ingreso=date.today(),
+            horario_entrada=time(9, 0),
+            horario_salida=time(18, 0),
+            dias_trabajo="L,M,Mi,J,V",
+        )
+        self.propietario = User.objects.create_user(
+            email="owner.export@test.com",
+            password="password1.2.3",
+            username="owner_export",
+            role="propietario",
+        )
+        base = timezone.now() - timedelta(days=10)
+        self.turnos = [
+            Turno.objects.create(
+                cliente=self.cliente,
+                empleado=self.profesional,
+                servicio=servicio,
+                fecha_hora=base + timedelta(days=indice),
+                estado="completado" if indice < 2 else "confirmado",
+                precio_final=Decimal("4000.00"),
+            )
+            for indice in range(5)
+        ]
+        self.fecha_desde = (base - timedelta(days=1)).date()
+        self.fecha_hasta = timezone.now().date()
+        self.client_api = APIClient()
+        self.client_api.force_authenticate(self.propietario)
+
+    def _get(self, ruta, **params):
+        return self.client_api.get(
+            f"/api/turnos/reportes/{ruta}/",
+            {"fecha_desde": self.fecha_desde, "fecha_hasta": self.fecha_hasta, **params},
+        )
+
+    def _csv(self, response):
+        contenido = b"".join(response.streaming_content).decode("utf-8-sig")
+        return list(csv.reader(io.StringIO(contenido)))
+
+    def _exportado(self, reporte, **params):
+        params = {
+            "fecha_desde": self.fecha_desde.isoformat(),
+            "fecha_hasta": self.fecha_hasta.isoformat(),
+            **params,
+        }
+        tablas = exportacion_reportes_service.tablas_reporte(
+            reporte, params, self.fecha_desde, self.fecha_hasta, "xlsx"
+        )
+        return {tabla.nombre: list(tabla.filas()) for tabla in tablas}
+
+    def _ids(self, filas):
+        return sorted(str(fila["id"]) for fila in filas)
+
+    def _cargar_fuentes_secundarias(self):
+        billetera, _ = Billetera.objects.get_or_create(cliente=self.cliente)
+        billetera.agregar_saldo(Decimal("500.00"), "Crédito de prueba")
+        Notificacion.objects.create(
+            usuario=self.cliente.user,
+            tipo="fidelizacion",
+            titulo="Te esperamos",
+            mensaje="Volvé a reservar",
+        )
+        Turno.objects.filter(pk=self.turnos[-1].pk).update(estado="cancelado")
+
+    def test_csv_de_finanzas_incluye_todos_los_turnos_del_periodo(self):
+        response = self._get("finanzas", format="csv")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/csv"))
+        self.assertIn("reporte_finanzas_", response["Content-Disposition"])
+        filas = self._csv(response)
+        self.assertEqual(filas[0][0], "Turno")
+        self.assertEqual([int(fila[0]) for fila in filas[1:]], [turno.id for turno in self.turnos])
+        # Un nombre que empieza con "=" no se exporta como fórmula.
+        self.assertTrue(all(fila[3].startswith("'=Ana") for fila in filas[1:]))
+
+    def test_csv_de_clientes_agrega_todos_los_turnos_en_la_base(self):
+        filas = self._csv(self._get("clientes", format="csv"))
+
+        self.assertEqual(len(filas), 2)
+        fila = dict(zip(filas[0], filas[1]))
+        self.assertEqual(fila["Turnos"], "5")
+        self.assertEqual(fila["Completados"], "2")
+        self.assertEqual(Decimal(fila["Ingresos"]), Decimal("8000"))
+
+    def test_csv_de_billetera_intercala_fuentes_por_fecha(self):
+        filas = self._csv(self._get("billetera", format="csv", entidad="turnos"))
+
+        fechas = [fila[1] for fila in filas[1:]]
+        self.assertEqual(len(fechas), 5)
+        self.assertEqual(fechas, sorted(fechas, reverse=True))
+
+    def test_xlsx_de_auditoria_tiene_una_hoja_por_tabla(self):
+        response = self._get("auditoria-operativa", format="xlsx")
+
+        self.assertEqual(response.status_code, 200)
+        archivo = zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content)))
+        self.assertIsNone(archivo.testzip())
+        workbook = archivo.read("xl/workbook.xml").decode()
+        for hoja in ["turnos", "clientes", "ofertas", "profesionales", "salas", "servicios", "finanzas", "cambios"]:
+            self.assertIn(f'name="{hoja}"', workbook)
+        turnos = archivo.read("xl/worksheets/sheet1.xml").decode()
+        self.assertEqual(turnos.count("<row>"), 6)
+        cambios = archivo.read("xl/worksheets/sheet8.xml").decode()
+        self.assertEqual(cambios.count("<row>"), 6)
+
+    def test_todos_los_reportes_exportan_en_ambos_formatos(self):
+        rutas = ["finanzas", "billetera", "automatizaciones", "clientes", "salas", "profesionales", "auditoria-operativa"]
+        for ruta in rutas:
+            for formato in ["csv", "xlsx"]:
+                with self.subTest(ruta=ruta, formato=formato):
+                    response = self._get(ruta, format=formato)
+                    self.assertEqual(response.status_code, 200)
+                    self.assertTrue(b"".join(response.streaming_content))
+
+    def test_exportacion_de_finanzas_coincide_con_la_vista(self):
+        vista = self._get("finanzas").json()
+        exportado = self._exportado("finanzas")
+
+        self.assertEqual(len(exportado["turnos"]), vista["resumen"]["total_turnos"])
+        self.assertEqual(
+            [(fila["mes"], float(fila["total"]), fila["cantidad_turnos"]) for fila in exportado["ingresos_mensuales"]],
+            [(item["mes"], item["total"], item["cantidad_turnos"]) for item in vista["ingresos_mensuales"]],
+        )
+        self.assertEqual(
+            [(fila["id"], float(fila["total"]), fila["cantidad"]) for fila in exportado["ingresos_por_servicio"][:5]],
+            [(item["servicio_id"], item["total"], item["cantidad"]) for item in vista["top_servicios"]],
+        )
+        self.assertEqual(
+            [(fila["id"], float(fila["total"]), fila["cantidad"]) for fila in exportado["ingresos_por_profesional"]],
+            [(item["empleado_id"], item["total"], item["cantidad"]) for item in vista["rendimiento_empleados"]],
+        )
+
+    def test_exportacion_de_billetera_coincide_con_la_vista(self):
+        self._cargar_fuentes_secundarias()
+
+        for params in [{}, {"entidad": "turnos"}, {"accion": "modificacion"}, {"entidad": "usuarios_credito"}]:
+            with self.subTest(**params):
+                vista = self._get("billetera", page_size=200, **params).json()
+                exportado = self._exportado("billetera", **params)
+                self.assertEqual(vista["paginacion"]["total_items"], len(exportado["registros"]))
+                self.assertEqual(self._ids(vista["registros"]), self._ids(exportado["registros"]))
+
+    def test_billetera_rechaza_monto_invalido_en_vista_y_exportacion(self):
+        response = self._get("billetera", monto_desde="abc")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["error"], "monto_desde inválido")
+        self.assertEqual(self._get("billetera", format="csv", monto_hasta="abc").status_code, 400)
+
+    def test_exportacion_de_automatizaciones_coincide_con_la_vista(self):
+        self._cargar_fuentes_secundarias()
+
+        for pa in ["todos", "pa1", "pa2"]:
+            with self.subTest(pa=pa):
+                vista = self._get("automatizaciones", pa=pa).json()
+                exportado = self._exportado("automatizaciones", pa=pa)
+                self.assertEqual(self._ids(vista["registros"]), self._ids(exportado["registros"]))
+
+    def test_exportacion_por_entidad_coincide_con_la_vista(self):
+        self._cargar_fuentes_secundarias()
+        campos = {
+            "clientes": ["total_turnos", "completados", "cancelados", "ingresos"],
+            "salas": ["total_turnos", "reservados_activos", "completados", "ingresos"],
+            "profesionales": ["total_turnos", "completados", "cancelados", "ingresos"],
+        }
+
+        for reporte, columnas in campos.items():
+            with self.subTest(reporte=reporte):
+                vista = {item["id"]: item for item in self._get(reporte).json()["registros"]}
+                exportado = {fila["id"]: fila for fila in self._exportado(reporte)[reporte]}
+                self.assertEqual(set(vista), set(exportado))
+                for entidad_id, item in vista.items():
+                    self.assertEqual(
+                        [float(item[campo]) for campo in columnas],
+                        [float(exportado[entidad_id][campo]) for campo in columnas],
+                    )
+
+    def test_exportacion_de_auditoria_coincide_con_la_vista(self):
+        self._cargar_fuentes_secundarias()
+        vista = self._get("auditoria-operativa").json()
+        exportado = self._exportado("auditoria_operativa")
+
+        for tabla in ["turnos", "clientes", "ofertas", "profesionales", "salas", "servicios", "finanzas", "cambios"]:
+            with self.subTest(tabla=tabla):
+                self.assertEqual(self._ids(vista[tabla]), self._ids(exportado[tabla]))
+
+    def test_modo_async_genera_archivo_y_notifica(self):
+        from apps.turnos.tasks import generar_exportacion_reporte
+
+        with patch.object(generar_exportacion_reporte, "delay", side_effect=generar_exportacion_reporte):
+            response = self._get("finanzas", format="csv", modo="async")
+
+        self.assertEqual(response.status_code, 202)
+        exportacion = ExportacionReporte.objects.get(pk=response.json()["id"])
+        self.assertEqual(exportacion.estado, ExportacionReporte.ESTADO_LISTA)
+        self.assertEqual(exportacion.filas, 5)
+        self.assertTrue(
+            Notificacion.objects.filter(
+                usuario=self.propietario,
+                tipo="exportacion_reporte",
+                data__exportacion_id=exportacion.id,
+            ).exists()
+        )
+
+        detalle = self.client_api.get(f"/api/turnos/reportes/exportaciones/{exportacion.id}/")
+        descarga = self.client_api.get(detalle.json()["descarga_url"])
+        self.assertEqual(descarga.status_code, 200)
+        self.assertEqual(len(self._csv(descarga)), 6)
+
+    def test_modo_async_sin_broker_marca_la_exportacion_con_error(self):
+        from apps.turnos.tasks import generar_exportacion_reporte
+
+        with patch.object(generar_exportacion_reporte, "delay", side_effect=OSError("broker caído")), \
+                patch.object(exportacion_reportes_service, "generar_archivo") as generar_archivo:
+            response = self._get("finanzas", format="csv", modo="async")
+
+        self.assertEqual(response.status_code, 503)
+        generar_archivo.assert_not_called()
+        exportacion = ExportacionReporte.objects.get(pk=response.json()["id"])
+        self.assertEqual(exportacion.estado, ExportacionReporte.ESTADO_ERROR)
+        self.assertTrue(exportacion.error)
+        self.assertIsNotNone(exportacion.finalizado_en)
+        self.assertEqual(response.json()["estado"], ExportacionReporte.ESTADO_ERROR)
+
+    def test_solo_propietario_puede_exportar(self):
+        self.client_api.force_authenticate(self.profesional.user)
+
+        response = self._get("finanzas", format="csv")
+
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertIn("error", response.json())
+        self.assertEqual(self._get("finanzas").status_code, 200)
+
+
+class CuponesRachaVencimientoTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="cupones@test.com",
+            password="password1.2.3",
+            username="cupones",
+            role="cliente",
+        )
+        self.cliente = Cliente.objects.create(user=self.user)
+        ahora = timezone.now()
+        self.vencido = StreakCoupon.objects.create(
+            cliente=self.cliente,
+            code="RACHA-VENC01",
+            milestone_number=1,
+            discount_amount=Decimal("500.00"),
+            status="reclamado",
+            expires_at=ahora - timedelta(hours=1),
+        )
+        self.vigente = StreakCoupon.objects.create(
+            cliente=self.cliente,
+            milestone_number=2,
+            discount_amount=Decimal("700.00"),
+            expires_at=ahora + timedelta(days=10),
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_lecturas_tratan_el_vencimiento_sin_escribir(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/clientes/me/streak/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["active_coupon"]["id"], self.vigente.pk)
+        self.assertFalse([q for q in queries.captured_queries if q["sql"].startswith("UPDATE")])
+
+        response = self.client.post(
+            "/api/clientes/me/streak-coupons/validate/", {"code": "RACHA-VENC01"}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(f"/api/clientes/me/streak-coupons/{self.vencido.pk}/claim/")
+        self.assertEqual(response.data["detail"], "El cupón está vencido.")
+        self.vencido.refresh_from_db()
+        self.assertEqual(self.vencido.status, "reclamado")
+
+    def test_tarea_marca_vencidos_por_lotes(self):
+        otro = StreakCoupon.objects.create(
+            cliente=self.cliente,
+            milestone_number=3,
+            discount_amount=Decimal("100.00"),
+            expires_at=timezone.now() - timedelta(days=1),
+        )
+
+        self.assertEqual(expire_streak_coupons(batch_size=1), 2)
+
+        self.assertEqual(
+            dict(StreakCoupon.objects.values_list("pk", "status")),
+            {self.vencido.pk: "vencido", otro.pk: "vencido", self.vigente.pk: "pendiente"},
+        )
+        self.assertEqual(expire_streak_coupons(), 0)
+
+
+class RecalculoRachasTest(TestCase):
+    def setUp(self):
+        from apps.turnos.models import ClienteStreakStats
+
+        config = ConfiguracionGlobal.get_config()
+        config.streak_expiration_days = 30
+        config.save(update_fields=["streak_expiration_days"])
+        sala = Sala.objects.create(nombre="Sala Rachas", capacidad_simultanea=5)
+        self.servicio = Servicio.objects.create(
+            nombre="Servicio Rachas",
+            categoria=CategoriaServicio.objects.create(nombre="Categoria Rachas", sala=sala),
+            precio=Decimal("1000.00"),
+            duracion_minutos=60,
+        )
+        self.profesional = Empleado.objects.create(
+            user=User.objects.create_user(
+                email="profesional.rachas@test.com",
+                password="password1.2.3",
+                username="profesional_rachas",
+                role="profesional",
+            ),
+            fecha_ingreso=date.today(),
+            horario_entrada=time(9, 0),
+            horario_salida=time(18, 0),
+            dias_trabajo="L,M,M,J,V",
+            comision_porcentaje=Decimal("10.00"),
+        )
+        self.ahora = timezone.now()
+        self.con_corte = self._cliente("corte")
+        self.con_cupon = self._cliente("cupon")
+        for dias in (100, 90, 20, 10):
+            self._completado(self.con_corte, dias)
+        for dias in (50, 40, 30):
+            self._completado(self.con_cupon, dias)
+        StreakCoupon.objects.create(
+            cliente=self.con_cupon,
+            milestone_number=1,
+            discount_amount=Decimal("100.00"),
+            status="usado",
+            used_at=self.ahora - timedelta(days=35),
+        )
+        ClienteStreakStats.objects.filter(cliente__in=[self.con_corte, self.con_cupon]).delete()
+        ClienteStreakStats.objects.create(cliente=self.con_corte, streak_count=7)
+
+    def _cliente(self, sufijo):
+        return Cliente.objects.create(
+            user=User.objects.create_user(
+                email=f"rachas.{sufijo}@test.com",
+                password="password1.2.3",
+                username=f"rachas_{sufijo}",
+                role="cliente",
+            )
+        )
+
+    def _completado(self, cliente, dias_atras):
+        turno = Turno.objects.create(
+            cliente=cliente,
+            empleado=self.profesional,
+            servicio=self.servicio,
+            fecha_hora=self.ahora - timedelta(days=dias_atras, hours=1),
+            estado="confirmado",
+            precio_final=Decimal("1000.00"),
+        )
+        Turno.objects.filter(pk=turno.pk).update(
+            estado="completado", fecha_hora_completado=self.ahora - timedelta(days=dias_atras)
+        )
+        return turno
+
+    def test_dry_run_informa_y_recalculo_escribe_en_bloque(self):
+        from apps.turnos.models import ClienteStreakStats, StreakAuditLog
+
+        reporte = recalcular_rachas(lote=1, dry_run=True)
+        self.assertEqual((reporte["cambios"], reporte["creados"], reporte["lotes"]), (2, 1, 2))
+        self.assertEqual(ClienteStreakStats.objects.get(cliente=self.con_corte).streak_count, 7)
+        self.assertFalse(ClienteStreakStats.objects.filter(cliente=self.con_cupon).exists())
+
+        recalcular_rachas(lote=1)
+
+        corte = ClienteStreakStats.objects.get(cliente=self.con_corte)
+        self.assertEqual(corte.streak_count, 2)
+        self.assertEqual(corte.last_completed_at, self.ahora - timedelta(days=10))
+        self.assertEqual(corte.next_expiration_at, self.ahora + timedelta(days=20))
+        self.assertEqual(ClienteStreakStats.objects.get(cliente=self.con_cupon).streak_count, 1)
+        self.assertEqual(
+            StreakAuditLog.objects.filter(detalle="PA3 recálculo masivo desde el historial").count(), 2
+        )
+        self.assertEqual(recalcular_rachas()["cambios"], 0)
+
+
+@patch("apps.turnos.tasks.expirar_oferta_reasignacion.apply_async")
+@patch(
+    "apps.turnos.services.reasignacion_service.EmailService.enviar_email_oferta_reasignacion",
+    return_value=True,
+)
+class CandidatosReasignacionTest(TestCase):
+    def setUp(self):
+        sala = Sala.objects.create(nombre="Sala Reasignacion", capacidad_simultanea=5)
+        self.servicio = Servicio.objects.create(
+            nombre="Servicio Reasignacion",
+            categoria=CategoriaServicio.objects.create(nombre="Categoria Reasignacion", sala=sala),
+            precio=Decimal("10000.00"),
+            duracion_minutos=60,
+        )
+        self.profesional = Empleado.objects.create(
+            user=User.objects.create_user(
+                email="profesional.reasig@test.com",
+                password="password1.2.3",
+                username="profesional_reasig",
+                role="profesional",
+            ),
+            fecha_ingreso=date.today(),
+            horario_entrada=time(9, 0),
+            horario_salida=time(18, 0),
+            dias_trabajo="L,M,M,J,V",
+            comision_porcentaje=Decimal("10.00"),
+        )
+        ahora = timezone.now()
+        self.hueco = self._turno(self._cliente("original"), ahora + timedelta(days=1))
+        Turno.objects.filter(pk=self.hueco.pk).update(estado="cancelado")
+        primero = self._cliente("primero")
+        self.candidatos = [
+            self._turno(primero, ahora + timedelta(days=5)),
+            self._turno(self._cliente("segundo"), ahora + timedelta(days=4)),
+            self._turno(self._cliente("tercero"), ahora + timedelta(days=3)),
+        ]
+        # Un cliente entra una sola vez al ranking, con su turno más lejano.
+        self._turno(primero, ahora + timedelta(days=2))
+
+    def _cliente(self, sufijo):
+        return Cliente.objects.create(
+            user=User.objects.create_user(
+                email=f"reasig.{sufijo}@test.com",
+                password="password1.2.3",
+                username=f"reasig_{sufijo}",
+                role="cliente",
+            )
+        )
+
+    def _turno(self, cliente, fecha_hora):
+        return Turno.objects.create(
+            cliente=cliente,
+            empleado=self.profesional,
+            servicio=self.servicio,
+            fecha_hora=fecha_hora,
+            estado="confirmado",
+            precio_final=Decimal("10000.00"),
+        )
+
+    def test_ranking_se_guarda_y_las_ofertas_siguientes_salen_de_la_lista(self, _email, _expirar):
+        from apps.turnos.models import CandidatosReasignacion
+        from apps.turnos.services.reasignacion_service import (
+            expirar_oferta_reasignacion,
+            iniciar_reasignacion_turno,
+        )
+
+        resultado = iniciar_reasignacion_turno(self.hueco.pk)
+
+        ranking = CandidatosReasignacion.objects.get(turno_cancelado=self.hueco)
+        self.assertEqual(ranking.candidatos, [turno.pk for turno in self.candidatos])
+        log = LogReasignacion.objects.get(pk=resultado["log_id"])
+        self.assertEqual(log.turno_ofrecido_id, self.candidatos[0].pk)
+        self.assertEqual(iniciar_reasignacion_turno(self.hueco.pk)["status"], "ofertas_en_curso")
+
+        LogReasignacion.objects.filter(pk=log.pk).update(expires_at=timezone.now() - timedelta(minutes=1))
+        expirar_oferta_reasignacion(log.pk)
+
+        siguiente = LogReasignacion.objects.filter(estado_final__isnull=True).get()
+        self.assertEqual(siguiente.turno_ofrecido_id, self.candidatos[1].pk)
+        self.candidatos[0].refresh_from_db()
+        self.assertEqual(self.candidatos[0].estado, "confirmado")
+        self.assertEqual(CandidatosReasignacion.objects.get().candidatos, ranking.candidatos)
+
+    @override_settings(REASIGNACION_OFERTAS_SIMULTANEAS=2)
+    def test_ofertas_simultaneas_gana_la_primera_aceptacion(self, _email, _expirar):
+        from apps.emails.models import PromotionOffer
+        from apps.turnos.services.reasignacion_service import (
+            iniciar_reasignacion_turno,
+            responder_oferta_reasignacion,
+        )
+
+        resultado = iniciar_reasignacion_turno(self.hueco.pk)
+
+        self.assertEqual(len(resultado["log_ids"]), 2)
+        primera, segunda = (LogReasignacion.objects.get(pk=pk) for pk in resultado["log_ids"])
+        self.assertEqual(
+            [primera.turno_ofrecido_id, segunda.turno_ofrecido_id],
+            [self.candidatos[0].pk, self.candidatos[1].pk],
+        )
+
+        self.assertEqual(responder_oferta_reasignacion(segunda.token, "aceptar")["status"], "aceptada")
+
+        primera.refresh_from_db()
+        self.hueco.refresh_from_db()
+        self.candidatos[0].refresh_from_db()
+        self.assertEqual(primera.estado_final, "expirada")
+        self.assertEqual(primera.estado_posterior["motivo"], "aceptada_por_otro_cliente")
+        self.assertEqual(self.candidatos[0].estado, "confirmado")
+        self.assertEqual(self.hueco.cliente_id, self.candidatos[1].cliente_id)
+        self.assertFalse(
+            PromotionOffer.objects.filter(reasignacion_log=primera)
+            .exclude(status=PromotionOffer.Status.TAKEN_BY_OTHER)
+            .exists()
+        )
+        self.assertEqual(responder_oferta_reasignacion(primera.token, "aceptar")["status"], "ya_resuelta")
@@ -35,6 +35,11 @@ urlpatterns = [
         views_comprobantes.comprobante_final_turno_pdf,
         name="comprobante-final-turno-pdf",
     ),
+    path(
+        "comprobantes/exportar/",
+        views_comprobantes.exportar_comprobantes_zip,
+        name="exportar-comprobantes-zip",
+    ),
     path(
         "reasignacion/<uuid:token>/",
         views.responder_reasignacion,
@@ -88,6 +93,21 @@ urlpatterns = [
         views_reportes.auditoria_operativa,
         name="auditoria-operativa",
     ),
+    path(
+        "reportes/exportaciones/",
+        views_reportes.exportaciones_reporte,
+        name="exportaciones-reporte",
+    ),
+    path(
+        "reportes/exportaciones/<int:exportacion_id>/",
+        views_reportes.detalle_exportacion_reporte,
+        name="detalle-exportacion-reporte",
+    ),
+    path(
+        "reportes/exportaciones/<int:exportacion_id>/descargar/",
+        views_reportes.descargar_exportacion_reporte,
+        name="descargar-exportacion-reporte",
+    ),
     # Oportunidades de Agenda
     path(
         "oportunidades/",
@@ -130,4 +150,9 @@ urlpatterns = [
         views_diagnostico.diagnostico_fidelidad_racha,
         name="diagnostico-fidelidad-racha",
     ),
+    path(
+        "diagnostico/requests-lentos/",
+        views_diagnostico.diagnostico_requests_lentos,
+        name="diagnostico-requests-lentos",
+    ),
 ]
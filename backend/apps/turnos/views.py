@@ -2,6 +2,7 @@
 
 import logging
 import secrets
+import time
 import uuid
 from decimal import Decimal
 
@@ -36,6 +37,13 @@ from apps.turnos.services.reprogramacion_service import (
     reprogramar_turno,
 )
 from apps.turnos.services.pagos_service import registrar_movimiento_pago_turno
+from apps.turnos.services.completado_service import completar_turnos_en_lote
+from apps.turnos.services.disponibilidad_service import (
+    calcular_horarios_disponibles_rango,
+    intervalos_bloqueados_por_fecha,
+)
+from apps.core.metrics import observe_api_request
+from apps.users.utils import normalize_phone
 
 logger = logging.getLogger(__name__)
 
@@ -109,7 +117,10 @@ def _actualizar_telefono_cliente_staff(cliente, telefono: str, request=None, ori
     if not telefono or not getattr(cliente, "user", None):
         return
     telefono_anterior = cliente.user.phone or ""
-    if telefono_anterior == telefono:
+    if telefono_anterior == telefono or (
+        cliente.user.phone_normalized
+        and cliente.user.phone_normalized == normalize_phone(telefono)
+    ):
         return
     cliente.user.phone = telefono
     cliente.user.save(update_fields=["phone"])
@@ -186,6 +197,17 @@ class TurnoViewSet(viewsets.ModelViewSet):
     ordering_fields = ["fecha_hora", "created_at", "precio_final"]
     ordering = ["-fecha_hora"]
 
+    def dispatch(self, request, *args, **kwargs):
+        inicio = time.perf_counter()
+        response = super().dispatch(request, *args, **kwargs)
+        observe_api_request(
+            "turnos",
+            getattr(self, "action", None),
+            response.status_code,
+            time.perf_counter() - inicio,
+        )
+        return response
+
     def get_serializer_class(self):
         """Retornar el serializer apropiado según la acción"""
         if self.action == "list":
@@ -883,82 +905,7 @@ class TurnoViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
     def _calcular_horarios_disponibles(self, empleado, servicio, fecha_obj):
-        from apps.empleados.models import HorarioEmpleado
-
-        dia_semana = fecha_obj.weekday()
-        horarios_dia = HorarioEmpleado.objects.filter(
-            empleado=empleado, dia_semana=dia_semana, is_active=True
-        ).order_by("hora_inicio")
-
-        if not horarios_dia.exists():
-            dias_trabajo = empleado.dias_trabajo.split(",")
-            dias_map = {"L": 0, "M": 1, "Mi": 2, "J": 3, "V": 4, "S": 5, "D": 6}
-            dias_numericos = []
-            for dia in dias_trabajo:
-                dia = dia.strip()
-                if dia == "X":
-                    dias_numericos.append(2)
-                elif dia in dias_map:
-                    dias_numericos.append(dias_map[dia])
-
-            if dia_semana not in dias_numericos:
-                return []
-
-            class HorarioLegacy:
-                def __init__(self, hora_inicio, hora_fin):
-                    self.hora_inicio = hora_inicio
-                    self.hora_fin = hora_fin
-
-            horarios_dia = [
-                HorarioLegacy(empleado.horario_entrada, empleado.horario_salida)
-            ]
-
-        horarios_disponibles = []
-        incremento = timedelta(minutes=15)
-        turnos_dia = list(
-            Turno.objects.select_related("servicio").filter(
-                empleado=empleado,
-                fecha_hora__date=fecha_obj,
-                estado__in=[
-                    "pendiente",
-                    "confirmado",
-                    "en_proceso",
-                ],
-            )
-        )
-
-        for horario_rango in horarios_dia:
-            hora_actual = timezone.make_aware(
-                datetime.combine(fecha_obj, horario_rango.hora_inicio)
-            )
-            hora_fin = timezone.make_aware(
-                datetime.combine(fecha_obj, horario_rango.hora_fin)
-            )
-
-            while hora_actual + timedelta(minutes=servicio.duracion_minutos) <= hora_fin:
-                hora_fin_turno = hora_actual + timedelta(
-                    minutes=servicio.duracion_minutos
-                )
-                conflicto = False
-                for turno_existente in turnos_dia:
-                    if not turno_existente.fecha_hora or not turno_existente.servicio:
-                        continue
-                    inicio_existente = turno_existente.fecha_hora
-                    fin_existente = inicio_existente + timedelta(
-                        minutes=turno_existente.servicio.duracion_minutos
-                    )
-                    if hora_actual < fin_existente and hora_fin_turno > inicio_existente:
-                        conflicto = True
-                        break
-
-                if not conflicto and hora_actual > timezone.now():
-                    hora_str = hora_actual.strftime("%H:%M")
-                    if hora_str not in horarios_disponibles:
-                        horarios_disponibles.append(hora_str)
-
-                hora_actual += incremento
-
-        return sorted(horarios_disponibles)
+        return calcular_horarios_disponibles_rango(empleado, servicio, [fecha_obj])[fecha_obj]
 
     def _buscar_conflicto_sobreturno(self, turno: Turno, fecha_hora_nueva):
         hora_fin_nueva = fecha_hora_nueva + timedelta(
@@ -1111,6 +1058,8 @@ class TurnoViewSet(viewsets.ModelViewSet):
                     estado__in=["pendiente", "confirmado", "en_proceso"],
                 )
             )
+            # Horarios que otro cliente está pagando en Mercado Pago
+            bloqueos_dia = intervalos_bloqueados_por_fecha(empleado, fecha_obj, fecha_obj)[fecha_obj]
 
             for horario_rango in horarios_dia:
                 # Crear datetime aware (con zona horaria)
@@ -1149,6 +1098,11 @@ class TurnoViewSet(viewsets.ModelViewSet):
                         ):
                             conflicto = True
                             break
+                    if not conflicto:
+                        conflicto = any(
+                            hora_actual < fin_bloqueo and hora_fin_turno > inicio_bloqueo
+                            for inicio_bloqueo, fin_bloqueo in bloqueos_dia
+                        )
 
                     if not conflicto and hora_actual > timezone.now():
                         hora_str = hora_actual.strftime("%H:%M")
@@ -1748,37 +1702,20 @@ class TurnoViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        # Filtrar solo turnos que NO están ya completados o cancelados
-        queryset = queryset.filter(estado__in=["pendiente", "confirmado", "en_proceso"])
-
-        completados = 0
-        errores = []
-
-        for turno in queryset:
-            try:
-                pendiente = calcular_monto_pendiente_turno(turno)
-                if pendiente > Decimal("0.00"):
-                    errores.append(
-                        {
-                            "turno_id": turno.id,
-                            "error": f"Falta registrar un pago de ${pendiente}.",
-                            "monto_pendiente": str(pendiente),
-                        }
-                    )
-                    continue
-                turno.estado = "completado"
-                turno.fecha_hora_completado = timezone.now()
-                turno.save()
-                completados += 1
-            except Exception as e:
-                errores.append({"turno_id": turno.id, "error": str(e)})
+        # Sólo se completan turnos que NO están ya completados o cancelados
+        resultado = completar_turnos_en_lote(
+            queryset,
+            actor_user=user,
+            turno_ids_solicitados=turno_ids or None,
+        )
 
         return Response(
             {
                 "success": True,
-                "completados": completados,
-                "total_seleccionados": queryset.count(),
-                "errores": errores,
+                "completados": len(resultado.completados),
+                "total_seleccionados": resultado.total_seleccionados,
+                "errores": resultado.errores,
+                "resultados": resultado.resultados,
             }
         )
 
@@ -1814,39 +1751,19 @@ class TurnoViewSet(viewsets.ModelViewSet):
             empleado=empleado,
             fecha_hora__gte=hace_7_dias,
             fecha_hora__lte=ahora,
-            estado__in=["pendiente", "confirmado", "en_proceso"],
         )
 
-        completados = 0
-        errores = []
-
-        for turno in turnos:
-            try:
-                pendiente = calcular_monto_pendiente_turno(turno)
-                if pendiente > Decimal("0.00"):
-                    errores.append(
-                        {
-                            "turno_id": turno.id,
-                            "error": f"Falta registrar un pago de ${pendiente}.",
-                            "monto_pendiente": str(pendiente),
-                        }
-                    )
-                    continue
-                turno.estado = "completado"
-                turno.fecha_hora_completado = timezone.now()
-                turno.save()
-                completados += 1
-            except Exception as e:
-                errores.append({"turno_id": turno.id, "error": str(e)})
+        resultado = completar_turnos_en_lote(turnos, actor_user=user)
 
         return Response(
             {
                 "success": True,
-                "completados": completados,
-                "total_encontrados": turnos.count(),
+                "completados": len(resultado.completados),
+                "total_encontrados": resultado.total_seleccionados,
                 "fecha_desde": hace_7_dias.isoformat(),
                 "fecha_hasta": ahora.isoformat(),
-                "errores": errores,
+                "errores": resultado.errores,
+                "resultados": resultado.resultados,
             }
         )
 
@@ -1,7 +1,9 @@
+from datetime import datetime, timedelta
 from decimal import Decimal
 from io import BytesIO
 
-from django.http import HttpResponse
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
 from django.utils import timezone
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
@@ -13,6 +15,7 @@ from rest_framework.response import Response
 from apps.authentication.models import ConfiguracionGlobal
 from apps.turnos.models import MovimientoPagoTurno, Turno
 from apps.turnos.serializers import calcular_monto_pendiente_turno
+from apps.turnos.services import comprobantes_pdf_service, exportacion_comprobantes_service
 
 
 def _puede_ver_turno(user, turno: Turno) -> bool:
@@ -65,12 +68,18 @@ def _turno_data(turno: Turno) -> dict:
 
 
 def _movimientos_data(turno: Turno) -> list[dict]:
-    movimientos = list(
-        turno.movimientos_pago.filter(estado="aprobado").select_related("registrado_por")
-    )
+    # La exportación masiva precarga los movimientos y pagos aprobados.
+    movimientos = getattr(turno, "movimientos_aprobados", None)
+    if movimientos is None:
+        movimientos = list(
+            turno.movimientos_pago.filter(estado="aprobado").select_related("registrado_por")
+        )
     if not movimientos:
         movimientos = []
-        for pago in turno.pagos_mercadopago.filter(estado="approved"):
+        pagos_aprobados = getattr(turno, "pagos_mercadopago_aprobados", None)
+        if pagos_aprobados is None:
+            pagos_aprobados = turno.pagos_mercadopago.filter(estado="approved")
+        for pago in pagos_aprobados:
             movimientos.append(
                 MovimientoPagoTurno(
                     turno=turno,
@@ -119,7 +128,7 @@ def _movimientos_data(turno: Turno) -> list[dict]:
     ]
 
 
-def _comprobante_data(turno: Turno, tipo: str) -> dict:
+def _comprobante_data(turno: Turno, tipo: str, empresa: dict | None = None) -> dict:
     movimientos = _movimientos_data(turno)
     total_abonado = sum(Decimal(mov["monto"]) for mov in movimientos)
     total_turno = Decimal(_turno_data(turno)["precio_final"])
@@ -167,7 +176,7 @@ def _comprobante_data(turno: Turno, tipo: str) -> dict:
         "monto_principal": monto_principal,
         "secciones": secciones,
         "mensaje": mensaje,
-        "empresa": _empresa_data(),
+        "empresa": empresa if empresa is not None else _empresa_data(),
         "turno": turno_info,
         "pago_principal": ultimo_movimiento,
         "movimientos": movimientos,
@@ -225,7 +234,7 @@ def _draw_line(pdf, y):
     pdf.line(40, y, 555, y)
 
 
-def _comprobante_pago_pdf_response(data: dict):
+def _comprobante_pago_pdf(data: dict) -> bytes:
     buffer = BytesIO()
     pdf = canvas.Canvas(buffer, pagesize=A4)
     width, height = A4
@@ -292,13 +301,10 @@ def _comprobante_pago_pdf_response(data: dict):
     pdf.drawString(58, 70, data["leyenda"])
     pdf.showPage()
     pdf.save()
-    buffer.seek(0)
-    response = HttpResponse(buffer.read(), content_type="application/pdf")
-    response["Content-Disposition"] = f'attachment; filename="comprobante_pago_turno_{turno["id"]}.pdf"'
-    return response
+    return buffer.getvalue()
 
 
-def _comprobante_final_pdf_response(data: dict):
+def _comprobante_final_pdf(data: dict) -> bytes:
     buffer = BytesIO()
     pdf = canvas.Canvas(buffer, pagesize=A4)
     width, height = A4
@@ -352,10 +358,7 @@ def _comprobante_final_pdf_response(data: dict):
     pdf.drawString(58, y, data["leyenda"])
     pdf.showPage()
     pdf.save()
-    buffer.seek(0)
-    response = HttpResponse(buffer.read(), content_type="application/pdf")
-    response["Content-Disposition"] = f'attachment; filename="comprobante_final_turno_{turno["id"]}.pdf"'
-    return response
+    return buffer.getvalue()
 
 
 def _comprobante_pdf_response(data: dict):
@@ -501,7 +504,14 @@ def comprobante_pago_turno_pdf(request, turno_id: int):
         return error
     if not turno.movimientos_pago.filter(estado="aprobado").exists() and not turno.pagos_mercadopago.filter(estado="approved").exists() and Decimal(str(turno.senia_pagada or 0)) <= Decimal("0.00"):
         return Response({"detail": "Este turno no tiene pagos registrados."}, status=status.HTTP_404_NOT_FOUND)
-    return _comprobante_pago_pdf_response(_comprobante_data(turno, "pago"))
+    return comprobantes_pdf_service.responder_pdf(
+        request,
+        turno.id,
+        "pago",
+        lambda: _comprobante_data(turno, "pago"),
+        _comprobante_pago_pdf,
+        f"comprobante_pago_turno_{turno.id}.pdf",
+    )
 
 
 @api_view(["GET"])
@@ -512,4 +522,73 @@ def comprobante_final_turno_pdf(request, turno_id: int):
         return error
     if turno.estado != "completado":
         return Response({"detail": "El turno todavia no fue finalizado."}, status=status.HTTP_400_BAD_REQUEST)
-    return _comprobante_final_pdf_response(_comprobante_data(turno, "final"))
+    return comprobantes_pdf_service.responder_pdf(
+        request,
+        turno.id,
+        "final",
+        lambda: _comprobante_data(turno, "final"),
+        _comprobante_final_pdf,
+        f"comprobante_final_turno_{turno.id}.pdf",
+    )
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def exportar_comprobantes_zip(request):
+    """
+    ZIP con los comprobantes de pago y finales de un período, para contabilidad.
+
+    Query params:
+    - fecha_desde, fecha_hasta: rango de fechas del turno (YYYY-MM-DD, obligatorios)
+    - tipo: pago | final | todos (default: todos)
+    - empleado_id, servicio_id: filtros opcionales
+    """
+    if getattr(request.user, "role", None) not in ["propietario", "superusuario"]:
+        return Response({"error": "No tienes permisos para exportar comprobantes"}, status=403)
+
+    try:
+        fecha_desde = datetime.strptime(request.query_params.get("fecha_desde", ""), "%Y-%m-%d").date()
+        fecha_hasta = datetime.strptime(request.query_params.get("fecha_hasta", ""), "%Y-%m-%d").date()
+    except ValueError:
+        return Response(
+            {"detail": "fecha_desde y fecha_hasta son obligatorias (YYYY-MM-DD)."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    max_dias = int(getattr(settings, "COMPROBANTES_EXPORT_MAX_DIAS", 366))
+    if fecha_hasta < fecha_desde or fecha_hasta - fecha_desde > timedelta(days=max_dias):
+        return Response(
+            {"detail": f"El rango debe ser válido y de hasta {max_dias} días."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    tipo = request.query_params.get("tipo", "todos")
+    if tipo not in {"pago", "final", "todos"}:
+        return Response({"detail": "tipo debe ser pago, final o todos."}, status=status.HTTP_400_BAD_REQUEST)
+    tipos = exportacion_comprobantes_service.TIPOS_EXPORTACION if tipo == "todos" else (tipo,)
+
+    filtros = {}
+    for campo in ("empleado_id", "servicio_id"):
+        valor = request.query_params.get(campo)
+        if not valor:
+            continue
+        try:
+            filtros[campo] = int(valor)
+        except ValueError:
+            return Response(
+                {"detail": f"{campo} debe ser un ID numérico válido."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+    turnos = exportacion_comprobantes_service.turnos_a_exportar(
+        fecha_desde, fecha_hasta, tipos, **filtros
+    )
+    response = StreamingHttpResponse(
+        exportacion_comprobantes_service.generar_zip(
+            exportacion_comprobantes_service.entradas_comprobantes(turnos, tipos)
+        ),
+        content_type="application/zip",
+    )
+    response["Content-Disposition"] = (
+        f'attachment; filename="comprobantes_{fecha_desde:%Y%m%d}_{fecha_hasta:%Y%m%d}.zip"'
+    )
+    return response
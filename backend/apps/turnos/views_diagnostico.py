@@ -218,18 +218,13 @@ def diagnostico_optimizacion_agenda(request):
                 # Calcular monto a acreditar: solo la seña pagada
                 monto_credito = turno.senia_pagada or Decimal("0.00")
 
-                # Agregar crédito
+                # Agregar crédito (con referencia al turno)
                 billetera.agregar_saldo(
                     monto=monto_credito,
                     motivo=f"Cancelación anticipada (diagnóstico) del turno #{turno.id} - {turno.servicio.nombre}",
+                    turno=turno,
                 )
 
-                # Actualizar movimiento con referencia al turno
-                ultimo_movimiento = billetera.movimientos.first()
-                if ultimo_movimiento:
-                    ultimo_movimiento.turno = turno
-                    ultimo_movimiento.save()
-
                 credito_aplicado = True
 
                 resultado["logs"].append(
@@ -1073,3 +1068,31 @@ def diagnostico_fidelidad_racha(request):
         },
         status=status.HTTP_200_OK,
     )
+
+
+@api_view(["GET", "DELETE"])
+@permission_classes([IsAuthenticated])
+def diagnostico_requests_lentos(request):
+    """Lista (GET) o vacía (DELETE) el buffer de requests lentos del perfilador.
+
+    El buffer es por proceso: con varios workers cada uno guarda sus propios
+    requests lentos.
+    """
+
+    forbidden = _validar_propietario_diagnostico(request)
+    if forbidden:
+        return forbidden
+
+    from apps.core.middleware import clear_slow_requests, get_slow_requests
+
+    if request.method == "DELETE":
+        return Response({"descartados": clear_slow_requests()}, status=status.HTTP_200_OK)
+
+    return Response(
+        {
+            "perfilado_activo": bool(getattr(settings, "REQUEST_PROFILING_ENABLED", False)),
+            "umbral_ms": getattr(settings, "REQUEST_PROFILING_SLOW_MS", None),
+            "requests": get_slow_requests(),
+        },
+        status=status.HTTP_200_OK,
+    )
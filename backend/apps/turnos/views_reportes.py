@@ -1,18 +1,133 @@
 """Vistas para reportes y estadísticas"""
 
-from rest_framework.decorators import api_view, permission_classes
+import logging
+
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from django.core.paginator import Paginator
 from django.db.models import Sum, Count, Q
-from django.db.models.functions import TruncMonth
-from datetime import datetime, timedelta, time
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from datetime import datetime, timedelta
 from decimal import Decimal
-from .models import Turno
+from .models import ExportacionReporte, Turno
+from .services import exportacion_reportes_service
+
+logger = logging.getLogger(__name__)
+
+
+class _ExportacionRenderer(JSONRenderer):
+    """Habilita ``?format=csv|xlsx``: la vista arma el archivo y los errores salen en JSON."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get("response")
+        if response is not None:
+            response["Content-Type"] = "application/json"
+        return super().render(data, "application/json", renderer_context)
+
+
+class CSVExportRenderer(_ExportacionRenderer):
+    media_type = "text/csv"
+    format = "csv"
+
+
+class XLSXExportRenderer(_ExportacionRenderer):
+    media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    format = "xlsx"
+
+
+REPORTE_RENDERERS = [JSONRenderer, CSVExportRenderer, XLSXExportRenderer]
+
+# Filas por fuente que la vista de billetera trae antes de filtrar y paginar.
+_TOPES_BILLETERA = {"usuarios_credito": 500, "pagos_mp": 300, "logins": 300, "turnos": 700, "servicios": 400}
+
+
+def _exportar_reporte(request, reporte, default_days=90):
+    """Respuesta CSV/XLSX si se pidió ``?format=csv|xlsx``; ``None`` si no.
+
+    Con ``modo=async`` no se genera en el request: se encola la exportación
+    y se responde 202 con su id.
+    """
+    formato = getattr(request.accepted_renderer, "format", None)
+    if formato not in exportacion_reportes_service.FORMATOS:
+        return None
+    if request.user.role not in ["propietario", "superusuario"]:
+        return Response({"error": "No tienes permisos para exportar este reporte"}, status=403)
+
+    fecha_desde, fecha_hasta, error = _parse_report_dates(request, default_days=default_days)
+    if error:
+        return error
+    params = request.query_params.dict()
+    params.pop("format", None)
+    params.update(fecha_desde=fecha_desde.isoformat(), fecha_hasta=fecha_hasta.isoformat())
+
+    if (request.query_params.get("modo") or "").lower() == "async":
+        exportacion = ExportacionReporte.objects.create(
+            usuario=request.user, reporte=reporte, formato=formato, parametros=params
+        )
+        if not _encolar_exportacion(exportacion):
+            return Response(_exportacion_data(exportacion), status=503)
+        return Response(_exportacion_data(exportacion), status=202)
+
+    try:
+        tablas = exportacion_reportes_service.tablas_reporte(
+            reporte, params, fecha_desde, fecha_hasta, formato
+        )
+    except ValueError:
+        return Response({"error": "Parámetros de exportación inválidos"}, status=400)
+    response = StreamingHttpResponse(
+        exportacion_reportes_service.generar(tablas, formato),
+        content_type=exportacion_reportes_service.CONTENT_TYPES[formato],
+    )
+    nombre = exportacion_reportes_service.nombre_archivo(reporte, fecha_desde, fecha_hasta, formato)
+    response["Content-Disposition"] = f'attachment; filename="{nombre}"'
+    return response
+
+
+def _encolar_exportacion(exportacion):
+    """Encola la exportación; si el broker no responde la marca con error.
+
+    No se genera en el request: justamente ``modo=async`` existe para los
+    reportes que no entran en el tiempo de una respuesta.
+    """
+    from .tasks import generar_exportacion_reporte
+
+    try:
+        generar_exportacion_reporte.delay(exportacion.pk)
+    except Exception:
+        logger.exception("No se pudo encolar la exportación de reporte %s", exportacion.pk)
+        exportacion.estado = ExportacionReporte.ESTADO_ERROR
+        exportacion.error = "No se pudo encolar la exportación. Intenta nuevamente más tarde."
+        exportacion.finalizado_en = timezone.now()
+        exportacion.save(update_fields=["estado", "error", "finalizado_en"])
+        return False
+    return True
+
+
+def _exportacion_data(exportacion):
+    return {
+        "id": exportacion.id,
+        "reporte": exportacion.reporte,
+        "formato": exportacion.formato,
+        "estado": exportacion.estado,
+        "filas": exportacion.filas,
+        "error": exportacion.error,
+        "parametros": exportacion.parametros,
+        "creado_en": exportacion.creado_en.isoformat(),
+        "finalizado_en": exportacion.finalizado_en.isoformat() if exportacion.finalizado_en else None,
+        "descarga_url": (
+            f"/api/turnos/reportes/exportaciones/{exportacion.id}/descargar/"
+            if exportacion.estado == ExportacionReporte.ESTADO_LISTA
+            else None
+        ),
+    }
 
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@renderer_classes(REPORTE_RENDERERS)
 def reportes_finanzas(request):
     """
     Endpoint para obtener datos financieros agregados
@@ -21,6 +136,9 @@ def reportes_finanzas(request):
     - fecha_desde: Fecha inicio (formato: YYYY-MM-DD)
     - fecha_hasta: Fecha fin (formato: YYYY-MM-DD)
     """
+    exportacion = _exportar_reporte(request, "finanzas", default_days=180)
+    if exportacion is not None:
+        return exportacion
 
     # Obtener parámetros de fecha
     fecha_desde_str = request.query_params.get("fecha_desde")
@@ -38,19 +156,12 @@ def reportes_finanzas(request):
         # 6 meses atrás
         fecha_desde = fecha_hasta - timedelta(days=180)
 
-    # Filtrar turnos en el rango de fechas
-    turnos_query = Turno.objects.filter(
-        fecha_hora__date__gte=fecha_desde, fecha_hora__date__lte=fecha_hasta
-    )
+    # Mismas consultas que la exportación CSV/XLSX del reporte
+    consultas = exportacion_reportes_service.consultas_finanzas(fecha_desde, fecha_hasta)
+    turnos_query = consultas["turnos"]
 
     # 1. Ingresos mensuales (solo turnos completados)
-    ingresos_mensuales = (
-        turnos_query.filter(estado="completado")
-        .annotate(mes=TruncMonth("fecha_hora"))
-        .values("mes")
-        .annotate(total=Sum("precio_final"), cantidad_turnos=Count("id"))
-        .order_by("mes")
-    )
+    ingresos_mensuales = consultas["ingresos_mensuales"]
 
     # Formatear datos para el frontend
     ingresos_data = []
@@ -94,12 +205,7 @@ def reportes_finanzas(request):
         tasa_conversion = 0
 
     # 6. Ingresos por servicio (top 5)
-    ingresos_por_servicio = (
-        turnos_query.filter(estado="completado")
-        .values("servicio__nombre", "servicio__id")
-        .annotate(total=Sum("precio_final"), cantidad=Count("id"))
-        .order_by("-total")[:5]
-    )
+    ingresos_por_servicio = consultas["ingresos_por_servicio"][:5]
 
     servicios_data = []
     for item in ingresos_por_servicio:
@@ -113,14 +219,7 @@ def reportes_finanzas(request):
         )
 
     # 7. Ingresos por profesional
-    ingresos_por_empleado = (
-        turnos_query.filter(estado="completado")
-        .values(
-            "empleado__user__first_name", "empleado__user__last_name", "empleado__id"
-        )
-        .annotate(total=Sum("precio_final"), cantidad=Count("id"))
-        .order_by("-total")
-    )
+    ingresos_por_empleado = consultas["ingresos_por_profesional"]
 
     empleados_data = []
     for item in ingresos_por_empleado:
@@ -162,25 +261,21 @@ def reportes_finanzas(request):
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@renderer_classes(REPORTE_RENDERERS)
 def reportes_billetera(request):
     """Endpoint de auditoría financiera y operativa con filtros."""
-    from apps.clientes.models import MovimientoBilletera, Billetera
-    from apps.emails.models import AccessToken
-    from apps.mercadopago.models import PagoMercadoPago
-    from apps.servicios.models import Servicio
+    exportacion = _exportar_reporte(request, "billetera", default_days=30)
+    if exportacion is not None:
+        return exportacion
+
+    from apps.clientes.models import Billetera
+    from apps.clientes.services.billetera_service import totales_movimientos
 
     fecha_desde_str = request.query_params.get("fecha_desde")
     fecha_hasta_str = request.query_params.get("fecha_hasta")
-    accion_filtro = (request.query_params.get("accion") or "todas").lower()
-    entidad_filtro = (request.query_params.get("entidad") or "todas").lower()
-    actor_filtro = (request.query_params.get("actor") or "").strip().lower()
-    status_filtro = (request.query_params.get("status") or "todos").strip().lower()
     sort_by = (request.query_params.get("sort_by") or "fecha_hora").strip().lower()
     sort_dir = (request.query_params.get("sort_dir") or "desc").strip().lower()
 
-    monto_desde_raw = request.query_params.get("monto_desde")
-    monto_hasta_raw = request.query_params.get("monto_hasta")
-
     try:
         page = int(request.query_params.get("page", 1))
     except (TypeError, ValueError):
@@ -209,45 +304,14 @@ def reportes_billetera(request):
             {"error": "Formato de fecha inválido. Use YYYY-MM-DD."}, status=400
         )
 
-    fecha_desde_dt = datetime.combine(fecha_desde, time.min)
-    fecha_hasta_dt = datetime.combine(fecha_hasta, time.max)
-
-    movimientos = MovimientoBilletera.objects.filter(
-        created_at__date__gte=fecha_desde, created_at__date__lte=fecha_hasta
-    ).select_related("billetera__cliente__user")
-
-    pagos_qs = PagoMercadoPago.objects.filter(
-        creado_en__date__gte=fecha_desde, creado_en__date__lte=fecha_hasta
-    ).select_related("cliente__user", "turno")
-
-    access_tokens_qs = AccessToken.objects.filter(
-        created_at__date__gte=fecha_desde, created_at__date__lte=fecha_hasta
-    ).select_related("user")
-
-    turno_history_qs = (
-        Turno.history.model.objects.filter(
-            history_date__gte=fecha_desde_dt,
-            history_date__lte=fecha_hasta_dt,
-        )
-        .select_related("history_user", "cliente__user", "servicio")
-        .order_by("-history_date")
-    )
-
-    servicio_history_qs = (
-        Servicio.history.model.objects.filter(
-            history_date__gte=fecha_desde_dt,
-            history_date__lte=fecha_hasta_dt,
-        )
-        .select_related("history_user")
-        .order_by("-history_date")
-    )
+    try:
+        incluida = exportacion_reportes_service.filtro_billetera(request.query_params)
+    except ValueError as exc:
+        return Response({"error": str(exc)}, status=400)
 
-    total_creditos = movimientos.filter(tipo="credito").aggregate(total=Sum("monto"))[
-        "total"
-    ] or Decimal("0")
-    total_debitos = movimientos.filter(tipo="debito").aggregate(total=Sum("monto"))[
-        "total"
-    ] or Decimal("0")
+    totales_billetera = totales_movimientos(fecha_desde, fecha_hasta)
+    total_creditos = totales_billetera["creditos"]
+    total_debitos = totales_billetera["debitos"]
     total_ingresos = Turno.objects.filter(
         estado="completado",
         fecha_hora__date__gte=fecha_desde,
@@ -259,199 +323,15 @@ def reportes_billetera(request):
     )
     billeteras_con_saldo = Billetera.objects.filter(saldo__gt=0).count()
 
-    accion_map = {
-        "+": ("insercion", "Inserción"),
-        "~": ("modificacion", "Modificación"),
-        "-": ("eliminacion", "Eliminación"),
-    }
-
-    registros = []
-
-    for mov in movimientos.order_by("-created_at")[:500]:
-        cliente = mov.billetera.cliente
-        actor = cliente.nombre_completo
-        actor_email = cliente.email or ""
-        monto = float(mov.monto or 0)
-        if mov.tipo == "debito":
-            monto = -abs(monto)
-
-        registros.append(
-            {
-                "id": f"mov-{mov.id}",
-                "fecha_hora": mov.created_at.isoformat(),
-                "descripcion": mov.descripcion
-                or f"Movimiento de billetera ({mov.get_tipo_display()})",
-                "monto": monto,
-                "status": "Aplicado",
-                "entidad": "Usuarios/Crédito",
-                "entidad_key": "usuarios_credito",
-                "actor": actor,
-                "actor_email": actor_email,
-                "detalle": f"Saldo: ${mov.saldo_anterior} -> ${mov.saldo_nuevo}",
-                "accion": "Inserción",
-                "accion_key": "insercion",
-            }
-        )
-
-    for pago in pagos_qs.order_by("-creado_en")[:300]:
-        actor = pago.cliente.nombre_completo if pago.cliente else "Sistema"
-        actor_email = pago.cliente.email if pago.cliente else ""
-
-        registros.append(
-            {
-                "id": f"pago-{pago.id}",
-                "fecha_hora": pago.creado_en.isoformat(),
-                "descripcion": f"Pago MP ({pago.preference_id})",
-                "monto": float(pago.monto or 0),
-                "status": pago.get_estado_display(),
-                "entidad": "Pagos (MP)",
-                "entidad_key": "pagos_mp",
-                "actor": actor,
-                "actor_email": actor_email,
-                "detalle": f"Turno #{pago.turno_id}",
-                "accion": "Inserción",
-                "accion_key": "insercion",
-            }
-        )
-
-    for token in access_tokens_qs.order_by("-created_at")[:300]:
-        actor = token.user.full_name
-        actor_email = token.user.email
-        if token.used_at:
-            estado = "Usado"
-        elif token.is_expired:
-            estado = "Expirado"
-        else:
-            estado = "Activo"
-
-        registros.append(
-            {
-                "id": f"login-{token.id}",
-                "fecha_hora": token.created_at.isoformat(),
-                "descripcion": "Generación de acceso mágico",
-                "monto": None,
-                "status": estado,
-                "entidad": "Logins (Inicios de Sesión)",
-                "entidad_key": "logins",
-                "actor": actor,
-                "actor_email": actor_email,
-                "detalle": token.get_tipo_accion_display(),
-                "accion": "Inserción",
-                "accion_key": "insercion",
-            }
-        )
-
-    for record in turno_history_qs[:700]:
-        accion_key, accion_label = accion_map.get(
-            record.history_type, ("modificacion", "Modificación")
-        )
-        actor = record.history_user.full_name if record.history_user else "Sistema"
-        actor_email = (
-            record.history_user.email if record.history_user else "system@local"
-        )
-        servicio_nombre = record.servicio.nombre if record.servicio else "Sin servicio"
-
-        registros.append(
-            {
-                "id": f"turno-{record.id}-{record.history_id}",
-                "fecha_hora": record.history_date.isoformat(),
-                "descripcion": f"Turno #{record.id} · {servicio_nombre}",
-                "monto": (
-                    float(record.precio_final)
-                    if record.precio_final is not None
-                    else None
-                ),
-                "status": (record.estado or "").replace("_", " ").title() or "N/A",
-                "entidad": "Turnos",
-                "entidad_key": "turnos",
-                "actor": actor,
-                "actor_email": actor_email,
-                "detalle": record.history_change_reason or "Cambio en turno",
-                "accion": accion_label,
-                "accion_key": accion_key,
-            }
-        )
-
-    for record in servicio_history_qs[:400]:
-        accion_key, accion_label = accion_map.get(
-            record.history_type, ("modificacion", "Modificación")
-        )
-        actor = record.history_user.full_name if record.history_user else "Sistema"
-        actor_email = (
-            record.history_user.email if record.history_user else "system@local"
-        )
-
-        registros.append(
-            {
-                "id": f"servicio-{record.id}-{record.history_id}",
-                "fecha_hora": record.history_date.isoformat(),
-                "descripcion": f"Servicio · {record.nombre}",
-                "monto": float(record.precio) if record.precio is not None else None,
-                "status": (
-                    "Activo" if getattr(record, "is_active", False) else "Inactivo"
-                ),
-                "entidad": "Servicios",
-                "entidad_key": "servicios",
-                "actor": actor,
-                "actor_email": actor_email,
-                "detalle": record.history_change_reason or "Cambio en servicio",
-                "accion": accion_label,
-                "accion_key": accion_key,
-            }
-        )
-
-    registros = sorted(registros, key=lambda item: item["fecha_hora"], reverse=True)
-
-    if accion_filtro != "todas":
-        registros = [item for item in registros if item["accion_key"] == accion_filtro]
-
-    if entidad_filtro != "todas":
-        registros = [
-            item for item in registros if item["entidad_key"] == entidad_filtro
-        ]
-
-    if actor_filtro:
-        registros = [
-            item
-            for item in registros
-            if actor_filtro in item["actor"].lower()
-            or actor_filtro in item["actor_email"].lower()
-        ]
-
-    if status_filtro != "todos":
-        registros = [
-            item
-            for item in registros
-            if (item.get("status") or "").strip().lower() == status_filtro
-        ]
-
-    monto_desde = None
-    monto_hasta = None
-    if monto_desde_raw not in (None, ""):
-        try:
-            monto_desde = float(monto_desde_raw)
-        except (TypeError, ValueError):
-            return Response({"error": "monto_desde inválido"}, status=400)
-
-    if monto_hasta_raw not in (None, ""):
-        try:
-            monto_hasta = float(monto_hasta_raw)
-        except (TypeError, ValueError):
-            return Response({"error": "monto_hasta inválido"}, status=400)
-
-    if monto_desde is not None:
-        registros = [
-            item
-            for item in registros
-            if item.get("monto") is not None and float(item["monto"]) >= monto_desde
-        ]
-
-    if monto_hasta is not None:
-        registros = [
-            item
-            for item in registros
-            if item.get("monto") is not None and float(item["monto"]) <= monto_hasta
-        ]
+    fuentes = exportacion_reportes_service.consultas_billetera(
+        request.query_params, fecha_desde, fecha_hasta, limites=_TOPES_BILLETERA
+    )
+    registros = [
+        _registro_billetera(fila)
+        for filas in fuentes.values()
+        for fila in filas
+        if incluida(fila)
+    ]
 
     if sort_by not in {"fecha_hora", "monto", "status"}:
         sort_by = "fecha_hora"
@@ -493,7 +373,7 @@ def reportes_billetera(request):
                 "total_debitos": float(total_debitos),
                 "saldo_total_sistema": float(saldo_total),
                 "billeteras_activas": billeteras_con_saldo,
-                "total_movimientos": movimientos.count(),
+                "total_movimientos": totales_billetera["cantidad"],
             },
             "filtros": {
                 "acciones": [
@@ -528,6 +408,13 @@ def reportes_billetera(request):
     )
 
 
+def _registro_billetera(fila):
+    registro = dict(fila)
+    registro["fecha_hora"] = registro.pop("fecha").isoformat()
+    registro["monto"] = float(fila["monto"]) if fila["monto"] is not None else None
+    return registro
+
+
 def _parse_report_dates(request, default_days=90):
     fecha_desde_str = request.query_params.get("fecha_desde")
     fecha_hasta_str = request.query_params.get("fecha_hasta")
@@ -566,13 +453,13 @@ def _format_turno_summary(turno):
     }
 
 
-def _apply_turno_common_filters(qs, request):
-    estado = request.query_params.get("estado")
-    cliente_id = request.query_params.get("cliente")
-    sala_id = request.query_params.get("sala")
-    profesional_id = request.query_params.get("profesional")
-    servicio_id = request.query_params.get("servicio")
-    search = (request.query_params.get("search") or "").strip()
+def _apply_turno_common_filters(qs, params):
+    estado = params.get("estado")
+    cliente_id = params.get("cliente")
+    sala_id = params.get("sala")
+    profesional_id = params.get("profesional")
+    servicio_id = params.get("servicio")
+    search = (params.get("search") or "").strip()
 
     if estado and estado != "todos":
         qs = qs.filter(estado=estado)
@@ -620,141 +507,30 @@ def _apply_turno_common_filters(qs, request):
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@renderer_classes(REPORTE_RENDERERS)
 def reportes_automatizaciones(request):
     """Auditoría detallada de procesos automáticos (PA)."""
+    exportacion = _exportar_reporte(request, "automatizaciones", default_days=30)
+    if exportacion is not None:
+        return exportacion
+
     if request.user.role not in ["propietario", "superusuario"]:
         return Response({"error": "No tienes permisos para ver este reporte"}, status=403)
 
-    from apps.emails.models import Notificacion
-    from apps.turnos.models import LogReasignacion, StreakCoupon, StreakRewardEvent
-
     fecha_desde, fecha_hasta, error = _parse_report_dates(request, default_days=30)
     if error:
         return error
 
-    pa = request.query_params.get("pa", "todos")
-    cliente_id = request.query_params.get("cliente")
-    search = (request.query_params.get("search") or "").strip().lower()
-    desde_dt = datetime.combine(fecha_desde, time.min)
-    hasta_dt = datetime.combine(fecha_hasta, time.max)
-    registros = []
-
-    if pa in ["todos", "pa1"]:
-        qs = Notificacion.objects.filter(
-            tipo="fidelizacion",
-            created_at__gte=desde_dt,
-            created_at__lte=hasta_dt,
-        ).select_related("usuario")
-        if cliente_id and cliente_id != "todos":
-            qs = qs.filter(usuario__cliente_profile__id=cliente_id)
-        for item in qs[:500]:
-            data = item.data or {}
-            registros.append({
-                "id": f"pa1-{item.id}",
-                "pa": "PA1",
-                "proceso": "Fidelización",
-                "fecha": item.created_at.isoformat(),
-                "cliente": item.usuario.full_name,
-                "cliente_email": item.usuario.email,
-                "estado": "Leída" if item.leida else "Enviada",
-                "detalle": item.titulo,
-                "datos": {
-                    "mensaje": item.mensaje,
-                    "tipo_email": data.get("tipo_email"),
-                    "servicio_id": data.get("servicio_id"),
-                    "fecha_sugerida": data.get("fecha_sugerida"),
-                    "fecha_ultimo_turno": data.get("fecha_ultimo_turno"),
-                },
-            })
-
-    if pa in ["todos", "pa2"]:
-        qs = LogReasignacion.objects.filter(
-            fecha_envio__gte=desde_dt,
-            fecha_envio__lte=hasta_dt,
-        ).select_related("cliente_notificado__user", "turno_cancelado__servicio", "turno_ofrecido")
-        if cliente_id and cliente_id != "todos":
-            qs = qs.filter(cliente_notificado_id=cliente_id)
-        for item in qs[:500]:
-            registros.append({
-                "id": f"pa2-{item.id}",
-                "pa": "PA2",
-                "proceso": "Reacomodamiento",
-                "fecha": item.fecha_envio.isoformat(),
-                "cliente": item.cliente_notificado.nombre_completo,
-                "cliente_email": item.cliente_notificado.email,
-                "estado": item.estado_final or "pendiente",
-                "detalle": f"Cancelado #{item.turno_cancelado_id} / Ofrecido #{item.turno_ofrecido_id or '-'}",
-                "datos": {
-                    "monto_descuento": str(item.monto_descuento),
-                    "regla_descuento_aplicada": item.regla_descuento_aplicada,
-                    "expira": item.expires_at.isoformat() if item.expires_at else None,
-                    "estado_anterior": item.estado_anterior,
-                    "estado_posterior": item.estado_posterior,
-                },
-            })
-
-    if pa in ["todos", "pa3"]:
-        qs = StreakRewardEvent.objects.filter(
-            created_at__gte=desde_dt,
-            created_at__lte=hasta_dt,
-        ).select_related("cliente__user", "turno")
-        if cliente_id and cliente_id != "todos":
-            qs = qs.filter(cliente_id=cliente_id)
-        for item in qs[:500]:
-            registros.append({
-                "id": f"pa3-event-{item.id}",
-                "pa": "PA3",
-                "proceso": "Racha y cupón",
-                "fecha": item.created_at.isoformat(),
-                "cliente": item.cliente.nombre_completo,
-                "cliente_email": item.cliente.email,
-                "estado": item.get_status_display(),
-                "detalle": f"Hito {item.milestone_number} en turno #{item.turno_id}",
-                "datos": {
-                    "racha_anterior": item.streak_before,
-                    "racha_posterior": item.streak_after,
-                    "bono": str(item.bonus_amount),
-                    "descuento_aplicado": str(item.applied_discount_amount),
-                    "motivo": item.reason,
-                    "valor_anterior": item.valor_anterior,
-                    "valor_posterior": item.valor_posterior,
-                },
-            })
-
-        coupons = StreakCoupon.objects.filter(
-            created_at__gte=desde_dt,
-            created_at__lte=hasta_dt,
-        ).select_related("cliente__user", "used_turno")
-        if cliente_id and cliente_id != "todos":
-            coupons = coupons.filter(cliente_id=cliente_id)
-        for item in coupons[:500]:
-            registros.append({
-                "id": f"pa3-coupon-{item.id}",
-                "pa": "PA3",
-                "proceso": "Cupón de racha",
-                "fecha": item.created_at.isoformat(),
-                "cliente": item.cliente.nombre_completo,
-                "cliente_email": item.cliente.email,
-                "estado": item.get_status_display(),
-                "detalle": item.code or f"Cupón hito {item.milestone_number}",
-                "datos": {
-                    "hito": item.milestone_number,
-                    "descuento": str(item.discount_amount),
-                    "reclamado": item.claimed_at.isoformat() if item.claimed_at else None,
-                    "usado": item.used_at.isoformat() if item.used_at else None,
-                    "turno_usado": item.used_turno_id,
-                    "vence": item.expires_at.isoformat() if item.expires_at else None,
-                },
-            })
-
-    if search:
-        registros = [
-            item for item in registros
-            if search in item["cliente"].lower()
-            or search in (item["cliente_email"] or "").lower()
-            or search in item["proceso"].lower()
-            or search in item["detalle"].lower()
-        ]
+    incluida = exportacion_reportes_service.filtro_automatizaciones(request.query_params)
+    fuentes = exportacion_reportes_service.consultas_automatizaciones(
+        request.query_params, fecha_desde, fecha_hasta, limite=500
+    )
+    registros = [
+        {**fila, "fecha": fila["fecha"].isoformat()}
+        for filas in fuentes
+        for fila in filas
+        if incluida(fila)
+    ]
 
     registros = sorted(registros, key=lambda item: item["fecha"], reverse=True)
     return Response({
@@ -772,7 +548,12 @@ def reportes_automatizaciones(request):
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@renderer_classes(REPORTE_RENDERERS)
 def reportes_clientes(request):
+    exportacion = _exportar_reporte(request, "clientes", default_days=90)
+    if exportacion is not None:
+        return exportacion
+
     if request.user.role not in ["propietario", "superusuario"]:
         return Response({"error": "No tienes permisos para ver este reporte"}, status=403)
     from apps.clientes.models import Cliente
@@ -781,7 +562,7 @@ def reportes_clientes(request):
     if error:
         return error
     qs = Turno.objects.filter(fecha_hora__date__gte=fecha_desde, fecha_hora__date__lte=fecha_hasta).select_related("cliente__user", "empleado__user", "servicio", "sala")
-    qs = _apply_turno_common_filters(qs, request)
+    qs = _apply_turno_common_filters(qs, request.query_params)
     clientes = Cliente.objects.select_related("user").filter(id__in=qs.values("cliente_id").distinct())
     rows = []
     for cliente in clientes[:300]:
@@ -805,7 +586,12 @@ def reportes_clientes(request):
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@renderer_classes(REPORTE_RENDERERS)
 def reportes_salas(request):
+    exportacion = _exportar_reporte(request, "salas", default_days=90)
+    if exportacion is not None:
+        return exportacion
+
     if request.user.role not in ["propietario", "superusuario"]:
         return Response({"error": "No tienes permisos para ver este reporte"}, status=403)
     from apps.servicios.models import Sala
@@ -814,7 +600,7 @@ def reportes_salas(request):
     if error:
         return error
     qs = Turno.objects.filter(fecha_hora__date__gte=fecha_desde, fecha_hora__date__lte=fecha_hasta).select_related("cliente__user", "empleado__user", "servicio", "sala")
-    qs = _apply_turno_common_filters(qs, request)
+    qs = _apply_turno_common_filters(qs, request.query_params)
     salas = Sala.objects.filter(id__in=qs.values("sala_id").distinct())
     rows = []
     for sala in salas[:300]:
@@ -839,7 +625,12 @@ def reportes_salas(request):
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@renderer_classes(REPORTE_RENDERERS)
 def reportes_profesionales(request):
+    exportacion = _exportar_reporte(request, "profesionales", default_days=90)
+    if exportacion is not None:
+        return exportacion
+
     if request.user.role not in ["propietario", "superusuario"]:
         return Response({"error": "No tienes permisos para ver este reporte"}, status=403)
     from apps.empleados.models import Empleado
@@ -849,7 +640,7 @@ def reportes_profesionales(request):
     if error:
         return error
     qs = Turno.objects.filter(fecha_hora__date__gte=fecha_desde, fecha_hora__date__lte=fecha_hasta).select_related("cliente__user", "empleado__user", "servicio", "sala")
-    qs = _apply_turno_common_filters(qs, request)
+    qs = _apply_turno_common_filters(qs, request.query_params)
     profesionales = Empleado.objects.select_related("user").filter(id__in=qs.values("empleado_id").distinct())
     rows = []
     for profesional in profesionales[:300]:
@@ -875,63 +666,35 @@ def reportes_profesionales(request):
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@renderer_classes(REPORTE_RENDERERS)
 def auditoria_operativa(request):
     """Reporte operativo unificado basado en tablas y filtros globales."""
+    exportacion = _exportar_reporte(request, "auditoria_operativa", default_days=90)
+    if exportacion is not None:
+        return exportacion
+
     if request.user.role not in ["propietario", "superusuario"]:
         return Response({"error": "No tienes permisos para ver este reporte"}, status=403)
 
-    from apps.clientes.models import Cliente, MovimientoBilletera
+    from apps.clientes.models import Cliente
     from apps.empleados.models import Empleado
     from apps.emails.models import Notificacion
-    from apps.mercadopago.models import PagoMercadoPago
     from apps.servicios.models import Sala, Servicio
-    from apps.turnos.models import HistorialTurno, LogReasignacion, StreakRewardEvent
+    from apps.turnos.models import HistorialTurno
 
     fecha_desde, fecha_hasta, error = _parse_report_dates(request, default_days=90)
     if error:
         return error
 
-    desde_dt = datetime.combine(fecha_desde, time.min)
-    hasta_dt = datetime.combine(fecha_hasta, time.max)
     search = (request.query_params.get("search") or "").strip()
     cliente_id = request.query_params.get("cliente")
-    profesional_id = request.query_params.get("profesional")
-    servicio_id = request.query_params.get("servicio")
-    sala_id = request.query_params.get("sala")
-    estado = request.query_params.get("estado")
-    canal = request.query_params.get("canal")
     tipo = request.query_params.get("tipo") or "todos"
 
-    turnos_qs = Turno.objects.filter(
-        fecha_hora__date__gte=fecha_desde,
-        fecha_hora__date__lte=fecha_hasta,
-    ).select_related("cliente__user", "empleado__user", "servicio__categoria", "sala")
-    turnos_qs = _apply_turno_common_filters(turnos_qs, request)
-    if canal and canal != "todos":
-        if canal == "telegram":
-            try:
-                turno_ids = HistorialTurno.objects.filter(origen="telegram").values("turno_id")
-                turnos_qs = turnos_qs.filter(id__in=turno_ids)
-            except Exception:
-                turnos_qs = turnos_qs.none()
-        elif canal == "web":
-            turnos_qs = turnos_qs.filter(canal_reserva="web_cliente")
-        elif canal == "panel":
-            turnos_qs = turnos_qs.filter(canal_reserva__in=["panel_profesional", "panel_propietario"])
-        elif canal == "sistema":
-            turnos_qs = turnos_qs.filter(canal_reserva__isnull=True)
+    consultas = exportacion_reportes_service.consultas_auditoria(request.query_params, fecha_desde, fecha_hasta)
+    turnos_qs = consultas["turnos"]
 
     turnos = []
-    for turno in turnos_qs.order_by("-fecha_hora")[:120]:
-        try:
-            ultimo_historial = (
-                HistorialTurno.objects.filter(turno=turno)
-                .values("accion", "origen", "created_at")
-                .order_by("-created_at")
-                .first()
-            )
-        except Exception:
-            ultimo_historial = None
+    for turno in consultas["turnos_detalle"][:120]:
         try:
             cambios_turno = list(
                 HistorialTurno.objects.filter(turno=turno)
@@ -949,8 +712,8 @@ def auditoria_operativa(request):
             "sala": turno.sala.nombre if turno.sala else "Sin sala",
             "estado": turno.get_estado_display(),
             "metodo_pago": turno.get_metodo_pago_display() if turno.metodo_pago else "Sin pago",
-            "canal": (ultimo_historial or {}).get("origen") or turno.get_canal_reserva_display() if turno.canal_reserva else (ultimo_historial or {}).get("origen") or "panel",
-            "ultimo_cambio": (ultimo_historial or {}).get("accion") or "Sin historial operativo",
+            "canal": turno.ultimo_origen or (turno.get_canal_reserva_display() if turno.canal_reserva else "panel"),
+            "ultimo_cambio": turno.ultimo_cambio or "Sin historial operativo",
             "monto": float(turno.precio_final or turno.servicio.precio or 0),
             "cambios": [
                 {
@@ -1006,118 +769,11 @@ def auditoria_operativa(request):
 
     ofertas = []
     if tipo in ["todos", "ofertas", "automatizaciones"]:
-        notificaciones = Notificacion.objects.filter(
-            tipo="fidelizacion", created_at__gte=desde_dt, created_at__lte=hasta_dt
-        ).select_related("usuario")
-        if cliente_id and cliente_id != "todos":
-            if str(cliente_id).isdigit():
-                notificaciones = notificaciones.filter(usuario__cliente_profile__id=cliente_id)
-            else:
-                notificaciones = notificaciones.filter(
-                    Q(usuario__first_name__icontains=cliente_id)
-                    | Q(usuario__last_name__icontains=cliente_id)
-                    | Q(usuario__email__icontains=cliente_id)
-                    | Q(usuario__dni__icontains=cliente_id)
-                )
-        for item in notificaciones[:80]:
-            data = item.data or {}
-            ofertas.append({
-                "id": f"pa1-{item.id}",
-                "pa": "Oferta de fidelización",
-                "cliente": item.usuario.full_name,
-                "fecha": item.created_at.isoformat(),
-                "estado": "Leída" if item.leida else "Enviada",
-                "turno": data.get("turno_id") or "-",
-                "servicio": data.get("servicio_id") or "-",
-                "resultado": item.titulo,
-                "detalle": item.mensaje,
-            })
-
-        logs = LogReasignacion.objects.filter(fecha_envio__gte=desde_dt, fecha_envio__lte=hasta_dt).select_related("cliente_notificado__user", "turno_cancelado__servicio", "turno_ofrecido")
-        if servicio_id and servicio_id != "todos":
-            if str(servicio_id).isdigit():
-                logs = logs.filter(turno_cancelado__servicio_id=servicio_id)
-            else:
-                logs = logs.filter(turno_cancelado__servicio__nombre__icontains=servicio_id)
-        if profesional_id and profesional_id != "todos":
-            if str(profesional_id).isdigit():
-                logs = logs.filter(turno_cancelado__empleado_id=profesional_id)
-            else:
-                logs = logs.filter(
-                    Q(turno_cancelado__empleado__user__first_name__icontains=profesional_id)
-                    | Q(turno_cancelado__empleado__user__last_name__icontains=profesional_id)
-                    | Q(turno_cancelado__empleado__user__email__icontains=profesional_id)
-                )
-        if sala_id and sala_id != "todos":
-            if str(sala_id).isdigit():
-                logs = logs.filter(turno_cancelado__sala_id=sala_id)
-            else:
-                logs = logs.filter(turno_cancelado__sala__nombre__icontains=sala_id)
-        if cliente_id and cliente_id != "todos":
-            if str(cliente_id).isdigit():
-                logs = logs.filter(cliente_notificado_id=cliente_id)
-            else:
-                logs = logs.filter(
-                    Q(cliente_notificado__user__first_name__icontains=cliente_id)
-                    | Q(cliente_notificado__user__last_name__icontains=cliente_id)
-                    | Q(cliente_notificado__user__email__icontains=cliente_id)
-                    | Q(cliente_notificado__user__dni__icontains=cliente_id)
-                )
-        for item in logs[:80]:
-            ofertas.append({
-                "id": f"pa2-{item.id}",
-                "pa": "Reacomodamiento",
-                "cliente": item.cliente_notificado.nombre_completo,
-                "fecha": item.fecha_envio.isoformat(),
-                "estado": item.estado_final or "Pendiente",
-                "turno": item.turno_cancelado_id,
-                "servicio": item.turno_cancelado.servicio.nombre if item.turno_cancelado and item.turno_cancelado.servicio else "-",
-                "resultado": f"Ofrecido #{item.turno_ofrecido_id or '-'}",
-                "detalle": f"Descuento ${item.monto_descuento}",
-            })
-
-        rewards = StreakRewardEvent.objects.filter(created_at__gte=desde_dt, created_at__lte=hasta_dt).select_related("cliente__user", "turno__servicio")
-        if servicio_id and servicio_id != "todos":
-            if str(servicio_id).isdigit():
-                rewards = rewards.filter(turno__servicio_id=servicio_id)
-            else:
-                rewards = rewards.filter(turno__servicio__nombre__icontains=servicio_id)
-        if profesional_id and profesional_id != "todos":
-            if str(profesional_id).isdigit():
-                rewards = rewards.filter(turno__empleado_id=profesional_id)
-            else:
-                rewards = rewards.filter(
-                    Q(turno__empleado__user__first_name__icontains=profesional_id)
-                    | Q(turno__empleado__user__last_name__icontains=profesional_id)
-                    | Q(turno__empleado__user__email__icontains=profesional_id)
-                )
-        if sala_id and sala_id != "todos":
-            if str(sala_id).isdigit():
-                rewards = rewards.filter(turno__sala_id=sala_id)
-            else:
-                rewards = rewards.filter(turno__sala__nombre__icontains=sala_id)
-        if cliente_id and cliente_id != "todos":
-            if str(cliente_id).isdigit():
-                rewards = rewards.filter(cliente_id=cliente_id)
-            else:
-                rewards = rewards.filter(
-                    Q(cliente__user__first_name__icontains=cliente_id)
-                    | Q(cliente__user__last_name__icontains=cliente_id)
-                    | Q(cliente__user__email__icontains=cliente_id)
-                    | Q(cliente__user__dni__icontains=cliente_id)
-                )
-        for item in rewards[:80]:
-            ofertas.append({
-                "id": f"pa3-{item.id}",
-                "pa": "Bono por racha",
-                "cliente": item.cliente.nombre_completo,
-                "fecha": item.created_at.isoformat(),
-                "estado": item.get_status_display(),
-                "turno": item.turno_id,
-                "servicio": item.turno.servicio.nombre if item.turno and item.turno.servicio else "-",
-                "resultado": f"Hito {item.milestone_number}",
-                "detalle": f"Bono ${item.bonus_amount}",
-            })
+        ofertas = [
+            {**fila, "fecha": fila["fecha"].isoformat()}
+            for filas in exportacion_reportes_service.filas_ofertas(consultas, limite=80)
+            for fila in filas
+        ]
 
     profesionales = []
     for profesional in Empleado.objects.select_related("user").filter(id__in=turnos_qs.values("empleado_id").distinct())[:120]:
@@ -1163,146 +819,22 @@ def auditoria_operativa(request):
             "ultima_reserva": ultimo.fecha_hora.isoformat() if ultimo and ultimo.fecha_hora else None,
         })
 
-    finanzas = []
-    movimientos = MovimientoBilletera.objects.filter(created_at__date__gte=fecha_desde, created_at__date__lte=fecha_hasta).select_related("billetera__cliente__user")
-    if cliente_id and cliente_id != "todos":
-        if str(cliente_id).isdigit():
-            movimientos = movimientos.filter(billetera__cliente_id=cliente_id)
-        else:
-            movimientos = movimientos.filter(
-                Q(billetera__cliente__user__first_name__icontains=cliente_id)
-                | Q(billetera__cliente__user__last_name__icontains=cliente_id)
-                | Q(billetera__cliente__user__email__icontains=cliente_id)
-                | Q(billetera__cliente__user__dni__icontains=cliente_id)
-            )
-    if search:
-        movimientos = movimientos.filter(
-            Q(billetera__cliente__user__first_name__icontains=search)
-            | Q(billetera__cliente__user__last_name__icontains=search)
-            | Q(billetera__cliente__user__email__icontains=search)
-            | Q(descripcion__icontains=search)
-        )
-    for mov in movimientos[:80]:
-        finanzas.append({
-            "id": f"mov-{mov.id}",
-            "fecha": mov.created_at.isoformat(),
-            "entidad": "Billetera",
-            "actor": mov.billetera.cliente.nombre_completo,
-            "accion": mov.get_tipo_display(),
-            "monto": float(mov.monto),
-            "estado": "Aplicado",
-            "detalle": mov.descripcion or "Movimiento de billetera",
-        })
-    pagos = PagoMercadoPago.objects.filter(creado_en__date__gte=fecha_desde, creado_en__date__lte=fecha_hasta).select_related("cliente__user")
-    if cliente_id and cliente_id != "todos":
-        if str(cliente_id).isdigit():
-            pagos = pagos.filter(cliente_id=cliente_id)
-        else:
-            pagos = pagos.filter(
-                Q(cliente__user__first_name__icontains=cliente_id)
-                | Q(cliente__user__last_name__icontains=cliente_id)
-                | Q(cliente__user__email__icontains=cliente_id)
-                | Q(cliente__user__dni__icontains=cliente_id)
-            )
-    if search:
-        pagos = pagos.filter(
-            Q(cliente__user__first_name__icontains=search)
-            | Q(cliente__user__last_name__icontains=search)
-            | Q(cliente__user__email__icontains=search)
-            | Q(descripcion__icontains=search)
-            | Q(preference_id__icontains=search)
-        )
-    for pago in pagos[:80]:
-        finanzas.append({
-            "id": f"pago-{pago.id}",
-            "fecha": pago.creado_en.isoformat(),
-            "entidad": "Mercado Pago",
-            "actor": pago.cliente.nombre_completo if pago.cliente else "Sistema",
-            "accion": "Pago",
-            "monto": float(pago.monto or 0),
-            "estado": pago.get_estado_display(),
-            "detalle": f"Turno #{pago.turno_id}",
-        })
+    finanzas = [
+        {**fila, "fecha": fila["fecha"].isoformat(), "monto": float(fila["monto"])}
+        for filas in exportacion_reportes_service.filas_finanzas(consultas, limite=80)
+        for fila in filas
+    ]
 
-    cambios = []
-    try:
-        telegram_turno_ids = set(HistorialTurno.objects.filter(origen="telegram").values_list("turno_id", flat=True))
-    except Exception:
-        telegram_turno_ids = set()
-    history_qs = Turno.history.model.objects.filter(history_date__gte=desde_dt, history_date__lte=hasta_dt).select_related("history_user", "cliente__user", "servicio")
-    if cliente_id and cliente_id != "todos":
-        if str(cliente_id).isdigit():
-            history_qs = history_qs.filter(cliente_id=cliente_id)
-        else:
-            history_qs = history_qs.filter(
-                Q(cliente__user__first_name__icontains=cliente_id)
-                | Q(cliente__user__last_name__icontains=cliente_id)
-                | Q(cliente__user__email__icontains=cliente_id)
-                | Q(cliente__user__dni__icontains=cliente_id)
-            )
-    if profesional_id and profesional_id != "todos":
-        if str(profesional_id).isdigit():
-            history_qs = history_qs.filter(empleado_id=profesional_id)
-        else:
-            history_qs = history_qs.filter(
-                Q(empleado__user__first_name__icontains=profesional_id)
-                | Q(empleado__user__last_name__icontains=profesional_id)
-                | Q(empleado__user__email__icontains=profesional_id)
-            )
-    if servicio_id and servicio_id != "todos":
-        if str(servicio_id).isdigit():
-            history_qs = history_qs.filter(servicio_id=servicio_id)
-        else:
-            history_qs = history_qs.filter(servicio__nombre__icontains=servicio_id)
-    if sala_id and sala_id != "todos":
-        if str(sala_id).isdigit():
-            history_qs = history_qs.filter(sala_id=sala_id)
-        else:
-            history_qs = history_qs.filter(sala__nombre__icontains=sala_id)
-    if estado and estado != "todos":
-        history_qs = history_qs.filter(estado=estado)
-    if canal and canal != "todos":
-        if canal == "telegram":
-            history_qs = history_qs.filter(id__in=telegram_turno_ids)
-        elif canal == "web":
-            history_qs = history_qs.filter(canal_reserva="web_cliente")
-        elif canal == "panel":
-            history_qs = history_qs.filter(canal_reserva__in=["panel_profesional", "panel_propietario"])
-        elif canal == "sistema":
-            history_qs = history_qs.filter(canal_reserva__isnull=True)
-    for record in history_qs.order_by("-history_date")[:120]:
-        previous = record.prev_record
-        changed = []
-        before_values = []
-        after_values = []
-        detail_changes = []
-        if previous:
-            for field in ["estado", "fecha_hora", "empleado_id", "servicio_id", "precio_final", "motivo_cancelacion"]:
-                previous_value = getattr(previous, field, None)
-                current_value = getattr(record, field, None)
-                if previous_value != current_value:
-                    changed.append(field)
-                    before_values.append(f"{field}: {previous_value or '-'}")
-                    after_values.append(f"{field}: {current_value or '-'}")
-                    detail_changes.append({
-                        "campo": field,
-                        "estado_anterior": str(previous_value or "-"),
-                        "estado_siguiente": str(current_value or "-"),
-                    })
-        cambios.append({
-            "id": record.history_id,
-            "fecha": record.history_date.isoformat(),
+    cambios = [
+        {
+            **fila,
+            "fecha": fila["fecha"].isoformat(),
             "entidad": "Turno",
-            "objeto_id": record.id,
-            "accion": record.get_history_type_display(),
-            "actor": record.history_user.full_name if record.history_user else "Sistema",
-            "canal": "telegram" if record.id in telegram_turno_ids else record.canal_reserva or "panel",
-            "motivo": record.history_change_reason or "Sin motivo registrado",
-            "campos": changed,
-            "antes": before_values[:4],
-            "despues": after_values[:4],
-            "detalle_cambios": detail_changes,
-        })
+            "antes": fila["antes"][:4],
+            "despues": fila["despues"][:4],
+        }
+        for fila in exportacion_reportes_service.filas_cambios(consultas, limite=120)
+    ]
 
     if tipo != "todos":
         allowed = {
@@ -1343,3 +875,40 @@ def auditoria_operativa(request):
                 payload[key] = []
 
     return Response(payload)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def exportaciones_reporte(request):
+    """Últimas exportaciones en segundo plano del usuario."""
+    exportaciones = ExportacionReporte.objects.filter(usuario=request.user)[:50]
+    return Response({"registros": [_exportacion_data(item) for item in exportaciones]})
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def detalle_exportacion_reporte(request, exportacion_id):
+    exportacion = ExportacionReporte.objects.filter(pk=exportacion_id, usuario=request.user).first()
+    if exportacion is None:
+        return Response({"error": "Exportación no encontrada"}, status=404)
+    return Response(_exportacion_data(exportacion))
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def descargar_exportacion_reporte(request, exportacion_id):
+    exportacion = ExportacionReporte.objects.filter(pk=exportacion_id, usuario=request.user).first()
+    if exportacion is None:
+        return Response({"error": "Exportación no encontrada"}, status=404)
+    if exportacion.estado != ExportacionReporte.ESTADO_LISTA:
+        return Response({"error": "La exportación todavía no está lista", "estado": exportacion.estado}, status=409)
+    try:
+        archivo = exportacion_reportes_service.abrir_archivo(exportacion)
+    except FileNotFoundError:
+        return Response({"error": "El archivo de la exportación ya no está disponible"}, status=410)
+    return FileResponse(
+        archivo,
+        as_attachment=True,
+        filename=exportacion.archivo.rsplit("/", 1)[-1],
+        content_type=exportacion_reportes_service.CONTENT_TYPES[exportacion.formato],
+    )
@@ -0,0 +1,68 @@
+"""
+Management command para completar los teléfonos normalizados existentes.
+
+Recalcula ``User.phone_normalized`` y ``Turno.walkin_telefono_normalizado``
+con ``normalize_phone`` para las filas creadas antes de que esos campos se
+mantuvieran en ``save()``. Es idempotente: solo escribe las filas cuyo valor
+cambia.
+"""
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+
+from apps.turnos.models import Turno
+from apps.users.utils import normalize_phone
+
+
+class Command(BaseCommand):
+    help = "Completa phone_normalized de usuarios y el teléfono normalizado de walk-ins"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Filas por lote de lectura y bulk_update (default: 1000)",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options["batch_size"])
+        User = get_user_model()
+
+        usuarios = self._backfill(
+            User.objects.exclude(phone__isnull=True).exclude(phone=""),
+            origen="phone",
+            destino="phone_normalized",
+            batch_size=batch_size,
+        )
+        self.stdout.write(f"Usuarios actualizados: {usuarios}")
+
+        # QuerySet.bulk_update no dispara save() ni el historial del turno.
+        walkins = self._backfill(
+            Turno.objects.exclude(walkin_telefono__isnull=True).exclude(walkin_telefono=""),
+            origen="walkin_telefono",
+            destino="walkin_telefono_normalizado",
+            batch_size=batch_size,
+        )
+        self.stdout.write(f"Turnos walk-in actualizados: {walkins}")
+
+        self.stdout.write(self.style.SUCCESS("Teléfonos normalizados al día."))
+
+    def _backfill(self, queryset, origen: str, destino: str, batch_size: int) -> int:
+        model = queryset.model
+        pendientes = []
+        actualizados = 0
+        for pk, valor, actual in queryset.values_list("pk", origen, destino).iterator(
+            chunk_size=batch_size
+        ):
+            normalizado = normalize_phone(valor)
+            if normalizado == actual:
+                continue
+            pendientes.append(model(pk=pk, **{destino: normalizado}))
+            if len(pendientes) >= batch_size:
+                model.objects.bulk_update(pendientes, [destino])
+                actualizados += len(pendientes)
+                pendientes = []
+        if pendientes:
+            model.objects.bulk_update(pendientes, [destino])
+            actualizados += len(pendientes)
+        return actualizados
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='phone_normalized',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, help_text="Clave E.164 sin '+' derivada de phone; se mantiene en save()", max_length=20, verbose_name='Teléfono normalizado'),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.db import models
 
+from apps.users.utils import normalize_phone
+
 
 class UserManager(BaseUserManager):
     """
@@ -82,6 +84,15 @@ class User(AbstractUser):
     phone = models.CharField(
         max_length=20, blank=True, null=True, verbose_name="Teléfono"
     )
+    phone_normalized = models.CharField(
+        max_length=20,
+        blank=True,
+        default="",
+        db_index=True,
+        editable=False,
+        verbose_name="Teléfono normalizado",
+        help_text="Clave E.164 sin '+' derivada de phone; se mantiene en save()",
+    )
     role = models.CharField(
         max_length=15, choices=ROLE_CHOICES, default="cliente", verbose_name="Rol"
     )
@@ -108,6 +119,13 @@ class User(AbstractUser):
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.email})"
 
+    def save(self, *args, **kwargs):
+        self.phone_normalized = normalize_phone(self.phone)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "phone" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "phone_normalized"}
+        super().save(*args, **kwargs)
+
     @property
     def full_name(self):
         return f"{self.first_name} {self.last_name}".strip()
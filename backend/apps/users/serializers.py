@@ -2,6 +2,7 @@
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
 from .models import User
+from .utils import normalize_phone
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -156,9 +157,13 @@ class UserUpdateSerializer(serializers.ModelSerializer):
         if value in [None, ""]:
             return value
 
+        phone_normalized = normalize_phone(value)
+        if not phone_normalized:
+            return value
+
         current_user = self.instance
         exists = (
-            User.objects.filter(phone=value)
+            User.objects.filter(phone_normalized=phone_normalized)
             .exclude(id=current_user.id)
             .exists()
         )
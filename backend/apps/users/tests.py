@@ -1,3 +1,6 @@
+from io import StringIO
+
+from django.core.management import call_command
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.authtoken.models import Token
@@ -62,3 +65,50 @@ class UserPhoneAndTelegramTests(APITestCase):
 		self.assertEqual(response.status_code, status.HTTP_200_OK)
 		self.assertEqual(response.data.get("telegram_chat_id"), 987654)
 		self.assertTrue(response.data.get("has_telegram_link"))
+
+	def test_update_phone_rejects_same_phone_in_other_format(self):
+		User.objects.create_user(
+			email="cliente3@test.com",
+			password="password1.2.3",
+			username="cliente3",
+			role="cliente",
+			phone="011 3333 4444",
+		)
+
+		url = reverse("users:update-phone")
+		response = self.client.patch(url, {"phone": "+54 9 11 3333-4444"}, format="json")
+
+		self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PhoneNormalizedTests(APITestCase):
+	def test_save_maintains_phone_normalized_with_update_fields(self):
+		user = User.objects.create_user(
+			email="normalizado@test.com",
+			password="password1.2.3",
+			username="normalizado",
+			phone="011 2233 4455",
+		)
+		self.assertEqual(user.phone_normalized, "5491122334455")
+
+		user.phone = "+54 9 351 555-6677"
+		user.save(update_fields=["phone"])
+
+		user.refresh_from_db()
+		self.assertEqual(user.phone_normalized, "5493515556677")
+
+	def test_backfill_command_fills_missing_keys(self):
+		user = User.objects.create_user(
+			email="backfill@test.com",
+			password="password1.2.3",
+			username="backfill",
+			phone="11 2233-4455",
+		)
+		User.objects.filter(pk=user.pk).update(phone_normalized="")
+
+		out = StringIO()
+		call_command("backfill_phone_normalized", stdout=out)
+
+		user.refresh_from_db()
+		self.assertEqual(user.phone_normalized, "5491122334455")
+		self.assertIn("Usuarios actualizados: 1", out.getvalue())
@@ -0,0 +1,70 @@
+"""Utilidades de usuarios: normalización de teléfonos para búsquedas indexadas."""
+
+import re
+
+
+def normalize_phone(value):
+    if not value:
+        return ""
+    digits = re.sub(r"\D", "", str(value))
+    if digits.startswith("00"):
+        digits = digits[2:]
+    if digits.startswith("0") and len(digits) > 10:
+        digits = digits[1:]
+    if digits.startswith("549"):
+        return digits
+    if digits.startswith("54"):
+        return f"549{digits[2:]}"
+    if len(digits) == 10:
+        return f"549{digits}"
+    return digits
+
+
+def phone_variants(value):
+    """Genera variantes de telefono para empatar formato local e internacional."""
+    if not value:
+        return set()
+
+    digits = re.sub(r"\D", "", str(value))
+    if not digits:
+        return set()
+
+    if digits.startswith("00"):
+        digits = digits[2:]
+
+    variants = {digits}
+
+    # Formato internacional AR (54 / 549)
+    if digits.startswith("549"):
+        variants.add(digits[2:])  # 9 + area + numero
+        variants.add(digits[3:])  # area + numero
+    if digits.startswith("54"):
+        variants.add(digits[2:])
+
+    # Prefijo local con 0 troncal
+    if digits.startswith("0"):
+        variants.add(digits[1:])
+
+    # Si tiene prefijo 9 de celular internacional, quitarlo
+    for candidate in list(variants):
+        if candidate.startswith("9") and len(candidate) >= 10:
+            variants.add(candidate[1:])
+
+    # Si llega sin prefijo pais y tiene 10 digitos (area + numero), agregar variantes AR.
+    for candidate in list(variants):
+        if len(candidate) == 10 and candidate.isdigit():
+            variants.add(f"54{candidate}")
+            variants.add(f"549{candidate}")
+            variants.add(f"0{candidate}")
+
+    return {v for v in variants if v}
+
+
+def phone_lookup_keys(value):
+    """Claves normalizadas a buscar en ``phone_normalized`` para ``value``.
+
+    Normaliza cada variante local/internacional del número, de modo que un
+    filtro ``phone_normalized__in`` empate los mismos formatos que comparar
+    variantes fila por fila.
+    """
+    return {key for key in map(normalize_phone, phone_variants(value)) if key}
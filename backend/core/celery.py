@@ -38,6 +38,46 @@ app.conf.beat_schedule = {
         'task': 'apps.emails.tasks.enviar_alertas_vencimiento_racha',
         'schedule': crontab(hour=10, minute=0),
     },
+    # Persistencia diferida de last_seen_at de Telegram (estado en caché)
+    'persistir-last-seen-telegram': {
+        'task': 'apps.telegram_bot.persistir_last_seen',
+        'schedule': 60.0,
+    },
+    # Reconciliación de pagos de Mercado Pago sin webhook
+    'reconciliar-pagos-mercadopago': {
+        'task': 'apps.mercadopago.tasks.reconciliar_pagos',
+        'schedule': 60.0,
+    },
+    # Limpieza de bloqueos temporales de horario vencidos (checkout MP)
+    'limpiar-bloqueos-temporales-turnos': {
+        'task': 'apps.turnos.tasks.limpiar_bloqueos_temporales',
+        'schedule': 300.0,
+    },
+    # Vencimiento de cupones de racha (las lecturas ya los tratan como vencidos)
+    'expirar-cupones-racha': {
+        'task': 'apps.turnos.tasks.expirar_cupones_racha',
+        'schedule': crontab(minute=10),
+    },
+    # Limpieza de exportaciones de reportes vencidas
+    'limpiar-exportaciones-reporte': {
+        'task': 'apps.turnos.tasks.limpiar_exportaciones_reporte',
+        'schedule': crontab(hour=4, minute=30),
+    },
+    # Verificación del libro de movimientos contra el saldo de las billeteras
+    'verificar-libro-billeteras': {
+        'task': 'apps.clientes.tasks.verificar_libro_billeteras',
+        'schedule': crontab(hour=3, minute=15),
+    },
+    # Resúmenes mensuales de billeteras (solo procesa meses cerrados pendientes)
+    'consolidar-saldos-mensuales-billeteras': {
+        'task': 'apps.clientes.tasks.consolidar_saldos_mensuales',
+        'schedule': crontab(hour=2, minute=45),
+    },
+    # Vencimiento del saldo de billeteras y avisos de saldo por vencer
+    'procesar-vencimientos-billeteras': {
+        'task': 'apps.clientes.tasks.procesar_vencimientos_billeteras',
+        'schedule': crontab(hour=9, minute=0),
+    },
 }
 
 @app.task(bind=True, ignore_result=True)
@@ -78,6 +78,7 @@ INSTALLED_APPS = [
     "social_django",  # Google OAuth
     "simple_history",
     # Local apps
+    "apps.core",
     "apps.authentication",
     "apps.users",
     "apps.turnos",
@@ -90,6 +91,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primero para medir el request completo; se descarta solo si está desactivado.
+    "apps.core.middleware.RequestProfilingMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
@@ -408,6 +411,101 @@ MERCADO_PAGO_PENDING_URL = env(
     "MERCADO_PAGO_PENDING_URL", default="http://localhost:3000/pago-pendiente"
 )  # Monto mínimo permitido por Mercado Pago (en ARS). MP rechaza montos menores.
 MP_MIN_AMOUNT = config("MP_MIN_AMOUNT", default=50, cast=float)
+# Sesión HTTP compartida con la API de MP (ver apps.mercadopago.client).
+MP_HTTP_POOL_SIZE = config("MP_HTTP_POOL_SIZE", default=10, cast=int)
+MP_HTTP_CONNECT_TIMEOUT = config("MP_HTTP_CONNECT_TIMEOUT", default=5, cast=float)
+MP_HTTP_READ_TIMEOUT = config("MP_HTTP_READ_TIMEOUT", default=20, cast=float)
+MP_HTTP_GET_RETRIES = config("MP_HTTP_GET_RETRIES", default=2, cast=int)
+# Verificación de pagos por long-poll (ver apps.mercadopago.eventos). Con
+# MP_PAYMENT_EVENTS_REDIS_URL el webhook despierta a los clientes en espera por
+# pub/sub y el límite de reconciliación se comparte entre workers.
+MP_PAYMENT_EVENTS_REDIS_URL = config("MP_PAYMENT_EVENTS_REDIS_URL", default="")
+MP_PAYMENT_EVENTS_CACHE_ALIAS = "mercadopago" if MP_PAYMENT_EVENTS_REDIS_URL else "default"
+MP_VERIFICAR_PAGO_ESPERA_MAX = config("MP_VERIFICAR_PAGO_ESPERA_MAX", default=25, cast=float)
+MP_VERIFICAR_PAGO_DB_INTERVAL = config("MP_VERIFICAR_PAGO_DB_INTERVAL", default=1, cast=float)
+MP_RECONCILIACION_INTERVALO = config("MP_RECONCILIACION_INTERVALO", default=10, cast=int)
+MP_RECONCILIACION_MAX_POR_SEGUNDO = config("MP_RECONCILIACION_MAX_POR_SEGUNDO", default=5, cast=int)
+# Con False (default) VerificarPago solo lee la base y espera eventos: los
+# webhooks perdidos los recupera la tarea reconciliar_pagos.
+MP_VERIFICAR_PAGO_CONSULTAR_MP = config("MP_VERIFICAR_PAGO_CONSULTAR_MP", default=False, cast=bool)
+MP_RECONCILIACION_ANTIGUEDAD_MINUTOS = config("MP_RECONCILIACION_ANTIGUEDAD_MINUTOS", default=5, cast=int)
+MP_RECONCILIACION_VENTANA_HORAS = config("MP_RECONCILIACION_VENTANA_HORAS", default=48, cast=int)
+MP_RECONCILIACION_LOTE = config("MP_RECONCILIACION_LOTE", default=50, cast=int)
+MP_RECONCILIACION_CONCURRENCIA = config("MP_RECONCILIACION_CONCURRENCIA", default=4, cast=int)
+# ──────────────────────────────────────────────────────────────────────────────
+
+# ── Bloqueos temporales de horario ───────────────────────────────────────────
+# Minutos que un horario queda reservado entre la creación de la preferencia
+# de MP y el webhook de aprobación (o la cancelación). La preferencia (o la
+# orden QR) vence al mismo tiempo que el bloqueo.
+TURNOS_BLOQUEO_TEMPORAL_MINUTOS = config("TURNOS_BLOQUEO_TEMPORAL_MINUTOS", default=15, cast=int)
+# ──────────────────────────────────────────────────────────────────────────────
+
+# ── Comprobantes PDF ─────────────────────────────────────────────────────────
+# PDFs de comprobantes guardados por hash de contenido (mismo formato que una
+# entrada de STORAGES; en producción puede ser un bucket compartido).
+COMPROBANTES_PDF_STORAGE = {
+    "BACKEND": config(
+        "COMPROBANTES_PDF_STORAGE_BACKEND",
+        default="django.core.files.storage.FileSystemStorage",
+    ),
+    "OPTIONS": {
+        "location": config(
+            "COMPROBANTES_PDF_DIR", default=str(BASE_DIR / "media" / "comprobantes")
+        ),
+    },
+}
+COMPROBANTES_PDF_CACHE_ALIAS = config("COMPROBANTES_PDF_CACHE_ALIAS", default="default")
+# Vigencia (segundos) del índice turno → hash del PDF vigente.
+COMPROBANTES_PDF_INDEX_TTL = config("COMPROBANTES_PDF_INDEX_TTL", default=60 * 60, cast=int)
+# Exportación ZIP: procesos del pool del comando exportar_comprobantes (0 = uno
+# por CPU; el endpoint renderiza siempre en serie), PDFs por lote y rango
+# máximo de días.
+COMPROBANTES_EXPORT_PROCESOS = config("COMPROBANTES_EXPORT_PROCESOS", default=0, cast=int)
+COMPROBANTES_EXPORT_LOTE = config("COMPROBANTES_EXPORT_LOTE", default=16, cast=int)
+COMPROBANTES_EXPORT_MAX_DIAS = config("COMPROBANTES_EXPORT_MAX_DIAS", default=366, cast=int)
+# ──────────────────────────────────────────────────────────────────────────────
+
+# ── Exportación de reportes ──────────────────────────────────────────────────
+# CSV/XLSX de los reportes (?format=csv|xlsx). Las exportaciones pedidas con
+# modo=async se escriben en este storage y se borran después de
+# REPORTES_EXPORT_RETENCION_DIAS.
+REPORTES_EXPORT_STORAGE = {
+    "BACKEND": config(
+        "REPORTES_EXPORT_STORAGE_BACKEND",
+        default="django.core.files.storage.FileSystemStorage",
+    ),
+    "OPTIONS": {
+        "location": config("REPORTES_EXPORT_DIR", default=str(BASE_DIR / "media" / "reportes")),
+    },
+}
+# Filas por lectura de los querysets (.iterator(chunk_size=...)).
+REPORTES_EXPORT_CHUNK = config("REPORTES_EXPORT_CHUNK", default=1000, cast=int)
+REPORTES_EXPORT_RETENCION_DIAS = config("REPORTES_EXPORT_RETENCION_DIAS", default=7, cast=int)
+# ──────────────────────────────────────────────────────────────────────────────
+
+# ── Vencimiento de billeteras ────────────────────────────────────────────────
+# La tarea diaria da de baja el saldo vencido y avisa a quienes vence dentro de
+# BILLETERA_AVISO_VENCIMIENTO_DIAS, de a BILLETERA_VENCIMIENTO_LOTE billeteras.
+BILLETERA_VENCIMIENTO_LOTE = config("BILLETERA_VENCIMIENTO_LOTE", default=1000, cast=int)
+BILLETERA_AVISO_VENCIMIENTO_DIAS = config("BILLETERA_AVISO_VENCIMIENTO_DIAS", default=7, cast=int)
+# ──────────────────────────────────────────────────────────────────────────────
+
+# ── Envíos masivos ───────────────────────────────────────────────────────────
+# Las tareas que avisan a muchos clientes mandan los emails en lotes de
+# EMAIL_ENVIO_LOTE mensajes por conexión SMTP, con EMAIL_ENVIO_CONCURRENCIA
+# conexiones en paralelo. RACHA_ALERTAS_LOTE: rachas por lote de alertas.
+EMAIL_ENVIO_LOTE = config("EMAIL_ENVIO_LOTE", default=50, cast=int)
+EMAIL_ENVIO_CONCURRENCIA = config("EMAIL_ENVIO_CONCURRENCIA", default=4, cast=int)
+RACHA_ALERTAS_LOTE = config("RACHA_ALERTAS_LOTE", default=500, cast=int)
+# ──────────────────────────────────────────────────────────────────────────────
+
+# ── Reasignación de turnos ───────────────────────────────────────────────────
+# Al liberarse un hueco se guarda un ranking de hasta REASIGNACION_CANDIDATOS_MAX
+# candidatos. REASIGNACION_OFERTAS_SIMULTANEAS > 1 ofrece el hueco a varios a la
+# vez: el primero que acepta se lo queda y las demás ofertas se cierran.
+REASIGNACION_CANDIDATOS_MAX = config("REASIGNACION_CANDIDATOS_MAX", default=50, cast=int)
+REASIGNACION_OFERTAS_SIMULTANEAS = config("REASIGNACION_OFERTAS_SIMULTANEAS", default=1, cast=int)
 # ──────────────────────────────────────────────────────────────────────────────
 
 # ── Telegram Bot ─────────────────────────────────────────────────────────────
@@ -419,6 +517,68 @@ TELEGRAM_DEBUG = config("TELEGRAM_DEBUG", default=False, cast=bool)
 TELEGRAM_API_REQUEST_TIMEOUT = config(
     "TELEGRAM_API_REQUEST_TIMEOUT", default=10, cast=int
 )
+# Cliente compartido (apps/telegram_bot/client.py): base de la API (apuntar a
+# un servidor local para pruebas), límites de envío y reintentos ante 429.
+TELEGRAM_API_BASE = config("TELEGRAM_API_BASE", default="https://api.telegram.org")
+TELEGRAM_GLOBAL_RATE_PER_SEC = config("TELEGRAM_GLOBAL_RATE_PER_SEC", default=30, cast=float)
+TELEGRAM_CHAT_RATE_PER_SEC = config("TELEGRAM_CHAT_RATE_PER_SEC", default=1, cast=float)
+TELEGRAM_CHAT_BURST = config("TELEGRAM_CHAT_BURST", default=3, cast=int)
+TELEGRAM_MAX_RETRIES = config("TELEGRAM_MAX_RETRIES", default=2, cast=int)
+TELEGRAM_MAX_RETRY_AFTER = config("TELEGRAM_MAX_RETRY_AFTER", default=30, cast=int)
+TELEGRAM_BATCH_CONCURRENCY = config("TELEGRAM_BATCH_CONCURRENCY", default=8, cast=int)
+# Estado de conversación y vínculos en caché (apps/telegram_bot/state_store.py).
+# TELEGRAM_STATE_CACHE_URL apunta a un Redis compartido por web y workers.
+TELEGRAM_STATE_CACHE_ENABLED = config("TELEGRAM_STATE_CACHE_ENABLED", default=False, cast=bool)
+TELEGRAM_STATE_CACHE_URL = config("TELEGRAM_STATE_CACHE_URL", default="")
+TELEGRAM_STATE_CACHE_ALIAS = "telegram" if TELEGRAM_STATE_CACHE_URL else "default"
+TELEGRAM_STATE_TTL = config("TELEGRAM_STATE_TTL", default=60 * 60 * 24, cast=int)
+TELEGRAM_LAST_SEEN_THROTTLE = config("TELEGRAM_LAST_SEEN_THROTTLE", default=60, cast=int)
+# Vigencia (segundos) del snapshot de fechas/horarios del flujo de reprogramación.
+TELEGRAM_REPROGRAM_OPTIONS_TTL = config("TELEGRAM_REPROGRAM_OPTIONS_TTL", default=300, cast=int)
+
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+}
+if TELEGRAM_STATE_CACHE_URL:
+    CACHES["telegram"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": TELEGRAM_STATE_CACHE_URL,
+        "KEY_PREFIX": "beautiful",
+    }
+if MP_PAYMENT_EVENTS_REDIS_URL:
+    CACHES["mercadopago"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": MP_PAYMENT_EVENTS_REDIS_URL,
+        "KEY_PREFIX": "beautiful",
+    }
+# ──────────────────────────────────────────────────────────────────────────────
+
+# ── Perfilado de requests ────────────────────────────────────────────────────
+# Desactivado no tiene costo: el middleware se descarta al arrancar.
+REQUEST_PROFILING_ENABLED = config("REQUEST_PROFILING_ENABLED", default=False, cast=bool)
+REQUEST_PROFILING_SLOW_MS = config("REQUEST_PROFILING_SLOW_MS", default=500, cast=int)
+REQUEST_PROFILING_BUFFER_SIZE = config(
+    "REQUEST_PROFILING_BUFFER_SIZE", default=100, cast=int
+)
+REQUEST_PROFILING_MAX_QUERIES = config(
+    "REQUEST_PROFILING_MAX_QUERIES", default=50, cast=int
+)
+REQUEST_PROFILING_SERVER_TIMING = config(
+    "REQUEST_PROFILING_SERVER_TIMING", default=True, cast=bool
+)
+REQUEST_PROFILING_PATH_PREFIXES = config(
+    "REQUEST_PROFILING_PATH_PREFIXES",
+    default="/api/",
+    cast=lambda v: tuple(s.strip() for s in v.split(",") if s.strip()),
+)
+# ──────────────────────────────────────────────────────────────────────────────
+
+# ── Métricas (Prometheus) ────────────────────────────────────────────────────
+# Token para /metrics (Authorization: Bearer <token>). Sin token, fuera de
+# DEBUG el endpoint solo responde a usuarios staff autenticados. Con gunicorn
+# multiproceso, exportar además PROMETHEUS_MULTIPROC_DIR en el entorno (ver
+# apps/core/metrics.py).
+METRICS_AUTH_TOKEN = config("METRICS_AUTH_TOKEN", default="")
 # ──────────────────────────────────────────────────────────────────────────────
 
 # Logging
@@ -19,6 +19,8 @@ from django.contrib import admin
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
+from apps.core.views import metrics_view
+
 # Create a router for API endpoints
 router = DefaultRouter()
 
@@ -42,4 +44,5 @@ urlpatterns = [
     path("api/mercadopago/", include("apps.mercadopago.urls")),
     path("api/telegram/", include("apps.telegram_bot.urls")),
     path("api-auth/", include("rest_framework.urls")),
+    path("metrics", metrics_view, name="metrics"),
 ]